@@ -9,13 +9,31 @@ ln(Q) = C + α×ln(GDP) + β×ln(P_relative) + γ×ln(Tax_rate) + δ1×D2008 + 
 import pandas as pd
 import numpy as np
 import statsmodels.api as sm
+import argparse
 import os
 import json
 
+from lib.backfill import BACKFILL_LOG_FILE
+from lib.collinearity import collinearity_diagnostics
+from lib.results_store import ResultsStore, file_hash, make_key
+from lib.structural_break import break_dummies
+
+parser = argparse.ArgumentParser(description='需要関数の推定（年次データ・レベルモデル）')
+parser.add_argument('--break-dummies', action='store_true',
+                    help='イベントダミーの代わりに09で検出した構造変化の時点の水準シフトダミーを使用')
+parser.add_argument('--backfill', action='store_true',
+                    help='1990年より前の過去データを接続して延長した年次データ（データ準備の09）を使用')
+args = parser.parse_args()
+
 # 出力ディレクトリ
 output_dir = 'analysis/results'
 os.makedirs(output_dir, exist_ok=True)
 
+# 構造変化ダミー・延長したデータを使う場合は別のファイル名で保存（02・03の既定の入力は上書きしない）
+model_type = 'annual_level_model_breaks' if args.break_dummies else 'annual_level_model'
+if args.backfill:
+    model_type += '_backfill'
+
 print("="*60)
 print("需要関数の推定（年次データ・レベルモデル）")
 print("="*60)
@@ -33,11 +51,18 @@ print("現在の方法: 年次データ + 実質GDP + 相対価格 + ダミー
 print("\n" + "="*60)
 print("データの読み込み")
 print("="*60)
-data_file = 'analysis/demand_regression_data_annual_log_transformed.csv'
-if not os.path.exists(data_file):
-    print("エラー: 対数変換済み年次データが見つかりません。")
-    print("先に 07_prepare_annual_log_transformed_data.py を実行してください。")
-    exit(1)
+if args.backfill:
+    data_file = BACKFILL_LOG_FILE
+    if not os.path.exists(data_file):
+        print("エラー: 延長した年次データが見つかりません。")
+        print("先に 09_backfill_historical_data.py を実行してください。")
+        exit(1)
+else:
+    data_file = 'analysis/demand_regression_data_annual_log_transformed.csv'
+    if not os.path.exists(data_file):
+        print("エラー: 対数変換済み年次データが見つかりません。")
+        print("先に 07_prepare_annual_log_transformed_data.py を実行してください。")
+        exit(1)
 
 df = pd.read_csv(data_file, encoding='utf-8-sig')
 df['Year'] = df['Year'].astype(str)
@@ -71,6 +96,19 @@ if 'D2020' in df.columns:
 if 'D2009' in df.columns:
     dummy_vars.append('D2009')
 
+if args.break_dummies:
+    breaks_file = f'{output_dir}/09_structural_breaks.json'
+    if not os.path.exists(breaks_file):
+        print(f"エラー: {breaks_file} が見つかりません。")
+        print("先に 09_detect_structural_breaks.py を実行してください。")
+        exit(1)
+    with open(breaks_file, 'r', encoding='utf-8') as f:
+        break_dates = json.load(f)['annual']['break_dates']
+    breaks = break_dummies(df['Year'], break_dates)
+    df = pd.concat([df, breaks.set_axis(df.index)], axis=1)
+    dummy_vars = list(breaks.columns)
+    print(f"09で検出した構造変化の時点: {break_dates}")
+
 print(f"使用するダミー変数: {dummy_vars}")
 
 df_complete = df[
@@ -128,28 +166,55 @@ if len(X) < 10:
 X = sm.add_constant(X)
 X.columns = ['const', 'ln_GDP', 'ln_P', 'ln_Tax_rate'] + dummy_vars
 
-# OLS回帰分析の実行
-model = sm.OLS(y, X).fit()
-
-# 結果の表示
-print("\n" + "="*60)
-print("回帰分析結果")
-print("="*60)
-print(model.summary())
+# 推定結果ストアのキー（データ・推定式・推定オプションが同じなら同じキーになる）
+store = ResultsStore()
+data_version = file_hash(data_file)
+model_spec = {
+    'formula': 'ln(Q) = C + α×ln(GDP) + β×ln(P) + γ×ln(Tax_rate) + dummies',
+    'price_variable': ln_price_col,
+    'regressors': list(X.columns),
+    'sample_years': df_complete.loc[y.index, 'Year'].tolist(),
+}
+model_options = {'estimator': 'OLS', 'cov_type': 'nonrobust'}
+model_key = make_key(data_version, model_spec, model_options)
+cached = store.load(model_key)
+
+if cached is not None:
+    # 同じ入力で推定済みの場合はストアから読み込む
+    print(f"\n推定結果ストアに同じ入力の結果があります（key: {model_key[:12]}）。再推定を省略します。")
+    params = pd.Series(cached['arrays']['params'], index=X.columns)
+    pvalues = pd.Series(cached['arrays']['pvalues'], index=X.columns)
+    rsquared = cached['summary']['rsquared']
+    rsquared_adj = cached['summary']['rsquared_adj']
+    fvalue = cached['summary']['fvalue']
+    f_pvalue = cached['summary']['f_pvalue']
+else:
+    # OLS回帰分析の実行
+    model = sm.OLS(y, X).fit()
+
+    # 結果の表示
+    print("\n" + "="*60)
+    print("回帰分析結果")
+    print("="*60)
+    print(model.summary())
+
+    params = model.params
+    pvalues = model.pvalues
+    rsquared = model.rsquared
+    rsquared_adj = model.rsquared_adj
+    fvalue = model.fvalue
+    f_pvalue = model.f_pvalue
 
 # 係数の抽出
-alpha = model.params['ln_GDP']      # 所得弾力性
-beta = model.params['ln_P']         # 価格弾力性
-gamma = model.params['ln_Tax_rate'] # 税率弾力性
-const = model.params['const']       # 定数項
+alpha = params['ln_GDP']      # 所得弾力性
+beta = params['ln_P']         # 価格弾力性
+gamma = params['ln_Tax_rate'] # 税率弾力性
+const = params['const']       # 定数項
 
 # ダミー変数の係数
 dummy_coeffs = {}
 for dummy in dummy_vars:
-    dummy_coeffs[dummy] = model.params[dummy]
-
-# P値の抽出
-pvalues = model.pvalues
+    dummy_coeffs[dummy] = params[dummy]
 
 # 結果の保存
 print("\n" + "="*60)
@@ -174,10 +239,10 @@ for dummy, coeff in dummy_coeffs.items():
 print("\n" + "="*60)
 print("統計的有意性")
 print("="*60)
-print(f"R-squared: {model.rsquared:.4f} ({model.rsquared*100:.1f}%)")
-print(f"Adjusted R-squared: {model.rsquared_adj:.4f} ({model.rsquared_adj*100:.1f}%)")
-print(f"F統計量: {model.fvalue:.4f}")
-print(f"F統計量のP値: {model.f_pvalue:.6f} {'***' if model.f_pvalue < 0.001 else '**' if model.f_pvalue < 0.01 else '*' if model.f_pvalue < 0.05 else '(非有意)'}")
+print(f"R-squared: {rsquared:.4f} ({rsquared*100:.1f}%)")
+print(f"Adjusted R-squared: {rsquared_adj:.4f} ({rsquared_adj*100:.1f}%)")
+print(f"F統計量: {fvalue:.4f}")
+print(f"F統計量のP値: {f_pvalue:.6f} {'***' if f_pvalue < 0.001 else '**' if f_pvalue < 0.01 else '*' if f_pvalue < 0.05 else '(非有意)'}")
 
 print(f"\n各係数の有意性:")
 print(f"  所得弾力性 (α): P値 = {pvalues['ln_GDP']:.6f} {'***' if pvalues['ln_GDP'] < 0.001 else '**' if pvalues['ln_GDP'] < 0.01 else '*' if pvalues['ln_GDP'] < 0.05 else '(非有意)'}")
@@ -201,7 +266,7 @@ results_df = pd.DataFrame({
 })
 
 results_df.to_csv(
-    os.path.join(output_dir, '01_demand_function_coefficients_annual_level_model.csv'),
+    os.path.join(output_dir, f'01_demand_function_coefficients_{model_type}.csv'),
     index=False,
     encoding='utf-8-sig'
 )
@@ -210,7 +275,7 @@ results_df.to_csv(
 df_analysis = df_complete[['Year', 'Q (liters)', 'P (yen/liter)', 'Tax_rate (%)', 'GDP (trillion yen)', 
                            'CPI', 'P_relative', 'ln_Q', 'ln_P', 'ln_P_relative', 'ln_GDP', 'ln_Tax_rate'] + dummy_vars].copy()
 df_analysis.to_csv(
-    os.path.join(output_dir, '01_analysis_data_annual_level_model.csv'),
+    os.path.join(output_dir, f'01_analysis_data_{model_type}.csv'),
     index=False,
     encoding='utf-8-sig'
 )
@@ -221,23 +286,52 @@ results_json = {
     'beta': float(beta),
     'gamma': float(gamma),
     'const': float(const),
-    'rsquared': float(model.rsquared),
-    'rsquared_adj': float(model.rsquared_adj),
-    'f_pvalue': float(model.f_pvalue),
-    'model_type': 'annual_level_model',
+    'rsquared': float(rsquared),
+    'rsquared_adj': float(rsquared_adj),
+    'f_pvalue': float(f_pvalue),
+    'model_type': model_type,
     'dummy_variables': {d: float(dummy_coeffs[d]) for d in dummy_vars},
     'dummy_pvalues': {d: float(pvalues[d]) for d in dummy_vars}
 }
 
-with open(os.path.join(output_dir, '01_coefficients_annual_level_model.json'), 'w', encoding='utf-8') as f:
+with open(os.path.join(output_dir, f'01_coefficients_{model_type}.json'), 'w', encoding='utf-8') as f:
     json.dump(results_json, f, indent=2, ensure_ascii=False)
 
+# 推定結果ストアにも保存（係数・共分散行列・残差・理論値をバイナリで保持）
+if cached is None:
+    # 多重共線性の診断も推定結果に添付（相関行列の逆行列1回で計算）
+    diagnostics = collinearity_diagnostics(X.drop(columns=['const']))
+    store.save(
+        model_key,
+        model_type=model_type,
+        data_version=data_version,
+        spec=model_spec,
+        options=model_options,
+        summary={
+            **results_json,
+            'fvalue': float(fvalue),
+            'model_key': model_key,
+            'vif': dict(zip(diagnostics['vif']['Variable'], diagnostics['vif']['VIF'].astype(float))),
+            'max_condition_index': float(diagnostics['condition']['Condition_Index'].max()),
+        },
+        arrays={
+            'params': model.params.to_numpy(),
+            'bse': model.bse.to_numpy(),
+            'pvalues': model.pvalues.to_numpy(),
+            'cov_params': model.cov_params().to_numpy(),
+            'resid': model.resid.to_numpy(),
+            'fitted': model.fittedvalues.to_numpy(),
+        },
+        frame=df_analysis,
+    )
+
 print("\n" + "="*60)
 print("結果を保存しました")
 print("="*60)
-print(f"分析データ: {os.path.join(output_dir, '01_analysis_data_annual_level_model.csv')}")
-print(f"係数結果: {os.path.join(output_dir, '01_demand_function_coefficients_annual_level_model.csv')}")
-print(f"係数（JSON）: {os.path.join(output_dir, '01_coefficients_annual_level_model.json')}")
+print(f"分析データ: {os.path.join(output_dir, f'01_analysis_data_{model_type}.csv')}")
+print(f"係数結果: {os.path.join(output_dir, f'01_demand_function_coefficients_{model_type}.csv')}")
+print(f"係数（JSON）: {os.path.join(output_dir, f'01_coefficients_{model_type}.json')}")
+print(f"推定結果ストア: {store.store_dir}（key: {model_key[:12]}）")
 
 print("\n完了しました！")
 
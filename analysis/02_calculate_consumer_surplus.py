@@ -9,10 +9,18 @@
 """
 
 import pandas as pd
-import numpy as np
+import argparse
 import json
 import os
 
+from lib.consumer_surplus import trapezoid_cs
+from lib.results_store import ResultsStore
+
+parser = argparse.ArgumentParser(description='消費者余剰の計算')
+parser.add_argument('--model-key', default=None,
+                    help='推定結果ストアのキー（先頭12文字程度でも可）。省略時は01のJSONを使用')
+args = parser.parse_args()
+
 # 出力ディレクトリ
 output_dir = 'analysis/results'
 os.makedirs(output_dir, exist_ok=True)
@@ -23,14 +31,21 @@ print("="*60)
 
 # 1. 需要関数の推定結果を読み込む（年次データ版）
 print("\n需要関数の推定結果を読み込み中...")
-coeff_file = f'{output_dir}/01_coefficients_annual_level_model.json'
-if not os.path.exists(coeff_file):
-    print(f"エラー: {coeff_file} が見つかりません。")
-    print("先に 01_estimate_demand_function_annual_level_model.py を実行してください。")
-    exit(1)
-
-with open(coeff_file, 'r', encoding='utf-8') as f:
-    coefficients = json.load(f)
+record = None
+if args.model_key:
+    store = ResultsStore()
+    record = store.load(store.resolve(args.model_key))
+    coefficients = record['summary']
+    print(f"推定結果ストアから読み込みました（key: {record['key'][:12]}）")
+else:
+    coeff_file = f'{output_dir}/01_coefficients_annual_level_model.json'
+    if not os.path.exists(coeff_file):
+        print(f"エラー: {coeff_file} が見つかりません。")
+        print("先に 01_estimate_demand_function_annual_level_model.py を実行してください。")
+        exit(1)
+
+    with open(coeff_file, 'r', encoding='utf-8') as f:
+        coefficients = json.load(f)
 
 alpha = coefficients['alpha']
 beta = coefficients['beta']
@@ -45,74 +60,45 @@ print(f"  R²: {coefficients.get('rsquared', 0):.4f}")
 
 # 2. 分析データを読み込む（年次データ版）
 print("\n分析データを読み込み中...")
-data_file = f'{output_dir}/01_analysis_data_annual_level_model.csv'
-if not os.path.exists(data_file):
-    print(f"エラー: {data_file} が見つかりません。")
-    exit(1)
-
-df = pd.read_csv(data_file)
+if record is not None and record['frame'] is not None:
+    df = record['frame']
+else:
+    data_file = f'{output_dir}/01_analysis_data_annual_level_model.csv'
+    if not os.path.exists(data_file):
+        print(f"エラー: {data_file} が見つかりません。")
+        exit(1)
+
+    df = pd.read_csv(data_file)
 print(f"データ期間: {df['Year'].min()} - {df['Year'].max()}")
 print(f"データ行数: {len(df)}行")
-print(f"データタイプ: 年次データ")
+# 推定結果ストアのモデル（16 の月次の差分モデルなど）は、その頻度の分析データ（期間ごとの Q・P）で計算
+print(f"データタイプ: {'年次データ' if record is None else coefficients.get('model_type', 'N/A')}")
 
 # 3. 消費者余剰の計算（測定方法総論に基づく）
 print("\n消費者余剰を計算中...")
-results = []
-
-for i in range(1, len(df)):  # 最初の行は除外（前四半期比のため）
-    year = df.iloc[i]['Year']
-    q_prev = df.iloc[i-1]['Q (liters)']
-    q_curr = df.iloc[i]['Q (liters)']
-    p_prev = df.iloc[i-1]['P (yen/liter)']
-    p_curr = df.iloc[i]['P (yen/liter)']
-    
-    # 価格要因の寄与率を計算
-    # Xt+1 = β(exp(lnPt+1－lnPt)－1)／(exp(lnQt+1－lnQt)－1)
-    if q_curr != q_prev and p_curr != p_prev:
-        ln_p_change = np.log(p_curr) - np.log(p_prev)
-        ln_q_change = np.log(q_curr) - np.log(q_prev)
-        
-        if abs(ln_q_change) > 1e-10:  # ゼロ除算を避ける
-            price_contribution = beta * (np.exp(ln_p_change) - 1) / (np.exp(ln_q_change) - 1)
-        else:
-            price_contribution = 0
-    else:
-        price_contribution = 0
-    
-    # 需要増加分のうち価格要因によって説明される部分
-    # Yt+1 = Xt+1 × (Qt+1－Qt)
-    demand_change = q_curr - q_prev
-    price_effect = price_contribution * demand_change
-    
-    # 消費者余剰の増分となる台形の面積を計算
-    # (Qt＋Qt＋Yt+1)×(Pt－Pt+1)×1/2
-    if p_prev != p_curr:
-        cs_increase = (q_prev + q_curr + price_effect) * (p_prev - p_curr) * 0.5
-    else:
-        cs_increase = 0
-    
-    # 累積消費者余剰の計算
-    if i == 1:
-        cumulative_cs = cs_increase
-    else:
-        cumulative_cs = results[-1]['Cumulative_CS'] + cs_increase
-    
-    results.append({
-        'Year': year,
-        'Q_prev': q_prev,
-        'Q_curr': q_curr,
-        'P_prev': p_prev,
-        'P_curr': p_curr,
-        'Price_Contribution': price_contribution,
-        'Price_Effect': price_effect,
-        'CS_Increase': cs_increase,
-        'Cumulative_CS': cumulative_cs,
-        'ΔQ': demand_change,
-        'ΔP': p_curr - p_prev
-    })
-
-# 4. 結果をDataFrameに変換
-results_df = pd.DataFrame(results)
+# 価格要因の寄与率 Xt+1、価格要因部分 Yt+1、台形の面積を全期間まとめて計算（lib/consumer_surplus.py）
+q = df['Q (liters)'].to_numpy(dtype=float)
+p = df['P (yen/liter)'].to_numpy(dtype=float)
+cs = trapezoid_cs(q, p, beta)
+
+# 4. 結果をDataFrameに変換（最初の行は前年比のため除外）
+# 数値の年は従来どおり 2008.0 の形式で出力（四半期・月次の期間ラベルは文字列のまま）
+years = df['Year'].to_numpy()
+if pd.api.types.is_numeric_dtype(df['Year']):
+    years = years.astype(float)
+results_df = pd.DataFrame({
+    'Year': years[1:],
+    'Q_prev': q[:-1],
+    'Q_curr': q[1:],
+    'P_prev': p[:-1],
+    'P_curr': p[1:],
+    'Price_Contribution': cs['Price_Contribution'],
+    'Price_Effect': cs['Price_Effect'],
+    'CS_Increase': cs['CS_Increase'],
+    'Cumulative_CS': cs['Cumulative_CS'],
+    'ΔQ': cs['ΔQ'],
+    'ΔP': cs['ΔP'],
+})
 
 # 5. 統計情報の表示
 print("\n" + "="*60)
@@ -138,13 +124,17 @@ print(f"  価格下落: {price_decrease}四半期")
 correlation = results_df['ΔP'].corr(results_df['CS_Increase'])
 print(f"  価格変化と余剰変化の相関係数: {correlation:.4f}")
 
-# 6. 結果を保存
-results_df.to_csv(f'{output_dir}/02_consumer_surplus_results.csv', index=False, encoding='utf-8-sig')
+# 6. 結果を保存（ストアのモデルを使った場合はキー付きのファイル名）
+if record is not None:
+    cs_file = f"{output_dir}/02_consumer_surplus_results_{record['key'][:12]}.csv"
+else:
+    cs_file = f'{output_dir}/02_consumer_surplus_results.csv'
+results_df.to_csv(cs_file, index=False, encoding='utf-8-sig')
 
 print(f"\n" + "="*60)
 print("結果を保存しました")
 print("="*60)
-print(f"消費者余剰計算結果: {output_dir}/02_consumer_surplus_results.csv")
+print(f"消費者余剰計算結果: {cs_file}")
 
 # 7. サマリーを表示
 print(f"\n最初の10行:")
@@ -9,9 +9,17 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+import argparse
 import json
 import os
 
+from lib.results_store import ResultsStore
+
+parser = argparse.ArgumentParser(description='分析結果の可視化')
+parser.add_argument('--model-key', default=None,
+                    help='推定結果ストアのキー（先頭12文字程度でも可）。省略時は01のJSONを使用')
+args = parser.parse_args()
+
 # 出力ディレクトリ
 output_dir = 'analysis/results'
 figures_dir = 'analysis/figures'
@@ -35,15 +43,26 @@ print("="*60)
 # 1. データの読み込み
 print("\nデータを読み込み中...")
 
-# 需要関数の係数（年次データ版）
-with open(f'{output_dir}/01_coefficients_annual_level_model.json', 'r', encoding='utf-8') as f:
-    coefficients = json.load(f)
+if args.model_key:
+    # 推定結果ストアのモデルを使用（02も同じキーで実行済みであること）
+    store = ResultsStore()
+    record = store.load(store.resolve(args.model_key))
+    coefficients = record['summary']
+    df_analysis = record['frame']
+    df_cs = pd.read_csv(f"{output_dir}/02_consumer_surplus_results_{record['key'][:12]}.csv")
+    figures_dir = os.path.join(figures_dir, record['key'][:12])
+    os.makedirs(figures_dir, exist_ok=True)
+    print(f"推定結果ストアから読み込みました（key: {record['key'][:12]}）")
+else:
+    # 需要関数の係数（年次データ版）
+    with open(f'{output_dir}/01_coefficients_annual_level_model.json', 'r', encoding='utf-8') as f:
+        coefficients = json.load(f)
 
-# 分析データ（年次データ版）
-df_analysis = pd.read_csv(f'{output_dir}/01_analysis_data_annual_level_model.csv')
+    # 分析データ（年次データ版）
+    df_analysis = pd.read_csv(f'{output_dir}/01_analysis_data_annual_level_model.csv')
 
-# 消費者余剰の結果
-df_cs = pd.read_csv(f'{output_dir}/02_consumer_surplus_results.csv')
+    # 消費者余剰の結果
+    df_cs = pd.read_csv(f'{output_dir}/02_consumer_surplus_results.csv')
 
 # Yearをdatetimeに変換（年次データの場合）
 def year_to_date(year_str):
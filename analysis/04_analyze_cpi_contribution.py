@@ -10,7 +10,6 @@ CPIへのガソリン価格寄与度分析スクリプト
 """
 
 import pandas as pd
-import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # 非対話型バックエンドを使用
 import matplotlib.pyplot as plt
@@ -18,6 +17,9 @@ import matplotlib.dates as mdates
 from datetime import datetime
 import os
 
+from lib.cpi_contribution import CPI_ITEMS_FILE, ENERGY_CODES, TOTAL, CPIMatrix
+from lib.price_decomposition import TaxSchedule, decompose
+
 # 出力ディレクトリ
 output_dir = 'analysis/results'
 figures_dir = 'analysis/figures'
@@ -33,31 +35,21 @@ print("="*60)
 # ============================================================================
 print("\n1. データ読み込み中...")
 
-# CPIデータ（品目別）
+# CPIデータ（品目別）: 全ての類・品目の指数とウエイトの行列（lib/cpi_contribution.py）
 print("  - CPIデータ（品目別）を読み込み中...")
-df_cpi_items = pd.read_csv(
-    'data/-2025消費者物価指数/自由帳 - zni2020a-品目別.csv',
-    encoding='utf-8-sig',
-    header=None
-)
+cpi = CPIMatrix.from_file(CPI_ITEMS_FILE)
 
-# ガソリンの列を特定（1行目のヘッダーから）
-japanese_headers = df_cpi_items.iloc[0]
-gasoline_col_index = None
-for idx, col_name in enumerate(japanese_headers):
-    if isinstance(col_name, str) and "ガソリン" in col_name:
-        gasoline_col_index = idx
-        break
-
-if gasoline_col_index is None:
+# ガソリンの列を特定（品目符号から）
+try:
+    gasoline_column = cpi.column(ENERGY_CODES['gasoline'])
+except KeyError:
     raise ValueError("CPIデータで「ガソリン」の列が見つかりませんでした。")
 
-print(f"  - ガソリンの列インデックス: {gasoline_col_index}")
+print(f"  - ガソリンの列: {cpi.names[gasoline_column]}（品目符号 {cpi.codes[gasoline_column]}）")
 
-# CPIのガソリンウェイトを取得（5行目のウエイト）
-weights_row = df_cpi_items.iloc[4]  # ウエイトの行（0-indexedなので4行目）
-total_weight = float(weights_row[1])  # 総合のウエイト（2列目）
-gasoline_weight = float(weights_row[gasoline_col_index])
+# CPIのガソリンウェイトを取得
+total_weight = cpi.weights[cpi.column(TOTAL)]  # 総合のウエイト
+gasoline_weight = cpi.weights[gasoline_column]
 
 # ウェイトの割合を計算
 gasoline_weight_percentage = (gasoline_weight / total_weight) * 100
@@ -65,30 +57,12 @@ print(f"  - CPI総合のウエイト: {total_weight:,.0f}")
 print(f"  - ガソリンのウエイト: {gasoline_weight:,.0f}")
 print(f"  - CPIに占めるガソリンのウェイト: {gasoline_weight_percentage:.2f}%")
 
-# CPIデータの年次データを抽出（7行目以降がデータ）
-# 列名を設定
-df_cpi_data = df_cpi_items.iloc[6:].copy()  # 7行目以降
-df_cpi_data.columns = df_cpi_items.iloc[0]  # 1行目を列名に
-
-# 年列とガソリン指数列を抽出
-cpi_years = []
-cpi_gasoline_index = []
-
-for idx, row in df_cpi_data.iterrows():
-    year_str = str(row.iloc[0])  # 1列目が年
-    if year_str.isdigit():
-        year = int(year_str)
-        if 2007 <= year <= 2025:
-            cpi_years.append(year)
-            gasoline_index_val = row.iloc[gasoline_col_index]
-            try:
-                cpi_gasoline_index.append(float(gasoline_index_val))
-            except (ValueError, TypeError):
-                cpi_gasoline_index.append(np.nan)
-
+# 2007-2025年のガソリン指数を抽出
+cpi_years = cpi.periods.astype('datetime64[Y]').astype(int) + 1970
+in_range = (cpi_years >= 2007) & (cpi_years <= 2025)
 df_cpi_gasoline = pd.DataFrame({
-    'Year': cpi_years,
-    'CPI_Gasoline_Index': cpi_gasoline_index
+    'Year': cpi_years[in_range],
+    'CPI_Gasoline_Index': cpi.index[in_range, gasoline_column]
 })
 
 print(f"  - CPIガソリン指数データ: {len(df_cpi_gasoline)}年分")
@@ -109,28 +83,14 @@ df_price = df_price.dropna(subset=['P (yen/liter)'])
 
 print(f"  - ガソリン価格データ: {len(df_price)}行")
 
-# ガソリン税額データ
+# ガソリン税額データ（四半期ごとの税率表）
 print("  - ガソリン税額データを読み込み中...")
-df_tax = pd.read_csv(
-    'data/-2025ガソリン関連税四半期ごと/gasoline_tax_quarterly.csv',
-    encoding='utf-8-sig'
-)
-
-# 2007-2025年のデータを抽出
-df_tax = df_tax[(df_tax['Year'] >= 2007) & (df_tax['Year'] <= 2025)].copy()
-
-# Year_Quarter列を作成してマージ
-df_tax['Year_Quarter'] = df_tax['Year'].astype(int).astype(str) + '-Q' + df_tax['Quarter'].astype(int).astype(str)
+schedule = TaxSchedule.from_quarterly_table()
 df_price['Year_Quarter'] = df_price['Year'].astype(int).astype(str) + '-Q' + df_price['Quarter'].astype(int).astype(str)
 
-# マージ
-df_price = df_price.merge(
-    df_tax[['Year_Quarter', '合計従量税率_円L', '消費税率_%']],
-    on='Year_Quarter',
-    how='left'
-)
+specific_tax, consumption_tax_rate = schedule.lookup(df_price['Year_Quarter'])
 
-print(f"  - マージ後のデータ: {len(df_price)}行")
+print(f"  - 税率を対応させたデータ: {len(df_price)}行")
 
 # ============================================================================
 # 2. ガソリン価格の分解
@@ -140,26 +100,16 @@ print("\n2. ガソリン価格の分解中...")
 # 税込み価格 = P (yen/liter)
 df_price['Price_TaxInclusive'] = df_price['P (yen/liter)']
 
-# ガソリン税額（円/L）= 合計従量税率_円L
-df_price['Gasoline_Tax_Amount'] = df_price['合計従量税率_円L']
-
-# 消費税額の計算
-# 消費税は、ガソリン税を除いた価格（本体価格 + ガソリン税）に課される
 # 税込み価格 = 本体価格 + ガソリン税 + 消費税
-# 消費税 = (本体価格 + ガソリン税) × 消費税率 / (1 + 消費税率)
-# または: 消費税 = (税込み価格 - ガソリン税) × 消費税率 / (1 + 消費税率)
-
-# 消費税率を取得（%から小数に変換）
-df_price['Consumption_Tax_Rate'] = df_price['消費税率_%'] / 100.0
-
-# 消費税額を計算
-# 税込み価格からガソリン税を引いた額が、消費税課税対象額（本体価格 + ガソリン税）
-# 消費税 = 消費税課税対象額 × 消費税率 / (1 + 消費税率)
-tax_base = df_price['Price_TaxInclusive'] - df_price['Gasoline_Tax_Amount']
-df_price['Consumption_Tax_Amount'] = tax_base * df_price['Consumption_Tax_Rate'] / (1 + df_price['Consumption_Tax_Rate'])
-
-# 本体価格（税抜き）= 税込み価格 - ガソリン税額 - 消費税額
-df_price['Price_Base'] = df_price['Price_TaxInclusive'] - df_price['Gasoline_Tax_Amount'] - df_price['Consumption_Tax_Amount']
+# 税込み価格からガソリン税を引いた額を消費税の課税対象として
+# 消費税 = (税込み価格 - ガソリン税) × 消費税率 / (1 + 消費税率)
+# 分解は lib/price_decomposition.py（税率は四半期ごとの税率表から引く、add_tax_rate_data.py と同じ定義）
+components = decompose(df_price['Price_TaxInclusive'].to_numpy(), specific_tax, consumption_tax_rate,
+                       tax_on_tax=False)
+df_price['Gasoline_Tax_Amount'] = components['excise']
+df_price['Consumption_Tax_Rate'] = consumption_tax_rate
+df_price['Consumption_Tax_Amount'] = components['consumption_tax']
+df_price['Price_Base'] = components['base_price']
 
 # 年次データに集約
 df_annual = df_price.groupby('Year').agg({
@@ -0,0 +1,222 @@
+"""
+正則化回帰による需要関数の推定（リッジ・ラッソ・エラスティックネット）
+ln(Q) = C + α×ln(GDP) + β×ln(P_relative) + γ×ln(Tax_rate) + δ×ダミー + ε
+
+step2_3のVIF診断で ln_P_relative と ln_Tax_rate の多重共線性（VIF > 40）が確認されたため、
+係数に罰則を課して推定を安定させます。
+
+- 01と同じ計画行列を使用（lib/design.py）
+- 罰則は弾力性（α, β, γ）のみに課し、ダミー変数には課さない
+- λは時系列交差検証（拡大ウィンドウ、1期先予測）で選択
+- 係数は01と同じJSON形式で保存（02の --model-key でも使用可能）
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import json
+import os
+import time
+
+from lib.design import coefficients_json, load_annual_design
+from lib.regularized import cross_validate
+from lib.results_store import ResultsStore, file_hash, make_key
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+# 推定する手法（l1_ratio: 1=ラッソ、0=リッジ、その間=エラスティックネット）
+METHODS = {
+    'ridge': 0.0,
+    'lasso': 1.0,
+    'elastic_net': 0.5,
+}
+N_LAMBDAS = 200
+MIN_TRAIN = 10  # 交差検証の最小学習期間（年）
+
+print("="*60)
+print("正則化回帰による需要関数の推定")
+print("="*60)
+
+# 1. データの読み込み（01と同じ計画行列）
+print("\n【1. データの読み込み】")
+design = load_annual_design()
+X = design['X']
+y = design['y']
+dummy_vars = design['dummy_vars']
+regressors = [c for c in X.columns if c != 'const']
+X_values = X[regressors].to_numpy(dtype=float)
+y_values = y.to_numpy(dtype=float)
+
+print(f"期間: {design['data']['Year'].min()} - {design['data']['Year'].max()}（{len(y)}行）")
+print(f"説明変数: {regressors}")
+print(f"罰則なしの変数（ダミー）: {dummy_vars}")
+
+penalty_factor = np.array([0.0 if c in dummy_vars else 1.0 for c in regressors])
+
+store = ResultsStore()
+data_version = file_hash(design['data_file'])
+path_frames = []
+summary_rows = []
+fitted_paths = {}
+
+for method, l1_ratio in METHODS.items():
+    print("\n" + "="*60)
+    print(f"【{method}】 l1_ratio = {l1_ratio}")
+    print("="*60)
+
+    start = time.perf_counter()
+    cv = cross_validate(
+        X_values, y_values, l1_ratio=l1_ratio, n_lambdas=N_LAMBDAS,
+        penalty_factor=penalty_factor, min_train=MIN_TRAIN
+    )
+    elapsed = time.perf_counter() - start
+    print(f"λの経路 {N_LAMBDAS}点 + 交差検証 {cv['n_splits']}分割: {elapsed*1000:.1f}ミリ秒")
+
+    path = cv['path']
+    i_min = cv['index_min']
+    coef = path['coef'][i_min]
+    intercept = path['intercept'][i_min]
+    params = pd.Series(np.concatenate([[intercept], coef]), index=['const'] + regressors)
+
+    # 選択されたλでの当てはまり（自由度は非ゼロ係数の数）
+    fitted = intercept + X_values @ coef
+    resid = y_values - fitted
+    rsquared = 1 - (resid ** 2).sum() / ((y_values - y_values.mean()) ** 2).sum()
+    k = int((np.abs(coef) > 0).sum())
+    n = len(y_values)
+    rsquared_adj = 1 - (1 - rsquared) * (n - 1) / (n - k - 1) if n - k - 1 > 0 else np.nan
+
+    print(f"選択されたλ（CV誤差最小）: {cv['lambda_min']:.6f}")
+    print(f"1標準誤差ルールのλ: {cv['lambda_1se']:.6f}")
+    print(f"CV平均二乗誤差: {cv['cv_mse'][i_min]:.6f}")
+    print(f"所得弾力性 (α): {params['ln_GDP']:.4f}")
+    print(f"価格弾力性 (β): {params['ln_P']:.4f}")
+    print(f"税率弾力性 (γ): {params['ln_Tax_rate']:.4f}")
+    print(f"R-squared: {rsquared:.4f}")
+
+    model_type = f'annual_level_model_{method}'
+    results_json = coefficients_json(
+        params, model_type, rsquared=rsquared, rsquared_adj=rsquared_adj,
+        dummy_vars=dummy_vars,
+        l1_ratio=l1_ratio,
+        lambda_selected=float(cv['lambda_min']),
+        lambda_1se=float(cv['lambda_1se']),
+        cv_mse=float(cv['cv_mse'][i_min]),
+        lambda_rule='time_series_cv_min',
+    )
+    json_file = os.path.join(output_dir, f'07_coefficients_regularized_{method}.json')
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(results_json, f, indent=2, ensure_ascii=False)
+    print(f"係数（JSON）: {json_file}")
+
+    # 推定結果ストアに保存
+    model_spec = {
+        'formula': 'ln(Q) = C + α×ln(GDP) + β×ln(P) + γ×ln(Tax_rate) + dummies',
+        'price_variable': design['ln_price_col'],
+        'regressors': list(X.columns),
+        'sample_years': design['data']['Year'].tolist(),
+    }
+    model_options = {
+        'estimator': 'coordinate_descent', 'l1_ratio': l1_ratio, 'n_lambdas': N_LAMBDAS,
+        'penalty_factor': penalty_factor.tolist(), 'cv': f'expanding_window_min_train_{MIN_TRAIN}',
+    }
+    model_key = make_key(data_version, model_spec, model_options)
+    store.save(
+        model_key, model_type=model_type, data_version=data_version,
+        spec=model_spec, options=model_options,
+        summary={**results_json, 'model_key': model_key},
+        arrays={
+            'params': params.to_numpy(),
+            'resid': resid,
+            'fitted': fitted,
+            'path_lambdas': path['lambdas'],
+            'path_coef': path['coef'],
+            'cv_mse': cv['cv_mse'],
+        },
+        frame=design['data'][['Year', 'Q (liters)', 'P (yen/liter)', 'Tax_rate (%)', 'GDP (trillion yen)',
+                              'CPI', 'P_relative', 'ln_Q', 'ln_P', 'ln_P_relative', 'ln_GDP', 'ln_Tax_rate']
+                             + dummy_vars],
+    )
+    print(f"推定結果ストア: key {model_key[:12]}")
+
+    path_df = pd.DataFrame(path['coef'], columns=regressors)
+    path_df.insert(0, 'lambda', path['lambdas'])
+    path_df.insert(0, 'method', method)
+    path_df['intercept'] = path['intercept']
+    path_df['cv_mse'] = cv['cv_mse']
+    path_df['cv_se'] = cv['cv_se']
+    path_frames.append(path_df)
+    fitted_paths[method] = cv
+
+    summary_rows.append({
+        'Method': method,
+        'l1_ratio': l1_ratio,
+        'lambda': cv['lambda_min'],
+        'α (所得弾力性)': params['ln_GDP'],
+        'β (価格弾力性)': params['ln_P'],
+        'γ (税率弾力性)': params['ln_Tax_rate'],
+        'R2': rsquared,
+        'CV_MSE': cv['cv_mse'][i_min],
+        'Model_Key': model_key[:12],
+    })
+
+# 2. 結果の保存
+path_file = os.path.join(output_dir, '07_regularization_path.csv')
+pd.concat(path_frames, ignore_index=True).to_csv(path_file, index=False, encoding='utf-8-sig')
+
+summary_df = pd.DataFrame(summary_rows)
+print("\n" + "="*60)
+print("手法ごとの比較")
+print("="*60)
+print(summary_df.round(4).to_string(index=False))
+
+# 3. 正則化パスのグラフ
+print("\nCreating Graph: Regularization Path...")
+fig, axes = plt.subplots(2, len(METHODS), figsize=(15, 8), sharex='col')
+colors = {'ln_GDP': '#2E86AB', 'ln_P': '#A23B72', 'ln_Tax_rate': '#06A77D'}
+for col, (method, cv) in enumerate(fitted_paths.items()):
+    ax = axes[0, col]
+    lambdas = cv['lambdas']
+    for j, name in enumerate(regressors):
+        if name in colors:
+            ax.plot(lambdas, cv['path']['coef'][:, j], label=name, color=colors[name], linewidth=2)
+    ax.axvline(cv['lambda_min'], color='black', linestyle='--', linewidth=1, label='λ (CV min)')
+    ax.axvline(cv['lambda_1se'], color='gray', linestyle=':', linewidth=1, label='λ (1SE)')
+    ax.axhline(0, color='black', linewidth=0.5)
+    ax.set_xscale('log')
+    ax.set_title(f'{method} Coefficient Path', fontweight='bold')
+    ax.set_ylabel('Coefficient')
+    ax.grid(True, alpha=0.3, linestyle='--')
+    if col == 0:
+        ax.legend(loc='best', fontsize=8)
+
+    ax = axes[1, col]
+    ax.plot(lambdas, cv['cv_mse'], color='#C73E1D', linewidth=2)
+    ax.fill_between(lambdas, cv['cv_mse'] - cv['cv_se'], cv['cv_mse'] + cv['cv_se'],
+                    color='#C73E1D', alpha=0.2)
+    ax.axvline(cv['lambda_min'], color='black', linestyle='--', linewidth=1)
+    ax.axvline(cv['lambda_1se'], color='gray', linestyle=':', linewidth=1)
+    ax.set_xscale('log')
+    ax.set_xlabel('λ')
+    ax.set_ylabel('Time-series CV MSE')
+    ax.grid(True, alpha=0.3, linestyle='--')
+
+plt.tight_layout()
+figure_file = f'{figures_dir}/10_regularization_path.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"正則化パス: {path_file}")
+print(f"係数（JSON）: {output_dir}/07_coefficients_regularized_*.json")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
@@ -0,0 +1,263 @@
+"""
+ベイズ推定による需要関数の推定と消費者余剰の事後分布
+ln(Q) = C + α×ln(GDP) + β×ln(P_relative) + γ×ln(Tax_rate) + δ×ダミー + ε
+
+年次データは18年分しかなく、01の点推定は不安定です。
+弾力性に前年度提出論文（同じ推定式の年次データ+ダミー変数モデル）の推定値を
+事前平均とする情報事前分布を置き、ギブスサンプラーで事後分布を求めます。
+
+- 01と同じ計画行列を使用（lib/design.py）
+- 多数のチェーンを配列の次元として同時に更新（lib/bayes.py）
+- 事後抽出値の β をそのまま02の台形近似（lib/consumer_surplus.py）に渡し、
+  年ごとの消費者余剰増分の事後分布を計算
+- 事後予測分布: 抽出した (b, σ²) から ln(Q) を生成し、予測数量での消費者余剰も計算
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import json
+import os
+import time
+
+from lib.bayes import gibbs_sampler, posterior_summary
+from lib.consumer_surplus import trapezoid_cs
+from lib.design import coefficients_json, load_annual_design
+from lib.results_store import ResultsStore, file_hash, make_key
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+# 事前分布（弾力性）
+# 事前平均: 前年度提出論文（project/前年度提出論文_コピペ.text）の推定値
+#   α=0.9527, β=3.7623, γ=2.2638（R²=0.9559）
+# 事前標準偏差は推定値の不確実性（サンプル期間・データ改訂）を見込んで広めに設定
+PRIOR_MEAN = {'ln_GDP': 0.9527, 'ln_P': 3.7623, 'ln_Tax_rate': 2.2638}
+PRIOR_SD = {'ln_GDP': 0.5, 'ln_P': 2.0, 'ln_Tax_rate': 1.5}
+VAGUE_SD = 100.0         # 定数項・ダミー変数の事前標準偏差（ほぼ無情報）
+SIGMA2_PRIOR = (0.01, 0.01)  # σ² の逆ガンマ事前分布（形状, 尺度）
+
+N_CHAINS = 1000
+N_DRAWS = 100            # チェーンあたり → 合計 100,000 抽出
+BURN_IN = 200
+N_STORE_DRAWS = 10000    # 推定結果ストアに保存する抽出値の数（間引き）
+SEED = 20250101
+
+print("="*60)
+print("ベイズ推定による需要関数の推定")
+print("="*60)
+
+# 1. データの読み込み（01と同じ計画行列）
+print("\n【1. データの読み込み】")
+design = load_annual_design()
+X = design['X']
+y = design['y']
+data = design['data']
+dummy_vars = design['dummy_vars']
+names = list(X.columns)
+
+print(f"期間: {data['Year'].min()} - {data['Year'].max()}（{len(y)}行）")
+print(f"説明変数: {names}")
+
+prior_mean = np.array([PRIOR_MEAN.get(c, 0.0) for c in names])
+prior_sd = np.array([PRIOR_SD.get(c, VAGUE_SD) for c in names])
+
+print("\n事前分布:")
+for c, m, s in zip(names, prior_mean, prior_sd):
+    print(f"  {c:12s}: N({m:.4f}, {s:.2f}²)")
+print(f"  σ²          : 逆ガンマ{SIGMA2_PRIOR}")
+
+# 2. ギブスサンプラー
+print("\n【2. ギブスサンプラー】")
+start = time.perf_counter()
+draws = gibbs_sampler(
+    X.to_numpy(dtype=float), y.to_numpy(dtype=float), prior_mean, prior_sd,
+    a0=SIGMA2_PRIOR[0], b0=SIGMA2_PRIOR[1],
+    n_chains=N_CHAINS, n_draws=N_DRAWS, burn_in=BURN_IN, seed=SEED
+)
+elapsed = time.perf_counter() - start
+n_total = N_CHAINS * N_DRAWS
+print(f"{N_CHAINS}チェーン × {N_DRAWS}抽出 = {n_total:,}抽出（バーンイン{BURN_IN}）: {elapsed:.2f}秒")
+
+summary_df = posterior_summary(draws['beta'], names)
+print("\n事後分布の要約（95%信用区間）:")
+print(summary_df.round(4).to_string(index=False))
+if (summary_df['R_hat'] > 1.01).any():
+    print("警告: R-hat > 1.01 の変数があります。BURN_IN を増やしてください。")
+
+beta_flat = draws['beta'].reshape(n_total, -1)
+sigma2_flat = draws['sigma2'].reshape(n_total)
+params = pd.Series(beta_flat.mean(axis=0), index=names)
+price_draws = beta_flat[:, names.index('ln_P')]
+
+# 事後平均での当てはまり
+fitted = X.to_numpy(dtype=float) @ params.to_numpy()
+resid = y.to_numpy(dtype=float) - fitted
+rsquared = 1 - (resid ** 2).sum() / ((y - y.mean()) ** 2).sum()
+
+print(f"\n所得弾力性 (α): {params['ln_GDP']:.4f}")
+print(f"価格弾力性 (β): {params['ln_P']:.4f}")
+print(f"税率弾力性 (γ): {params['ln_Tax_rate']:.4f}")
+print(f"R-squared（事後平均）: {rsquared:.4f}")
+
+# 3. 消費者余剰の事後分布（02と同じ台形近似を全抽出値で一度に計算）
+print("\n【3. 消費者余剰の事後分布】")
+q = data['Q (liters)'].to_numpy(dtype=float)
+p = data['P (yen/liter)'].to_numpy(dtype=float)
+years = data['Year'].to_numpy()[1:]
+
+start = time.perf_counter()
+cs_post = trapezoid_cs(q, p, price_draws)                      # (抽出数, 年数-1)
+
+# 事後予測: ln(Q) ~ N(Xb, σ²) から数量を生成して同じ計算
+rng = np.random.default_rng(SEED + 1)
+ln_q_pred = beta_flat @ X.to_numpy(dtype=float).T
+ln_q_pred += np.sqrt(sigma2_flat)[:, None] * rng.standard_normal(ln_q_pred.shape)
+cs_pred = trapezoid_cs(np.exp(ln_q_pred), p, price_draws)
+elapsed = time.perf_counter() - start
+print(f"{n_total:,}抽出 × {len(years)}年の消費者余剰: {elapsed:.2f}秒")
+
+
+def _interval(values, prob=0.95):
+    lower, upper = np.quantile(values, [(1 - prob) / 2, (1 + prob) / 2], axis=0)
+    return lower, upper
+
+
+cs_lower, cs_upper = _interval(cs_post['CS_Increase'])
+cum_lower, cum_upper = _interval(cs_post['Cumulative_CS'])
+pred_lower, pred_upper = _interval(cs_pred['CS_Increase'])
+cs_df = pd.DataFrame({
+    'Year': years,
+    'ΔP': cs_post['ΔP'][0],
+    'CS_Mean': cs_post['CS_Increase'].mean(axis=0),
+    'CS_Median': np.median(cs_post['CS_Increase'], axis=0),
+    'CS_Lower': cs_lower,
+    'CS_Upper': cs_upper,
+    'Cumulative_CS_Mean': cs_post['Cumulative_CS'].mean(axis=0),
+    'Cumulative_CS_Lower': cum_lower,
+    'Cumulative_CS_Upper': cum_upper,
+    'CS_Predictive_Mean': cs_pred['CS_Increase'].mean(axis=0),
+    'CS_Predictive_Lower': pred_lower,
+    'CS_Predictive_Upper': pred_upper,
+})
+
+print("\n消費者余剰増分の事後分布（兆円、95%信用区間）:")
+display_df = cs_df[['Year', 'ΔP', 'CS_Mean', 'CS_Lower', 'CS_Upper']].copy()
+for col in ['CS_Mean', 'CS_Lower', 'CS_Upper']:
+    display_df[col] = display_df[col] / 1e12
+print(display_df.round(4).to_string(index=False))
+print(f"\n累積消費者余剰（{years[-1]}年）: {cs_df['Cumulative_CS_Mean'].iloc[-1]/1e12:,.3f}兆円 "
+      f"[{cum_lower[-1]/1e12:,.3f}, {cum_upper[-1]/1e12:,.3f}]")
+
+# 4. 結果の保存
+summary_file = os.path.join(output_dir, '08_bayesian_posterior_summary.csv')
+summary_df.to_csv(summary_file, index=False, encoding='utf-8-sig')
+
+cs_file = os.path.join(output_dir, '08_consumer_surplus_posterior.csv')
+cs_df.to_csv(cs_file, index=False, encoding='utf-8-sig')
+
+model_type = 'annual_level_model_bayes'
+credible = {
+    row['Variable']: [float(row['Lower']), float(row['Upper'])]
+    for _, row in summary_df.iterrows()
+}
+results_json = coefficients_json(
+    params, model_type, rsquared=rsquared, dummy_vars=dummy_vars,
+    estimator='gibbs_sampler',
+    prior_mean=dict(zip(names, prior_mean.tolist())),
+    prior_sd=dict(zip(names, prior_sd.tolist())),
+    sigma2_prior=list(SIGMA2_PRIOR),
+    n_chains=N_CHAINS, n_draws=N_DRAWS, burn_in=BURN_IN,
+    credible_interval_95=credible,
+    max_rhat=float(summary_df['R_hat'].max()),
+)
+json_file = os.path.join(output_dir, '08_coefficients_bayesian.json')
+with open(json_file, 'w', encoding='utf-8') as f:
+    json.dump(results_json, f, indent=2, ensure_ascii=False)
+
+# 推定結果ストアに保存（抽出値は間引いて保存）
+store = ResultsStore()
+data_version = file_hash(design['data_file'])
+model_spec = {
+    'formula': 'ln(Q) = C + α×ln(GDP) + β×ln(P) + γ×ln(Tax_rate) + dummies',
+    'price_variable': design['ln_price_col'],
+    'regressors': names,
+    'sample_years': data['Year'].tolist(),
+}
+model_options = {
+    'estimator': 'gibbs_sampler',
+    'prior_mean': prior_mean.tolist(), 'prior_sd': prior_sd.tolist(), 'sigma2_prior': list(SIGMA2_PRIOR),
+    'n_chains': N_CHAINS, 'n_draws': N_DRAWS, 'burn_in': BURN_IN, 'seed': SEED,
+}
+model_key = make_key(data_version, model_spec, model_options)
+thin = np.linspace(0, n_total - 1, min(N_STORE_DRAWS, n_total)).astype(int)
+store.save(
+    model_key, model_type=model_type, data_version=data_version,
+    spec=model_spec, options=model_options,
+    summary={**results_json, 'model_key': model_key},
+    arrays={
+        'params': params.to_numpy(),
+        'resid': resid,
+        'fitted': fitted,
+        'beta_draws': beta_flat[thin],
+        'sigma2_draws': sigma2_flat[thin],
+        'cs_draws': cs_post['CS_Increase'][thin],
+    },
+    frame=data[['Year', 'Q (liters)', 'P (yen/liter)', 'Tax_rate (%)', 'GDP (trillion yen)',
+                'CPI', 'P_relative', 'ln_Q', 'ln_P', 'ln_P_relative', 'ln_GDP', 'ln_Tax_rate']
+               + dummy_vars],
+)
+
+# 5. グラフ: 弾力性の事前・事後分布と消費者余剰の事後分布
+print("\nCreating Graph: Bayesian Posterior...")
+fig = plt.figure(figsize=(15, 9))
+colors = {'ln_GDP': '#2E86AB', 'ln_P': '#A23B72', 'ln_Tax_rate': '#06A77D'}
+labels = {'ln_GDP': 'Income Elasticity (α)', 'ln_P': 'Price Elasticity (β)', 'ln_Tax_rate': 'Tax Elasticity (γ)'}
+for i, name in enumerate(['ln_GDP', 'ln_P', 'ln_Tax_rate']):
+    ax = fig.add_subplot(2, 3, i + 1)
+    j = names.index(name)
+    ax.hist(beta_flat[:, j], bins=80, density=True, color=colors[name], alpha=0.6, label='Posterior')
+    grid = np.linspace(*np.quantile(beta_flat[:, j], [0.0005, 0.9995]), 200)
+    prior_pdf = np.exp(-0.5 * ((grid - prior_mean[j]) / prior_sd[j]) ** 2) / (prior_sd[j] * np.sqrt(2 * np.pi))
+    ax.plot(grid, prior_pdf, color='black', linestyle='--', linewidth=1.5, label='Prior')
+    ax.axvline(params[name], color='black', linewidth=1)
+    ax.set_title(labels[name], fontweight='bold')
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.legend(fontsize=8)
+
+ax = fig.add_subplot(2, 1, 2)
+x_pos = np.arange(len(years))
+ax.fill_between(x_pos, pred_lower / 1e12, pred_upper / 1e12, color='#F18F01', alpha=0.2,
+                label='95% Posterior Predictive')
+ax.fill_between(x_pos, cs_lower / 1e12, cs_upper / 1e12, color='#A23B72', alpha=0.35,
+                label='95% Credible Interval')
+ax.plot(x_pos, cs_df['CS_Mean'] / 1e12, color='#A23B72', marker='o', linewidth=2, label='Posterior Mean')
+ax.axhline(0, color='black', linewidth=0.8)
+ax.set_xticks(x_pos)
+ax.set_xticklabels(years, rotation=45)
+ax.set_xlabel('Year', fontweight='bold')
+ax.set_ylabel('Consumer Surplus Increase (trillion yen)', fontweight='bold')
+ax.set_title('Posterior Distribution of Consumer Surplus Increase', fontweight='bold')
+ax.grid(True, alpha=0.3, linestyle='--')
+ax.legend(loc='best')
+
+plt.tight_layout()
+figure_file = f'{figures_dir}/11_bayesian_posterior.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"事後分布の要約: {summary_file}")
+print(f"消費者余剰の事後分布: {cs_file}")
+print(f"係数（JSON）: {json_file}")
+print(f"推定結果ストア: key {model_key[:12]}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
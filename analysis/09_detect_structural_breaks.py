@@ -0,0 +1,216 @@
+"""
+需要関数の構造変化の検定（Chow検定・sup-F検定・Bai–Perron）
+ln(Q) = C + α×ln(GDP) + β×ln(P_relative) + γ×ln(Tax_rate) + ε
+
+01と06のダミー変数（D2008, D2009, D2020）はイベントの年を想定して決めたものです。
+ここではダミー変数を入れずに推定式の係数が変化した時点をデータから探し、
+想定したイベントの年と比較します。
+
+- 年次データ（01と同じ期間）と四半期データ（季節ダミーつき）の両方で検定
+- 区間の残差平方和は累積積和から計算（lib/structural_break.py）
+- Bai–Perron で見つかった変化時点は analysis/results/09_structural_breaks.json に保存し、
+  01 を --break-dummies つきで実行すると、イベントダミーの代わりに水準シフトのダミー変数として使用
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import statsmodels.api as sm
+import json
+import os
+import time
+
+from lib.design import load_annual_design, load_quarterly_design
+from lib.structural_break import bai_perron, chow_test, sup_f_test
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+EVENT_YEARS = ['2008', '2009', '2020']  # 01・06のダミー変数のイベント年
+MAX_BREAKS = 5
+TRIM = 0.15
+N_BOOT = 999
+SEED = 0
+
+print("="*60)
+print("需要関数の構造変化の検定")
+print("="*60)
+
+designs = {
+    'annual': load_annual_design(dummy_vars=[]),
+}
+try:
+    designs['quarterly'] = load_quarterly_design()
+except FileNotFoundError as e:
+    print(f"注意: {e} 四半期データの検定は省略します。")
+
+results = {}
+series = {}
+for freq, design in designs.items():
+    X = design['X']
+    y = design['y']
+    labels = design['data']['Year'].tolist()
+    X_values = X.to_numpy(dtype=float)
+    y_values = y.to_numpy(dtype=float)
+
+    print("\n" + "="*60)
+    print(f"【{freq}】 {labels[0]} - {labels[-1]}（{len(y)}行）、説明変数: {list(X.columns)}")
+    print("="*60)
+
+    # 1. sup-F 検定（1回の変化）
+    start = time.perf_counter()
+    sup = sup_f_test(X_values, y_values, trim=TRIM, n_boot=N_BOOT, seed=SEED)
+    print(f"\nsup-F検定: F = {sup['statistic']:.3f}（時点 {labels[sup['break_index']]}）、"
+          f"ブートストラップp値 = {sup['pvalue']:.3f}")
+
+    # 2. Bai–Perron（複数の変化）
+    bp = bai_perron(X_values, y_values, max_breaks=MAX_BREAKS, trim=TRIM, n_boot=N_BOOT, seed=SEED)
+    elapsed = time.perf_counter() - start
+    print(f"Bai–Perron: 区間の最小長 {bp['min_size']}、最大 {bp['max_breaks']}回（ブートストラップ{N_BOOT}回を含め {elapsed:.2f}秒）")
+
+    bp_rows = []
+    for m in range(bp['max_breaks'] + 1):
+        dates = [labels[i] for i in bp['breaks'].get(m, [])]
+        bp_rows.append({
+            '変化回数': m,
+            '変化時点': ', '.join(dates) if dates else '-',
+            'SSR': bp['ssr'][m],
+            'BIC': bp['bic'][m],
+            'LWZ': bp['lwz'][m],
+            'sup-F': bp['sup_f'][m - 1] if m > 0 else np.nan,
+            'p値': bp['sup_f_pvalue'][m - 1] if m > 0 else np.nan,
+        })
+    print(pd.DataFrame(bp_rows).round(4).to_string(index=False))
+    print(f"UDmax = {bp['udmax']:.3f}（p値 = {bp['udmax_pvalue']:.3f}）")
+    print(f"BICで選択: {bp['n_breaks_bic']}回、LWZで選択: {bp['n_breaks_lwz']}回")
+
+    selected = [labels[i] for i in bp['breaks'].get(bp['n_breaks_bic'], [])]
+    print(f"選択された変化時点: {selected if selected else 'なし'}")
+
+    # 3. 想定したイベント年での Chow 検定（年次は年、四半期は年の最初の四半期から新しいレジーム）
+    chow_rows = []
+    for event in EVENT_YEARS:
+        matches = [i for i, label in enumerate(labels) if label.startswith(event)]
+        if not matches or matches[0] == 0:
+            continue
+        chow = chow_test(X_values, y_values, [matches[0]])
+        chow_rows.append({'イベント年': event, '時点': labels[matches[0]], 'F': chow['F'],
+                          'p値': chow['pvalue'], '自由度': f"({chow['df_num']}, {chow['df_den']})"})
+    if chow_rows:
+        print("\n想定したイベント年での Chow 検定:")
+        print(pd.DataFrame(chow_rows).round(4).to_string(index=False))
+
+    results[freq] = {
+        'period': [labels[0], labels[-1]],
+        'n_obs': len(labels),
+        'regressors': list(X.columns),
+        'trim': TRIM,
+        'min_size': bp['min_size'],
+        'break_dates': selected,
+        'n_breaks_bic': bp['n_breaks_bic'],
+        'n_breaks_lwz': bp['n_breaks_lwz'],
+        'breaks_by_count': {str(m): [labels[i] for i in b] for m, b in bp['breaks'].items()},
+        'sup_f': {'statistic': sup['statistic'], 'break_date': labels[sup['break_index']], 'pvalue': sup['pvalue']},
+        'sup_f_by_count': bp['sup_f'].tolist(),
+        'sup_f_pvalue_by_count': bp['sup_f_pvalue'].tolist(),
+        'udmax': bp['udmax'],
+        'udmax_pvalue': bp['udmax_pvalue'],
+        'chow_event_years': [{k: (v if not isinstance(v, float) else float(v)) for k, v in row.items()}
+                             for row in chow_rows],
+    }
+
+    # レジームごとの当てはまり（グラフ用）
+    bounds = [0] + bp['breaks'].get(bp['n_breaks_bic'], []) + [len(y_values)]
+    fitted = np.empty_like(y_values)
+    for i, j in zip(bounds[:-1], bounds[1:]):
+        b = np.linalg.lstsq(X_values[i:j], y_values[i:j], rcond=None)[0]
+        fitted[i:j] = X_values[i:j] @ b
+    series[freq] = pd.DataFrame({
+        'Period': labels, 'ln_Q': y_values, 'Fitted_Regime': fitted, 'sup_F': sup['F'][:len(labels)],
+    })
+
+# 4. 想定したダミー変数と検出した変化時点のダミー変数の比較（年次）
+print("\n" + "="*60)
+print("年次モデル: イベントダミー 対 構造変化ダミー")
+print("="*60)
+comparison = []
+annual_breaks = results['annual']['break_dates']
+for name, kwargs in [('イベントダミー（01）', {}),
+                     ('構造変化ダミー', {'dummy_vars': [], 'break_dates': annual_breaks})]:
+    if name == '構造変化ダミー' and not annual_breaks:
+        continue
+    d = load_annual_design(**kwargs)
+    fit = sm.OLS(d['y'], d['X']).fit()
+    comparison.append({
+        'モデル': name,
+        'ダミー変数': ', '.join(d['dummy_vars']),
+        'α': fit.params['ln_GDP'],
+        'β': fit.params['ln_P'],
+        'γ': fit.params['ln_Tax_rate'],
+        'R2': fit.rsquared,
+        'Adj_R2': fit.rsquared_adj,
+        'AIC': fit.aic,
+    })
+comparison_df = pd.DataFrame(comparison)
+print(comparison_df.round(4).to_string(index=False))
+
+# 5. 結果の保存
+json_file = os.path.join(output_dir, '09_structural_breaks.json')
+with open(json_file, 'w', encoding='utf-8') as f:
+    json.dump(results, f, indent=2, ensure_ascii=False)
+
+for freq, df_series in series.items():
+    df_series.to_csv(os.path.join(output_dir, f'09_structural_break_series_{freq}.csv'),
+                     index=False, encoding='utf-8-sig')
+comparison_df.to_csv(os.path.join(output_dir, '09_break_dummy_comparison.csv'), index=False, encoding='utf-8-sig')
+
+# 6. グラフ: レジームごとの当てはまりと sup-F 統計量
+print("\nCreating Graph: Structural Breaks...")
+fig, axes = plt.subplots(2, len(series), figsize=(7 * len(series), 8), squeeze=False)
+for col, (freq, df_series) in enumerate(series.items()):
+    x_pos = np.arange(len(df_series))
+    step = max(1, len(df_series) // 12)
+    break_positions = [df_series['Period'].tolist().index(d) for d in results[freq]['break_dates']]
+
+    ax = axes[0, col]
+    ax.plot(x_pos, df_series['ln_Q'], color='#2E86AB', marker='o', markersize=3, linewidth=1.5, label='ln(Q)')
+    ax.plot(x_pos, df_series['Fitted_Regime'], color='#A23B72', linewidth=2, label='Fitted (by regime)')
+    for pos in break_positions:
+        ax.axvline(pos - 0.5, color='black', linestyle='--', linewidth=1)
+    ax.set_title(f'{freq.capitalize()} Demand: Bai-Perron Regimes', fontweight='bold')
+    ax.set_ylabel('ln(Q)')
+    ax.set_xticks(x_pos[::step])
+    ax.set_xticklabels(df_series['Period'].iloc[::step], rotation=45)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.legend(loc='best')
+
+    ax = axes[1, col]
+    ax.plot(x_pos, df_series['sup_F'], color='#C73E1D', marker='o', markersize=3, linewidth=1.5)
+    ax.set_title(f'{freq.capitalize()}: F Statistic by Candidate Break '
+                 f'(sup-F p = {results[freq]["sup_f"]["pvalue"]:.3f})', fontweight='bold')
+    ax.set_ylabel('F statistic')
+    ax.set_xticks(x_pos[::step])
+    ax.set_xticklabels(df_series['Period'].iloc[::step], rotation=45)
+    ax.grid(True, alpha=0.3, linestyle='--')
+
+plt.tight_layout()
+figure_file = f'{figures_dir}/12_structural_breaks.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"検定結果: {json_file}")
+print(f"系列: {output_dir}/09_structural_break_series_*.csv")
+print(f"ダミー変数の比較: {output_dir}/09_break_dummy_comparison.csv")
+print(f"グラフ: {figure_file}")
+print("\n01で構造変化ダミーを使う場合:")
+print("  python analysis/01_estimate_demand_function_annual_level_model.py --break-dummies")
+
+print("\n完了しました！")
@@ -0,0 +1,246 @@
+"""
+需要曲線の積分による消費者余剰の計算（02の台形近似との比較）
+
+02は測定方法総論の台形近似 (Qt＋Qt＋Yt+1)×(Pt－Pt+1)×1/2 で消費者余剰の増分を計算します。
+ここでは前年の (P, Q) を通る需要曲線を置き、価格変化による消費者余剰の変化を積分で求めます。
+
+- 需要曲線: 一定弾力性（閉じた形）、線形、トランスログ、ノンパラメトリック（局所線形回帰）
+- ヒックス型: 補償変分（CV）・等価変分（EV）（所得はGDP、所得弾力性は α）
+- ガソリン税の死荷重: 04の税額（ガソリン税＋消費税）を使用、供給は完全弾力的と仮定
+- --model-key で事後抽出値（08）を持つモデルを指定すると、全抽出値について一度に計算
+
+需要曲線は右下がりと仮定し、価格弾力性は ε = −|β| を使用します（--elasticity で指定も可）。
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import statsmodels.api as sm
+import argparse
+import json
+import os
+import time
+
+from lib.consumer_surplus import (
+    cs_change, hicksian_variation, nonparametric_curve, tax_deadweight_loss, trapezoid_cs
+)
+from lib.results_store import ResultsStore
+
+parser = argparse.ArgumentParser(description='需要曲線の積分による消費者余剰の計算')
+parser.add_argument('--model-key', default=None,
+                    help='推定結果ストアのキー（先頭12文字程度でも可）。省略時は01のJSONを使用')
+parser.add_argument('--elasticity', type=float, default=None,
+                    help='需要曲線の価格弾力性（負の値）。省略時は −|β|')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+print("="*60)
+print("需要曲線の積分による消費者余剰の計算")
+print("="*60)
+
+# 1. 需要関数の推定結果と分析データを読み込む（02と同じ）
+record = None
+if args.model_key:
+    store = ResultsStore()
+    record = store.load(store.resolve(args.model_key))
+    coefficients = record['summary']
+    df = record['frame']
+    print(f"推定結果ストアから読み込みました（key: {record['key'][:12]}）")
+else:
+    coeff_file = f'{output_dir}/01_coefficients_annual_level_model.json'
+    data_file = f'{output_dir}/01_analysis_data_annual_level_model.csv'
+    for path in [coeff_file, data_file]:
+        if not os.path.exists(path):
+            print(f"エラー: {path} が見つかりません。")
+            print("先に 01_estimate_demand_function_annual_level_model.py を実行してください。")
+            exit(1)
+    with open(coeff_file, 'r', encoding='utf-8') as f:
+        coefficients = json.load(f)
+    df = pd.read_csv(data_file)
+
+alpha = coefficients['alpha']
+beta = coefficients['beta']
+gamma = coefficients['gamma']
+elasticity = args.elasticity if args.elasticity is not None else -abs(beta)
+
+print(f"\n価格弾力性の推定値 (β): {beta:.4f}")
+if args.elasticity is None and beta > 0:
+    print("  注意: β が正（右上がりの需要曲線）のため、需要曲線の弾力性には −|β| を使用します。")
+print(f"需要曲線の価格弾力性 (ε): {elasticity:.4f}")
+print(f"所得弾力性 (α): {alpha:.4f}")
+
+years = df['Year'].astype(str).to_numpy()
+q = df['Q (liters)'].to_numpy(dtype=float)
+p = df['P (yen/liter)'].to_numpy(dtype=float)
+income = df['GDP (trillion yen)'].to_numpy(dtype=float) * 1e12
+p0, p1, q0, y0 = p[:-1], p[1:], q[:-1], income[:-1]
+
+# 2. トランスログの曲率とノンパラメトリック曲線を年次データから推定
+print("\n需要曲線の形を推定中...")
+dummy_vars = list(coefficients.get('dummy_variables', {}).keys())
+price_col = 'ln_P_relative' if 'ln_P_relative' in df.columns and df['ln_P_relative'].notna().all() else 'ln_P'
+ln_p_centered = df[price_col] - df[price_col].mean()
+X_translog = sm.add_constant(pd.DataFrame({
+    'ln_GDP': df['ln_GDP'],
+    'ln_P': ln_p_centered,
+    'ln_P_sq': 0.5 * ln_p_centered ** 2,
+    'ln_Tax_rate': df['ln_Tax_rate'],
+    **{d: df[d] for d in dummy_vars if d in df.columns},
+}))
+translog_fit = sm.OLS(df['ln_Q'], X_translog).fit()
+curvature = float(translog_fit.params['ln_P_sq'])
+print(f"  トランスログの曲率 (θ): {curvature:.4f}（p値 = {translog_fit.pvalues['ln_P_sq']:.3f}）")
+
+# ノンパラメトリック: 価格以外の要因を除いた ln Q（偏残差）を ln P に回帰
+other = df['ln_GDP'] * alpha + df['ln_Tax_rate'] * gamma
+for d in dummy_vars:
+    if d in df.columns:
+        other = other + df[d] * coefficients['dummy_variables'][d]
+curve = nonparametric_curve(np.log(p), df['ln_Q'] - other)
+print(f"  ノンパラメトリック曲線のバンド幅: {curve['bandwidth']:.4f}")
+
+# 3. 全期間の消費者余剰の変化を一度に計算
+print("\n消費者余剰を計算中...")
+start = time.perf_counter()
+trapezoid = trapezoid_cs(q, p, beta)['CS_Increase']
+results = {
+    'Trapezoid_02': trapezoid,
+    'Constant_Elasticity': cs_change(p0, p1, q0, 'constant_elasticity', elasticity),
+    'Linear': cs_change(p0, p1, q0, 'linear', elasticity),
+    'Translog': cs_change(p0, p1, q0, 'translog', elasticity, curvature),
+    'Nonparametric': cs_change(p0, p1, q0, 'nonparametric', curve=curve),
+}
+cv, ev = hicksian_variation(p0, p1, q0, y0, alpha, 'constant_elasticity', elasticity)
+results['CV'] = cv
+results['EV'] = ev
+elapsed = time.perf_counter() - start
+print(f"  {len(p0)}期間 × 7指標: {elapsed*1000:.1f}ミリ秒")
+
+cs_df = pd.DataFrame({'Year': years[1:], 'P_prev': p0, 'P_curr': p1, 'ΔP': p1 - p0, **results})
+for col in results:
+    cs_df[f'{col}_Cumulative'] = np.cumsum(results[col])
+
+print("\n消費者余剰の変化（兆円）:")
+display_df = cs_df[['Year', 'ΔP'] + list(results)].copy()
+display_df[list(results)] = display_df[list(results)] / 1e12
+print(display_df.round(4).to_string(index=False))
+print("\n累積（兆円）:")
+for col in results:
+    print(f"  {col:20s}: {cs_df[f'{col}_Cumulative'].iloc[-1]/1e12:,.4f}")
+
+# 4. ガソリン税の死荷重
+dwl_df = None
+tax_file = f'{output_dir}/04_cpi_contribution_analysis.csv'
+if os.path.exists(tax_file):
+    print("\nガソリン税の死荷重を計算中...")
+    df_tax = pd.read_csv(tax_file, encoding='utf-8-sig')
+    df_tax['Year'] = df_tax['Year'].astype(int).astype(str)
+    merged = pd.DataFrame({'Year': years, 'P': p, 'Q': q}).merge(
+        df_tax[['Year', 'Gasoline_Tax_Amount', 'Consumption_Tax_Amount']], on='Year', how='inner')
+    tax = (merged['Gasoline_Tax_Amount'] + merged['Consumption_Tax_Amount']).to_numpy()
+    dwl_df = merged[['Year', 'P', 'Q']].copy()
+    dwl_df['Tax_per_liter'] = tax
+    for form, kwargs in [('constant_elasticity', {'elasticity': elasticity}),
+                         ('linear', {'elasticity': elasticity}),
+                         ('translog', {'elasticity': elasticity, 'curvature': curvature})]:
+        dwl = tax_deadweight_loss(merged['P'].to_numpy(), merged['Q'].to_numpy(), tax, form, **kwargs)
+        dwl_df[f'DWL_{form}'] = dwl['dwl']
+        if form == 'constant_elasticity':
+            dwl_df['Tax_Revenue'] = dwl['revenue']
+            dwl_df['CS_Loss'] = dwl['cs_loss']
+    dwl_df['DWL_Ratio_to_Revenue'] = dwl_df['DWL_constant_elasticity'] / dwl_df['Tax_Revenue']
+    print(dwl_df[['Year', 'Tax_per_liter', 'Tax_Revenue', 'DWL_constant_elasticity', 'DWL_linear',
+                  'DWL_Ratio_to_Revenue']].assign(
+        Tax_Revenue=lambda d: d['Tax_Revenue'] / 1e12,
+        DWL_constant_elasticity=lambda d: d['DWL_constant_elasticity'] / 1e12,
+        DWL_linear=lambda d: d['DWL_linear'] / 1e12,
+    ).round(4).to_string(index=False))
+else:
+    print(f"\n注意: {tax_file} が見つからないため、死荷重の計算は省略します。")
+
+# 5. 事後抽出値がある場合は全抽出値で計算
+draws_df = None
+if record is not None and 'beta_draws' in record['arrays']:
+    names = record['spec']['regressors']
+    beta_draws = record['arrays']['beta_draws'][:, names.index('ln_P')]
+    elasticity_draws = -np.abs(beta_draws)[:, None]                 # (抽出数, 1)
+    start = time.perf_counter()
+    cs_draws = cs_change(p0, p1, q0, 'constant_elasticity', elasticity_draws)   # (抽出数, 期間)
+    elapsed = time.perf_counter() - start
+    print(f"\n事後抽出値 {len(beta_draws):,}個 × {len(p0)}期間: {elapsed*1000:.1f}ミリ秒")
+    lower, upper = np.quantile(cs_draws, [0.025, 0.975], axis=0)
+    draws_df = pd.DataFrame({
+        'Year': years[1:],
+        'CS_Mean': cs_draws.mean(axis=0),
+        'CS_Lower': lower,
+        'CS_Upper': upper,
+    })
+
+# 6. 結果の保存（ストアのモデルを使った場合はキー付きのファイル名）
+suffix = f"_{record['key'][:12]}" if record is not None else ''
+cs_file = f'{output_dir}/10_exact_consumer_surplus{suffix}.csv'
+cs_df.to_csv(cs_file, index=False, encoding='utf-8-sig')
+if dwl_df is not None:
+    dwl_df.to_csv(f'{output_dir}/10_tax_deadweight_loss{suffix}.csv', index=False, encoding='utf-8-sig')
+if draws_df is not None:
+    draws_df.to_csv(f'{output_dir}/10_exact_consumer_surplus_posterior{suffix}.csv', index=False,
+                    encoding='utf-8-sig')
+
+# 7. グラフ
+print("\nCreating Graph: Exact Consumer Surplus...")
+fig, axes = plt.subplots(2, 1, figsize=(14, 10))
+ax = axes[0]
+x_pos = np.arange(len(cs_df))
+methods = ['Trapezoid_02', 'Constant_Elasticity', 'Linear', 'Translog', 'Nonparametric', 'CV', 'EV']
+colors = ['#808080', '#2E86AB', '#06A77D', '#A23B72', '#F18F01', '#C73E1D', '#6A4C93']
+width = 0.8 / len(methods)
+for i, (method, color) in enumerate(zip(methods, colors)):
+    ax.bar(x_pos + (i - len(methods) / 2 + 0.5) * width, cs_df[method] / 1e12, width,
+           label=method.replace('_', ' '), color=color, alpha=0.85)
+ax.axhline(0, color='black', linewidth=0.8)
+ax.set_xticks(x_pos)
+ax.set_xticklabels(cs_df['Year'], rotation=45)
+ax.set_ylabel('Change in Consumer Surplus (trillion yen)', fontweight='bold')
+ax.set_title(f'Consumer Surplus Change by Demand Curve (ε = {elasticity:.3f})', fontweight='bold')
+ax.grid(True, alpha=0.3, linestyle='--', axis='y')
+ax.legend(loc='best', fontsize=8, ncol=4)
+
+ax = axes[1]
+if dwl_df is not None:
+    ax.plot(dwl_df['Year'], dwl_df['Tax_Revenue'] / 1e12, color='#2E86AB', marker='o', linewidth=2,
+            label='Tax Revenue')
+    ax.plot(dwl_df['Year'], dwl_df['DWL_constant_elasticity'] / 1e12, color='#C73E1D', marker='s', linewidth=2,
+            label='DWL (constant elasticity)')
+    ax.plot(dwl_df['Year'], dwl_df['DWL_linear'] / 1e12, color='#06A77D', marker='^', linewidth=2,
+            label='DWL (linear)')
+    ax.set_ylabel('trillion yen', fontweight='bold')
+    ax.set_title('Gasoline Tax Revenue and Deadweight Loss', fontweight='bold')
+    ax.tick_params(axis='x', rotation=45)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.legend(loc='best')
+else:
+    ax.axis('off')
+
+plt.tight_layout()
+figure_file = f'{figures_dir}/13_exact_consumer_surplus{suffix}.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"消費者余剰の比較: {cs_file}")
+if dwl_df is not None:
+    print(f"死荷重: {output_dir}/10_tax_deadweight_loss{suffix}.csv")
+if draws_df is not None:
+    print(f"事後分布: {output_dir}/10_exact_consumer_surplus_posterior{suffix}.csv")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
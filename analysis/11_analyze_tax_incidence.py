@@ -0,0 +1,245 @@
+"""
+ガソリン税の帰着と死荷重（1950年〜2025年の全四半期）
+
+04は2007年以降の年次データで税額を計算しています。ここでは四半期ごとの税率表
+（data/-2025ガソリン関連税四半期ごと/gasoline_tax_quarterly.csv、1950年Q1〜）の全期間について、
+需要・供給の弾力性の仮定のもとで税収・消費者負担・生産者負担・死荷重を計算します。
+
+- 税込み価格 P = (本体価格 + 従量税)(1 + 消費税率)（ガソリン税にも消費税がかかる、タックス・オン・タックス）
+- 税なしの均衡との比較で帰着と死荷重を計算（lib/tax_incidence.py）
+- タックス・オン・タックス分: 消費税が本体価格のみにかかる場合との比較
+- 需要の弾力性 × 供給の弾力性の格子と全四半期をブロードキャストして一度に計算
+
+価格は1990年Q3から、数量は2007年Q1からしかないため、
+1990年Q2以前は税率表（1リットルあたりの従量税とタックス・オン・タックス分）のみ、
+2006年Q4以前は1リットルあたりの指標のみを計算します（金額の合計は数量のある期間のみ）。
+一定弾力性の需要・供給曲線は観測点 (P, Q) を通るので、金額は1リットルあたりの値 × Q で求まります。
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import json
+import os
+import time
+
+from lib.design import QUARTERLY_DATA_FILE
+from lib.price_decomposition import decompose
+from lib.tax_incidence import incidence, load_quarterly_tax_table
+
+parser = argparse.ArgumentParser(description='ガソリン税の帰着と死荷重（全四半期）')
+parser.add_argument('--demand-elasticity', type=float, default=None,
+                    help='基準ケースの需要の価格弾力性（負の値）。省略時は01の −|β|')
+parser.add_argument('--supply-elasticity', type=float, default=1.0,
+                    help='基準ケースの供給の価格弾力性（inf で完全弾力的）')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+# 弾力性の格子
+DEMAND_GRID = [-0.1, -0.2, -0.3, -0.5, -0.75, -1.0]
+SUPPLY_GRID = [0.5, 1.0, 2.0, 5.0, np.inf]
+
+print("="*60)
+print("ガソリン税の帰着と死荷重（1950年〜2025年）")
+print("="*60)
+
+# 1. 需要の弾力性（01の推定結果）
+if args.demand_elasticity is not None:
+    demand_elasticity = args.demand_elasticity
+else:
+    coeff_file = f'{output_dir}/01_coefficients_annual_level_model.json'
+    if not os.path.exists(coeff_file):
+        print(f"エラー: {coeff_file} が見つかりません。")
+        print("先に 01_estimate_demand_function_annual_level_model.py を実行するか、--demand-elasticity を指定してください。")
+        exit(1)
+    with open(coeff_file, 'r', encoding='utf-8') as f:
+        beta = json.load(f)['beta']
+    demand_elasticity = -abs(beta)
+    print(f"価格弾力性の推定値 (β): {beta:.4f}")
+    if beta > 0:
+        print("  注意: β が正（右上がりの需要曲線）のため、需要の弾力性には −|β| を使用します。")
+supply_elasticity = args.supply_elasticity
+print(f"基準ケース: 需要の弾力性 {demand_elasticity:.4f}、供給の弾力性 {supply_elasticity}")
+
+if demand_elasticity not in DEMAND_GRID:
+    DEMAND_GRID = sorted(DEMAND_GRID + [demand_elasticity], reverse=True)
+if supply_elasticity not in SUPPLY_GRID:
+    SUPPLY_GRID = sorted(SUPPLY_GRID + [supply_elasticity])
+
+# 2. 税率表と四半期の価格・数量を結合
+tax = load_quarterly_tax_table()
+if os.path.exists(QUARTERLY_DATA_FILE):
+    raw = pd.read_csv(QUARTERLY_DATA_FILE, encoding='utf-8-sig')
+    raw = raw.rename(columns={'Year': 'Period', 'P (yen/liter)': 'P', 'Q (liters)': 'Q'})[['Period', 'P', 'Q']]
+    df = tax.merge(raw, on='Period', how='left')
+else:
+    print(f"注意: {QUARTERLY_DATA_FILE} が見つからないため、税率表のみを計算します。")
+    df = tax.assign(P=np.nan, Q=np.nan)
+
+has_price = df['P'].notna().to_numpy()
+has_quantity = has_price & df['Q'].notna().to_numpy()
+print(f"\n税率表: {df['Period'].iloc[0]} - {df['Period'].iloc[-1]}（{len(df)}四半期）")
+print(f"  価格あり: {has_price.sum()}四半期（{df.loc[has_price, 'Period'].iloc[0]}〜）")
+print(f"  数量あり: {has_quantity.sum()}四半期（{df.loc[has_quantity, 'Period'].iloc[0]}〜）")
+
+t = df['Specific_Tax'].to_numpy(dtype=float)
+r = df['VAT_Rate'].to_numpy(dtype=float)
+price = df['P'].to_numpy(dtype=float)
+quantity = df['Q'].to_numpy(dtype=float)
+
+# 3. 1リットルあたりの内訳（タックス・オン・タックス分は税率表だけで計算できる）
+components = decompose(price, t, r)
+df['Producer_Price'] = components['base_price']
+df['VAT_per_liter'] = components['consumption_tax']
+df['Tax_on_Tax_per_liter'] = components['tax_on_tax']
+df['Tax_Share_of_Price'] = components['effective_rate']
+
+# 4. 全四半期 × 弾力性の格子を一度に計算（1リットルあたり、価格のある四半期のみ）
+p_obs = price[has_price]
+t_obs = t[has_price]
+r_obs = r[has_price]
+ed = np.array(DEMAND_GRID)[:, None, None]     # (需要, 1, 1)
+es = np.array(SUPPLY_GRID)[None, :, None]     # (1, 供給, 1)
+
+start = time.perf_counter()
+per_liter = incidence(p_obs, 1.0, t_obs, r_obs, ed, es)
+# タックス・オン・タックス分: 同じ税率で消費税が本体価格のみにかかる場合との比較
+tot = incidence(p_obs, 1.0, t_obs, r_obs, ed, es,
+                counterfactual_specific_tax=t_obs, counterfactual_vat_rate=r_obs,
+                counterfactual_tax_on_tax=False)
+elapsed = time.perf_counter() - start
+print(f"\n{len(DEMAND_GRID)} × {len(SUPPLY_GRID)} の弾力性 × {has_price.sum()}四半期: {elapsed*1000:.1f}ミリ秒")
+
+i_d = DEMAND_GRID.index(demand_elasticity)
+i_s = SUPPLY_GRID.index(supply_elasticity)
+
+
+def baseline(values):
+    """基準ケースの値を全四半期の列に戻す（価格のない四半期は NaN）"""
+    out = np.full(len(df), np.nan)
+    out[has_price] = values[i_d, i_s]
+    return out
+
+
+df['Consumer_Share'] = baseline(per_liter['consumer_share'])
+df['NoTax_Consumer_Price'] = baseline(per_liter['counterfactual_consumer_price'])
+df['NoTax_Producer_Price'] = baseline(per_liter['counterfactual_producer_price'])
+for name, key in [('Revenue', 'revenue'), ('Consumer_Burden', 'consumer_burden'),
+                  ('Producer_Burden', 'producer_burden'), ('DWL', 'dwl')]:
+    df[f'{name}_per_liter'] = baseline(per_liter[key])
+    df[name] = df[f'{name}_per_liter'] * df['Q']
+df['DWL_Ratio_to_Revenue'] = df['DWL_per_liter'] / df['Revenue_per_liter']
+df['Tax_on_Tax_Revenue'] = baseline(tot['revenue']) * df['Q']
+df['Tax_on_Tax_DWL'] = baseline(tot['dwl']) * df['Q']
+
+print("\n基準ケース（5年ごとの第1四半期、金額は億円）:")
+display_cols = ['Period', 'Specific_Tax', 'VAT_Rate', 'Tax_on_Tax_per_liter', 'P', 'Consumer_Share',
+                'Revenue', 'DWL', 'Tax_on_Tax_Revenue']
+display_df = df.loc[(df['Quarter'] == 1) & (df['Year'] % 5 == 0) | (df['Period'] == '2025Q1'), display_cols].copy()
+for col in ['Revenue', 'DWL', 'Tax_on_Tax_Revenue']:
+    display_df[col] = display_df[col] / 1e8
+print(display_df.round(3).to_string(index=False))
+
+# 5. 弾力性の格子ごとの合計（数量のある四半期）
+q_obs = quantity[has_price]
+with_q = ~np.isnan(q_obs)
+grid_rows = []
+for a, d in enumerate(DEMAND_GRID):
+    for b, s in enumerate(SUPPLY_GRID):
+        revenue = np.sum(per_liter['revenue'][a, b, with_q] * q_obs[with_q])
+        dwl = np.sum(per_liter['dwl'][a, b, with_q] * q_obs[with_q])
+        grid_rows.append({
+            'Demand_Elasticity': d,
+            'Supply_Elasticity': s,
+            'Revenue': revenue,
+            'Consumer_Burden': np.sum(per_liter['consumer_burden'][a, b, with_q] * q_obs[with_q]),
+            'Producer_Burden': np.sum(per_liter['producer_burden'][a, b, with_q] * q_obs[with_q]),
+            'DWL': dwl,
+            'DWL_Ratio_to_Revenue': dwl / revenue,
+            'Consumer_Share_Mean': np.mean(per_liter['consumer_share'][a, b]),
+            'Tax_on_Tax_Revenue': np.sum(tot['revenue'][a, b, with_q] * q_obs[with_q]),
+            'Tax_on_Tax_DWL': np.sum(tot['dwl'][a, b, with_q] * q_obs[with_q]),
+        })
+grid_df = pd.DataFrame(grid_rows)
+period_q = f"{df.loc[has_quantity, 'Period'].iloc[0]}〜{df.loc[has_quantity, 'Period'].iloc[-1]}"
+print(f"\n弾力性の格子ごとの合計（{period_q}、兆円）:")
+grid_display = grid_df.copy()
+for col in ['Revenue', 'Consumer_Burden', 'Producer_Burden', 'DWL', 'Tax_on_Tax_Revenue', 'Tax_on_Tax_DWL']:
+    grid_display[col] = grid_display[col] / 1e12
+print(grid_display.round(4).to_string(index=False))
+
+# 6. 結果の保存
+quarterly_file = f'{output_dir}/11_tax_incidence_quarterly.csv'
+grid_file = f'{output_dir}/11_tax_incidence_elasticity_grid.csv'
+df.to_csv(quarterly_file, index=False, encoding='utf-8-sig')
+grid_df.to_csv(grid_file, index=False, encoding='utf-8-sig')
+
+# 7. グラフ
+print("\nCreating Graph: Tax Incidence...")
+fig, axes = plt.subplots(3, 1, figsize=(14, 14))
+x_pos = np.arange(len(df))
+step = 20
+
+ax = axes[0]
+ax.fill_between(x_pos, 0, df['Specific_Tax'], color='#2E86AB', alpha=0.7, step='mid',
+                label='Specific Tax (yen/L)')
+ax.fill_between(x_pos, df['Specific_Tax'], df['Specific_Tax'] + df['Tax_on_Tax_per_liter'],
+                color='#C73E1D', alpha=0.8, step='mid', label='VAT on Specific Tax (yen/L)')
+ax.plot(x_pos, df['P'], color='black', linewidth=1.5, label='Retail Price (yen/L)')
+ax.plot(x_pos, df['Producer_Price'], color='#06A77D', linewidth=1.5, label='Producer Price (yen/L)')
+ax.set_xticks(x_pos[::step])
+ax.set_xticklabels(df['Period'].iloc[::step], rotation=45)
+ax.set_ylabel('yen per liter', fontweight='bold')
+ax.set_title('Gasoline Tax Schedule 1950-2025 and Tax-on-Tax', fontweight='bold')
+ax.grid(True, alpha=0.3, linestyle='--')
+ax.legend(loc='upper left')
+
+ax = axes[1]
+sub = df[has_quantity]
+sub_pos = np.arange(len(sub))
+ax.plot(sub_pos, sub['Consumer_Burden'] / 1e12, color='#2E86AB', linewidth=2, label='Consumer Burden')
+ax.plot(sub_pos, sub['Producer_Burden'] / 1e12, color='#06A77D', linewidth=2, label='Producer Burden')
+ax.plot(sub_pos, sub['Revenue'] / 1e12, color='black', linestyle='--', linewidth=1.5, label='Tax Revenue')
+ax.bar(sub_pos, sub['DWL'] / 1e12, color='#C73E1D', alpha=0.7, label='Deadweight Loss')
+ax.set_xticks(sub_pos[::4])
+ax.set_xticklabels(sub['Period'].iloc[::4], rotation=45)
+ax.set_ylabel('trillion yen per quarter', fontweight='bold')
+ax.set_title(f'Tax Incidence (εd = {demand_elasticity:.3f}, εs = {supply_elasticity})', fontweight='bold')
+ax.grid(True, alpha=0.3, linestyle='--')
+ax.legend(loc='best')
+
+ax = axes[2]
+ratio = grid_df.pivot(index='Demand_Elasticity', columns='Supply_Elasticity', values='DWL_Ratio_to_Revenue')
+image = ax.imshow(ratio.to_numpy() * 100, cmap='Reds', aspect='auto')
+ax.set_xticks(np.arange(len(ratio.columns)))
+ax.set_xticklabels([str(c) for c in ratio.columns])
+ax.set_yticks(np.arange(len(ratio.index)))
+ax.set_yticklabels([f'{i:.3f}' for i in ratio.index])
+for (a, b), value in np.ndenumerate(ratio.to_numpy() * 100):
+    ax.text(b, a, f'{value:.1f}', ha='center', va='center', fontsize=8)
+ax.set_xlabel('Supply Elasticity', fontweight='bold')
+ax.set_ylabel('Demand Elasticity', fontweight='bold')
+ax.set_title(f"Deadweight Loss / Tax Revenue (%), {period_q.replace('〜', '-')}", fontweight='bold')
+fig.colorbar(image, ax=ax)
+
+plt.tight_layout()
+figure_file = f'{figures_dir}/14_tax_incidence.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"四半期ごとの帰着と死荷重: {quarterly_file}")
+print(f"弾力性の格子: {grid_file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
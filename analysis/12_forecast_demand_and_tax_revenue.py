@@ -0,0 +1,162 @@
+"""
+ガソリン需要・価格・税収・消費者余剰の予測（シナリオ別のファンチャート）
+
+01の需要関数を長期関係とする四半期の誤差修正モデル（lib/forecast.py）で、
+1〜10年先の数量 Q・税込み価格・ガソリン税（従量税）と消費税の税収・消費者余剰の変化を
+シナリオ（GDP成長率・本体価格（原油価格の代わり）・税制）ごとにシミュレーションします。
+予測区間は数千本の経路の分位点です。
+
+- シナリオは下の SCENARIOS、または --scenario-file の JSON（{名前: 既定値からの変更}）で指定
+- 結果はシナリオのハッシュをキーとして推定結果ストアに保存し、同じシナリオは再計算しない
+- 需要曲線は右下がりと仮定し、価格弾力性は −|β| を使用します（--elasticity で指定も可）
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import json
+import os
+import time
+
+from lib.forecast import forecast, make_scenario
+from lib.price_decomposition import PROVISIONAL_RATE
+from lib.results_store import ResultsStore
+
+parser = argparse.ArgumentParser(description='ガソリン需要・税収・消費者余剰の予測')
+parser.add_argument('--horizon-years', type=int, default=10, choices=range(1, 11), metavar='{1..10}',
+                    help='予測期間（年）')
+parser.add_argument('--paths', type=int, default=5000, help='シミュレーションの経路数')
+parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+parser.add_argument('--elasticity', type=float, default=None,
+                    help='需要の価格弾力性（負の値）。省略時は −|β|')
+parser.add_argument('--scenario-file', default=None,
+                    help='シナリオの JSON ファイル（{名前: {gdp_growth: ..., tax: {...}}}）')
+parser.add_argument('--no-cache', action='store_true', help='ストアを使わずに毎回計算する')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+# シナリオ（年率）。税制は四半期ごとの税率表を基準に amend() で変更
+SCENARIOS = {
+    'baseline': make_scenario(),
+    'abolish_provisional_2026Q1': make_scenario(
+        tax={'source': 'quarterly_table', 'amend': [{'start': '2026Q1', 'delta_specific_tax': -PROVISIONAL_RATE}]}),
+    'high_crude': make_scenario(base_price_growth=0.05, base_price_shock=0.2),
+    'low_growth': make_scenario(gdp_growth=0.0),
+}
+
+print("="*60)
+print("ガソリン需要・税収・消費者余剰の予測")
+print("="*60)
+
+if args.scenario_file:
+    with open(args.scenario_file, 'r', encoding='utf-8') as f:
+        SCENARIOS = {name: make_scenario(**overrides) for name, overrides in json.load(f).items()}
+
+# 1. 01の推定結果
+coeff_file = f'{output_dir}/01_coefficients_annual_level_model.json'
+if not os.path.exists(coeff_file):
+    print(f"エラー: {coeff_file} が見つかりません。")
+    print("先に 01_estimate_demand_function_annual_level_model.py を実行してください。")
+    exit(1)
+with open(coeff_file, 'r', encoding='utf-8') as f:
+    coefficients = json.load(f)
+beta = coefficients['beta']
+elasticity = args.elasticity if args.elasticity is not None else -abs(beta)
+print(f"\n長期関係（01）: α = {coefficients['alpha']:.4f}, β = {beta:.4f}, γ = {coefficients['gamma']:.4f}")
+if args.elasticity is None and beta > 0:
+    print("  注意: β が正（右上がりの需要曲線）のため、価格弾力性には −|β| を使用します。")
+if coefficients['gamma'] > 0:
+    print("  注意: γ が正のため、税率（Tax_rate）が下がるシナリオでは長期の需要も下がります。")
+print(f"価格弾力性 (ε): {elasticity:.4f}")
+
+# 2. シナリオごとに予測（ストアにあれば読み込み）
+store = None if args.no_cache else ResultsStore()
+horizon = args.horizon_years * 4
+fans = []
+annuals = []
+ecm = None
+for name, scenario in SCENARIOS.items():
+    start = time.perf_counter()
+    result = forecast(scenario, coefficients, store=store, horizon=horizon, n_paths=args.paths,
+                      seed=args.seed, elasticity=elasticity)
+    elapsed = time.perf_counter() - start
+    status = 'ストアから読み込み' if result['cached'] else f'{args.paths:,}経路を計算'
+    print(f"\n【{name}】 {status}（{elapsed*1000:.0f}ミリ秒、key: {result['key'][:12]}）")
+    fans.append(result['fan'].assign(Scenario=name))
+    annuals.append(result['annual'].assign(Scenario=name))
+    ecm = result['ecm']
+
+print("\n誤差修正モデル（四半期）:")
+for param, value in ecm['params'].items():
+    print(f"  {param:8s}: {value: .4f}")
+print(f"  σ = {ecm['sigma']:.4f}, R² = {ecm['rsquared']:.3f}（{ecm['n_obs']}期）")
+ar = ecm['price_ar']
+print(f"本体価格の AR(1): μ = {ar['mu']:.4f}/四半期, ρ = {ar['rho']:.3f}, σ = {ar['sigma']:.4f}")
+
+fan_df = pd.concat(fans, ignore_index=True)
+annual_df = pd.concat(annuals, ignore_index=True)
+fan_df = fan_df[['Scenario'] + [c for c in fan_df.columns if c != 'Scenario']]
+annual_df = annual_df[['Scenario'] + [c for c in annual_df.columns if c != 'Scenario']]
+
+# 3. 予測期間の最初と最後の年の比較
+years = sorted(annual_df['Year'].unique())
+print(f"\n年ごとの予測（中央値 [5%, 95%]）:")
+for year in [years[0], years[-1]]:
+    print(f"\n  {year}年")
+    rows = annual_df[annual_df['Year'] == year]
+    for variable, scale, unit in [('Q', 1e9, '10億L'), ('P', 1, '円/L'), ('Excise_Revenue', 1e12, '兆円'),
+                                  ('VAT_Revenue', 1e12, '兆円'), ('CS_Change', 1e12, '兆円')]:
+        line = f"    {variable:15s}"
+        for _, row in rows[rows['Variable'] == variable].iterrows():
+            line += f" | {row['Scenario']}: {row['q50']/scale:,.2f} [{row['q05']/scale:,.2f}, {row['q95']/scale:,.2f}]"
+        print(line + f"（{unit}）")
+
+# 4. 結果の保存
+quarterly_file = f'{output_dir}/12_forecast_quarterly.csv'
+annual_file = f'{output_dir}/12_forecast_annual.csv'
+fan_df.to_csv(quarterly_file, index=False, encoding='utf-8-sig')
+annual_df.to_csv(annual_file, index=False, encoding='utf-8-sig')
+
+# 5. グラフ: シナリオ別のファンチャート
+print("\nCreating Graph: Forecast Fan Charts...")
+panels = [('Q', 1e9, 'Q (billion liters per quarter)'), ('P', 1, 'Retail Price (yen/L)'),
+          ('Excise_Revenue', 1e12, 'Gasoline Tax Revenue (trillion yen per quarter)'),
+          ('CS_Cumulative', 1e12, 'Cumulative Change in Consumer Surplus (trillion yen)')]
+colors = ['#2E86AB', '#C73E1D', '#F18F01', '#06A77D', '#A23B72', '#6A4C93']
+fig, axes = plt.subplots(2, 2, figsize=(16, 10))
+for ax, (variable, scale, label) in zip(axes.flat, panels):
+    for color, name in zip(colors, SCENARIOS):
+        sub = fan_df[(fan_df['Scenario'] == name) & (fan_df['Variable'] == variable)]
+        x_pos = np.arange(len(sub))
+        ax.fill_between(x_pos, sub['q05'] / scale, sub['q95'] / scale, color=color, alpha=0.12)
+        ax.fill_between(x_pos, sub['q25'] / scale, sub['q75'] / scale, color=color, alpha=0.25)
+        ax.plot(x_pos, sub['q50'] / scale, color=color, linewidth=2, label=name)
+    periods = sub['Period'].tolist()
+    step = max(1, len(periods) // 10)
+    ax.set_xticks(np.arange(len(periods))[::step])
+    ax.set_xticklabels(periods[::step], rotation=45)
+    ax.set_title(label, fontweight='bold')
+    ax.grid(True, alpha=0.3, linestyle='--')
+axes[0, 0].legend(loc='best', fontsize=8)
+fig.suptitle(f'Forecast Fan Charts (median, 50% and 90% intervals, {args.paths:,} paths)', fontweight='bold')
+plt.tight_layout()
+figure_file = f'{figures_dir}/15_forecast_fan_charts.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"四半期ごとの予測: {quarterly_file}")
+print(f"年ごとの予測: {annual_file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
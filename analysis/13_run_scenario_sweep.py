@@ -0,0 +1,126 @@
+"""
+政策シナリオの格子計算（税制 × 需要の価格弾力性 × 本体価格の経路）
+
+06のようにスクリプトを書き換える代わりに、格子を JSON で宣言して全セルを計算します（lib/scenario_sweep.py）。
+既定の格子: 2026Q1 の暫定税率廃止 × β = −0.1〜−0.5 × 原油価格（本体価格）の3シナリオ
+
+- --grid で格子の JSON を指定（形式は lib/scenario_sweep.py の EXAMPLE_GRID）
+- --large で従量税 0〜60円/L × β 21通り × 本体価格の確率的な経路の大きな格子（約10万セル）
+- セルはブロックごとにプロセスプールで計算し、終わったブロックから CSV に追記
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import json
+import os
+
+from lib.scenario_sweep import EXAMPLE_GRID, build_inputs, run_sweep
+
+parser = argparse.ArgumentParser(description='政策シナリオの格子計算')
+parser.add_argument('--grid', default=None, help='格子の JSON ファイル。省略時は既定の格子')
+parser.add_argument('--large', action='store_true', help='約10万セルの大きな格子を計算')
+parser.add_argument('--workers', type=int, default=None, help='プロセス数（省略時は CPU 数）')
+parser.add_argument('--block-size', type=int, default=5000, help='1回にまとめて計算するセル数')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+LARGE_GRID = {
+    'horizon': 20,
+    'reference_tax': 'status_quo',
+    'tax': {
+        'status_quo': {'source': 'quarterly_table', 'amend': []},
+        'levels': {'start': '2026Q1', 'specific_tax': {'start': 0, 'stop': 60, 'num': 61}},
+    },
+    'elasticity': {'start': -0.1, 'stop': -1.1, 'num': 21},
+    'price': {'ar1': {'random': 80, 'seed': 0}},
+}
+
+print("="*60)
+print("政策シナリオの格子計算")
+print("="*60)
+
+if args.grid:
+    with open(args.grid, 'r', encoding='utf-8') as f:
+        grid = json.load(f)
+    name = os.path.splitext(os.path.basename(args.grid))[0]
+elif args.large:
+    grid, name = LARGE_GRID, 'large'
+else:
+    grid, name = EXAMPLE_GRID, 'default'
+
+# 1. 入力の配列
+inputs = build_inputs(grid)
+n_tax, n_eps, n_price = len(inputs['tax_names']), len(inputs['elasticities']), len(inputs['price_names'])
+print(f"\n格子: 税制 {n_tax} × 弾力性 {n_eps} × 本体価格の経路 {n_price} = {n_tax * n_eps * n_price:,}セル")
+print(f"予測期間: {inputs['periods'][0]} - {inputs['periods'][-1]}（{len(inputs['periods'])}四半期）")
+print(f"基準の税制: {inputs['reference_tax']}")
+
+
+# 2. 全セルを計算して CSV に追記
+def report(done, total):
+    if done == total or done % (args.block_size * 10) == 0:
+        print(f"  {done:,} / {total:,}セル")
+
+
+output_file = f'{output_dir}/13_scenario_sweep_{name}.csv'
+result = run_sweep(inputs, output_file, workers=args.workers, block_size=args.block_size, progress=report)
+print(f"\n{result['n_cells']:,}セル: {result['elapsed']:.2f}秒"
+      f"（{result['n_cells'] / max(result['elapsed'], 1e-9):,.0f}セル/秒）")
+
+# 3. 集計（税制 × 弾力性ごとの本体価格の経路についての平均）
+df = pd.read_csv(output_file, encoding='utf-8-sig')
+df['Price_Group'] = df['Price_Scenario'].str.split('#').str[0]
+summary = df.groupby(['Tax_Scenario', 'Elasticity', 'Price_Group'], sort=False)[
+    ['Price_Mean', 'Quantity', 'Total_Revenue', 'Revenue_Change', 'CS_Change', 'Net_Benefit']
+].mean().reset_index()
+summary_file = f'{output_dir}/13_scenario_sweep_{name}_summary.csv'
+summary.to_csv(summary_file, index=False, encoding='utf-8-sig')
+
+display = summary[summary['Tax_Scenario'] != inputs['reference_tax']].copy()
+for col in ['Quantity']:
+    display[col] = display[col] / 1e9
+for col in ['Total_Revenue', 'Revenue_Change', 'CS_Change', 'Net_Benefit']:
+    display[col] = display[col] / 1e12
+print(f"\n基準の税制との比較（期間合計、数量は10億L、金額は兆円）:")
+print(display.head(30).round(3).to_string(index=False))
+
+# 4. グラフ: 弾力性ごとの消費者余剰・税収の変化
+print("\nCreating Graph: Scenario Sweep...")
+fig, axes = plt.subplots(1, 2, figsize=(15, 6))
+groups = display.groupby(['Tax_Scenario', 'Price_Group'], sort=False)
+plot_groups = list(groups)[:12]
+colors = plt.cm.viridis(np.linspace(0, 0.9, len(plot_groups)))
+for color, ((tax, price), sub) in zip(colors, plot_groups):
+    label = f'{tax} / {price}'
+    axes[0].plot(sub['Elasticity'], sub['CS_Change'], marker='o', color=color, label=label)
+    axes[1].plot(sub['Elasticity'], sub['Revenue_Change'], marker='o', color=color, label=label)
+axes[0].set_title('Change in Consumer Surplus vs Reference Tax', fontweight='bold')
+axes[1].set_title('Change in Tax Revenue vs Reference Tax', fontweight='bold')
+for ax in axes:
+    ax.set_xlabel('Price Elasticity of Demand', fontweight='bold')
+    ax.set_ylabel('trillion yen (sum over horizon)', fontweight='bold')
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.grid(True, alpha=0.3, linestyle='--')
+axes[0].legend(loc='best', fontsize=7)
+plt.tight_layout()
+figure_file = f'{figures_dir}/16_scenario_sweep_{name}.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"全セル: {output_file}")
+print(f"集計: {summary_file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
@@ -0,0 +1,150 @@
+"""
+公表時点のデータによる需要関数の推定（リアルタイム推定）
+
+GDP・CPI の公表値の履歴（lib/vintage_store.py、data/vintages/vintages.sqlite）から、
+公表のたびに「その日に利用できた GDP・CPI」で06・07と同じ年次データを作り、01と同じ推定式で推定します。
+最新の公表での推定（01と同じ結果）と比べて、改定で弾力性がどれだけ変わったかを確認します。
+
+- 履歴が空のときは、今の GDP・CPI のファイルを推定公表日（最後の期間の終わり + 公表までの日数）で登録
+- --record gdp|cpi FILE --release YYYY-MM-DD で公表を追加（データ更新サービスは受け取り時に自動で追加）
+- 数量・価格・税率は今の四半期データの値を使用（改定されない系列として扱う）
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import statsmodels.api as sm
+import argparse
+import os
+
+from lib.design import annual_design
+from lib.vintage_store import CPI_FILE, GDP_FILES, AsOfIndex, VintageStore, realtime_annual_frame
+
+parser = argparse.ArgumentParser(description='公表時点のデータによる需要関数の推定')
+parser.add_argument('--record', nargs=2, metavar=('SERIES', 'FILE'), help='公表を追加（SERIES: gdp または cpi）')
+parser.add_argument('--release', default=None, help='--record の公表日（YYYY-MM-DD）。省略時は推定公表日')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+print("="*60)
+print("公表時点のデータによる需要関数の推定（リアルタイム推定）")
+print("="*60)
+
+store = VintageStore()
+
+# 1. 公表の登録
+if args.record:
+    series, path = args.record
+    if series not in ('gdp', 'cpi'):
+        print(f"エラー: SERIES は gdp または cpi です: {series}")
+        exit(1)
+    release, n_changed = store.record_file(series, path, args.release)
+    print(f"\n{series} の公表 {release} を追加しました（{n_changed}期間が新規・改定）: {path}")
+
+for series, files in [('gdp', GDP_FILES), ('cpi', [CPI_FILE])]:
+    if len(store.releases(series)) == 0:
+        path = next((f for f in files if os.path.exists(f)), None)
+        if path is None:
+            print(f"エラー: {series} のファイルが見つかりません。")
+            exit(1)
+        release, n_changed = store.record_file(series, path)
+        print(f"\n{series} の履歴が空のため、今のファイルを推定公表日 {release} で登録しました: {path}")
+
+releases = store.releases()
+print(f"\n公表の履歴（{store.path}）:")
+for _, row in releases.iterrows():
+    print(f"  {row['series']:4s} {row['release']}: {row['n_obs']}期間（うち新規・改定 {row['n_changed']}）")
+
+# 2. 公表ごとの推定（その日に利用できた GDP・CPI）
+gdp_index = AsOfIndex(store, 'gdp')
+cpi_index = AsOfIndex(store, 'cpi')
+vintages = sorted(releases['release'].unique())
+rows = []
+for as_of in vintages:
+    gdp, cpi = gdp_index.at(as_of), cpi_index.at(as_of)
+    if len(gdp) == 0 or len(cpi) == 0:
+        continue                       # GDP・CPI の片方がまだ公表されていない
+    design = annual_design(realtime_annual_frame(gdp, cpi))
+    if len(design['y']) < 10:
+        continue
+    model = sm.OLS(design['y'], design['X']).fit()
+    years = design['data']['Year']
+    rows.append({
+        'As_Of': as_of,
+        'GDP_Last_Period': gdp.index[-1],
+        'CPI_Last_Period': cpi.index[-1],
+        'Sample': f"{years.min()}-{years.max()}",
+        'N': int(model.nobs),
+        'alpha': model.params['ln_GDP'],
+        'beta': model.params['ln_P'],
+        'gamma': model.params['ln_Tax_rate'],
+        'alpha_se': model.bse['ln_GDP'],
+        'beta_se': model.bse['ln_P'],
+        'gamma_se': model.bse['ln_Tax_rate'],
+        'rsquared': model.rsquared,
+    })
+
+if not rows:
+    print("\nエラー: 推定できる公表がありません（10年以上の年次データが必要）。")
+    exit(1)
+
+df = pd.DataFrame(rows)
+final = df.iloc[-1]
+for name in ['alpha', 'beta', 'gamma']:
+    df[f'{name}_revision'] = df[name] - final[name]
+
+print(f"\n公表ごとの推定（最後の行が最新の公表、01と同じ結果）:")
+print(df[['As_Of', 'GDP_Last_Period', 'CPI_Last_Period', 'Sample', 'N', 'alpha', 'beta', 'gamma', 'rsquared']]
+      .round(4).to_string(index=False))
+
+# 3. GDP の改定の大きさ（最初の公表値と最新の公表値の差）
+_, periods, values = store.matrix('gdp')
+first_idx = np.argmax(~np.isnan(values), axis=0)
+first = values[first_idx, np.arange(len(periods))]
+latest = values[-1]
+revision = pd.DataFrame({'Period': periods, 'First': first, 'Latest': latest})
+revision['Revision_%'] = (revision['Latest'] / revision['First'] - 1) * 100
+revised = revision[revision['Revision_%'].abs() > 1e-9]
+print(f"\nGDP の改定: {len(revised)} / {len(revision)} 期間"
+      + (f"（平均絶対改定率 {revised['Revision_%'].abs().mean():.2f}%）" if len(revised) else ''))
+
+# 4. 結果の保存
+estimates_file = f'{output_dir}/14_realtime_estimates.csv'
+revision_file = f'{output_dir}/14_gdp_revisions.csv'
+df.to_csv(estimates_file, index=False, encoding='utf-8-sig')
+revision.to_csv(revision_file, index=False, encoding='utf-8-sig')
+
+# 5. グラフ: 公表ごとの弾力性（±2標準誤差）
+print("\nCreating Graph: Real-time Estimates...")
+fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+x_pos = np.arange(len(df))
+for ax, (name, label) in zip(axes, [('alpha', 'α (ln GDP)'), ('beta', 'β (ln P)'), ('gamma', 'γ (ln Tax_rate)')]):
+    ax.errorbar(x_pos, df[name], yerr=2 * df[f'{name}_se'], fmt='o-', color='#2E86AB', capsize=4)
+    ax.axhline(final[name], color='#C73E1D', linestyle='--', linewidth=1, label='latest vintage')
+    ax.set_xticks(x_pos)
+    ax.set_xticklabels(df['As_Of'], rotation=45)
+    ax.set_title(label, fontweight='bold')
+    ax.set_xlabel('Vintage (as of)', fontweight='bold')
+    ax.grid(True, alpha=0.3, linestyle='--')
+axes[0].legend(loc='best')
+fig.suptitle('Real-time Estimates of the Demand Function by Data Vintage', fontweight='bold')
+plt.tight_layout()
+figure_file = f'{figures_dir}/17_realtime_estimates.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"公表ごとの推定: {estimates_file}")
+print(f"GDP の改定: {revision_file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
@@ -0,0 +1,134 @@
+"""
+需要関数の予測精度の検証（時系列のバックテスト）
+
+01のモデルは標本内の R² だけで評価されています。ここでは予測の起点ごとに過去のデータだけで推定し、
+その後の ln Q を予測して実績と比べます（lib/backtest.py）。
+- 年次データ（01と同じ）と四半期データ、拡大ウィンドウと移動ウィンドウ
+- 推定方法: OLS（レベル、01）・対数差分・操作変数（2SLS）・誤差修正モデル・リッジ・ラッソ・前期の値（基準）
+- 評価: ln Q の RMSE、Q の MAPE（%）、起点ごとの弾力性（α・β・γ）のばらつき
+データ更新サービス（lib/refresh.py）がデータの更新のたびに再実行します。
+"""
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import os
+
+from lib.backtest import ESTIMATORS, SCHEMES, check_ols, elasticity_stability, load_frames, run_backtest, score
+
+parser = argparse.ArgumentParser(description='需要関数の予測精度の検証（バックテスト）')
+parser.add_argument('--estimators', nargs='+', choices=list(ESTIMATORS), default=None, help='推定方法（既定: すべて）')
+parser.add_argument('--workers', type=int, default=None, help='プロセス数（既定: CPU 数）')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+print("="*60)
+print("需要関数の予測精度の検証（時系列のバックテスト）")
+print("="*60)
+
+# 1. バックテスト
+frames = load_frames()
+result = run_backtest(frames, estimators=args.estimators, workers=args.workers)
+forecasts, fits, full = result['forecasts'], result['fits'], result['full']
+for frequency, setting in result['settings'].items():
+    print(f"\n{frequency}: 最小の学習期間 {setting['min_train']}期、移動ウィンドウ {setting['window']}期、"
+          f"予測期間 {setting['horizon']}期先まで")
+print(f"予測 {len(forecasts)} 件、推定 {len(fits)} 回（{result['elapsed']:.1f}秒）")
+# 積和からの推定が、学習期間の行から直接推定した OLS と同じ予測になることの確認
+for frequency, diff in check_ols(frames, result['settings']).items():
+    print(f"確認（{frequency}）: 拡大ウィンドウの OLS と直接推定の予測の最大の差 {diff:.2e}")
+    if diff > 1e-8:
+        print("  警告: 差が大きすぎます。lib/backtest.py の推定を確認してください。")
+
+# 2. 予測精度
+scores = score(forecasts)
+stability = elasticity_stability(fits, full)
+for frequency in scores['Frequency'].unique():
+    table = scores[scores['Frequency'] == frequency].sort_values(['Scheme', 'RMSE'])
+    print(f"\n【{frequency}】予測精度（RMSE: ln Q、MAPE: %）")
+    print(table[['Scheme', 'Estimator', 'N', 'RMSE', 'RMSE_h1', 'MAPE']].round(4).to_string(index=False))
+
+    table = stability[(stability['Frequency'] == frequency) & stability['beta_full'].notna()]
+    print(f"\n【{frequency}】価格弾力性 β の安定性（起点ごとの推定値）")
+    print(table[['Scheme', 'Estimator', 'N_Folds', 'beta_full', 'beta_mean', 'beta_std', 'beta_min', 'beta_max',
+                 'beta_sign_flip_share']].round(3).to_string(index=False))
+
+    best = scores[(scores['Frequency'] == frequency) & (scores['Scheme'] == 'expanding')].sort_values('RMSE').iloc[0]
+    print(f"\n→ 拡大ウィンドウで RMSE が最小: {ESTIMATORS[best['Estimator']].label}"
+          f"（RMSE {best['RMSE']:.4f}、MAPE {best['MAPE']:.2f}%）")
+
+# 3. 結果の保存
+forecasts_file = f'{output_dir}/15_backtest_forecasts.csv'
+fits_file = f'{output_dir}/15_backtest_fits.csv'
+scores_file = f'{output_dir}/15_backtest_scores.csv'
+stability_file = f'{output_dir}/15_backtest_elasticity_stability.csv'
+forecasts.to_csv(forecasts_file, index=False, encoding='utf-8-sig')
+fits.to_csv(fits_file, index=False, encoding='utf-8-sig')
+scores.to_csv(scores_file, index=False, encoding='utf-8-sig')
+stability.to_csv(stability_file, index=False, encoding='utf-8-sig')
+
+# 4. グラフ: 推定方法ごとの RMSE と、起点ごとの価格弾力性 β（拡大ウィンドウ）
+print("\nCreating Graph: Backtest...")
+frequencies = list(scores['Frequency'].unique())
+fig, axes = plt.subplots(2, len(frequencies), figsize=(8 * len(frequencies), 10), squeeze=False)
+colors = {'expanding': '#2E86AB', 'rolling': '#F18F01'}
+for j, frequency in enumerate(frequencies):
+    ax = axes[0, j]
+    table = scores[scores['Frequency'] == frequency]
+    names = list(table[table['Scheme'] == SCHEMES[0]].sort_values('RMSE')['Estimator'])
+    x_pos = np.arange(len(names))
+    width = 0.8 / len(SCHEMES)
+    for i, scheme in enumerate(SCHEMES):
+        values = table[table['Scheme'] == scheme].set_index('Estimator').reindex(names)['RMSE']
+        ax.bar(x_pos + (i - (len(SCHEMES) - 1) / 2) * width, values, width, label=scheme, color=colors[scheme],
+               alpha=0.85, edgecolor='black')
+    ax.set_xticks(x_pos)
+    ax.set_xticklabels([ESTIMATORS[n].label for n in names], rotation=30, ha='right')
+    ax.set_yscale('log')                 # 外れた推定方法があっても比較できるように
+    ax.set_ylabel('RMSE of ln Q (log scale)', fontweight='bold')
+    ax.set_title(f'Out-of-sample Accuracy ({frequency})', fontweight='bold')
+    ax.legend(loc='best')
+    ax.grid(True, alpha=0.3, linestyle='--', axis='y')
+
+    ax = axes[1, j]
+    origins = None
+    for name in names:
+        if name == 'ecm':
+            continue                         # 長期の弾力性は OLS（レベル）と同じ
+        group = fits[(fits['Frequency'] == frequency) & (fits['Scheme'] == 'expanding') & (fits['Estimator'] == name)]
+        if group['beta'].notna().any():
+            origins = list(group['Origin'])
+            ax.plot(np.arange(len(group)), group['beta'], marker='o', markersize=3, label=ESTIMATORS[name].label)
+    if origins is not None:
+        step = max(1, len(origins) // 10)
+        ax.set_xticks(np.arange(0, len(origins), step))
+        ax.set_xticklabels(origins[::step])
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.set_ylabel('β (price elasticity)', fontweight='bold')
+    ax.set_xlabel('Forecast origin (expanding window)', fontweight='bold')
+    ax.set_title(f'Price Elasticity by Forecast Origin ({frequency})', fontweight='bold')
+    ax.tick_params(axis='x', rotation=45)
+    ax.legend(loc='best', fontsize=8)
+    ax.grid(True, alpha=0.3, linestyle='--')
+plt.tight_layout()
+figure_file = f'{figures_dir}/18_backtest.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"予測: {forecasts_file}")
+print(f"起点ごとの係数: {fits_file}")
+print(f"予測精度: {scores_file}")
+print(f"弾力性の安定性: {stability_file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
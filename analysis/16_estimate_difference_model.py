@@ -0,0 +1,211 @@
+"""
+四半期・月次の対数差分モデルの推定（HAC 標準誤差）
+
+README の需要関数 ⊿lnQ = α×⊿lnGDP + β×⊿lnP + γ×⊿lnTax_rate + ε を、
+00_prepare_log_transformed_data.py の四半期の対数差分で推定します（lib/design.py の load_difference_design）。
+--frequency monthly では 08_build_frequency_data.py の月次データ（元の頻度から集計、load_frequency_design）で推定します。
+- 定数項と季節ダミー（Q2〜Q4、月次は M2〜M12）つき（--no-seasonal で季節ダミーなし）、価格は01と同じ相対価格（--nominal-price で名目）
+- 差分の残差は系列相関が強いため、標準誤差は Newey–West の HAC（帯域幅は自動選択、lib/hac.py）
+- 通常の標準誤差・カーネル別の HAC を比較し、帯域幅を変えたときの標準誤差も確認
+係数は01と同じ形式の JSON と推定結果ストアに保存するので、
+02_calculate_consumer_surplus.py --model-key <key> で消費者余剰の計算に使えます。
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import json
+import os
+import time
+
+from lib.design import coefficients_json, load_difference_design, load_frequency_design
+from lib.hac import KERNELS, hac_cov_path, ols_hac
+from lib.results_store import ResultsStore, file_hash, make_key
+
+parser = argparse.ArgumentParser(description='四半期・月次の対数差分モデルの推定（HAC 標準誤差）')
+parser.add_argument('--frequency', choices=['quarterly', 'monthly'], default='quarterly',
+                    help='データの頻度（既定: quarterly）')
+parser.add_argument('--kernel', choices=list(KERNELS), default='bartlett', help='HAC のカーネル（既定: bartlett）')
+parser.add_argument('--bandwidth', type=float, default=None,
+                    help='帯域幅（bartlett・parzen はラグの数）。省略時は Newey–West（1994）の自動選択')
+parser.add_argument('--no-seasonal', action='store_true', help='季節ダミーを入れない')
+parser.add_argument('--nominal-price', action='store_true', help='名目価格の差分を使う（既定: 相対価格）')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+period_name = {'quarterly': '四半期', 'monthly': '月次'}[args.frequency]
+suffix = '' if args.frequency == 'quarterly' else f'_{args.frequency}'
+
+print("="*60)
+print(f"{period_name}の対数差分モデルの推定（HAC 標準誤差）")
+print("="*60)
+
+# 1. データ
+try:
+    if args.frequency == 'quarterly':
+        design = load_difference_design(seasonal=not args.no_seasonal, relative_price=not args.nominal_price)
+    else:
+        design = load_frequency_design(args.frequency, seasonal=not args.no_seasonal, difference=True,
+                                       relative_price=not args.nominal_price)
+except FileNotFoundError as e:
+    print(f"エラー: {e}")
+    exit(1)
+X, y = design['X'], design['y']
+names = list(X.columns)
+dummy_vars = design['dummy_vars']
+print(f"\nデータ: {design['data_file']}")
+print(f"期間: {design['data']['Year'].min()} - {design['data']['Year'].max()}（{len(y)}期間、{period_name}）")
+print(f"価格変数: Δ{design['ln_price_col']}、説明変数: {names}")
+
+# 2. 推定（係数は OLS、標準誤差は HAC）
+bandwidth = int(args.bandwidth) if args.bandwidth is not None and KERNELS[args.kernel][4] else args.bandwidth
+start = time.perf_counter()
+fit = ols_hac(y.to_numpy(), X.to_numpy(), cov_type='newey_west', kernel=args.kernel, bandwidth=bandwidth)
+elapsed = time.perf_counter() - start
+params = pd.Series(fit['params'], index=names)
+pvalues = pd.Series(fit['pvalues'], index=names)
+print(f"\n推定: {elapsed*1000:.1f}ミリ秒（カーネル {args.kernel}、帯域幅 {fit['bandwidth']}"
+      f"{'（自動選択）' if args.bandwidth is None else ''}、ラグ {fit['max_lag']}）")
+
+print("\n" + "="*60)
+print("推定された係数（HAC 標準誤差）")
+print("="*60)
+table = pd.DataFrame({'Coefficient': fit['params'], 'HAC_SE': fit['bse'], 't': fit['tvalues'],
+                      'P_value': fit['pvalues']}, index=names)
+print(table.round(4).to_string())
+print(f"\nR-squared: {fit['rsquared']:.4f}、Adjusted R-squared: {fit['rsquared_adj']:.4f}")
+print(f"\n所得弾力性 (α): {params['ln_GDP']:.4f}")
+print(f"価格弾力性 (β): {params['ln_P']:.4f}")
+print(f"税率弾力性 (γ): {params['ln_Tax_rate']:.4f}")
+
+# 3. 標準誤差の比較（通常・カーネル別の HAC）
+rows = []
+variants = [('nonrobust', None)] + [('newey_west', kernel) for kernel in KERNELS]
+for cov_type, kernel in variants:
+    other = ols_hac(y.to_numpy(), X.to_numpy(), cov_type=cov_type, kernel=kernel or 'bartlett')
+    row = {'Cov_Type': cov_type, 'Kernel': kernel or '', 'Bandwidth': other['bandwidth']}
+    for name in ['ln_GDP', 'ln_P', 'ln_Tax_rate']:
+        i = names.index(name)
+        row[f'{name}_SE'] = other['bse'][i]
+        row[f'{name}_p'] = other['pvalues'][i]
+    rows.append(row)
+se_table = pd.DataFrame(rows)
+print("\n標準誤差の比較（帯域幅はそれぞれ自動選択）:")
+print(se_table.round(4).to_string(index=False))
+
+# 帯域幅を変えたときの標準誤差（Bartlett、自己共分散は1回だけ計算）
+bandwidths = np.arange(0, 13 if args.frequency == 'quarterly' else 25)
+covs = hac_cov_path(X.to_numpy(), fit['resid'], 'bartlett', bandwidths)
+bandwidth_se = pd.DataFrame({'Lags': bandwidths})
+for name in ['ln_GDP', 'ln_P', 'ln_Tax_rate']:
+    i = names.index(name)
+    bandwidth_se[f'{name}_SE'] = np.sqrt(covs[:, i, i])
+
+# 4. 結果の保存（01と同じ形式の JSON、推定結果ストア）
+model_type = f'{args.frequency}_difference_model'
+results_json = coefficients_json(
+    params, model_type, rsquared=fit['rsquared'], rsquared_adj=fit['rsquared_adj'], pvalues=pvalues.to_dict(),
+    dummy_vars=dummy_vars,
+    cov_type='HAC', kernel=args.kernel, bandwidth=float(fit['bandwidth']), max_lag=int(fit['max_lag']),
+    bse={name: float(v) for name, v in zip(names, fit['bse'])},
+)
+json_file = f'{output_dir}/16_coefficients_{model_type}.json'
+with open(json_file, 'w', encoding='utf-8') as f:
+    json.dump(results_json, f, indent=2, ensure_ascii=False)
+
+frame_columns = ['Year', 'Q (liters)', 'P (yen/liter)', 'Tax_rate (%)', 'GDP (trillion yen)', 'CPI', 'P_relative',
+                 'ln_Q', 'ln_P', 'ln_P_relative', 'ln_GDP', 'ln_Tax_rate', 'Δln_Q', 'Δln_P', 'Δln_GDP', 'Δln_Tax_rate']
+df_analysis = design['data'][[c for c in frame_columns if c in design['data'].columns]].copy()
+data_file = f'{output_dir}/16_analysis_data_{model_type}.csv'
+df_analysis.to_csv(data_file, index=False, encoding='utf-8-sig')
+
+store = ResultsStore()
+data_version = file_hash(design['data_file'])
+model_spec = {
+    'formula': 'Δln(Q) = C + α×Δln(GDP) + β×Δln(P) + γ×Δln(Tax_rate) + seasonal',
+    'price_variable': design['ln_price_col'],
+    'regressors': names,
+    'sample_periods': design['data']['Year'].tolist(),
+}
+model_options = {'estimator': 'OLS', 'cov_type': 'HAC', 'kernel': args.kernel,
+                 'bandwidth': 'newey_west_1994' if args.bandwidth is None else args.bandwidth}
+model_key = make_key(data_version, model_spec, model_options)
+store.save(
+    model_key, model_type=model_type, data_version=data_version, spec=model_spec, options=model_options,
+    summary={**results_json, 'model_key': model_key},
+    arrays={
+        'params': fit['params'],
+        'bse': fit['bse'],
+        'pvalues': fit['pvalues'],
+        'cov_params': fit['cov'],
+        'resid': fit['resid'],
+        'fitted': fit['fitted'],
+    },
+    frame=df_analysis,
+)
+
+se_file = f'{output_dir}/16_difference_model_se_comparison{suffix}.csv'
+bandwidth_file = f'{output_dir}/16_difference_model_se_by_bandwidth{suffix}.csv'
+table.rename_axis('Variable').reset_index().to_csv(
+    f'{output_dir}/16_coefficients_{model_type}.csv', index=False, encoding='utf-8-sig')
+se_table.to_csv(se_file, index=False, encoding='utf-8-sig')
+bandwidth_se.to_csv(bandwidth_file, index=False, encoding='utf-8-sig')
+
+# 5. グラフ: 通常と HAC の95%信頼区間、帯域幅ごとの標準誤差
+print("\nCreating Graph: Difference Model with HAC Standard Errors...")
+fig, axes = plt.subplots(1, 2, figsize=(15, 6))
+ax = axes[0]
+labels = ['α (Δln GDP)', 'β (Δln P)', 'γ (Δln Tax_rate)']
+y_pos = np.arange(3)
+# 描く行は Cov_Type・Kernel の値で選ぶ（KERNELS の順序に依存しないように）
+plotted = se_table.set_index(['Cov_Type', 'Kernel']).loc[
+    [('nonrobust', ''), ('newey_west', 'bartlett'), ('newey_west', 'qs')]].reset_index()
+for offset, (_, row), color in zip([-0.2, 0, 0.2], plotted.iterrows(),
+                                   ['#6C757D', '#2E86AB', '#F18F01']):
+    estimates = [params[n] for n in ['ln_GDP', 'ln_P', 'ln_Tax_rate']]
+    errors = [1.96 * row[f'{n}_SE'] for n in ['ln_GDP', 'ln_P', 'ln_Tax_rate']]
+    label = 'OLS (nonrobust)' if row['Cov_Type'] == 'nonrobust' else f"HAC {row['Kernel']} (b={row['Bandwidth']:.1f})"
+    ax.errorbar(estimates, y_pos + offset, xerr=errors, fmt='o', color=color, capsize=4, label=label)
+ax.axvline(0, color='black', linewidth=0.8)
+ax.set_yticks(y_pos)
+ax.set_yticklabels(labels)
+ax.set_xlabel('Coefficient (95% CI)', fontweight='bold')
+ax.set_title(f'{args.frequency.capitalize()} Difference Model: Coefficients', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--')
+
+ax = axes[1]
+for name, label in zip(['ln_GDP', 'ln_P', 'ln_Tax_rate'], labels):
+    ax.plot(bandwidth_se['Lags'], bandwidth_se[f'{name}_SE'], marker='o', label=label)
+if args.kernel == 'bartlett':
+    ax.axvline(fit['bandwidth'], color='#C73E1D', linestyle='--', linewidth=1, label='selected lags')
+ax.set_xlabel('Bartlett lags', fontweight='bold')
+ax.set_ylabel('HAC standard error', fontweight='bold')
+ax.set_title('Standard Errors by Bandwidth', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--')
+plt.tight_layout()
+figure_file = f'{figures_dir}/19_difference_model_hac{suffix}.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"係数（JSON）: {json_file}")
+print(f"分析データ: {data_file}")
+print(f"標準誤差の比較: {se_file}")
+print(f"帯域幅ごとの標準誤差: {bandwidth_file}")
+print(f"グラフ: {figure_file}")
+print(f"推定結果ストア: {store.store_dir}（key: {model_key[:12]}）")
+print(f"消費者余剰: python analysis/02_calculate_consumer_surplus.py --model-key {model_key[:12]}")
+
+print("\n完了しました！")
@@ -0,0 +1,127 @@
+"""
+価格の非対称な転嫁の推定（「ロケットと羽根」、週次・地域別）
+
+費用が上がったときに小売価格が速く上がり、下がったときにはゆっくり下がるかを、
+週次の地域別ガソリン価格（scripts/data_preparation の価格パネル）で地域ごとに調べます（lib/pass_through.py）。
+- 非対称な誤差修正モデル（費用の上昇・下落の分布ラグ、閾値つきの調整の速さ）を全地域まとめて推定
+- 費用には全国平均の価格を使います（原油・卸売価格の系列がないため、地域に共通の費用ショックの代理）
+- 1円の費用の上昇・下落に対する累積反応と、その差（非対称の大きさ）の wild ブートストラップの90%区間・p値
+データ更新サービス（lib/refresh.py）が価格パネルの更新のたびに再実行します。
+"""
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import os
+import time
+
+from lib.pass_through import PREFECTURE_START, estimate, weekly_panel
+
+parser = argparse.ArgumentParser(description='価格の非対称な転嫁の推定（週次・地域別）')
+parser.add_argument('--start', default=PREFECTURE_START, help=f'推定の開始日（既定: {PREFECTURE_START}、都道府県の調査の開始）')
+parser.add_argument('--threshold', choices=['zero', 'search'], default='search',
+                    help='調整の閾値（zero: 0、search: SSR 最小の格子探索。既定: search）')
+parser.add_argument('--n-boot', type=int, default=499, help='ブートストラップの回数（既定: 499）')
+parser.add_argument('--horizon', type=int, default=26, help='累積反応の週数（既定: 26）')
+parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+print("="*60)
+print("価格の非対称な転嫁の推定（週次・地域別）")
+print("="*60)
+
+# 1. データ
+try:
+    panel = weekly_panel(start=args.start)
+except FileNotFoundError as e:
+    print(f"エラー: {e}")
+    exit(1)
+dates = panel['dates']
+print(f"\n期間: {str(dates[0])[:10]} - {str(dates[-1])[:10]}（{len(dates)}週）")
+print(f"地域: {len(panel['regions'])}（うち地方局 {int(panel['bureau'].sum())}）、費用: 全国平均の価格")
+
+# 2. 推定
+start = time.perf_counter()
+result = estimate(panel, threshold=args.threshold, horizon=args.horizon, n_boot=args.n_boot, seed=args.seed)
+elapsed = time.perf_counter() - start
+table, responses = result['table'], result['responses']
+print(f"推定: {elapsed:.2f}秒（{len(table)}地域を一括、ブートストラップ {args.n_boot}回、閾値 {args.threshold}）")
+
+print("\n" + "="*60)
+print("地域別の結果")
+print("="*60)
+columns = ['Region', 'Sum_Pass_Through_Up', 'Sum_Pass_Through_Down', 'Theta_Up', 'Theta_Down', 'Wald_Joint_p',
+           'Asymmetry_4w', 'Asymmetry_4w_p']
+print(table[columns].round(3).to_string(index=False))
+
+prefectures = table[~table['Bureau']]
+significant = prefectures[prefectures['Wald_Joint_p'] < 0.05]
+rockets = prefectures[(prefectures['Asymmetry_4w'] > 0) & (prefectures['Asymmetry_4w_p'] < 0.1)]
+feathers = prefectures[(prefectures['Asymmetry_4w'] < 0) & (prefectures['Asymmetry_4w_p'] < 0.1)]
+print(f"\n都道府県 {len(prefectures)}のうち:")
+print(f"  対称性（短期の転嫁の合計・調整の速さ）が5%で棄却: {len(significant)}")
+print(f"  4週後に上昇への反応が大きい（ロケットと羽根、10%）: {len(rockets)}"
+      f"{'（' + '、'.join(rockets['Region']) + '）' if len(rockets) else ''}")
+print(f"  4週後に下落への反応が大きい（10%）: {len(feathers)}"
+      f"{'（' + '、'.join(feathers['Region']) + '）' if len(feathers) else ''}")
+print(f"  4週後の非対称の大きさ（円/1円）: 中央値 {prefectures['Asymmetry_4w'].median():.3f}、"
+      f"範囲 {prefectures['Asymmetry_4w'].min():.3f} 〜 {prefectures['Asymmetry_4w'].max():.3f}")
+
+# 3. 結果の保存
+table_file = f'{output_dir}/17_price_asymmetry_by_region.csv'
+responses_file = f'{output_dir}/17_price_asymmetry_crf.csv'
+table.to_csv(table_file, index=False, encoding='utf-8-sig')
+responses.to_csv(responses_file, index=False, encoding='utf-8-sig')
+
+# 4. グラフ: 累積反応（都道府県の平均）と、地域別の4週後の非対称の大きさ
+print("\nCreating Graph: Asymmetric Price Pass-through...")
+fig, axes = plt.subplots(1, 2, figsize=(16, 7), gridspec_kw={'width_ratios': [1, 1.4]})
+ax = axes[0]
+mean = responses[responses['Region'].isin(prefectures['Region'])].groupby('Week')[['Up', 'Down']].mean()
+ax.plot(mean.index, mean['Up'], color='#C73E1D', marker='o', markersize=3, label='cost +1 yen')
+ax.plot(mean.index, -mean['Down'], color='#2E86AB', marker='o', markersize=3, label='cost −1 yen (sign flipped)')
+ax.axhline(1, color='black', linewidth=0.8, linestyle='--')
+ax.set_xlabel('Weeks after cost change', fontweight='bold')
+ax.set_ylabel('Cumulative retail price response (yen)', fontweight='bold')
+ax.set_title('Cumulative Response Functions (prefecture mean)', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--')
+
+ax = axes[1]
+week = min(4, args.horizon)
+at_week = responses[responses['Week'] == week].set_index('Region').reindex(table['Region'])
+x_pos = np.arange(len(at_week))
+colors = np.where(at_week['Asymmetry_p'] < 0.1, np.where(at_week['Asymmetry'] > 0, '#C73E1D', '#2E86AB'), '#ADB5BD')
+ax.bar(x_pos, at_week['Asymmetry'], color=colors, edgecolor='black', linewidth=0.3)
+if args.n_boot > 0:
+    ax.vlines(x_pos, at_week['Asymmetry_Lower_90'], at_week['Asymmetry_Upper_90'], color='black', linewidth=0.8)
+ax.axhline(0, color='black', linewidth=0.8)
+bureaus = np.flatnonzero(table['Bureau'].to_numpy())
+ax.plot(bureaus, np.zeros(len(bureaus)), linestyle='none', marker='v', color='black', markersize=4,
+        label='regional bureau')
+ax.set_xlabel('Region (panel column order, north to south; names in the CSV)', fontweight='bold')
+ax.legend(loc='best')
+ax.set_ylabel(f'Response to +1 minus response to −1 at week {week} (yen)', fontweight='bold')
+ax.set_title('Asymmetry by Region (90% wild bootstrap CI)', fontweight='bold')
+ax.grid(True, alpha=0.3, linestyle='--', axis='y')
+plt.tight_layout()
+figure_file = f'{figures_dir}/20_price_asymmetry.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"地域別の結果: {table_file}")
+print(f"累積反応: {responses_file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
@@ -0,0 +1,153 @@
+"""
+税率の変更のイベントスタディ（週次価格への税の転嫁率）
+
+税率表から従量税・消費税率の変更日を自動で取り出し（05のグラフで手で注記していた2008年の暫定税率の失効・復活、
+消費税率の引き上げなど）、変更の前後の週次の価格から転嫁率を全国・地方局・都道府県ごとに推定します（lib/event_study.py）。
+- 異常な変化: 変更前の週からの価格の変化から、推定期間の平均の週次の変化（トレンド）を除いたもの
+- 転嫁率: 異常な変化 / 税が完全に転嫁されたときの価格の変化
+- 検定: 税率の変更から離れた全ての週を偽の変更日とした並べ替え検定と、1年前・1年後のプラセボ
+データ更新サービス（lib/refresh.py）が価格パネル・税率表の更新のたびに再実行します。
+"""
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import os
+import time
+
+from lib.event_study import HORIZONS, run_event_study
+
+parser = argparse.ArgumentParser(description='税率の変更のイベントスタディ（週次価格への税の転嫁率）')
+parser.add_argument('--source', choices=['change_log', 'quarterly_table'], default='change_log',
+                    help='変更日の取り出し元（change_log: 制度変更のメモ（月単位）、quarterly_table: 四半期ごとの税率表）')
+parser.add_argument('--post', type=int, default=8, help='変更後の窓の週数（既定: 8）')
+parser.add_argument('--estimation-weeks', type=int, default=26, help='トレンドの推定期間の週数（既定: 26）')
+parser.add_argument('--gap', type=int, default=4, help='推定期間の終わりから変更日までの週数（既定: 4）')
+parser.add_argument('--n-perm', type=int, default=5000, help='まとめた転嫁率の並べ替えの回数（既定: 5000）')
+parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+print("="*60)
+print("税率の変更のイベントスタディ（週次価格への税の転嫁率）")
+print("="*60)
+
+# 1. 推定
+start = time.perf_counter()
+try:
+    study = run_event_study(source=args.source, post=args.post, gap=args.gap, est_weeks=args.estimation_weeks,
+                            n_perm=args.n_perm, seed=args.seed)
+except FileNotFoundError as e:
+    print(f"エラー: {e}")
+    exit(1)
+elapsed = time.perf_counter() - start
+events, results, paths, pooled = study['events'], study['results'], study['paths'], study['pooled']
+tax = events[events['Type'] == 'tax']
+print(f"\n税率の変更: {len(tax)}件（{args.source}、価格データの期間内）、プラセボ: {len(events) - len(tax)}件")
+print(f"偽の変更日のプール: {study['pool_size']}週、まとめた転嫁率の並べ替え: {args.n_perm}回（{elapsed:.2f}秒）")
+
+print("\n" + "="*60)
+print("変更ごとの転嫁率（全国・都道府県の平均、p値は並べ替え検定）")
+print("="*60)
+for _, row in tax.iterrows():
+    print(f"\n{str(row['Event_Date'])[:10]} {row['Label']}（完全に転嫁された場合の変化: "
+          f"全国 {row['Predicted_Change_National']:+.2f}円/L）")
+    for h in HORIZONS:
+        national = row[f'Pass_Through_National_{h}w']
+        if np.isnan(national):
+            continue
+        line = f"  {h}週: 全国 {national:6.2f}（p={row[f'p_National_{h}w']:.3f}）"
+        if row['Prefectures_Observed'] > 0 and not np.isnan(row[f'Pass_Through_Prefecture_Mean_{h}w']):
+            line += (f"、都道府県の平均 {row[f'Pass_Through_Prefecture_Mean_{h}w']:6.2f}"
+                     f"（p={row[f'p_Prefecture_Mean_{h}w']:.3f}、5%で有意 {row[f'Prefectures_Significant_{h}w']}"
+                     f"/{row['Prefectures_Observed']}）")
+        print(line)
+
+print("\n" + "="*60)
+print("種類ごとにまとめた転嫁率（Σ AR·ΔP* / Σ ΔP*²）")
+print("="*60)
+print(pooled.round(3).to_string(index=False))
+
+placebo = events[events['Type'] != 'tax']
+if len(placebo):
+    rejected = (placebo[f'p_National_{HORIZONS[0]}w'] < 0.05).sum()
+    print(f"\nプラセボ（±52週）: {len(placebo)}件のうち {HORIZONS[0]}週の全国の転嫁率が5%で有意: {rejected}件")
+
+# 2. 結果の保存
+events_file = f'{output_dir}/18_tax_event_study_events.csv'
+results_file = f'{output_dir}/18_tax_event_study_by_region.csv'
+paths_file = f'{output_dir}/18_tax_event_study_paths.csv'
+pooled_file = f'{output_dir}/18_tax_event_study_pooled.csv'
+events.to_csv(events_file, index=False, encoding='utf-8-sig')
+results.to_csv(results_file, index=False, encoding='utf-8-sig')
+paths.to_csv(paths_file, index=False, encoding='utf-8-sig')
+pooled.to_csv(pooled_file, index=False, encoding='utf-8-sig')
+
+# 3. グラフ: 変更ごとのイベント時間の転嫁率と、種類ごとにまとめた転嫁率
+print("\nCreating Graph: Tax Event Study...")
+n_events = len(tax)
+n_cols = 4
+n_rows = (n_events + n_cols - 1) // n_cols
+fig = plt.figure(figsize=(18, 4.5 * (n_rows + 1)))
+grid = fig.add_gridspec(n_rows + 1, n_cols)
+for i, (_, row) in enumerate(tax.iterrows()):
+    ax = fig.add_subplot(grid[i // n_cols, i % n_cols])
+    path = paths[(paths['Event_Date'] == row['Event_Date']) & (paths['Type'] == 'tax')]
+    ax.fill_between(path['Event_Week'], path['Pass_Through_Prefecture_P10'], path['Pass_Through_Prefecture_P90'],
+                    color='#2E86AB', alpha=0.2, label='prefectures P10–P90')
+    ax.plot(path['Event_Week'], path['Pass_Through_Prefecture_Mean'], color='#2E86AB', label='prefecture mean')
+    ax.plot(path['Event_Week'], path['Pass_Through_National'], color='#C73E1D', marker='o', markersize=3,
+            label='national')
+    ax.axhline(1, color='black', linewidth=0.8, linestyle='--')
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.axvline(-0.5, color='gray', linewidth=0.8)
+    kind = 'consumption tax' if row['Kind'] == 'consumption_tax' else 'specific tax'
+    ax.set_title(f"{str(row['Event_Date'])[:7]} {kind} ({row['Predicted_Change_National']:+.1f} yen/L)",
+                 fontweight='bold', fontsize=10)
+    ax.set_ylim(-1.5, 2.5)
+    ax.set_xlabel('Weeks from tax change')
+    ax.set_ylabel('Pass-through rate')
+    ax.grid(True, alpha=0.3, linestyle='--')
+    if i == 0:
+        ax.legend(loc='best', fontsize=7)
+
+for j, kind in enumerate(pooled['Kind'].unique()):
+    ax = fig.add_subplot(grid[n_rows, 2 * j:2 * j + 2])
+    table = pooled[pooled['Kind'] == kind]
+    x_pos = np.arange(len(HORIZONS))
+    for k, (level, color) in enumerate([('National', '#C73E1D'), ('Prefectures', '#2E86AB')]):
+        sub = table[table['Level'] == level].set_index('Weeks').reindex(HORIZONS)
+        offset = (k - 0.5) * 0.35
+        ax.bar(x_pos + offset, sub['Pass_Through'], 0.35, color=color, alpha=0.85, edgecolor='black', label=level)
+        ax.vlines(x_pos + offset, sub['Null_P05'], sub['Null_P95'], color='black', linewidth=2,
+                  label='permutation null 5–95%' if k == 0 else None)
+    ax.axhline(1, color='black', linewidth=0.8, linestyle='--')
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.set_xticks(x_pos)
+    ax.set_xticklabels([f'{h} week{"s" if h > 1 else ""}' for h in HORIZONS])
+    ax.set_ylabel('Pooled pass-through rate', fontweight='bold')
+    ax.set_title(f"Pooled Pass-through: {kind.replace('_', ' ')}", fontweight='bold')
+    ax.legend(loc='best', fontsize=8)
+    ax.grid(True, alpha=0.3, linestyle='--', axis='y')
+plt.tight_layout()
+figure_file = f'{figures_dir}/21_tax_event_study.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"変更ごとの結果: {events_file}")
+print(f"地域別の転嫁率: {results_file}")
+print(f"イベント時間の転嫁率: {paths_file}")
+print(f"まとめた転嫁率: {pooled_file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
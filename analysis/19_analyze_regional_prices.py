@@ -0,0 +1,162 @@
+"""
+地域間の価格のばらつき・収束・価格の先導関係の分析（週次の都道府県別価格）
+
+週次の小売価格の都道府県・地方局の列から（lib/regional.py）
+- 週ごとの地域間のばらつき: 変動係数（CV）・ジニ係数・四分位範囲・最大−最小
+- σ収束（対数価格の地域間の標準偏差の時間トレンド、HAC 標準誤差）と
+  β収束（全国平均からの乖離の自己回帰、地域ごとの β と Driscoll–Kraay の標準誤差による全体の β・半減期）
+- 全ての地域の組の価格の変化の相互相関（FFT による一括計算）による価格の先導関係
+データ更新サービス（lib/refresh.py）が価格パネルの更新のたびに再実行します。
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import os
+import time
+
+from lib.regional import (PREFECTURE_START, beta_convergence, dispersion, lead_lag, regional_panel,
+                          sigma_convergence)
+
+parser = argparse.ArgumentParser(description='地域間の価格のばらつき・収束・先導関係の分析')
+parser.add_argument('--level', choices=['prefecture', 'bureau'], default='prefecture',
+                    help='地域の単位（prefecture: 都道府県、bureau: 地方局。既定: prefecture）')
+parser.add_argument('--start', default=PREFECTURE_START, help=f'分析の開始日（既定: {PREFECTURE_START}）')
+parser.add_argument('--max-lag', type=int, default=8, help='相互相関の最大のラグ（週、既定: 8）')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+print("="*60)
+print("地域間の価格のばらつき・収束・先導関係の分析")
+print("="*60)
+
+# 1. データ
+try:
+    dates, regions, prices = regional_panel(level=args.level, start=args.start)
+except FileNotFoundError as e:
+    print(f"エラー: {e}")
+    exit(1)
+print(f"\n期間: {str(dates[0])[:10]} - {str(dates[-1])[:10]}（{len(dates)}週）、地域: {len(regions)}（{args.level}）")
+
+# 2. ばらつき
+spread = dispersion(dates, prices)
+year = pd.Series(dates.astype('datetime64[Y]').astype(int) + 1970, name='Year')
+annual = spread.drop(columns='Date').groupby(year).mean()
+print("\n年平均の地域間のばらつき（抜粋）:")
+print(annual[['Mean', 'CV', 'Gini', 'IQR', 'Range']].iloc[::3].round(4).to_string())
+
+# 3. σ収束・β収束
+sigma = sigma_convergence(dates, prices)
+beta = beta_convergence(prices)
+print("\n" + "="*60)
+print("収束")
+print("="*60)
+direction = '縮小（σ収束）' if sigma['slope'] < 0 else '拡大'
+print(f"σ収束: 対数価格の標準偏差 {sigma['start']:.4f}（最初の年）→ {sigma['end']:.4f}（最後の年）、"
+      f"トレンド {sigma['slope']*1000:+.3f}×10⁻³/年（HAC SE {sigma['bse']*1000:.3f}、p={sigma['pvalue']:.4f}）→ {direction}")
+print(f"β収束: β = {beta['beta']:.4f}（Driscoll–Kraay SE {beta['bse']:.4f}、p={beta['pvalue']:.4g}）、"
+      f"乖離の半減期 {beta['half_life']:.1f}週")
+print(f"  地域ごとの半減期: 中央値 {np.nanmedian(beta['half_life_by_region']):.1f}週、"
+      f"最短 {regions[np.nanargmin(beta['half_life_by_region'])]}（{np.nanmin(beta['half_life_by_region']):.1f}週）、"
+      f"最長 {regions[np.nanargmax(beta['half_life_by_region'])]}（{np.nanmax(beta['half_life_by_region']):.1f}週）")
+
+# 4. 価格の先導関係（週次の対数価格の変化）
+changes = np.diff(np.log(prices), axis=0)
+start = time.perf_counter()
+pairs, leadership, rho = lead_lag(changes, regions, max_lag=args.max_lag)
+elapsed = time.perf_counter() - start
+print("\n" + "="*60)
+print("価格の先導関係")
+print("="*60)
+print(f"{len(pairs)}組 × {2 * args.max_lag + 1}ラグの相互相関: {elapsed*1000:.0f}ミリ秒（FFT）")
+print(f"同時点の相関: 中央値 {pairs['Corr_0'].median():.3f}")
+print("\n先導する地域（上位）:")
+print(leadership.head(8).round(3).to_string(index=False))
+print("\n先導される地域（下位）:")
+print(leadership.tail(5).round(3).to_string(index=False))
+
+# 5. 結果の保存
+dispersion_file = f'{output_dir}/19_regional_dispersion.csv'
+convergence_file = f'{output_dir}/19_regional_convergence.csv'
+pairs_file = f'{output_dir}/19_regional_lead_lag_pairs.csv'
+leadership_file = f'{output_dir}/19_regional_leadership.csv'
+spread.to_csv(dispersion_file, index=False, encoding='utf-8-sig')
+convergence = pd.DataFrame({
+    'Region': regions,
+    'Beta': beta['by_region'],
+    'Half_Life_Weeks': beta['half_life_by_region'],
+})
+summary = pd.DataFrame([
+    {'Region': '(sigma_trend_per_year)', 'Beta': sigma['slope'], 'Half_Life_Weeks': np.nan},
+    {'Region': '(pooled_beta)', 'Beta': beta['beta'], 'Half_Life_Weeks': beta['half_life']},
+])
+pd.concat([summary, convergence], ignore_index=True).to_csv(convergence_file, index=False, encoding='utf-8-sig')
+pairs.to_csv(pairs_file, index=False, encoding='utf-8-sig')
+leadership.to_csv(leadership_file, index=False, encoding='utf-8-sig')
+
+# 6. グラフ
+print("\nCreating Graph: Regional Price Dispersion and Leadership...")
+fig, axes = plt.subplots(2, 2, figsize=(16, 11))
+ax = axes[0, 0]
+ax.plot(spread['Date'], spread['CV'] * 100, color='#2E86AB', linewidth=1, label='CV (%)')
+ax.plot(spread['Date'], spread['Gini'] * 100, color='#F18F01', linewidth=1, label='Gini (×100)')
+ax.set_ylabel('Dispersion', fontweight='bold')
+ax.set_title('Cross-regional Price Dispersion (weekly)', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--')
+
+ax = axes[0, 1]
+years = (dates - dates[0]).astype(float) / 365.25
+ax.plot(spread['Date'], spread['Std_Log'], color='#6C757D', linewidth=1, label='SD of log price')
+intercept = spread['Std_Log'].mean() - sigma['slope'] * years.mean()
+ax.plot(spread['Date'], intercept + sigma['slope'] * years, color='#C73E1D', linewidth=2,
+        label=f"trend {sigma['slope']*1000:+.3f}e-3/year (p={sigma['pvalue']:.3f})")
+ax.set_ylabel('SD of log price', fontweight='bold')
+ax.set_title('σ-convergence', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--')
+
+ax = axes[1, 0]
+ax.hist(beta['half_life_by_region'][np.isfinite(beta['half_life_by_region'])], bins=20, color='#2E86AB',
+        alpha=0.8, edgecolor='black')
+ax.axvline(beta['half_life'], color='#C73E1D', linestyle='--', linewidth=2,
+           label=f"pooled half-life {beta['half_life']:.1f} weeks (β={beta['beta']:.3f})")
+ax.set_xlabel('Half-life of deviation from national mean (weeks)', fontweight='bold')
+ax.set_ylabel('Regions', fontweight='bold')
+ax.set_title('β-convergence by Region', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--', axis='y')
+
+ax = axes[1, 1]
+order = [list(regions).index(r) for r in leadership['Region']]
+lags = np.arange(-args.max_lag, args.max_lag + 1)
+asymmetry = rho[lags > 0].sum(axis=0) - rho[lags < 0].sum(axis=0)
+limit = np.abs(asymmetry).max()
+image = ax.imshow(asymmetry[np.ix_(order, order)], cmap='RdBu_r', vmin=-limit, vmax=limit)
+fig.colorbar(image, ax=ax, label='Σ_{k>0} ρ_ij(k) − Σ_{k<0} ρ_ij(k)')
+ax.set_xlabel('Region j (ordered by leadership; names in the CSV)', fontweight='bold')
+ax.set_ylabel('Region i', fontweight='bold')
+ax.set_title('Lead–lag Asymmetry (red: i leads j)', fontweight='bold')
+plt.tight_layout()
+figure_file = f'{figures_dir}/22_regional_prices.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"ばらつき（週次）: {dispersion_file}")
+print(f"収束: {convergence_file}")
+print(f"組ごとの相互相関: {pairs_file}")
+print(f"地域ごとの先導の指標: {leadership_file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
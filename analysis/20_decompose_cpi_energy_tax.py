@@ -0,0 +1,166 @@
+"""
+CPI の全品目の寄与度とエネルギー・ガソリン税の分解
+
+04_analyze_cpi_contribution.py はガソリンの1品目だけを扱っていました。ここでは CPI の表の全ての類・品目の
+指数とウエイトを行列で1回だけ読み込み（lib/cpi_contribution.py）、
+- 全ての類・品目の前年比・前月比（月次）の寄与度
+- エネルギー（ガソリン・灯油・電気代・ガス代）の寄与度と、ガソリンの寄与度の本体価格・ガソリン税・消費税への分解
+- ガソリン税（従量税すべて）・暫定税率がなかった場合の総合指数の前年比（「ガソリン税を除く CPI」）
+を年次（品目別、zni2020a）と月次（zmi2020s）で計算します。
+データ更新サービス（lib/refresh.py）が CPI・価格パネル・税率表の更新のたびに再実行します。
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import os
+import time
+
+from lib.cpi_contribution import (TAX_COMPONENTS, TOTAL, energy_columns, gasoline_price_components, load_cpi,
+                                  tax_components, tax_counterfactuals)
+from lib.price_decomposition import TaxSchedule
+
+parser = argparse.ArgumentParser(description='CPI の全品目の寄与度とエネルギー・ガソリン税の分解')
+parser.add_argument('--frequency', nargs='+', choices=['annual', 'monthly'], default=['annual', 'monthly'],
+                    help='頻度（既定: 両方）')
+parser.add_argument('--figure-start', default='2005-01', help='グラフの開始（既定: 2005-01）')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+print("="*60)
+print("CPI の全品目の寄与度とエネルギー・ガソリン税の分解")
+print("="*60)
+
+# ガソリン税のシナリオ（実際の税率は制度変更のメモ、月単位）
+actual = TaxSchedule.from_change_log()
+scenarios = {
+    'ex_gasoline_tax': TaxSchedule(actual.start, np.zeros(len(actual.start)), actual.vat_rate, name='ex_gasoline_tax'),
+    'ex_provisional': TaxSchedule.from_change_log(provisional=False),
+}
+
+outputs = []
+energy_tables = {}
+for frequency in args.frequency:
+    # 1. 全ての類・品目の寄与度
+    start = time.perf_counter()
+    try:
+        cpi = load_cpi(frequency)
+    except FileNotFoundError as e:
+        print(f"エラー: {e}")
+        exit(1)
+    yoy = cpi.contributions(cpi.yoy_lag)
+    elapsed = time.perf_counter() - start
+    print(f"\n【{frequency}】{str(cpi.periods[0])} - {str(cpi.periods[-1])}（{len(cpi.periods)}期間）、"
+          f"{len(cpi.codes)}列（類・品目）の前年比の寄与度: {elapsed*1000:.0f}ミリ秒（読み込みを含む）")
+
+    contributions_file = f'{output_dir}/20_cpi_contributions_yoy_{frequency}.csv'
+    cpi.to_frame(yoy, with_codes=True).to_csv(contributions_file, encoding='utf-8-sig')
+    outputs.append(contributions_file)
+    if frequency == 'monthly':
+        mom_file = f'{output_dir}/20_cpi_contributions_mom_{frequency}.csv'
+        cpi.to_frame(cpi.contributions(1), with_codes=True).to_csv(mom_file, encoding='utf-8-sig')
+        outputs.append(mom_file)
+
+    # 2. エネルギーの寄与度とガソリン税の分解
+    columns = energy_columns(cpi)
+    table = pd.DataFrame({'Headline': cpi.changes(cpi.yoy_lag)[:, cpi.column(TOTAL)]},
+                         index=pd.Index(cpi.periods, name='Period'))
+    for name, column in columns.items():
+        table[f'Contribution_{name}'] = yoy[:, column]
+    if frequency == 'monthly':
+        mom = cpi.contributions(1)
+        table['Headline_MoM'] = cpi.changes(1)[:, cpi.column(TOTAL)]
+        for name, column in columns.items():
+            table[f'Contribution_MoM_{name}'] = mom[:, column]
+    prices = gasoline_price_components(cpi.periods, actual)
+    parts = tax_components(cpi, prices, cpi.yoy_lag)
+    for name in TAX_COMPONENTS + ['other']:
+        table[f'Gasoline_{name}'] = parts[name]
+    counterfactual = tax_counterfactuals(cpi, scenarios, actual)
+    for column in counterfactual.columns:
+        if column != 'Headline':
+            table[column] = counterfactual[column]
+    energy_tables[frequency] = table
+
+    weights = cpi.weight_shares()
+    print("  ウエイト（総合に対する割合）: " + "、".join(f"{n} {weights[c]*100:.2f}%" for n, c in columns.items()))
+    recent = table.dropna(subset=['Headline', 'Gasoline_excise']).tail(12 if frequency == 'monthly' else 6)
+    view = recent[['Headline', 'Contribution_energy', 'Contribution_gasoline', 'Gasoline_base_price',
+                   'Gasoline_excise', 'Gasoline_consumption_tax', 'Tax_Effect_ex_gasoline_tax',
+                   'Tax_Effect_ex_provisional']]
+    view.index = view.index.astype(str).str[:7 if frequency == 'monthly' else 4]
+    print(view.round(3).to_string())
+
+    energy_file = f'{output_dir}/20_cpi_energy_tax_{frequency}.csv'
+    table.to_csv(energy_file, encoding='utf-8-sig')
+    outputs.append(energy_file)
+
+    # 2008年の暫定税率の失効・復活（月次）
+    if frequency == 'monthly':
+        window = table.loc['2008-02-01':'2008-07-01', ['Contribution_MoM_gasoline', 'Gasoline_excise']]
+        if len(window):
+            print("\n  2008年の暫定税率の失効・復活（前月比の寄与度、前年比のうちガソリン税の部分）:")
+            window.index = window.index.astype(str).str[:7]
+            print(window.round(3).to_string())
+
+# 3. グラフ: エネルギーの寄与度の積み上げ（ガソリンは本体価格・税に分解）と、ガソリン税を除く総合の前年比
+print("\nCreating Graph: CPI Energy and Gasoline Tax Contributions...")
+frequency = 'monthly' if 'monthly' in energy_tables else args.frequency[0]
+table = energy_tables[frequency]
+table = table[table.index >= np.datetime64(args.figure_start)]
+fig, axes = plt.subplots(2, 1, figsize=(15, 11), sharex=True)
+ax = axes[0]
+stack = [('Contribution_electricity', 'Electricity', '#F18F01'), ('Contribution_gas', 'Gas', '#C73E1D'),
+         ('Contribution_kerosene', 'Kerosene', '#6C757D'), ('Gasoline_base_price', 'Gasoline: base price', '#2E86AB'),
+         ('Gasoline_excise', 'Gasoline: gasoline tax', '#06A77D'),
+         ('Gasoline_consumption_tax', 'Gasoline: consumption tax', '#A23B72')]
+width = 25 if frequency == 'monthly' else 300
+positive = np.zeros(len(table))
+negative = np.zeros(len(table))
+for column, label, color in stack:
+    if column not in table:
+        continue
+    values = table[column].fillna(0).to_numpy()
+    bottom = np.where(values >= 0, positive, negative)
+    ax.bar(table.index, values, width=width, bottom=bottom, color=color, label=label, alpha=0.85)
+    positive += np.where(values >= 0, values, 0)
+    negative += np.where(values < 0, values, 0)
+ax.plot(table.index, table['Contribution_energy'], color='black', linewidth=1, label='Energy total')
+ax.axhline(0, color='black', linewidth=0.5)
+ax.set_ylabel('Contribution to headline YoY (pp)', fontweight='bold')
+ax.set_title(f'Energy Contributions to CPI Inflation ({frequency})', fontweight='bold')
+ax.legend(loc='best', ncol=2, fontsize=9)
+ax.grid(True, alpha=0.3, linestyle='--', axis='y')
+
+ax = axes[1]
+ax.plot(table.index, table['Headline'], color='black', linewidth=1.5, label='Headline CPI')
+ax.plot(table.index, table['Headline_ex_gasoline_tax'], color='#06A77D', linewidth=1.2,
+        label='Without gasoline tax (specific taxes = 0)')
+ax.plot(table.index, table['Headline_ex_provisional'], color='#2E86AB', linewidth=1.2, linestyle='--',
+        label='Without provisional rate')
+ax.axhline(0, color='black', linewidth=0.5)
+ax.set_ylabel('Headline CPI YoY (%)', fontweight='bold')
+ax.set_title('Counterfactual Headline Inflation without Gasoline Taxes', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--')
+plt.tight_layout()
+figure_file = f'{figures_dir}/23_cpi_energy_tax.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+for file in outputs:
+    print(f"  {file}")
+print(f"グラフ: {figure_file}")
+
+print("\n完了しました！")
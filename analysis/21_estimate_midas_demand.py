@@ -0,0 +1,256 @@
+"""
+混合頻度（MIDAS）の需要関数の推定：週次の価格のラグと四半期の GDP
+
+01・16などは週次の価格を四半期（年次）の平均にしてから推定しています。ここでは四半期（--frequency monthly では
+月次）の販売量に、期間の終わりから K 週前までの週次の対数相対価格をラグの重み（指数 Almon・ベータ）で
+まとめて使い、GDP・税率・季節ダミーは期間の頻度のまま使います（lib/midas.py）。
+- 候補のラグの長さ K（既定 4〜52週）と重みの関数ごとに、全ての K を1回のバッチの非線形最小二乗で推定
+- 情報量規準（既定 BIC）で K と重みを選択し、期間の平均の価格を使う従来のモデル（同じ標本）と比較
+- 選ばれたモデルの標準誤差は、ヤコビアンを説明変数とした Newey–West の HAC（lib/hac.py）
+係数は01と同じ形式の JSON と推定結果ストアに保存するので、
+02_calculate_consumer_surplus.py --model-key <key> で消費者余剰の計算に使えます。
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 非対話型バックエンドを使用
+import matplotlib.pyplot as plt
+import argparse
+import json
+import os
+import time
+from scipy import stats
+
+from lib.design import coefficients_json, load_frequency_design, load_quarterly_design
+from lib.hac import KERNELS, hac_cov, ols_hac
+from lib.midas import WEIGHT_FUNCTIONS, fit, lag_matrix, select, weekly_log_price
+from lib.price_decomposition import to_datetime64
+from lib.results_store import ResultsStore, file_hash, make_key
+
+parser = argparse.ArgumentParser(description='混合頻度（MIDAS）の需要関数の推定')
+parser.add_argument('--frequency', choices=['quarterly', 'monthly'], default='quarterly',
+                    help='販売量の頻度（既定: quarterly）')
+parser.add_argument('--weights', nargs='+', choices=list(WEIGHT_FUNCTIONS), default=list(WEIGHT_FUNCTIONS),
+                    help='ラグの重みの関数（既定: 全て）')
+parser.add_argument('--min-lags', type=int, default=4, help='ラグの長さの候補の最小（週、既定: 4）')
+parser.add_argument('--max-lags', type=int, default=52, help='ラグの長さの候補の最大（週、既定: 52）')
+parser.add_argument('--criterion', choices=['bic', 'aic'], default='bic', help='モデル選択の情報量規準（既定: bic）')
+parser.add_argument('--kernel', choices=list(KERNELS), default='bartlett', help='HAC のカーネル（既定: bartlett）')
+args = parser.parse_args()
+
+# 出力ディレクトリ
+output_dir = 'analysis/results'
+figures_dir = 'analysis/figures'
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(figures_dir, exist_ok=True)
+
+period_name = {'quarterly': '四半期', 'monthly': '月次'}[args.frequency]
+suffix = '' if args.frequency == 'quarterly' else f'_{args.frequency}'
+period_weeks = 13 if args.frequency == 'quarterly' else 4      # 期間の平均の価格に相当する週の数
+
+print("="*60)
+print(f"混合頻度（MIDAS）の需要関数の推定（{period_name}の販売量 × 週次の価格）")
+print("="*60)
+
+# 1. データ（期間の頻度の計画行列と、週次の価格のラグの行列）
+try:
+    if args.frequency == 'quarterly':
+        design = load_quarterly_design()
+    else:
+        design = load_frequency_design(args.frequency)
+    dates, log_price = weekly_log_price(relative=design['ln_price_col'] == 'ln_P_relative')
+except FileNotFoundError as e:
+    print(f"エラー: {e}")
+    exit(1)
+periods = to_datetime64(design['data']['Year'].to_numpy())
+lag_values = lag_matrix(dates, log_price, periods, args.frequency, args.max_lags)
+complete = np.isfinite(lag_values).all(axis=1)
+data = design['data'][complete]
+X_average = design['X'][complete]
+y = design['y'][complete].to_numpy()
+X = X_average.drop(columns='ln_P')
+lag_values = lag_values[complete]
+names = list(X.columns)
+dummy_vars = design['dummy_vars']
+lags = np.arange(args.min_lags, args.max_lags + 1)
+print(f"\nデータ: {design['data_file']}、週次の価格（{str(dates[0])} - {str(dates[-1])}）")
+print(f"期間: {data['Year'].iloc[0]} - {data['Year'].iloc[-1]}（{len(y)}期間、{period_name}）")
+print(f"価格変数: 週次の {design['ln_price_col']}、期間の頻度の説明変数: {names}")
+print(f"ラグの長さの候補: {lags[0]}〜{lags[-1]}週（{len(lags)}個）")
+
+# 2. 従来のモデル（期間の平均の価格、同じ標本）
+average = ols_hac(y, X_average.to_numpy(), kernel=args.kernel)
+n = len(y)
+average_ssr = float(average['resid'] @ average['resid'])
+average_k = X_average.shape[1]
+average_row = {
+    'Weights': 'period_average', 'Lags': np.nan, 'SSR': average_ssr,
+    'AIC': n * np.log(average_ssr / n) + 2 * average_k, 'BIC': n * np.log(average_ssr / n) + average_k * np.log(n),
+    'Beta': average['params'][list(X_average.columns).index('ln_P')], 'Theta1': np.nan, 'Theta2': np.nan,
+    'Converged': True, 'Iterations': 0,
+}
+
+# 3. MIDAS（重みの関数ごとに全ての K を一括で推定）
+fits = {}
+rows = [average_row]
+print("\n" + "="*60)
+print("ラグの長さの選択")
+print("="*60)
+for kind in args.weights:
+    start = time.perf_counter()
+    result = fit(y, X.to_numpy(), lag_values, lags, kind)
+    elapsed = time.perf_counter() - start
+    fits[kind] = result
+    best = select(result, args.criterion)
+    print(f"{kind}: {len(lags)}個の K × 初期値を一括推定 {elapsed*1000:.0f}ミリ秒"
+          f"（収束 {result['converged'].sum()}/{len(lags)}、最大 {result['iterations'].max()}回）"
+          f" → K = {lags[best]}週、{args.criterion.upper()} {result[args.criterion][best]:.2f}")
+    for i, K in enumerate(lags):
+        rows.append({
+            'Weights': kind, 'Lags': K, 'SSR': result['ssr'][i], 'AIC': result['aic'][i], 'BIC': result['bic'][i],
+            'Beta': result['params'][i, len(names)], 'Theta1': result['params'][i, -2],
+            'Theta2': result['params'][i, -1], 'Converged': result['converged'][i],
+            'Iterations': result['iterations'][i],
+        })
+selection = pd.DataFrame(rows)
+criterion = args.criterion.upper()
+print(f"期間の平均の価格（従来のモデル）: {criterion} {average_row[criterion]:.2f}")
+
+# 4. 選ばれたモデル（HAC 標準誤差）
+kind = min(fits, key=lambda k: fits[k][args.criterion][select(fits[k], args.criterion)])
+result = fits[kind]
+best = select(result, args.criterion)
+K = int(lags[best])
+jacobian = result['jacobian'][best]
+resid = result['resid'][best]
+cov, bandwidth, max_lag = hac_cov(jacobian, resid, kernel=args.kernel)
+param_names = names + ['ln_P', 'theta1', 'theta2']
+estimates = result['params'][best]
+bse = np.sqrt(np.diag(cov))
+df_resid = n - result['n_params']
+with np.errstate(divide='ignore', invalid='ignore'):
+    tvalues = estimates / bse
+pvalues = 2 * stats.t.sf(np.abs(tvalues), df_resid)
+table = pd.DataFrame({'Coefficient': estimates, 'HAC_SE': bse, 't': tvalues, 'P_value': pvalues}, index=param_names)
+rsquared = 1 - result['ssr'][best] / np.sum((y - y.mean()) ** 2)
+rsquared_adj = 1 - (1 - rsquared) * (n - 1) / df_resid
+
+print("\n" + "="*60)
+print(f"選ばれたモデル: {kind}、K = {K}週（{criterion}）")
+print("="*60)
+print(table.round(4).to_string())
+print(f"\nR-squared: {rsquared:.4f}、Adjusted R-squared: {rsquared_adj:.4f}"
+      f"（HAC {args.kernel}、帯域幅 {bandwidth}）")
+params = pd.Series(estimates[:len(names) + 1], index=names + ['ln_P'])
+average_params = pd.Series(average['params'], index=X_average.columns)
+print(f"\n価格弾力性 (β): {params['ln_P']:.4f}（期間の平均の価格: {average_params['ln_P']:.4f}）")
+print(f"所得弾力性 (α): {params['ln_GDP']:.4f}（期間の平均の価格: {average_params['ln_GDP']:.4f}）")
+print(f"税率弾力性 (γ): {params['ln_Tax_rate']:.4f}（期間の平均の価格: {average_params['ln_Tax_rate']:.4f}）")
+weights = result['weights'][best, :K]
+print(f"重みの中心: {np.sum(np.arange(K) * weights):.1f}週前、"
+      f"直近{period_weeks}週（期間の長さ）の重みの合計: {weights[:period_weeks].sum():.3f}")
+if result[args.criterion][best] >= average_row[criterion]:
+    print(f"注意: {criterion} は期間の平均の価格のモデルの方が小さく、週次のラグの重みで当てはまりは改善していません。")
+
+# 5. 結果の保存（01と同じ形式の JSON、推定結果ストア）
+model_type = f'{args.frequency}_midas_{kind}'
+results_json = coefficients_json(
+    params, model_type, rsquared=rsquared, rsquared_adj=rsquared_adj,
+    pvalues=dict(zip(param_names, pvalues.tolist())), dummy_vars=dummy_vars,
+    weights=kind, lags=K, theta=[float(v) for v in estimates[-2:]], lag_weights=[float(v) for v in weights],
+    cov_type='HAC', kernel=args.kernel, bandwidth=float(bandwidth), max_lag=int(max_lag),
+    bse={name: float(v) for name, v in zip(param_names, bse)},
+)
+json_file = f'{output_dir}/21_coefficients_{model_type}.json'
+with open(json_file, 'w', encoding='utf-8') as f:
+    json.dump(results_json, f, indent=2, ensure_ascii=False)
+
+frame_columns = ['Year', 'Q (liters)', 'P (yen/liter)', 'Tax_rate (%)', 'GDP (trillion yen)', 'CPI', 'P_relative',
+                 'ln_Q', 'ln_P', 'ln_P_relative', 'ln_GDP', 'ln_Tax_rate']
+df_analysis = data[[c for c in frame_columns if c in data.columns]].copy()
+df_analysis['ln_P_midas'] = lag_values[:, :K] @ weights
+
+store = ResultsStore()
+data_version = file_hash(design['data_file'])
+model_spec = {
+    'formula': 'ln(Q) = C + α×ln(GDP) + β×Σ_j w_j(θ) ln(P_week,t−j) + γ×ln(Tax_rate) + seasonal',
+    'price_variable': f"weekly {design['ln_price_col']}",
+    'weights': kind,
+    'lags': K,
+    'regressors': param_names,
+    'sample_periods': data['Year'].tolist(),
+}
+model_options = {'estimator': 'NLS (Levenberg–Marquardt)', 'criterion': args.criterion,
+                 'lag_candidates': [int(lags[0]), int(lags[-1])], 'cov_type': 'HAC', 'kernel': args.kernel}
+model_key = make_key(data_version, model_spec, model_options)
+store.save(
+    model_key, model_type=model_type, data_version=data_version, spec=model_spec, options=model_options,
+    summary={**results_json, 'model_key': model_key},
+    arrays={
+        'params': estimates,
+        'bse': bse,
+        'pvalues': pvalues,
+        'cov_params': cov,
+        'resid': resid,
+        'fitted': y - resid,
+        'lag_weights': weights,
+    },
+    frame=df_analysis,
+)
+
+selection_file = f'{output_dir}/21_midas_model_selection{suffix}.csv'
+weights_file = f'{output_dir}/21_midas_lag_weights{suffix}.csv'
+coefficients_file = f'{output_dir}/21_coefficients_{model_type}.csv'
+selection.to_csv(selection_file, index=False, encoding='utf-8-sig')
+weight_table = pd.DataFrame({'Lag_Weeks': np.arange(args.max_lags)})
+for name, other in fits.items():
+    i = select(other, args.criterion)
+    weight_table[f'{name}_K{lags[i]}'] = other['weights'][i]
+weight_table.to_csv(weights_file, index=False, encoding='utf-8-sig')
+table.rename_axis('Variable').reset_index().to_csv(coefficients_file, index=False, encoding='utf-8-sig')
+
+# 6. グラフ: 選ばれたラグの重みと、ラグの長さごとの情報量規準
+print("\nCreating Graph: MIDAS Lag Weights and Model Selection...")
+fig, axes = plt.subplots(1, 2, figsize=(15, 6))
+colors = {'almon': '#2E86AB', 'beta': '#F18F01'}
+ax = axes[0]
+for name, other in fits.items():
+    i = select(other, args.criterion)
+    ax.plot(np.arange(lags[i]), other['weights'][i, :lags[i]], marker='o', markersize=3, color=colors[name],
+            label=f"{name} (K={lags[i]}, β={other['params'][i, len(names)]:.3f})")
+ax.step(np.arange(period_weeks + 1), np.r_[np.full(period_weeks, 1 / period_weeks), 0], where='post',
+        color='#6C757D', linestyle='--', label=f"period average (β={average_params['ln_P']:.3f})")
+ax.set_xlabel('Weeks before the end of the period', fontweight='bold')
+ax.set_ylabel('Lag weight', fontweight='bold')
+ax.set_title(f'Estimated MIDAS Lag Weights ({args.frequency} sales, weekly prices)', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--')
+
+ax = axes[1]
+for name, other in fits.items():
+    ax.plot(lags, other[args.criterion], marker='o', markersize=3, color=colors[name], label=name)
+ax.axhline(average_row[criterion], color='#6C757D', linestyle='--', label='period average')
+ax.axvline(K, color='#C73E1D', linestyle=':', linewidth=1, label=f'selected K={K}')
+ax.set_xlabel('Number of weekly lags K', fontweight='bold')
+ax.set_ylabel(criterion, fontweight='bold')
+ax.set_title(f'Model Selection by {criterion}', fontweight='bold')
+ax.legend(loc='best')
+ax.grid(True, alpha=0.3, linestyle='--')
+plt.tight_layout()
+figure_file = f'{figures_dir}/24_midas_lag_weights{suffix}.png'
+plt.savefig(figure_file, dpi=300, bbox_inches='tight')
+plt.close()
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"係数（JSON）: {json_file}")
+print(f"係数（CSV）: {coefficients_file}")
+print(f"ラグの長さの選択: {selection_file}")
+print(f"ラグの重み: {weights_file}")
+print(f"グラフ: {figure_file}")
+print(f"推定結果ストア: {store.store_dir}（key: {model_key[:12]}）")
+print(f"消費者余剰: python analysis/02_calculate_consumer_surplus.py --model-key {model_key[:12]}")
+
+print("\n完了しました！")
@@ -0,0 +1,59 @@
+"""
+分析結果のレポート（HTML・PDF）の作成
+
+analysis/results の推定・消費者余剰・診断の表（CSV・JSON）と analysis/figures・visualization/figures の図を
+節ごとにまとめ、analysis/results/report/report.html に出力します（lib/report.py）。
+- 前回から結果のファイル（ハッシュ）が変わった節だけを作り直し、他の節は保存した HTML を使います
+- 図は縮小した画像（サムネイル）を埋め込み、クリックで元の解像度の画像を開きます
+- --pdf で同じ表と図の PDF（analysis/results/report/report.pdf）も出力します
+"""
+
+import argparse
+import time
+
+from lib.report import PDF_FILE, REPORT_DIR, SECTIONS, build, write_pdf
+
+parser = argparse.ArgumentParser(description='分析結果のレポートの作成')
+parser.add_argument('--force', action='store_true', help='全ての節を作り直す')
+parser.add_argument('--embed', action='store_true',
+                    help='サムネイルを HTML に埋め込む（data URI、report.html だけで表示できる。元の画像へのリンクは相対パス）')
+parser.add_argument('--pdf', action='store_true', help=f'PDF も出力（{PDF_FILE}）')
+parser.add_argument('--sections', nargs='+', choices=[s['key'] for s in SECTIONS], default=None,
+                    help='レポートに含める節（既定: 全て）')
+args = parser.parse_args()
+
+print("="*60)
+print("分析結果のレポートの作成")
+print("="*60)
+
+# 1. 節ごとの作成（結果が変わった節だけ）
+sections = [s for s in SECTIONS if args.sections is None or s['key'] in args.sections]
+start = time.perf_counter()
+report_file, summary = build(sections, REPORT_DIR, force=args.force, embed=args.embed)
+elapsed = time.perf_counter() - start
+
+print(f"\n{'節':<11} {'表':>3} {'図':>3}  状態")
+for section in summary:
+    status = '作成' if section['rendered'] else '前回のまま'
+    print(f"{section['key']:<12} {len(section['tables']):>4} {len(section['figures']):>4}  {status}（{section['title']}）")
+rendered = sum(s['rendered'] for s in summary)
+print(f"\n作り直した節: {rendered} / {len(summary)}（{elapsed:.2f}秒）")
+empty = [s['key'] for s in summary if not s['tables'] and not s['figures']]
+if empty:
+    print(f"注意: 結果のファイルがない節: {empty}（該当するスクリプトを実行してください）")
+
+# 2. PDF
+pdf_file = None
+if args.pdf:
+    start = time.perf_counter()
+    pdf_file = write_pdf(summary, PDF_FILE)
+    print(f"PDF: {time.perf_counter() - start:.2f}秒")
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"レポート: {report_file}")
+if pdf_file:
+    print(f"PDF: {pdf_file}")
+
+print("\n完了しました！")
@@ -0,0 +1,107 @@
+"""
+推定・シミュレーションの結果を返すローカルの HTTP API（読み取り専用）
+
+係数・消費者余剰・価格の分解・税制のシナリオを、スクリプトを再実行せずに問い合わせます（lib/query_api.py）。
+データは起動時に1回だけ読み込み、計算が必要な問い合わせは件数・大きさの上限つきの LRU キャッシュに保存します。
+
+実行方法（リポジトリのルートで）:
+    python analysis/24_serve_results_api.py                     # http://127.0.0.1:8765
+    python analysis/24_serve_results_api.py --watch 10          # 10秒ごとに結果の更新を確認して読み直す
+    python analysis/24_serve_results_api.py --check             # 空いているポートで起動し、同時のリクエストで確認して終了
+
+問い合わせの例:
+    curl "http://127.0.0.1:8765/surplus?year=2022&beta=-0.3"
+    curl "http://127.0.0.1:8765/decomposition?period=2008Q2"
+    curl "http://127.0.0.1:8765/scenario?delta=-25.1&start=2026Q1&beta=-0.1,-0.3"
+    curl "http://127.0.0.1:8765/coefficients/01_coefficients_annual_level_model"
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from lib.query_api import CACHE_BYTES, CACHE_ENTRIES, HOST, PORT, QueryService, ResultsData, fetch
+
+parser = argparse.ArgumentParser(description='推定・シミュレーションの結果を返す HTTP API')
+parser.add_argument('--host', default=HOST, help=f'待ち受けるアドレス（既定: {HOST}、ローカルのみ）')
+parser.add_argument('--port', type=int, default=PORT, help=f'ポート（既定: {PORT}）')
+parser.add_argument('--cache-entries', type=int, default=CACHE_ENTRIES,
+                    help=f'キャッシュする計算結果の件数の上限（既定: {CACHE_ENTRIES}）')
+parser.add_argument('--cache-mb', type=float, default=CACHE_BYTES / 2**20,
+                    help=f'キャッシュの大きさの上限（MB、既定: {CACHE_BYTES / 2**20:g}）')
+parser.add_argument('--watch', type=float, default=0,
+                    help='結果のファイルの更新を確認する間隔（秒、0 なら確認しない）')
+parser.add_argument('--check', action='store_true', help='空いているポートで起動し、同時のリクエストで確認して終了')
+parser.add_argument('--concurrency', type=int, default=200, help='--check の同時リクエスト数（既定: 200）')
+args = parser.parse_args()
+
+print("="*60)
+print("推定・シミュレーションの結果の HTTP API")
+print("="*60)
+
+# 1. データの読み込み（1回だけ）
+start = time.perf_counter()
+try:
+    data = ResultsData()
+except FileNotFoundError as e:
+    print(f"エラー: {e}")
+    exit(1)
+print(f"\n読み込み: {time.perf_counter() - start:.2f}秒（{len(data.files)}ファイル）")
+print(f"係数: {', '.join(sorted(data.coefficients)) or 'なし'}")
+print(f"消費者余剰: {'なし（02を実行してください）' if data.surplus is None else f'{len(data.surplus)}年'}")
+print(f"価格の分解: {len(data.decomposition)}四半期（{data.decomposition['Period'].iloc[0]} - "
+      f"{data.decomposition['Period'].iloc[-1]}）")
+service = QueryService(data, args.cache_entries, int(args.cache_mb * 2**20))
+
+
+async def check():
+    """空いているポートで起動し、いろいろな問い合わせを同時に送って応答と時間を確認"""
+    server = await service.start(args.host, 0)
+    port = server.sockets[0].getsockname()[1]
+    targets = ['/health', '/coefficients', '/decomposition?period=2008Q2', '/surplus?year=2022',
+               '/surplus?year=2022&beta=-0.3', '/scenario?delta=-25.1&start=2026Q1&beta=-0.1,-0.3',
+               '/scenario?specific_tax=0&start=2026Q1&beta=-0.3&growth=0.05', '/nothing']
+    print(f"\n確認: http://{args.host}:{port}")
+    for target in targets:
+        status, body = await fetch(args.host, port, target)
+        print(f"  {status} {target}: {body[:100].decode('utf-8', errors='replace')}")
+
+    requests = [targets[i % (len(targets) - 1)] for i in range(args.concurrency)]
+
+    async def timed(target):
+        begin = time.perf_counter()
+        status, _ = await fetch(args.host, port, target)
+        return status, time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    results = await asyncio.gather(*(timed(t) for t in requests))
+    elapsed = time.perf_counter() - begin
+    latency = np.array([r[1] for r in results]) * 1000
+    print(f"\n同時のリクエスト: {len(requests)}件 {elapsed:.2f}秒（{len(requests) / elapsed:.0f}件/秒）、"
+          f"ステータス {sorted(set(r[0] for r in results))}")
+    print(f"応答時間: 中央値 {np.median(latency):.1f}ミリ秒、95% {np.percentile(latency, 95):.1f}ミリ秒")
+    print(f"キャッシュ: {json.dumps(service.cache.stats())}")
+    server.close()
+    await server.wait_closed()
+
+
+async def serve():
+    server = await service.start(args.host, args.port)
+    print(f"\nhttp://{args.host}:{args.port} で待ち受けます（Ctrl+C で終了）")
+    if args.watch > 0:
+        asyncio.ensure_future(service.watch(args.watch))
+    async with server:
+        await server.serve_forever()
+
+
+if args.check:
+    asyncio.run(check())
+    print("\n完了しました！")
+else:
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n終了しました")
@@ -0,0 +1,6 @@
+"""
+分析スクリプト共通モジュール
+
+analysis/ 以下の番号付きスクリプトから `from lib.xxx import ...` の形で読み込みます。
+（scripts/data_preparation/ からは analysis/ を sys.path に追加して使用）
+"""
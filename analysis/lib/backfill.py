@@ -0,0 +1,222 @@
+"""
+1990年より前の過去データの接続（backfill）：価格・GDP・販売量・CPI を 1950年まで延長
+
+06の年次データ（demand_regression_data_annual.csv）は価格が1990年、GDP が1994年、販売量が2007年からです。
+古い統計表（68SNA・93SNA の GDP、旧系列の価格・販売量など）を data/backfill/ にローカルの CSV として置き、
+目録（sources.csv）に登録すると、現在の系列に古い順に比率で接続（overlap-ratio splicing）して延長します。
+
+- 目録の列: Variable（Q (liters)・P (yen/liter)・GDP (trillion yen)・CPI）, Source（名前）, File（CSV のパス）,
+  Value_Column（値の列）, Scale（単位の換算の倍率）, Priority（小さいほど新しい系列、現在の系列は 0）, Note
+  CSV は Year 列（'1975'・'1975Q1'・'1975-01'）と値の列を持ち、四半期・月次は年次に集計します（Q・GDP は合計、P・CPI は平均）。
+- 接続: 変数ごとに Priority の順に並べた系列の行列 (年, 変数, 系列) を作り、隣り合う系列の重なる年
+  （新しい系列の最初の overlap_years 年）の合計の比を全ての変数・系列について一括で計算し、
+  比の累積積で全ての系列を現在の系列の水準にそろえます（チェーン接続）。各年の値は最も新しい系列の値です。
+- 由来: セルごとに系列の名前・接続の倍率・区分（observed: 現在の系列、spliced: 接続、derived: 税率・相対価格、
+  missing）を記録します。
+- キャッシュ: 列ごとに（目録の行・ファイルのハッシュ・現在の系列・接続の設定）から作ったバージョンのキーで
+  data/backfill/cache/ に保存し、入力が変わった列だけを再計算します。
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from lib.frequency import resample
+from lib.price_decomposition import TaxSchedule, decompose, to_datetime64
+from lib.results_store import file_hash
+
+BACKFILL_DIR = 'data/backfill'
+MANIFEST_FILE = f'{BACKFILL_DIR}/sources.csv'
+CACHE_DIR = f'{BACKFILL_DIR}/cache'
+ANNUAL_FILE = 'demand_regression_data_annual.csv'           # 06の出力（現在の系列）
+BACKFILL_FILE = 'demand_regression_data_annual_backfill.csv'
+PROVENANCE_FILE = 'demand_regression_data_annual_backfill_provenance.csv'
+BACKFILL_LOG_FILE = 'analysis/demand_regression_data_annual_backfill_log_transformed.csv'
+VARIABLES = {'Q (liters)': 'sum', 'P (yen/liter)': 'mean', 'GDP (trillion yen)': 'sum', 'CPI': 'mean'}
+MANIFEST_COLUMNS = ['Variable', 'Source', 'File', 'Value_Column', 'Scale', 'Priority', 'Note']
+CURRENT = 'current'
+VERSION = 1                           # 接続の計算を変えたら上げる（キャッシュのキーに含める）
+
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    """目録（登録された過去の系列）。ファイルがなければ空"""
+    if not os.path.exists(manifest_file):
+        return pd.DataFrame(columns=MANIFEST_COLUMNS)
+    manifest = pd.read_csv(manifest_file, encoding='utf-8-sig', dtype={'Value_Column': str, 'Note': str})
+    unknown = set(manifest['Variable']) - set(VARIABLES)
+    if unknown:
+        raise ValueError(f"目録の Variable は {list(VARIABLES)} のいずれかです: {sorted(unknown)}")
+    manifest['Scale'] = pd.to_numeric(manifest['Scale'], errors='coerce').fillna(1.0)
+    manifest['Priority'] = pd.to_numeric(manifest['Priority'])
+    if (manifest['Priority'] <= 0).any():
+        raise ValueError("目録の Priority は 1 以上です（0 は現在の系列）。")
+    return manifest.sort_values(['Variable', 'Priority'], kind='stable').reset_index(drop=True)
+
+
+def load_source(row, years):
+    """目録の1行の系列を年 years (Y,) の年次の値に（年次でない系列は年の期間が揃っている年のみ）"""
+    if not os.path.exists(row['File']):
+        raise FileNotFoundError(f"{row['File']} が見つかりません（目録: {row['Source']}）。")
+    df = pd.read_csv(row['File'], encoding='utf-8-sig', dtype={'Year': str})
+    column = row['Value_Column'] if isinstance(row['Value_Column'], str) and row['Value_Column'] else df.columns[1]
+    labels = df['Year'].astype(str).str.strip()
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy() * row['Scale']
+    dates = to_datetime64(labels.to_numpy())
+    per_year = 4 if labels.str.contains('Q').any() else 12 if labels.str.contains('-').any() else 1
+    periods, annual, _ = resample(dates, values, 'annual', how=VARIABLES[row['Variable']], min_count=per_year)
+    index = np.searchsorted(periods, to_datetime64(years.astype(str)))
+    found = (index < len(periods)) & (periods[np.minimum(index, len(periods) - 1)] == to_datetime64(years.astype(str)))
+    return np.where(found, annual[np.minimum(index, len(periods) - 1)], np.nan)
+
+
+def splice(values, overlap_years=5):
+    """
+    系列の行列 values (Y, V, K)（年, 変数, 系列。系列は新しい順、NaN で埋める）をチェーン接続
+
+    系列 k の倍率 = 系列 k−1 と k の重なる年（系列 k−1 の最初の overlap_years 年）の合計の比 × 系列 k−1 の倍率。
+    戻り値: (接続した値 (Y, V), 使った系列 (Y, V)（−1 は欠損）, 倍率 (V, K)（重なりのない系列は NaN）)
+    """
+    values = np.where(values > 0, values, np.nan)
+    Y, V, K = values.shape
+    observed = np.isfinite(values)
+    newer = np.concatenate([np.full((Y, V, 1), np.nan), values[:, :, :-1]], axis=2)   # 系列 k−1
+    # 系列 k−1 の最初の overlap_years 年のうち、系列 k も観測されている年
+    rank = np.cumsum(np.isfinite(newer), axis=0)
+    overlap = np.isfinite(newer) & observed & (rank <= overlap_years)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(overlap, newer, 0).sum(axis=0) / np.where(overlap, values, 0).sum(axis=0)
+    ratio[:, 0] = 1.0
+    ratio = np.where(overlap.any(axis=0) | (np.arange(K) == 0), ratio, np.nan)
+    factor = np.cumprod(ratio, axis=1)                  # NaN は以降の系列にも伝わる（接続できない）
+    scaled = values * factor[None]
+    usable = np.isfinite(scaled)
+    source = np.where(usable.any(axis=2), usable.argmax(axis=2), -1)
+    spliced = np.take_along_axis(scaled, np.maximum(source, 0)[:, :, None], axis=2)[:, :, 0]
+    return np.where(source >= 0, spliced, np.nan), source, factor
+
+
+def column_key(variable, current, sources, overlap_years):
+    """列のバージョンのキー（現在の系列の値・目録の行・ファイルのハッシュ・設定）"""
+    payload = {
+        'version': VERSION,
+        'variable': variable,
+        'current': np.round(current, 10).tolist(),
+        'sources': [{**{k: (None if pd.isna(v) else v) for k, v in row.items()}, 'hash': file_hash(row['File'])}
+                    for row in sources],
+        'overlap_years': overlap_years,
+    }
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _cache_file(variable, key, cache_dir):
+    slug = variable.split(' ')[0].lower()
+    return os.path.join(cache_dir, f'{slug}_{key[:16]}.csv')
+
+
+def build(annual_file=ANNUAL_FILE, manifest_file=MANIFEST_FILE, overlap_years=5, cache_dir=CACHE_DIR,
+          refresh=False, schedule=None):
+    """
+    接続した年次データ・セルごとの由来・列のバージョン
+
+    戻り値: (06と同じ列の DataFrame, 由来の DataFrame（Year, Variable, Source, Factor, Kind）,
+             列のバージョン {変数: {'key', 'cached', 'sources'}})
+    """
+    if not os.path.exists(annual_file):
+        raise FileNotFoundError(f"{annual_file} が見つかりません。先に 06_aggregate_to_annual_data.py を実行してください。")
+    df = pd.read_csv(annual_file, encoding='utf-8-sig')
+    df['Year'] = df['Year'].astype(str)
+    years = df['Year'].to_numpy()
+    manifest = load_manifest(manifest_file)
+
+    # 列ごとのキャッシュの確認
+    variables = list(VARIABLES)
+    versions, cached = {}, {}
+    for variable in variables:
+        current = pd.to_numeric(df[variable], errors='coerce').to_numpy()
+        rows = manifest[manifest['Variable'] == variable].to_dict('records')
+        key = column_key(variable, current, rows, overlap_years)
+        path = _cache_file(variable, key, cache_dir)
+        versions[variable] = {'key': key, 'cached': os.path.exists(path) and not refresh,
+                              'sources': [CURRENT] + [r['Source'] for r in rows]}
+        if versions[variable]['cached']:
+            cached[variable] = pd.read_csv(path, encoding='utf-8-sig', dtype={'Year': str, 'Source': str},
+                                            float_precision='round_trip')
+
+    # キャッシュのない列をまとめて接続
+    missing = [v for v in variables if v not in cached]
+    if missing:
+        depth = 1 + max(len(manifest[manifest['Variable'] == v]) for v in missing)
+        values = np.full((len(years), len(missing), depth), np.nan)
+        names = np.full((len(missing), depth), '', dtype=object)
+        for j, variable in enumerate(missing):
+            values[:, j, 0] = pd.to_numeric(df[variable], errors='coerce').to_numpy()
+            names[j, 0] = CURRENT
+            for k, row in enumerate(manifest[manifest['Variable'] == variable].to_dict('records'), start=1):
+                values[:, j, k] = load_source(row, years)
+                names[j, k] = row['Source']
+        spliced, source, factor = splice(values, overlap_years)
+        os.makedirs(cache_dir, exist_ok=True)
+        for j, variable in enumerate(missing):
+            used = source[:, j]
+            column = pd.DataFrame({
+                'Year': years,
+                'Value': spliced[:, j],
+                'Source': np.where(used >= 0, names[j, np.maximum(used, 0)], ''),
+                'Factor': np.where(used >= 0, factor[j, np.maximum(used, 0)], np.nan),
+            })
+            column.to_csv(_cache_file(variable, versions[variable]['key'], cache_dir), index=False,
+                          encoding='utf-8-sig')
+            cached[variable] = column
+
+    # 接続した値と由来
+    out = df.copy()
+    provenance = []
+    for variable in variables:
+        column = cached[variable]
+        source = column['Source'].fillna('')
+        out[variable] = column['Value'].to_numpy()
+        kind = np.where(source == CURRENT, 'observed', np.where(source == '', 'missing', 'spliced'))
+        provenance.append(pd.DataFrame({'Year': years, 'Variable': variable, 'Source': source,
+                                        'Factor': column['Factor'], 'Kind': kind}))
+
+    # 税率・相対価格（現在の値がない年は接続した価格と税率表から）
+    schedule = schedule if schedule is not None else TaxSchedule.from_change_log()
+    months = (to_datetime64(years)[:, None].astype('datetime64[M]') + np.arange(12)).astype('datetime64[D]')
+    specific, vat = schedule.lookup(months.ravel())
+    specific, vat = specific.reshape(months.shape).mean(axis=1), vat.reshape(months.shape).mean(axis=1)
+    components = decompose(out['P (yen/liter)'].to_numpy(), specific, vat, tax_on_tax=False)
+    derived_tax = np.round(np.where(components['base_price'] > 0, components['excise_rate'] * 100, np.nan), 2)
+    current_tax = pd.to_numeric(df['Tax_rate (%)'], errors='coerce').to_numpy()
+    current_relative = pd.to_numeric(df['P_relative'], errors='coerce').to_numpy()
+    out['Tax_rate (%)'] = np.where(np.isfinite(current_tax), current_tax, derived_tax)
+    out['P_relative'] = np.where(np.isfinite(current_relative), current_relative,
+                                 out['P (yen/liter)'] / out['CPI'])
+    for variable, current in [('Tax_rate (%)', current_tax), ('P_relative', current_relative)]:
+        value = out[variable].to_numpy()
+        kind = np.where(np.isfinite(current), 'observed', np.where(np.isfinite(value), 'derived', 'missing'))
+        provenance.append(pd.DataFrame({'Year': years, 'Variable': variable,
+                                        'Source': np.where(kind == 'observed', CURRENT, np.where(
+                                            kind == 'derived', 'P (yen/liter)', '')),
+                                        'Factor': np.nan, 'Kind': kind}))
+    provenance = pd.concat(provenance, ignore_index=True)
+    return out, provenance, versions
+
+
+def dataset_version(versions):
+    """データセット全体のバージョン（列のキーの組み合わせ）"""
+    text = json.dumps({v: info['key'] for v, info in sorted(versions.items())})
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def log_transform(df):
+    """07_prepare_annual_log_transformed_data.py と同じ対数の列を追加（正の値のみ）"""
+    df = df.copy()
+    for column, name in [('Q (liters)', 'ln_Q'), ('P (yen/liter)', 'ln_P'), ('GDP (trillion yen)', 'ln_GDP'),
+                         ('Tax_rate (%)', 'ln_Tax_rate'), ('P_relative', 'ln_P_relative')]:
+        values = pd.to_numeric(df[column], errors='coerce')
+        df[name] = np.log(values.where(values > 0))
+    return df
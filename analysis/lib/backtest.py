@@ -0,0 +1,562 @@
+"""
+需要関数の予測精度の検証（時系列のバックテスト）
+
+年次データ（01と同じ）と四半期データで、予測の起点 t ごとに t より前の期間だけで推定し、
+t から horizon 期先までの ln Q を予測して実績と比べます。
+    expanding: 学習期間 [0, t)（拡大ウィンドウ）
+    rolling:   学習期間 [t − window, t)（移動ウィンドウ）
+予測は説明変数（GDP・価格・税率）の実績を与えた条件つき予測で、ln Q のラグは起点の直前の実績から
+予測値を順に使います。
+
+登録した推定方法（ESTIMATORS）:
+    ols:         01と同じレベルモデル
+    difference:  対数差分のモデル（短期の弾力性）
+    iv:          価格を内生変数とする2段階最小二乗法（操作変数: ln 従量税、1期前の ln 価格）
+    ecm:         Engle–Granger の2段階の誤差修正モデル（長期関係はレベルモデル、lib/forecast.py と同じ形）
+    ridge・lasso: 正則化回帰（lib/regularized.py、λは学習期間内の1期先の交差検証で選択）
+    naive:       前期（四半期は前年同期）の値（比較の基準）
+
+推定方法ごとに、回帰に使う行列 [説明変数, 被説明変数] の累積積和 S[t] = Σ_{s<t} a_s a_s' を1回だけ計算し、
+学習期間 [i, j) の積和を S[j] − S[i] で求めます（lib/structural_break.py と同じ考え方）。
+各分割の推定は積和の小さな行列の計算だけで、観測数によりません。ECM の2段階目は、
+ラグの ln Q・説明変数を含む行列の積和を1段階目の係数で線形変換して求めます。
+分割はプロセスプール（lib/data_plane.py）で並列に計算し、入力の配列は共有メモリに置きます。
+
+評価: ln Q の予測誤差の RMSE、Q の MAPE（%）、分割ごとの弾力性（α・β・γ）のばらつき。
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from lib.data_plane import DataPlane, WorkerPool
+from lib.design import load_annual_design, load_quarterly_design
+from lib.price_decomposition import TaxSchedule
+from lib.regularized import gram_path, lambda_grid
+
+# 頻度ごとの既定の設定（最小の学習期間・移動ウィンドウの長さ・予測期間）
+SETTINGS = {
+    'annual': {'min_train': 10, 'window': 10, 'horizon': 2},
+    'quarterly': {'min_train': 24, 'window': 24, 'horizon': 4},
+}
+SCHEMES = ('expanding', 'rolling')
+ELASTICITIES = ['alpha', 'beta', 'gamma']
+
+# 説明変数行列 X の列（0: 定数項、1: ln_GDP、2: ln_P、3: ln_Tax_rate、4以降: 季節ダミー・イベントのダミー）
+GDP, PRICE, TAX = 1, 2, 3
+
+
+# ---- データ ----
+
+def _frame(design, labels, specific_tax, seasonal):
+    """推定方法が共通に使う配列の辞書（ln_GDP・ln_P・ln_Tax_rate を平均で中心化、定数項・ダミーは0/1のまま）"""
+    X = design['X'].to_numpy(dtype=float)
+    y = design['y'].to_numpy(dtype=float)
+    ln_tax = np.log(specific_tax)
+    # 中心化しても定数項つきの推定の傾きと予測は変わらず、積和の桁落ちを防げる。
+    # ダミーは中心化しない（学習期間に変動のないダミーが定数項と共線になるのを防ぐ）
+    x_mean = np.zeros(X.shape[1])
+    x_mean[GDP:TAX + 1] = X[:, GDP:TAX + 1].mean(axis=0)
+    dummy_vars = design['dummy_vars']
+    return {
+        'labels': np.asarray(labels, dtype='<U8'),
+        'y': y - y.mean(),
+        'y_mean': np.array([y.mean()]),
+        'X': X - x_mean,
+        'x_mean': x_mean,
+        'ln_tax': ln_tax - ln_tax.mean(),
+        'n_seasonal': np.array([len(dummy_vars) if seasonal else 0]),
+        'penalty': np.array([1.0, 1.0, 1.0] + [0.0] * len(dummy_vars)),   # ダミーは罰則なし（07と同じ）
+    }
+
+
+def load_frames():
+    """
+    年次（01と同じ計画行列）と四半期（季節ダミーつき）のデータ
+
+    戻り値: {'annual': 配列の辞書, 'quarterly': 配列の辞書}
+        labels・y（ln Q − 平均）・y_mean・X（[定数項, ln_GDP − 平均, ln_P − 平均, ln_Tax_rate − 平均, ダミー]）・
+        x_mean（X の中心化に使った平均）・ln_tax（ln 従量税 − 平均）・n_seasonal（季節ダミーの数）・penalty（正則化の罰則の重み）
+    """
+    schedule = TaxSchedule.from_quarterly_table()
+
+    annual = load_annual_design()
+    years = annual['data']['Year'].to_numpy()
+    quarters = [f'{y}Q{q}' for y in years for q in range(1, 5)]
+    annual_tax = schedule.lookup(quarters)[0].reshape(len(years), 4).mean(axis=1)
+
+    quarterly = load_quarterly_design()
+    periods = quarterly['data']['Year'].to_numpy()
+    quarterly_tax = schedule.lookup(periods)[0]
+
+    return {
+        'annual': _frame(annual, years, annual_tax, seasonal=False),
+        'quarterly': _frame(quarterly, periods, quarterly_tax, seasonal=True),
+    }
+
+
+def cumulative_cross_products(A):
+    """
+    行列 A (n, m) の累積積和 S (n+1, m, m) と有効な行の累積数 C (n+1,)
+
+    NaN を含む行（差分・ラグの最初の行）は0として足し、数に含めません。区間 [i, j) の積和は S[j] − S[i]。
+    """
+    valid = np.isfinite(A).all(axis=1)
+    A0 = np.where(valid[:, None], A, 0.0)
+    n, m = A.shape
+    S = np.zeros((n + 1, m, m))
+    S[1:] = np.cumsum(A0[:, :, None] * A0[:, None, :], axis=0)
+    C = np.zeros(n + 1)
+    C[1:] = np.cumsum(valid)
+    return S, C
+
+
+def _varying(M):
+    """
+    積和 M（先頭の列が定数項、最後の列が被説明変数）で、学習期間に変動のある説明変数の列（定数項は常に含む）
+
+    変動のない列（学習期間の外にしかないイベントのダミーなど）は定数項と共線なので推定から除きます。
+    """
+    n = M[0, 0]
+    spread = n * np.diag(M)[:-1] - M[0, :-1] ** 2          # n² × 分散（0/1のダミーは丸め誤差なし）
+    keep = spread > 1e-12 * np.maximum(n * np.diag(M)[:-1], 1.0)
+    keep[0] = True
+    return keep
+
+
+def _ols(M):
+    """積和 M（最後の列が被説明変数）からの最小二乗推定（学習期間に変動のないダミーの係数は0）"""
+    keep = _varying(M)
+    params = np.zeros(len(keep))
+    params[keep] = np.linalg.pinv(M[:-1, :-1][np.ix_(keep, keep)], hermitian=True) @ M[:-1, -1][keep]
+    return params
+
+
+def _lag(values):
+    out = np.full(values.shape, np.nan)
+    out[1:] = values[:-1]
+    return out
+
+
+def _diff(values):
+    out = np.full(values.shape, np.nan)
+    out[1:] = values[1:] - values[:-1]
+    return out
+
+
+# ---- 推定方法 ----
+
+class Estimator:
+    """
+    推定方法の基底クラス
+
+    blocks(frame): 回帰に使う行列 [説明変数, 被説明変数] のリスト（累積積和を1回だけ計算する）
+    lags: blocks の各行列で、学習期間の先頭から除く行数（1期前の値を使う行列は1）
+    fit(moments, frame, start, stop): 学習期間 [start, stop) の積和 [(M, 行数), ...] から係数
+    predict(params, frame, start, stop): 期間 [start, stop) の ln Q（中心化した値）の予測
+    elasticities(params): (α, β, γ)
+    """
+
+    name = ''
+    label = ''
+    lags = ()
+
+    def blocks(self, frame):
+        return []
+
+    def fit(self, moments, frame, start, stop):
+        raise NotImplementedError
+
+    def predict(self, params, frame, start, stop):
+        raise NotImplementedError
+
+    def elasticities(self, params):
+        return params[GDP], params[PRICE], params[TAX]
+
+
+class OLSLevel(Estimator):
+    name = 'ols'
+    label = 'OLS (level, 01)'
+    lags = (0,)
+
+    def blocks(self, frame):
+        return [np.column_stack([frame['X'], frame['y']])]
+
+    def fit(self, moments, frame, start, stop):
+        return _ols(moments[0][0])
+
+    def predict(self, params, frame, start, stop):
+        return frame['X'][start:stop] @ params
+
+
+class Differenced(Estimator):
+    """Δln Q = c + 季節ダミー + α Δln GDP + β Δln P + γ Δln Tax_rate"""
+
+    name = 'difference'
+    label = 'First differences'
+    lags = (1,)
+
+    @staticmethod
+    def _regressors(frame):
+        X = frame['X']
+        s = int(frame['n_seasonal'][0])
+        return np.column_stack([np.ones(len(X)), _diff(X[:, GDP]), _diff(X[:, PRICE]), _diff(X[:, TAX]),
+                                X[:, 4:4 + s]])
+
+    def blocks(self, frame):
+        return [np.column_stack([self._regressors(frame), _diff(frame['y'])])]
+
+    def fit(self, moments, frame, start, stop):
+        return _ols(moments[0][0])
+
+    def predict(self, params, frame, start, stop):
+        steps = self._regressors(frame)[start:stop] @ params
+        return frame['y'][start - 1] + np.cumsum(steps)
+
+
+class InstrumentalVariables(Estimator):
+    """ln P を ln 従量税と1期前の ln P で操作する2段階最小二乗法（ほかの説明変数は外生）"""
+
+    name = 'iv'
+    label = 'IV (2SLS)'
+    lags = (1,)
+
+    def blocks(self, frame):
+        X = frame['X']
+        return [np.column_stack([X, frame['ln_tax'], _lag(X[:, PRICE]), frame['y']])]
+
+    def fit(self, moments, frame, start, stop):
+        M = moments[0][0]
+        k = frame['X'].shape[1]
+        keep = _varying(M)[:k]
+        x = np.flatnonzero(keep)
+        z = np.r_[x[x != PRICE], k, k + 1]
+        Szz_inv = np.linalg.pinv(M[np.ix_(z, z)], hermitian=True)
+        Sxz = M[np.ix_(x, z)]
+        A = Sxz @ Szz_inv @ Sxz.T
+        b = Sxz @ Szz_inv @ M[z, -1]
+        params = np.zeros(k)
+        params[keep] = np.linalg.pinv(A, hermitian=True) @ b
+        return params
+
+    def predict(self, params, frame, start, stop):
+        return frame['X'][start:stop] @ params
+
+
+class ErrorCorrection(Estimator):
+    """
+    Engle–Granger の2段階の誤差修正モデル
+
+        1段階目: ln Q = X b1（レベルモデル）
+        2段階目: Δln Q_t = c + 季節ダミー + λ (ln Q_{t−1} − X_{t−1} b1) + b Δln P_t + g Δln GDP_t
+    2段階目の行列は [定数項, 季節ダミー, ln Q_{t−1}, X_{t−1}, Δln P, Δln GDP, Δln Q] の積和を b1 で変換します。
+    弾力性は長期（1段階目）の値です。
+    """
+
+    name = 'ecm'
+    label = 'ECM (Engle-Granger)'
+    lags = (0, 1)
+
+    @staticmethod
+    def _short_run(frame):
+        X = frame['X']
+        s = int(frame['n_seasonal'][0])
+        return np.column_stack([np.ones(len(X)), X[:, 4:4 + s]]), _diff(X[:, PRICE]), _diff(X[:, GDP])
+
+    def blocks(self, frame):
+        X, y = frame['X'], frame['y']
+        deterministic, d_price, d_gdp = self._short_run(frame)
+        lagged = np.column_stack([_lag(y), np.vstack([np.full((1, X.shape[1]), np.nan), X[:-1]])])
+        return [np.column_stack([X, y]),
+                np.column_stack([deterministic, lagged, d_price, d_gdp, _diff(y)])]
+
+    def fit(self, moments, frame, start, stop):
+        b1 = _ols(moments[0][0])
+        k = frame['X'].shape[1]
+        d = 1 + int(frame['n_seasonal'][0])
+        # 2段階目の列 [定数項・季節, ECT, Δln P, Δln GDP, Δln Q] への変換
+        m = d + 1 + k + 3
+        T = np.zeros((m, d + 4))
+        T[:d, :d] = np.eye(d)
+        T[d, d] = 1.0                       # ln Q_{t−1}
+        T[d + 1:d + 1 + k, d] = -b1         # − X_{t−1} b1
+        T[d + 1 + k:, d + 1:] = np.eye(3)
+        b2 = _ols(T.T @ moments[1][0] @ T)
+        return np.r_[b1, b2]
+
+    def predict(self, params, frame, start, stop):
+        X, y = frame['X'], frame['y']
+        k = X.shape[1]
+        b1, b2 = params[:k], params[k:]
+        deterministic, d_price, d_gdp = self._short_run(frame)
+        pred = np.empty(stop - start)
+        previous = y[start - 1]
+        for i, t in enumerate(range(start, stop)):
+            ect = previous - X[t - 1] @ b1
+            previous = previous + np.r_[deterministic[t], ect, d_price[t], d_gdp[t]] @ b2
+            pred[i] = previous
+        return pred
+
+
+class Regularized(Estimator):
+    """
+    リッジ・ラッソ（lib/regularized.py と同じ定式化、説明変数は学習期間で標準化）
+
+    λは学習期間の最後の inner_splits 期を1期先で予測する拡大ウィンドウの交差検証で選択します
+    （07と同じ考え方。λの格子は学習期間全体の積和から作成）。
+    """
+
+    lags = (0,)
+    n_lambdas = 30
+    inner_splits = 6
+
+    def __init__(self, name, label, l1_ratio):
+        self.name = name
+        self.label = label
+        self.l1_ratio = l1_ratio
+
+    def blocks(self, frame):
+        return [np.column_stack([frame['X'], frame['y']])]       # X の先頭の列（定数項）から行数・合計
+
+    @staticmethod
+    def _gram(M):
+        n = M[0, 0]
+        mean = M[0, 1:] / n
+        cov = M[1:, 1:] / n - np.outer(mean, mean)
+        std = np.sqrt(np.maximum(np.diag(cov)[:-1], 0.0))
+        std = np.where(std > 1e-12, std, 1.0)
+        G = cov[:-1, :-1] / std[:, None] / std[None, :]
+        c = cov[:-1, -1] / std
+        return G, c, mean, std
+
+    def _path(self, M, lambdas, pf):
+        G, c, mean, std = self._gram(M)
+        coefs, _ = gram_path(G, c, lambdas, self.l1_ratio, pf)
+        coef = coefs / std[None, :]
+        intercept = mean[-1] - coef @ mean[:-1]
+        return intercept, coef
+
+    def fit(self, moments, frame, start, stop):
+        M = moments[0][0]
+        pf = frame['penalty']
+        G, c, _, _ = self._gram(M)
+        lambdas = lambda_grid(c, pf, self.l1_ratio, self.n_lambdas)
+        X, y = frame['X'][:, 1:], frame['y']
+        S = moments[0][2]
+        inner = range(max(start + 4, stop - self.inner_splits), stop)
+        errors = np.zeros((len(inner), len(lambdas)))
+        for i, t in enumerate(inner):
+            intercept, coef = self._path(S[t] - S[start], lambdas, pf)
+            errors[i] = (intercept + coef @ X[t] - y[t]) ** 2
+        best = int(np.argmin(errors.mean(axis=0))) if len(inner) else len(lambdas) - 1
+        intercept, coef = self._path(M, lambdas[best:best + 1], pf)
+        return np.r_[intercept[0], coef[0], lambdas[best]]
+
+    def predict(self, params, frame, start, stop):
+        k = frame['X'].shape[1]
+        return params[0] + frame['X'][start:stop, 1:] @ params[1:k]
+
+    def elasticities(self, params):
+        return params[1], params[2], params[3]
+
+
+class Naive(Estimator):
+    """前期の値（季節ダミーがあれば前年同期の値）"""
+
+    name = 'naive'
+    label = 'Naive (no change)'
+
+    def fit(self, moments, frame, start, stop):
+        return np.zeros(0)
+
+    def predict(self, params, frame, start, stop):
+        period = 4 if int(frame['n_seasonal'][0]) else 1
+        t = np.arange(start, stop)
+        back = period * ((t - start) // period + 1)
+        return frame['y'][t - back]
+
+    def elasticities(self, params):
+        return np.nan, np.nan, np.nan
+
+
+ESTIMATORS = {e.name: e for e in [
+    OLSLevel(), Differenced(), InstrumentalVariables(), ErrorCorrection(),
+    Regularized('ridge', 'Ridge', 0.0), Regularized('lasso', 'Lasso', 1.0), Naive(),
+]}
+
+
+# ---- 分割と計算 ----
+
+def splits(n, scheme, min_train, window, horizon):
+    """予測の起点ごとの (学習の開始, 起点, 予測の終わり)。学習期間 [開始, 起点)、予測期間 [起点, 終わり)"""
+    out = []
+    for origin in range(min_train, n):
+        start = 0 if scheme == 'expanding' else max(0, origin - window)
+        out.append((start, origin, min(n, origin + horizon)))
+    return out
+
+
+def _moments(estimator, arrays, prefix, start, stop):
+    moments = []
+    for i, lag in enumerate(estimator.lags):
+        S, C = arrays[f'{prefix}/S{i}'], arrays[f'{prefix}/C{i}']
+        first = start + lag
+        moments.append((S[stop] - S[first], C[stop] - C[first], S))
+    return moments
+
+
+def _run_folds(arrays, task):
+    """1つの (頻度, 推定方法, 分割の方法) の分割をまとめて計算（WorkerPool のワーカーで実行）"""
+    frequency, name, scheme, folds = task
+    estimator = ESTIMATORS[name]
+    frame = {key.split('/', 1)[1]: value for key, value in arrays.items()
+             if key.startswith(f'{frequency}/') and key.count('/') == 1}
+    prefix = f'{frequency}/{name}'
+    y_mean = frame['y_mean'][0]
+    forecasts, fits = [], []
+    for start, origin, stop in folds:
+        params = estimator.fit(_moments(estimator, arrays, prefix, start, origin), frame, start, origin)
+        pred = estimator.predict(params, frame, origin, stop)
+        alpha, beta, gamma = estimator.elasticities(params)
+        origin_label = str(frame['labels'][origin])
+        fits.append({'Frequency': frequency, 'Estimator': name, 'Scheme': scheme, 'Origin': origin_label,
+                     'Train_Start': str(frame['labels'][start]), 'N_Train': origin - start,
+                     'alpha': alpha, 'beta': beta, 'gamma': gamma,
+                     'lambda': params[-1] if isinstance(estimator, Regularized) else np.nan})
+        for step, t in enumerate(range(origin, stop), start=1):
+            forecasts.append({'Frequency': frequency, 'Estimator': name, 'Scheme': scheme,
+                              'Origin': origin_label, 'Step': step, 'Period': str(frame['labels'][t]),
+                              'ln_Q': frame['y'][t] + y_mean, 'ln_Q_Forecast': pred[step - 1] + y_mean})
+    return forecasts, fits
+
+
+def check_ols(frames, settings=None):
+    """
+    拡大ウィンドウの OLS（積和からの推定）の予測と、学習期間の行から直接推定した OLS の予測の最大の差
+
+    起点ごと（と全期間）に、中心化する前の計画行列の学習期間 [0, 起点) の行を np.linalg.lstsq で推定して
+    比べます（学習期間に変動のないダミーは0の列なので係数0）。
+    戻り値: {頻度: 最大の差（ln Q）}
+    """
+    estimator = ESTIMATORS['ols']
+    out = {}
+    for frequency, frame in frames.items():
+        setting = {**SETTINGS[frequency], **(settings or {}).get(frequency, {})}
+        X, y = frame['X'] + frame['x_mean'], frame['y']
+        n = len(y)
+        arrays = {}
+        S, C = cumulative_cross_products(estimator.blocks(frame)[0])
+        arrays['f/ols/S0'], arrays['f/ols/C0'] = S, C
+        folds = splits(n, 'expanding', **setting) + [(0, n, n)]
+        diff = 0.0
+        for start, origin, stop in folds:
+            params = estimator.fit(_moments(estimator, arrays, 'f/ols', start, origin), frame, start, origin)
+            direct = np.linalg.lstsq(X[start:origin], y[start:origin], rcond=None)[0]
+            # 全期間は標本内の予測（当てはめ値）で比べる
+            lo, hi = (start, origin) if origin == stop else (origin, stop)
+            diff = max(diff, np.max(np.abs(estimator.predict(params, frame, lo, hi) - X[lo:hi] @ direct)))
+        out[frequency] = diff
+    return out
+
+
+def full_sample_fits(frames, estimators):
+    """全期間で推定した弾力性（分割ごとの弾力性の比較の基準）"""
+    rows = []
+    for frequency, frame in frames.items():
+        for name in estimators:
+            estimator = ESTIMATORS[name]
+            n = len(frame['y'])
+            arrays = {}
+            for i, block in enumerate(estimator.blocks(frame)):
+                arrays[f'f/{name}/S{i}'], arrays[f'f/{name}/C{i}'] = cumulative_cross_products(block)
+            params = estimator.fit(_moments(estimator, arrays, f'f/{name}', 0, n), frame, 0, n)
+            alpha, beta, gamma = estimator.elasticities(params)
+            rows.append({'Frequency': frequency, 'Estimator': name, 'alpha': alpha, 'beta': beta, 'gamma': gamma})
+    return pd.DataFrame(rows)
+
+
+def run_backtest(frames=None, estimators=None, schemes=SCHEMES, settings=None, workers=None, chunk=8):
+    """
+    全ての (頻度, 推定方法, 分割の方法) でバックテスト
+
+    settings: 頻度ごとの min_train・window・horizon（SETTINGS を上書き）
+    workers: プロセス数（None なら CPU 数、1 ならプールを使わずに計算）
+    chunk: 1タスクにまとめる分割の数
+    戻り値: 辞書（forecasts: 予測1件1行, fits: 分割ごとの係数, full: 全期間の係数, elapsed: 秒）
+    """
+    frames = load_frames() if frames is None else frames
+    estimators = list(ESTIMATORS) if estimators is None else list(estimators)
+    settings = {f: {**SETTINGS[f], **(settings or {}).get(f, {})} for f in frames}
+    start_time = time.perf_counter()
+
+    arrays = {}
+    tasks = []
+    for frequency, frame in frames.items():
+        arrays.update({f'{frequency}/{key}': value for key, value in frame.items()})
+        n = len(frame['y'])
+        for name in estimators:
+            estimator = ESTIMATORS[name]
+            for i, block in enumerate(estimator.blocks(frame)):
+                S, C = cumulative_cross_products(block)
+                arrays[f'{frequency}/{name}/S{i}'] = S
+                arrays[f'{frequency}/{name}/C{i}'] = C
+            for scheme in schemes:
+                folds = splits(n, scheme, **settings[frequency])
+                for i in range(0, len(folds), chunk):
+                    tasks.append((frequency, name, scheme, folds[i:i + chunk]))
+
+    forecasts, fits = [], []
+    plane = DataPlane(arrays)
+    try:
+        with WorkerPool(plane, workers=workers) as pool:
+            for rows, fold_rows in pool.imap_unordered(_run_folds, tasks):
+                forecasts.extend(rows)
+                fits.extend(fold_rows)
+    finally:
+        plane.close()
+
+    keys = ['Frequency', 'Estimator', 'Scheme', 'Origin']
+    forecasts = pd.DataFrame(forecasts).sort_values(keys + ['Step']).reset_index(drop=True)
+    forecasts['Error'] = forecasts['ln_Q_Forecast'] - forecasts['ln_Q']
+    forecasts['APE_%'] = np.abs(np.exp(-forecasts['Error']) - 1) * 100   # |Q − Q̂| / Q
+    return {
+        'forecasts': forecasts,
+        'fits': pd.DataFrame(fits).sort_values(keys).reset_index(drop=True),
+        'full': full_sample_fits(frames, estimators),
+        'settings': settings,
+        'elapsed': time.perf_counter() - start_time,
+    }
+
+
+def score(forecasts):
+    """(頻度, 推定方法, 分割の方法) ごとの RMSE（ln Q）・MAPE（%）、1期先の RMSE"""
+    groups = forecasts.groupby(['Frequency', 'Estimator', 'Scheme'], sort=False)
+    table = groups.agg(N=('Error', 'size'), RMSE=('Error', lambda e: np.sqrt(np.mean(e ** 2))),
+                       MAPE=('APE_%', 'mean'))
+    one_step = forecasts[forecasts['Step'] == 1].groupby(['Frequency', 'Estimator', 'Scheme'], sort=False)
+    table['RMSE_h1'] = one_step['Error'].apply(lambda e: np.sqrt(np.mean(e ** 2)))
+    return table.reset_index()
+
+
+def elasticity_stability(fits, full):
+    """
+    分割ごとの弾力性のばらつき
+
+    平均・標準偏差・最小・最大と、全期間の推定値と符号が異なる分割の割合（β）
+    """
+    rows = []
+    for (frequency, name, scheme), group in fits.groupby(['Frequency', 'Estimator', 'Scheme'], sort=False):
+        reference = full[(full['Frequency'] == frequency) & (full['Estimator'] == name)].iloc[0]
+        row = {'Frequency': frequency, 'Estimator': name, 'Scheme': scheme, 'N_Folds': len(group)}
+        for e in ELASTICITIES:
+            values = group[e].to_numpy(dtype=float)
+            row[f'{e}_full'] = reference[e]
+            row[f'{e}_mean'] = np.mean(values)
+            row[f'{e}_std'] = np.std(values, ddof=1) if len(values) > 1 else np.nan
+            row[f'{e}_min'] = np.min(values)
+            row[f'{e}_max'] = np.max(values)
+        row['beta_sign_flip_share'] = (np.mean(np.sign(group['beta']) != np.sign(reference['beta']))
+                                       if np.isfinite(reference['beta']) else np.nan)
+        rows.append(row)
+    return pd.DataFrame(rows)
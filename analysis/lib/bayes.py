@@ -0,0 +1,114 @@
+"""
+ベイズ線形回帰（独立な正規－逆ガンマ事前分布、ギブスサンプラー）
+
+モデル: y = Xb + ε, ε ~ N(0, σ²)
+事前分布: b ~ N(m0, V0)（V0 は対角）, σ² ~ 逆ガンマ(a0, b0)
+
+条件付き事後分布:
+    b | σ², y ~ N(Vn (V0⁻¹m0 + X'y/σ²), Vn),  Vn = (V0⁻¹ + X'X/σ²)⁻¹
+    σ² | b, y ~ 逆ガンマ(a0 + n/2, b0 + SSR(b)/2)
+
+チェーンを配列の次元として持ち、全チェーンを同時に1ステップずつ更新します。
+V0^{-1/2} で変数変換した X'X を最初に1回だけ固有値分解しておくと、
+Vn は σ² によらず同じ固有ベクトルで対角化できるため、
+各ステップは (チェーン数, 係数の数) の要素ごとの演算と行列積1回で済みます。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _prepare(X, y, prior_mean, prior_sd):
+    """σ² によらない量（固有値分解・十分統計量）を事前に計算"""
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    m0 = np.asarray(prior_mean, dtype=float)
+    s0 = np.asarray(prior_sd, dtype=float)
+
+    XtX = X.T @ X
+    Xty = X.T @ y
+    # b = m0 + S u（S = diag(s0)）と置くと、事前分布は u ~ N(0, I)
+    M = XtX * s0[:, None] * s0[None, :]
+    eigval, Q = np.linalg.eigh(M)
+    eigval = np.clip(eigval, 0.0, None)
+    A = s0[:, None] * Q                          # b = m0 + A w（w は固有基底での座標）
+    # X'(y − X m0) を固有基底に射影
+    r = Q.T @ (s0 * (Xty - XtX @ m0))
+    return {
+        'XtX': XtX, 'Xty': Xty, 'yty': float(y @ y), 'n': len(y),
+        'm0': m0, 'eigval': eigval, 'A': A, 'r': r,
+    }
+
+
+def gibbs_sampler(X, y, prior_mean, prior_sd, a0=2.0, b0=0.01, n_chains=1000, n_draws=100,
+                  burn_in=100, seed=None):
+    """
+    多数のチェーンを同時に走らせるギブスサンプラー
+
+    X: 定数項を含む説明変数 (n, k)
+    prior_mean, prior_sd: 係数の事前平均・事前標準偏差 (k,)
+    a0, b0: σ² の逆ガンマ事前分布の形状・尺度
+    n_chains × n_draws 個の事後抽出値を返します（burn_in は各チェーンの初期に捨てる回数）。
+    戻り値: 辞書（beta (n_chains, n_draws, k), sigma2 (n_chains, n_draws)）
+    """
+    rng = np.random.default_rng(seed)
+    s = _prepare(X, y, prior_mean, prior_sd)
+    k = len(s['m0'])
+    a_n = a0 + s['n'] / 2.0
+
+    beta = np.empty((n_chains, n_draws, k))
+    sigma2_draws = np.empty((n_chains, n_draws))
+
+    # 初期値: 最小二乗法の残差分散をチェーンごとにばらつかせて出発（チェーン間の収束診断のため）
+    b_ls = np.linalg.lstsq(np.asarray(X, dtype=float), np.asarray(y, dtype=float), rcond=None)[0]
+    ssr_ls = s['yty'] - 2.0 * b_ls @ s['Xty'] + b_ls @ s['XtX'] @ b_ls
+    sigma2 = max(ssr_ls, 1e-12) / s['n'] * rng.lognormal(0.0, 1.0, size=n_chains)
+
+    for it in range(burn_in + n_draws):
+        # b | σ²: 固有基底では各成分が独立な正規分布
+        prec = 1.0 + s['eigval'][None, :] / sigma2[:, None]         # (C, k)
+        mean_w = (s['r'][None, :] / sigma2[:, None]) / prec
+        w = mean_w + rng.standard_normal((n_chains, k)) / np.sqrt(prec)
+        b = s['m0'][None, :] + w @ s['A'].T                          # (C, k)
+
+        # σ² | b: SSR = y'y − 2b'X'y + b'X'Xb
+        ssr = s['yty'] - 2.0 * b @ s['Xty'] + np.einsum('ci,ij,cj->c', b, s['XtX'], b)
+        sigma2 = (b0 + 0.5 * np.maximum(ssr, 0.0)) / rng.gamma(a_n, size=n_chains)
+
+        if it >= burn_in:
+            beta[:, it - burn_in] = b
+            sigma2_draws[:, it - burn_in] = sigma2
+
+    return {'beta': beta, 'sigma2': sigma2_draws}
+
+
+def split_rhat(draws):
+    """
+    分割 R-hat（Gelman-Rubin の収束診断）
+
+    draws: (チェーン数, 抽出数, ...) 。各チェーンを前半・後半に分けて計算します。
+    """
+    draws = np.asarray(draws, dtype=float)
+    half = draws.shape[1] // 2
+    chains = np.concatenate([draws[:, :half], draws[:, half:2 * half]], axis=0)
+    n = chains.shape[1]
+    chain_mean = chains.mean(axis=1)
+    within = chains.var(axis=1, ddof=1).mean(axis=0)
+    between = n * chain_mean.var(axis=0, ddof=1)
+    var_hat = (n - 1) / n * within + between / n
+    return np.sqrt(var_hat / within)
+
+
+def posterior_summary(draws, names, prob=0.95):
+    """事後平均・標準偏差・信用区間・R-hat の表を作成（draws: (チェーン数, 抽出数, k)）"""
+    flat = draws.reshape(-1, draws.shape[-1])
+    lower, upper = np.quantile(flat, [(1 - prob) / 2, (1 + prob) / 2], axis=0)
+    return pd.DataFrame({
+        'Variable': names,
+        'Mean': flat.mean(axis=0),
+        'SD': flat.std(axis=0, ddof=1),
+        'Lower': lower,
+        'Upper': upper,
+        'P(>0)': (flat > 0).mean(axis=0),
+        'R_hat': split_rhat(draws),
+    })
@@ -0,0 +1,153 @@
+"""
+多重共線性の診断（VIF・条件指数・分散分解比率・偏相関）
+
+statsmodels の variance_inflation_factor は列ごとに補助回帰を1本ずつ推定しますが、
+ここでは相関行列の逆行列の対角要素から全変数のVIFを一度に計算します。
+
+    VIF_j = [R^{-1}]_jj          （R: 説明変数の相関行列）
+    偏相関_ij = -P_ij / sqrt(P_ii × P_jj)   （P = R^{-1}）
+
+条件指数と分散分解比率は Belsley, Kuh and Welsch (1980) の方法に従い、
+定数項を含む計画行列の各列を長さ1に基準化した特異値分解から計算します。
+
+配列の先頭に次元を追加すれば（例: (候補数, n, k)）、複数の推定式候補をまとめて診断できます。
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+def _standardize(X):
+    """列ごとに平均0・ノルム1に基準化（Z'Z が相関行列になる）"""
+    X = np.asarray(X, dtype=float)
+    Z = X - X.mean(axis=-2, keepdims=True)
+    norms = np.sqrt((Z ** 2).sum(axis=-2, keepdims=True))
+    norms = np.where(norms > 0, norms, np.nan)  # 定数列は相関が定義できない
+    return Z / norms
+
+
+def correlation_matrix(X):
+    """説明変数の相関行列（X: (..., n, k) → (..., k, k)）"""
+    Z = _standardize(X)
+    return np.swapaxes(Z, -1, -2) @ Z
+
+
+def vif_from_corr(R):
+    """相関行列からVIFを計算（R: (..., k, k) → (..., k)）"""
+    P = np.linalg.pinv(R, hermitian=True)
+    return np.diagonal(P, axis1=-2, axis2=-1).copy()
+
+
+def vif(X):
+    """全説明変数のVIFを一度に計算（X: 定数項を除いた (..., n, k)）"""
+    return vif_from_corr(correlation_matrix(X))
+
+
+def partial_correlations(X):
+    """他のすべての説明変数を制御した偏相関行列（X: (..., n, k) → (..., k, k)）"""
+    P = np.linalg.pinv(correlation_matrix(X), hermitian=True)
+    d = np.sqrt(np.diagonal(P, axis1=-2, axis2=-1))
+    pcorr = -P / (d[..., :, None] * d[..., None, :])
+    idx = np.arange(P.shape[-1])
+    pcorr[..., idx, idx] = 1.0
+    return pcorr
+
+
+def condition_diagnostics(X_with_const):
+    """
+    条件指数と分散分解比率（Belsley）
+
+    X_with_const: 定数項を含む計画行列 (..., n, k)
+    戻り値: (条件指数 (..., k), 分散分解比率 (..., k, k))
+        分散分解比率[..., j, m] は、条件指数 j の成分が係数 m の分散に占める割合
+    """
+    X = np.asarray(X_with_const, dtype=float)
+    Xs = X / np.sqrt((X ** 2).sum(axis=-2, keepdims=True))
+    _, s, Vt = np.linalg.svd(Xs, full_matrices=False)
+    condition_indices = s[..., :1] / s
+
+    # phi[m, j] = v_mj^2 / s_j^2 を係数 m ごとに正規化
+    phi = (np.swapaxes(Vt, -1, -2) ** 2) / (s[..., None, :] ** 2)
+    proportions = phi / phi.sum(axis=-1, keepdims=True)
+    return condition_indices, np.swapaxes(proportions, -1, -2)
+
+
+def collinearity_diagnostics(X, names=None, add_const=True):
+    """
+    1つの推定式について診断結果をDataFrameにまとめる
+
+    X: 定数項を除いた説明変数（DataFrameまたは配列）
+    戻り値: {'vif', 'condition', 'partial_correlation', 'correlation'} の辞書
+    """
+    if isinstance(X, pd.DataFrame):
+        names = list(X.columns) if names is None else names
+        X = X.to_numpy(dtype=float)
+    X = np.asarray(X, dtype=float)
+    names = names if names is not None else [f'x{i}' for i in range(X.shape[1])]
+
+    R = correlation_matrix(X)
+    vifs = vif_from_corr(R)
+    pcorr = partial_correlations(X)
+
+    X_design = np.column_stack([np.ones(len(X)), X]) if add_const else X
+    design_names = (['const'] + list(names)) if add_const else list(names)
+    cond_idx, proportions = condition_diagnostics(X_design)
+
+    condition_df = pd.DataFrame(proportions, columns=design_names)
+    condition_df.insert(0, 'Condition_Index', cond_idx)
+
+    return {
+        'vif': pd.DataFrame({'Variable': names, 'VIF': vifs}),
+        'condition': condition_df,
+        'partial_correlation': pd.DataFrame(pcorr, index=names, columns=names),
+        'correlation': pd.DataFrame(R, index=names, columns=names),
+    }
+
+
+def batch_vif(X, names, specs):
+    """
+    多数の推定式候補（列の部分集合）のVIFをまとめて計算
+
+    全説明変数の相関行列を1回だけ計算し、各候補はその部分行列の逆行列をとるだけで済みます。
+    同じ変数数の候補は (候補数, k, k) に積み上げて一括で逆行列を計算します。
+
+    X: 全候補変数を含む説明変数 (n, K)
+    names: 列名のリスト
+    specs: 候補のリスト（各候補は列名のタプル）
+    戻り値: 候補ごとのVIFを縦持ちにしたDataFrame（spec_id, Variable, VIF）
+    """
+    if isinstance(X, pd.DataFrame):
+        X = X.to_numpy(dtype=float)
+    R = correlation_matrix(X)
+    position = {name: i for i, name in enumerate(names)}
+
+    frames = []
+    by_size = {}
+    for spec_id, spec in enumerate(specs):
+        by_size.setdefault(len(spec), []).append(spec_id)
+
+    for size, spec_ids in by_size.items():
+        idx = np.array([[position[v] for v in specs[s]] for s in spec_ids])   # (m, k)
+        R_sub = R[idx[:, :, None], idx[:, None, :]]                            # (m, k, k)
+        vifs = vif_from_corr(R_sub)                                            # (m, k)
+        frames.append(pd.DataFrame({
+            'spec_id': np.repeat(spec_ids, size),
+            'Variable': [names[i] for i in idx.ravel()],
+            'VIF': vifs.ravel(),
+        }))
+
+    return pd.concat(frames, ignore_index=True).sort_values('spec_id', kind='stable').reset_index(drop=True)
+
+
+def all_subsets(names, min_size=2, always=()):
+    """候補変数の全組み合わせ（always の変数は常に含める）"""
+    optional = [v for v in names if v not in always]
+    specs = []
+    for size in range(max(min_size - len(always), 0), len(optional) + 1):
+        for combo in itertools.combinations(optional, size):
+            spec = tuple(always) + combo
+            if len(spec) >= min_size:
+                specs.append(spec)
+    return specs
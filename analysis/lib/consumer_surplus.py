@@ -0,0 +1,257 @@
+"""
+消費者余剰の計算
+
+1. 測定方法総論（消費者余剰測定方法まとめ/測定方法総論.text）の台形近似（02で使用）:
+   1. 価格要因の寄与率: X_{t+1} = β(exp(lnP_{t+1} − lnP_t) − 1) / (exp(lnQ_{t+1} − lnQ_t) − 1)
+   2. 需要増加分の価格要因部分: Y_{t+1} = X_{t+1} × (Q_{t+1} − Q_t)
+   3. 消費者余剰増分の台形面積: (Q_t + Q_t + Y_{t+1}) × (P_t − P_{t+1}) × 1/2
+      （02の実装に合わせ、上底＋下底は Q_t + Q_{t+1} + Y_{t+1} として計算）
+
+2. 需要曲線の積分による厳密な消費者余剰の変化: ΔCS = −∫_{P0}^{P1} Q(p) dp
+   需要曲線は基準点 (P0, Q0) を通るように置きます（他の需要要因は基準点の値で固定）。
+   - constant_elasticity: Q = Q0 (p/P0)^ε（閉じた形）
+   - linear: Q = Q0 (1 + ε(p − P0)/P0)、Q ≥ 0 で打ち切り（閉じた形、ε は基準点での弾力性）
+   - translog: ln Q = ln Q0 + ε ln(p/P0) + θ/2 × ln(p/P0)²（ガウス・ルジャンドル求積）
+   - nonparametric: 局所線形回帰で推定した ln Q の曲線（ガウス・ルジャンドル求積）
+
+3. ヒックス型の厚生指標（補償変分 CV・等価変分 EV、利得を正とする）
+   所得弾力性 δ の所得効果 Q(p, y) = Q(p)(y/y0)^δ を含めた支出関数 e' = Q(p, e) を解きます。
+   constant_elasticity は Hausman (1981) の閉じた形、それ以外は4次のルンゲ・クッタ法。
+
+4. ガソリン税の死荷重（供給は完全弾力的、税をなくすと価格は税額分だけ下がると仮定）
+   DWL = ∫_{P−t}^{P} Q(p) dp − t × Q(P)
+
+いずれも期間・抽出値などの配列をそのまま受け取り、ブロードキャストして一度に計算します。
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+def trapezoid_cs(q, p, beta):
+    """
+    台形近似による各期の消費者余剰増分
+
+    q, p: 各期の数量・価格 (T,) または (..., T)
+    beta: 価格弾力性（スカラー、または (...,) の配列。末尾に期間の次元が追加される）
+    戻り値: 辞書（各要素は (..., T-1)）
+        Price_Contribution, Price_Effect, CS_Increase, Cumulative_CS, ΔQ, ΔP
+    """
+    q = np.asarray(q, dtype=float)
+    p = np.asarray(p, dtype=float)
+    beta = np.asarray(beta, dtype=float)[..., None]
+
+    q_prev, q_curr = q[..., :-1], q[..., 1:]
+    p_prev, p_curr = p[..., :-1], p[..., 1:]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ln_p_change = np.log(p_curr) - np.log(p_prev)
+        ln_q_change = np.log(q_curr) - np.log(q_prev)
+        # ゼロ除算を避ける（数量・価格が変化しない期は寄与率0）
+        valid = (q_curr != q_prev) & (p_curr != p_prev) & (np.abs(ln_q_change) > 1e-10)
+        ratio = np.where(valid, (np.exp(ln_p_change) - 1) / (np.exp(ln_q_change) - 1), 0.0)
+    price_contribution = beta * ratio
+
+    demand_change = q_curr - q_prev
+    price_effect = price_contribution * demand_change
+    cs_increase = np.where(
+        p_prev != p_curr,
+        (q_prev + q_curr + price_effect) * (p_prev - p_curr) * 0.5,
+        0.0
+    )
+
+    return {
+        'Price_Contribution': price_contribution,
+        'Price_Effect': price_effect,
+        'CS_Increase': cs_increase,
+        'Cumulative_CS': np.cumsum(cs_increase, axis=-1),
+        'ΔQ': np.broadcast_to(demand_change, cs_increase.shape),
+        'ΔP': np.broadcast_to(p_curr - p_prev, cs_increase.shape),
+    }
+
+
+DEMAND_FORMS = ('constant_elasticity', 'linear', 'translog', 'nonparametric')
+
+
+@lru_cache(maxsize=None)
+def gauss_legendre(n_nodes):
+    """[-1, 1] のガウス・ルジャンドル求積の節点と重み"""
+    return np.polynomial.legendre.leggauss(n_nodes)
+
+
+def nonparametric_curve(ln_p, ln_q, bandwidth=None, grid_size=200):
+    """
+    局所線形回帰（ガウスカーネル）による ln Q の ln P への曲線の推定
+
+    ln_q には GDP などの需要要因の影響を除いた値（偏残差）を渡します。
+    bandwidth を省略した場合は Silverman の目安を使用します。
+    戻り値: 辞書（ln_p, ln_q, slope: 格子点での値と傾き）
+    """
+    x = np.asarray(ln_p, dtype=float)
+    y = np.asarray(ln_q, dtype=float)
+    if bandwidth is None:
+        bandwidth = 1.06 * x.std(ddof=1) * len(x) ** (-1 / 5)
+    grid = np.linspace(x.min(), x.max(), grid_size)
+
+    d = x[None, :] - grid[:, None]                                # (G, n)
+    w = np.exp(-0.5 * (d / bandwidth) ** 2)
+    s0 = w.sum(axis=1)
+    s1 = (w * d).sum(axis=1)
+    s2 = (w * d ** 2).sum(axis=1)
+    t0 = (w * y).sum(axis=1)
+    t1 = (w * d * y).sum(axis=1)
+    det = s0 * s2 - s1 ** 2
+    level = (s2 * t0 - s1 * t1) / det
+    slope = (s0 * t1 - s1 * t0) / det
+    return {'ln_p': grid, 'ln_q': level, 'slope': slope, 'bandwidth': bandwidth}
+
+
+def _curve_ln_q(x, curve):
+    """推定した曲線の値（範囲外は端点の傾きで線形に延長）"""
+    grid, level, slope = curve['ln_p'], curve['ln_q'], curve['slope']
+    inside = np.interp(x, grid, level)
+    below = level[0] + slope[0] * (x - grid[0])
+    above = level[-1] + slope[-1] * (x - grid[-1])
+    return np.where(x < grid[0], below, np.where(x > grid[-1], above, inside))
+
+
+def demand_quantity(p, p0, q0, form='constant_elasticity', elasticity=None, curvature=0.0, curve=None):
+    """基準点 (p0, q0) を通る需要曲線上の数量 Q(p)"""
+    p = np.asarray(p, dtype=float)
+    x = np.log(p / p0)
+    if form == 'constant_elasticity':
+        return q0 * np.exp(elasticity * x)
+    if form == 'linear':
+        return q0 * np.maximum(1.0 + elasticity * (p / p0 - 1.0), 0.0)
+    if form == 'translog':
+        return q0 * np.exp(elasticity * x + 0.5 * curvature * x ** 2)
+    if form == 'nonparametric':
+        return q0 * np.exp(_curve_ln_q(np.log(p), curve) - _curve_ln_q(np.log(p0), curve))
+    raise ValueError(f"需要曲線の形は {DEMAND_FORMS} のいずれかを指定してください: {form}")
+
+
+def integrate_demand(p0, p1, q0, form='constant_elasticity', elasticity=None, curvature=0.0, curve=None,
+                     n_nodes=32):
+    """
+    ∫_{p0}^{p1} Q(p) dp（需要曲線は (p0, q0) を通る）
+
+    constant_elasticity と linear は閉じた形、それ以外は n_nodes 点のガウス・ルジャンドル求積。
+    p0, p1, q0, elasticity, curvature はブロードキャスト可能な配列（期間 × 抽出値など）。
+    """
+    p0 = np.asarray(p0, dtype=float)
+    p1 = np.asarray(p1, dtype=float)
+    q0 = np.asarray(q0, dtype=float)
+
+    if form == 'constant_elasticity':
+        e = np.asarray(elasticity, dtype=float)
+        unit = np.abs(e + 1.0) < 1e-10
+        power = np.where(unit, 1.0, e + 1.0)
+        general = q0 * p0 / power * ((p1 / p0) ** power - 1.0)
+        return np.where(unit, q0 * p0 * np.log(p1 / p0), general)
+
+    if form == 'linear':
+        # 原始関数 G(p) = q0 (p + ε(p − p0)²/(2 p0)) を、数量が正の範囲に価格を切り詰めて評価
+        e = np.asarray(elasticity, dtype=float)
+        with np.errstate(divide='ignore'):
+            zero_price = np.where(e != 0, p0 * (1.0 - 1.0 / e), np.nan)   # Q = 0 となる価格
+
+        def _clamp(p):
+            p = np.where((e < 0) & (p > zero_price), zero_price, p)
+            return np.where((e > 0) & (p < zero_price), zero_price, p)
+
+        def _antiderivative(p):
+            return q0 * (p + e * (p - p0) ** 2 / (2.0 * p0))
+
+        return _antiderivative(_clamp(p1)) - _antiderivative(_clamp(p0))
+
+    nodes, weights = gauss_legendre(n_nodes)
+    mid = (0.5 * (p0 + p1))[..., None]
+    half = (0.5 * (p1 - p0))[..., None]
+    p = mid + half * nodes
+    elasticity = 0.0 if elasticity is None else elasticity
+    q = demand_quantity(p, p0[..., None], q0[..., None], form, np.asarray(elasticity, dtype=float)[..., None],
+                        np.asarray(curvature, dtype=float)[..., None], curve)
+    return half[..., 0] * (q * weights).sum(axis=-1)
+
+
+def cs_change(p0, p1, q0, form='constant_elasticity', elasticity=None, curvature=0.0, curve=None, n_nodes=32):
+    """価格が p0 から p1 に変化したときの消費者余剰の変化 ΔCS = −∫_{p0}^{p1} Q(p) dp"""
+    return -integrate_demand(p0, p1, q0, form, elasticity, curvature, curve, n_nodes)
+
+
+def hicksian_variation(p0, p1, q0, income, income_elasticity, form='constant_elasticity', elasticity=None,
+                       curvature=0.0, curve=None, n_steps=64):
+    """
+    補償変分（CV）と等価変分（EV）。いずれも利得を正とする（価格下落で正）
+
+    CV = y − e(p1, u0)：価格変化後に元の効用を保つために取り上げられる所得
+    EV = e(p0, u1) − y：価格変化前の価格で変化後の効用を得るのに必要な所得の増減
+    income: 所得（y、数量×価格と同じ単位）
+    income_elasticity: 所得弾力性 δ（Q(p, y) = Q(p)(y/y0)^δ）
+    戻り値: (CV, EV)
+    """
+    p0 = np.asarray(p0, dtype=float)
+    p1 = np.asarray(p1, dtype=float)
+    q0 = np.asarray(q0, dtype=float)
+    y = np.asarray(income, dtype=float)
+    d = np.asarray(income_elasticity, dtype=float)
+
+    if form == 'constant_elasticity':
+        # Hausman (1981): e^{1−δ}/(1−δ) − A p^{ε+1}/(ε+1) が効用水準
+        e = np.asarray(elasticity, dtype=float)
+        q1 = demand_quantity(p1, p0, q0, form, e)
+        unit_price = np.abs(e + 1.0) < 1e-10
+        # A (p1^{ε+1} − p0^{ε+1})/(ε+1) × y^δ に相当する量（ε = −1 では p0 q0 ln(p1/p0)）
+        spend = np.where(unit_price, p0 * q0 * np.log(p1 / p0),
+                         (p1 * q1 - p0 * q0) / np.where(unit_price, 1.0, e + 1.0))
+        unit_income = np.abs(d - 1.0) < 1e-10
+        one_minus = np.where(unit_income, 1.0, 1.0 - d)
+        with np.errstate(invalid='ignore'):
+            cv_general = y - (y ** one_minus + one_minus * y ** (-d) * spend) ** (1.0 / one_minus)
+            ev_general = (y ** one_minus - one_minus * y ** (-d) * spend) ** (1.0 / one_minus) - y
+        cv_unit = y - y * np.exp(spend / y)
+        ev_unit = y * np.exp(-spend / y) - y
+        return np.where(unit_income, cv_unit, cv_general), np.where(unit_income, ev_unit, ev_general)
+
+    def _slope(p, expenditure):
+        return demand_quantity(p, p0, q0, form, elasticity, curvature, curve) * (expenditure / y) ** d
+
+    def _solve(start, end):
+        # de/dp = Q(p, e) を start から end まで積分（e(start) = y）
+        h = (end - start) / n_steps
+        expenditure = y * np.ones(np.broadcast(start, end, y).shape)
+        p = start
+        for _ in range(n_steps):
+            k1 = _slope(p, expenditure)
+            k2 = _slope(p + h / 2, expenditure + h / 2 * k1)
+            k3 = _slope(p + h / 2, expenditure + h / 2 * k2)
+            k4 = _slope(p + h, expenditure + h * k3)
+            expenditure = expenditure + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+            p = p + h
+        return expenditure
+
+    cv = y - _solve(p0, p1)
+    ev = _solve(p1, p0) - y
+    return cv, ev
+
+
+def tax_deadweight_loss(price, quantity, tax, form='constant_elasticity', elasticity=None, curvature=0.0,
+                        curve=None, n_nodes=32):
+    """
+    税の死荷重（供給は完全弾力的と仮定）
+
+    price, quantity: 税込み価格と数量（需要曲線の基準点）
+    tax: 1単位あたりの税額（ガソリン税＋消費税など、価格との差が税抜き価格）
+    戻り値: 辞書（cs_loss: 税による消費者余剰の減少, revenue: 税収, dwl: 死荷重, quantity_no_tax）
+    """
+    price = np.asarray(price, dtype=float)
+    tax = np.asarray(tax, dtype=float)
+    cs_loss = -integrate_demand(price, price - tax, quantity, form, elasticity, curvature, curve, n_nodes)
+    revenue = tax * np.asarray(quantity, dtype=float)
+    return {
+        'cs_loss': cs_loss,
+        'revenue': revenue,
+        'dwl': cs_loss - revenue,
+        'quantity_no_tax': demand_quantity(price - tax, price, quantity, form, elasticity, curvature, curve),
+    }
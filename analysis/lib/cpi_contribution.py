@@ -0,0 +1,246 @@
+"""
+CPI の品目別の寄与度（全品目を一度に）とエネルギー・ガソリン税の分解
+
+総務省の CPI（2020年基準）の表（1行目: 類・品目名、3行目: 符号、5行目: ウエイト、7行目以降: 指数）を
+1回だけ読み込み、全ての類・品目の指数 (期間, 列) とウエイト (列,) の行列にします（CPIMatrix）。
+寄与度は総務省の方法と同じく
+    寄与度_i(t, t−k) = w_i / W × (I_i,t − I_i,t−k) / I_総合,t−k × 100（%ポイント）
+を全ての列について配列のまま計算します（前年比は k = 1 年・12か月、前月比は k = 1 か月）。
+
+- 品目は「ガソリン」などの名前ではなく符号で指定します（ENERGY_CODES）。
+- 月次の表（zmi2020s）にはガソリン・灯油の列がないため、エネルギー（167）から電気代（56）・ガス代（57）・
+  他の光熱（58、灯油のみ）を除いた残り（ウエイトはガソリンと一致）をガソリンの指数として derive_residual() で作ります。
+  2020年基準の指数はウエイト固定のラスパイレス指数なので、2020年基準の期間では正確です（それ以前は接続指数のため近似）。
+- ガソリン税の分解: 週次の全国の小売価格を本体価格・ガソリン税・消費税に分けて期間ごとに平均し、
+  ガソリンの寄与度を各部分の変化に比例して割り振ります（CPI と小売価格の調査の差は 'other' に残ります）。
+- 反実仮想: ガソリン税（または暫定税率）がなかった場合のガソリンの指数と総合指数・前年比を、
+  シナリオの税率 (S, 期間) のブロードキャストで一度に計算します。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from lib.data_plane import load_price_panel
+from lib.price_decomposition import TaxSchedule, base_price, consumer_price, decompose_by_date
+
+CPI_ITEMS_FILE = 'data/-2025消費者物価指数/自由帳 - zni2020a-品目別.csv'
+CPI_MONTHLY_FILE = 'data/-2025消費者物価指数/自由帳 - zmi2020s.csv'
+
+TOTAL = '1'
+# エネルギーの内訳（符号。先にあるものを使う。月次の灯油は「他の光熱」（灯油のみ））
+ENERGY_CODES = {
+    'energy': ['167'],
+    'gasoline': ['7301'],
+    'kerosene': ['3701', '58'],
+    'electricity': ['56', '3500'],
+    'gas': ['57'],
+}
+TAX_COMPONENTS = ['base_price', 'excise', 'consumption_tax']
+
+
+class CPIMatrix:
+    """
+    CPI の全ての類・品目の指数とウエイト
+
+    periods: datetime64[M] (T,)、names・codes: (N,)、weights: (N,)、index: (T, N)（欠損は NaN）
+    frequency: 'annual' または 'monthly'
+    """
+
+    def __init__(self, periods, names, codes, weights, index, frequency):
+        self.periods = periods
+        self.names = np.asarray(names)
+        self.codes = np.asarray(codes)
+        self.weights = np.asarray(weights, dtype=float)
+        self.index = np.asarray(index, dtype=float)
+        self.frequency = frequency
+
+    @classmethod
+    def from_file(cls, data_file=CPI_ITEMS_FILE):
+        """e-Stat の CPI の表（年次 zni2020a・月次 zmi2020s）から作成"""
+        if not os.path.exists(data_file):
+            raise FileNotFoundError(f"{data_file} が見つかりません。")
+        raw = pd.read_csv(data_file, encoding='utf-8-sig', header=None, dtype=str)
+        names = raw.iloc[0, 1:].to_numpy()
+        codes = raw.iloc[2, 1:].str.strip().to_numpy()
+        weights = pd.to_numeric(raw.iloc[4, 1:], errors='coerce').to_numpy()
+        labels = raw.iloc[6:, 0].str.strip()
+        rows = labels.str.fullmatch(r'\d{4}(\d{2})?').to_numpy()
+        labels = labels[rows]
+        monthly = labels.str.len().iloc[0] == 6
+        if monthly:
+            periods = pd.to_datetime(labels, format='%Y%m').to_numpy().astype('datetime64[M]')
+        else:
+            periods = pd.to_datetime(labels, format='%Y').to_numpy().astype('datetime64[M]')
+        index = raw.iloc[6:, 1:][rows].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        return cls(periods, names, codes, weights, index, 'monthly' if monthly else 'annual')
+
+    @property
+    def yoy_lag(self):
+        return 12 if self.frequency == 'monthly' else 1
+
+    def column(self, code):
+        """符号（またはその候補のリスト）の列の位置。なければ KeyError"""
+        for c in ([code] if isinstance(code, str) else code):
+            found = np.flatnonzero(self.codes == c)
+            if len(found):
+                return int(found[0])
+        raise KeyError(f"CPI の表に符号 {code} の列がありません。")
+
+    def has(self, code):
+        try:
+            self.column(code)
+            return True
+        except KeyError:
+            return False
+
+    def derive_residual(self, total_code, part_codes, code, name):
+        """
+        合計の列から部分の列を除いた残りの指数の列を追加（ウエイトで加重: (w_T I_T − Σ w_p I_p) / (w_T − Σ w_p)）
+
+        月次の表でのガソリン（エネルギー − 電気代 − ガス代 − 他の光熱）など。
+        """
+        t = self.column(total_code)
+        parts = [self.column(p) for p in part_codes]
+        weight = self.weights[t] - self.weights[parts].sum()
+        values = (self.weights[t] * self.index[:, t] - self.index[:, parts] @ self.weights[parts]) / weight
+        self.names = np.append(self.names, name)
+        self.codes = np.append(self.codes, code)
+        self.weights = np.append(self.weights, weight)
+        self.index = np.column_stack([self.index, values])
+        return len(self.codes) - 1
+
+    def weight_shares(self):
+        """総合に対するウエイトの割合 (N,)"""
+        return self.weights / self.weights[self.column(TOTAL)]
+
+    def changes(self, lag):
+        """全ての列の変化率（%） (T, N)。先頭の lag 期間は NaN"""
+        out = np.full(self.index.shape, np.nan)
+        out[lag:] = (self.index[lag:] / self.index[:-lag] - 1) * 100
+        return out
+
+    def contributions(self, lag):
+        """全ての列の総合の変化率への寄与度（%ポイント） (T, N)"""
+        total = self.index[:, self.column(TOTAL)]
+        out = np.full(self.index.shape, np.nan)
+        out[lag:] = (self.weight_shares()[None] * (self.index[lag:] - self.index[:-lag])
+                     / total[:-lag, None] * 100)
+        return out
+
+    def to_frame(self, values, codes=None, with_codes=False):
+        """(T, N) の値を期間×列（類・品目名、with_codes なら「名前（符号）」）の DataFrame に"""
+        columns = np.arange(len(self.codes)) if codes is None else [self.column(c) for c in codes]
+        labels = [f'{n}（{c}）' if with_codes else n for n, c in zip(self.names[columns], self.codes[columns])]
+        return pd.DataFrame(values[:, columns], index=pd.Index(self.periods, name='Period'), columns=labels)
+
+
+def load_cpi(frequency='annual'):
+    """年次（品目別）または月次の CPIMatrix。月次はガソリンの列を残差で追加"""
+    cpi = CPIMatrix.from_file(CPI_ITEMS_FILE if frequency == 'annual' else CPI_MONTHLY_FILE)
+    if not cpi.has(ENERGY_CODES['gasoline']):
+        cpi.derive_residual(ENERGY_CODES['energy'][0],
+                            [cpi.codes[cpi.column(ENERGY_CODES[k])] for k in ['electricity', 'gas', 'kerosene']],
+                            ENERGY_CODES['gasoline'][0], 'ガソリン（エネルギーの残差）')
+    return cpi
+
+
+def energy_columns(cpi):
+    """エネルギーの内訳の {名前: 列の位置}（表にあるものだけ）"""
+    return {name: cpi.column(codes) for name, codes in ENERGY_CODES.items() if cpi.has(codes)}
+
+
+def _weekly_national_price():
+    """週次の全国のガソリン価格（欠損の週を除く）"""
+    dates, regions, prices = load_price_panel()
+    price = prices[:, list(regions).index('全国')]
+    valid = np.isfinite(price)
+    return dates[valid], price[valid]
+
+
+def _period_key(dates, periods):
+    """週の日付を CPI の期間（月・年の初日、datetime64[M]）に対応させる"""
+    unit = 'M' if len(periods) < 2 or (periods[1] - periods[0]).astype(int) == 1 else 'Y'
+    return dates.astype(f'datetime64[{unit}]').astype('datetime64[M]')
+
+
+def gasoline_price_components(periods, schedule=None):
+    """
+    週次の全国のガソリン価格を本体価格・ガソリン税・消費税に分け、CPI の期間（月・年）ごとに平均
+
+    戻り値: DataFrame（index: periods、列: price・base_price・excise・consumption_tax・specific_tax・vat_rate）
+    価格データのない期間は NaN
+    """
+    schedule = TaxSchedule.from_change_log() if schedule is None else schedule
+    dates, price = _weekly_national_price()
+    parts = decompose_by_date(price, dates, schedule)
+    t, r = schedule.lookup(dates)
+    weekly = pd.DataFrame({'price': price, **{k: parts[k] for k in TAX_COMPONENTS},
+                           'specific_tax': t, 'vat_rate': r})
+    return weekly.groupby(_period_key(dates, periods)).mean().reindex(periods)
+
+
+def tax_components(cpi, prices, lag):
+    """
+    ガソリンの寄与度を本体価格・ガソリン税・消費税の変化に割り振る（%ポイント）
+
+        寄与度_j = w_g / W × I_g,t−k × ΔC_j / P_t−k / I_総合,t−k × 100
+    指数が小売価格に比例すれば合計はガソリンの寄与度に一致し、差は 'other'（調査の違い）に入ります。
+    戻り値: DataFrame（base_price・excise・consumption_tax・other・gasoline）
+    """
+    g = cpi.column(ENERGY_CODES['gasoline'])
+    total = cpi.index[:, cpi.column(TOTAL)]
+    share = cpi.weight_shares()[g]
+    gasoline = cpi.contributions(lag)[:, g]
+    out = {}
+    scale = np.full(len(total), np.nan)
+    scale[lag:] = share * cpi.index[:-lag, g] / prices['price'].to_numpy()[:-lag] / total[:-lag] * 100
+    for name in TAX_COMPONENTS:
+        values = prices[name].to_numpy()
+        delta = np.full(len(values), np.nan)
+        delta[lag:] = values[lag:] - values[:-lag]
+        out[name] = scale * delta
+    frame = pd.DataFrame(out, index=pd.Index(cpi.periods, name='Period'))
+    frame['other'] = gasoline - frame[TAX_COMPONENTS].sum(axis=1, min_count=len(TAX_COMPONENTS))
+    frame['gasoline'] = gasoline
+    return frame
+
+
+def tax_counterfactuals(cpi, scenarios, schedule=None, lag=None):
+    """
+    ガソリン税がなかった場合などのシナリオの総合指数と前年比
+
+    scenarios: {名前: TaxSchedule}、schedule: 実際の税率（既定: 制度変更のメモ）
+    週ごとに本体価格を変えずに税率だけ変えた価格 P_cf を求め、期間の平均の比 P̄_cf / P̄ をガソリンの指数に掛けます。
+    総合指数は I_総合 + w_g / W × (I_g,cf − I_g) です（シナリオは (S, 週) の配列で一度に計算）。
+    戻り値: DataFrame（期間ごとの総合の前年比（%）、シナリオの前年比と差（%ポイント）、シナリオの総合指数）
+    """
+    lag = cpi.yoy_lag if lag is None else lag
+    schedule = TaxSchedule.from_change_log() if schedule is None else schedule
+    g = cpi.column(ENERGY_CODES['gasoline'])
+    total = cpi.index[:, cpi.column(TOTAL)]
+    dates, price = _weekly_national_price()
+    t, r = schedule.lookup(dates)
+    base = base_price(price, t, r)
+    names = list(scenarios)
+    t_cf = np.stack([scenarios[n].lookup(dates)[0] for n in names])               # (S, W)
+    r_cf = np.stack([scenarios[n].lookup(dates)[1] for n in names])
+    weekly = pd.DataFrame(np.vstack([price[None], consumer_price(base[None], t_cf, r_cf)]).T)
+    period_mean = weekly.groupby(_period_key(dates, cpi.periods)).mean().reindex(cpi.periods).to_numpy()
+    factor = (period_mean[:, 1:] / period_mean[:, :1]).T                           # (S, T)
+    gas_cf = cpi.index[None, :, g] * factor
+    total_cf = total[None] + cpi.weight_shares()[g] * (gas_cf - cpi.index[None, :, g])
+
+    def yoy(x):
+        out = np.full(x.shape, np.nan)
+        out[..., lag:] = (x[..., lag:] / x[..., :-lag] - 1) * 100
+        return out
+
+    frame = pd.DataFrame({'Headline': yoy(total)}, index=pd.Index(cpi.periods, name='Period'))
+    for name, series in zip(names, yoy(total_cf)):
+        frame[f'Headline_{name}'] = series
+        frame[f'Tax_Effect_{name}'] = frame['Headline'] - series
+    for name, series in zip(names, total_cf):
+        frame[f'Index_{name}'] = series
+    return frame
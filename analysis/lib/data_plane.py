@@ -0,0 +1,209 @@
+"""
+マルチプロセスの分析で共有する入力配列（データプレーン）
+
+ブートストラップ・推定式の探索・シナリオの格子計算などを multiprocessing.Pool で並列化すると、
+引数の配列はワーカーごと・タスクごとに pickle でコピーされます。ここでは配列を1回だけ
+共有メモリ（multiprocessing.shared_memory）またはメモリマップの .npy ファイルに置き、
+ワーカーは名前（パス）で接続して読み取り専用のビューを作るだけにします。
+ワーカー数を増やしてもメモリ使用量は入力1つ分のままです。
+
+    plane = DataPlane(load_canonical())          # 共有メモリに配置
+    with WorkerPool(plane, workers=4) as pool:
+        for result in pool.imap_unordered(func, tasks):   # func(arrays, task) はモジュールの関数
+            ...
+
+- load_canonical(): 分析の基本データ（四半期の対数系列・税率表・週次の都道府県別価格）の配列
+- DataPlane: 配列の配置（backend='shm' は共有メモリ、'memmap' は directory 以下の .npy）
+- attach(): 配置の情報 specs から読み取り専用のビューの辞書を作成（ワーカー側）
+- WorkerPool: 初期化時に attach() するプール。workers=1 ならプールを作らずに同じ関数を順に実行
+"""
+
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from lib.design import QUARTERLY_DATA_FILE
+from lib.price_decomposition import TaxSchedule, to_datetime64
+
+PRICE_PANEL_FILE = 'data/1990-2025_ガソリン小売価格四半期ごと/1990-2025レギュラー現金価格.csv'
+MEMMAP_DIR = 'analysis/results/data_plane'
+
+
+def load_price_panel(data_file=PRICE_PANEL_FILE):
+    """
+    週次のレギュラーガソリン現金価格（全国・地方局・都道府県）
+
+    戻り値: (調査日 datetime64[D] (W,), 地域名 (R,), 価格 (W, R) 円/L、欠損は NaN)
+    """
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"{data_file} が見つかりません。")
+    raw = pd.read_csv(data_file, encoding='utf-8', skiprows=2, header=None)
+    header = pd.read_csv(data_file, encoding='utf-8', nrows=0).columns
+    dates = pd.to_datetime(raw.iloc[:, 1], format='%Y/%m/%d', errors='coerce')
+    valid = dates.notna().to_numpy()
+    names = [str(c).replace(' ', '').replace('　', '') for c in header]
+    # 地域の列は「九州沖縄局」まで（その後の空の列・ガソリン税・消費税率の列は除く）
+    last = names.index('九州沖縄局') if '九州沖縄局' in names else len(names) - 1
+    regions = np.array(names[2:last + 1])
+    prices = raw.iloc[valid, 2:2 + len(regions)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    return dates[valid].to_numpy().astype('datetime64[D]'), regions, prices
+
+
+def load_canonical(data_file=QUARTERLY_DATA_FILE, price_panel=True):
+    """
+    分析の基本データを配列の辞書で返す（値はすべて数値・日付・固定長文字列の ndarray）
+
+        period (N,): 四半期の初日、ln_Q・ln_P・ln_P_relative・ln_GDP・ln_Tax_rate (N,): 対数（欠損は NaN）
+        tax_start・tax_specific・tax_vat: 四半期ごとの税率表（TaxSchedule の変更日・従量税・消費税率）
+        panel_date・panel_region・panel_price: 週次の都道府県別価格（price_panel=False なら省略）
+    """
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"{data_file} が見つかりません。")
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    arrays = {'period': to_datetime64(df['Year'].astype(str).to_numpy())}
+    columns = {'ln_Q': 'Q (liters)', 'ln_P': 'P (yen/liter)', 'ln_P_relative': 'P_relative',
+               'ln_GDP': 'GDP (trillion yen)', 'ln_Tax_rate': 'Tax_rate (%)'}
+    for name, column in columns.items():
+        values = df[column].to_numpy(dtype=float) if column in df.columns else np.full(len(df), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            arrays[name] = np.where(values > 0, np.log(values), np.nan)
+
+    schedule = TaxSchedule.from_quarterly_table()
+    arrays['tax_start'] = schedule.start
+    arrays['tax_specific'] = schedule.specific_tax
+    arrays['tax_vat'] = schedule.vat_rate
+
+    if price_panel:
+        arrays['panel_date'], arrays['panel_region'], arrays['panel_price'] = load_price_panel()
+    return arrays
+
+
+class DataPlane:
+    """
+    配列の辞書を共有メモリ（backend='shm'）またはメモリマップの .npy（backend='memmap'）に配置
+
+    specs: ワーカーに渡す {名前: (backend, 場所, 形, 型)}（小さいので pickle しても問題なし）
+    arrays: 作成したプロセス側のビュー（読み取り専用）
+    close() で共有メモリを解放します（以後 arrays のビューは使わないこと。memmap の .npy ファイルは
+    残すので、別のプロセスからも再利用可）。
+    """
+
+    def __init__(self, arrays, backend='shm', directory=MEMMAP_DIR):
+        if backend not in ('shm', 'memmap'):
+            raise ValueError(f"backend は 'shm' か 'memmap' です: {backend}")
+        self.backend = backend
+        self.specs = {}
+        self.arrays = {}
+        self._blocks = []
+        if backend == 'memmap':
+            os.makedirs(directory, exist_ok=True)
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            if array.dtype.hasobject:
+                raise TypeError(f"{name}: object 型の配列は共有できません（固定長文字列などに変換してください）。")
+            if backend == 'shm':
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+                view[...] = array
+                self._blocks.append(shm)
+                location = shm.name
+            else:
+                location = os.path.join(directory, f'{name}.npy')
+                np.save(location, array)
+                view = np.load(location, mmap_mode='r')
+            view.flags.writeable = False
+            self.arrays[name] = view
+            self.specs[name] = (backend, location, array.shape, array.dtype.str)
+
+    @property
+    def nbytes(self):
+        return sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, _, shape, dtype in self.specs.values())
+
+    def close(self):
+        self.arrays = {}
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---- ワーカー側 ----
+
+_attached = {'arrays': None, 'handles': []}
+
+
+def attach(specs):
+    """specs（DataPlane.specs）から読み取り専用のビューの辞書を作成（コピーなし）"""
+    arrays = {}
+    handles = []
+    for name, (backend, location, shape, dtype) in specs.items():
+        if backend == 'shm':
+            shm = shared_memory.SharedMemory(name=location)
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            handles.append(shm)                # ビューを使う間は接続を保持
+        else:
+            view = np.load(location, mmap_mode='r')
+        view.flags.writeable = False
+        arrays[name] = view
+    return arrays, handles
+
+
+def _initialize(specs):
+    _attached['arrays'], _attached['handles'] = attach(specs)
+
+
+def _call(args):
+    func, task = args
+    return func(_attached['arrays'], task)
+
+
+class WorkerPool:
+    """
+    DataPlane の配列に接続したワーカーのプール
+
+    map・imap_unordered には func(arrays, task) の形の関数（モジュールの最上位で定義、pickle 可能）を渡します。
+    タスクと戻り値だけがプロセス間で受け渡されます。
+    workers: プロセス数（None なら CPU 数、1 ならプールを作らずにこのプロセスで実行）
+    """
+
+    def __init__(self, plane, workers=None):
+        self.plane = plane
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self._pool = Pool(self.workers, initializer=_initialize, initargs=(self.plane.specs,))
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            if exc[0] is not None:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def map(self, func, tasks):
+        return list(self.imap(func, tasks))
+
+    def imap(self, func, tasks):
+        """結果をタスクの順に返す"""
+        if self._pool is None:
+            return (func(self.plane.arrays, task) for task in tasks)
+        return self._pool.imap(_call, ((func, task) for task in tasks))
+
+    def imap_unordered(self, func, tasks):
+        """結果を終わった順に返す（タスクの識別子は戻り値に含めること）"""
+        if self._pool is None:
+            return (func(self.plane.arrays, task) for task in tasks)
+        return self._pool.imap_unordered(_call, ((func, task) for task in tasks))
@@ -0,0 +1,297 @@
+"""
+需要関数の計画行列（説明変数・被説明変数）の作成
+
+01_estimate_demand_function_annual_level_model.py と同じ手順で年次データを読み込み、
+ln(Q) = C + α×ln(GDP) + β×ln(P_relative) + γ×ln(Tax_rate) + δ×ダミー + ε
+の説明変数行列 X（定数項つき）と被説明変数 y を作成します。
+01以外の推定スクリプトはここから同じデータを受け取ります。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from lib.price_decomposition import to_datetime64
+from lib.structural_break import break_dummies
+
+ANNUAL_DATA_FILE = 'analysis/demand_regression_data_annual_log_transformed.csv'
+QUARTERLY_DATA_FILE = 'demand_regression_data_raw.csv'
+LOG_TRANSFORMED_FILE = 'analysis/demand_regression_data_log_transformed.csv'   # 00_prepare_log_transformed_data.py の出力
+MONTHLY_DATA_FILE = 'demand_regression_data_monthly.csv'     # 08_build_frequency_data.py の出力
+FREQUENCY_DATA_FILES = {'monthly': MONTHLY_DATA_FILE, 'quarterly': QUARTERLY_DATA_FILE}
+SEASONAL_PERIODS = {'monthly': ('M', 1), 'quarterly': ('Q', 3)}   # 季節ダミーの接頭辞, 期間の月数
+DUMMY_CANDIDATES = ['D2008', 'D2020', 'D2009']
+EXCLUDED_YEARS = ('2025',)  # GDPが異常に小さいため除外（01と同じ）
+
+
+def load_annual_design(data_file=ANNUAL_DATA_FILE, exclude_years=EXCLUDED_YEARS, dummy_vars=None,
+                       break_dates=None):
+    """
+    01と同じ年次データ・レベルモデルの計画行列を作成
+
+    break_dates: 構造変化の時点（例: ['2009']）。指定すると水準シフトのダミー変数
+        （列名 B<年>、lib/structural_break.py の break_dummies）を追加します。
+
+    戻り値: 辞書
+        X: 定数項つき説明変数（列名: const, ln_GDP, ln_P, ln_Tax_rate, ダミー）
+        y: ln_Q
+        data: 推定に使用した行の元データ（Year, Q, P などを含む）
+        dummy_vars: 使用したダミー変数
+        price_col / ln_price_col: 使用した価格変数（相対価格があれば相対価格）
+        data_file: 読み込んだファイル
+    """
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(
+            f"{data_file} が見つかりません。先に 07_prepare_annual_log_transformed_data.py を実行してください。"
+        )
+
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    design = annual_design(df, exclude_years=exclude_years, dummy_vars=dummy_vars, break_dates=break_dates)
+    design['data_file'] = data_file
+    return design
+
+
+def annual_design(df, exclude_years=EXCLUDED_YEARS, dummy_vars=None, break_dates=None):
+    """
+    年次データ（07の出力と同じ列）の DataFrame から計画行列を作成
+
+    リアルタイム推定（lib/vintage_store.py）のように、ファイルを経由しないデータに使います。
+    戻り値は load_annual_design() と同じ形式の辞書（data_file は None）です。
+    """
+    df = df.copy()
+    df['Year'] = df['Year'].astype(str)
+
+    if 'P_relative' in df.columns and 'ln_P_relative' not in df.columns:
+        df['ln_P_relative'] = np.log(df['P_relative'])
+
+    use_relative_price = 'P_relative' in df.columns and df['P_relative'].notna().any()
+    if use_relative_price:
+        price_col, ln_price_col = 'P_relative', 'ln_P_relative'
+    else:
+        price_col, ln_price_col = 'P (yen/liter)', 'ln_P'
+
+    if dummy_vars is None:
+        dummy_vars = [d for d in DUMMY_CANDIDATES if d in df.columns]
+
+    if break_dates:
+        breaks = break_dummies(df['Year'], break_dates)
+        df = pd.concat([df, breaks.set_axis(df.index)], axis=1)
+        dummy_vars = list(dummy_vars) + list(breaks.columns)
+
+    df_complete = df[
+        df['Q (liters)'].notna() &
+        df[price_col].notna() &
+        df['Tax_rate (%)'].notna() &
+        df['GDP (trillion yen)'].notna() &
+        df['ln_Q'].notna() &
+        df[ln_price_col].notna() &
+        df['ln_GDP'].notna() &
+        df['ln_Tax_rate'].notna()
+    ].copy()
+    df_complete = df_complete[~df_complete['Year'].isin(exclude_years)].copy()
+
+    X = df_complete[['ln_GDP', ln_price_col, 'ln_Tax_rate'] + dummy_vars].copy()
+    X.columns = ['ln_GDP', 'ln_P', 'ln_Tax_rate'] + dummy_vars
+    y = df_complete['ln_Q'].copy()
+
+    valid_mask = X.notna().all(axis=1) & y.notna()
+    X = X[valid_mask]
+    y = y[valid_mask]
+    X.insert(0, 'const', 1.0)
+
+    return {
+        'X': X,
+        'y': y,
+        'data': df_complete.loc[y.index],
+        'dummy_vars': dummy_vars,
+        'price_col': price_col,
+        'ln_price_col': ln_price_col,
+        'data_file': None,
+    }
+
+
+def load_quarterly_design(data_file=QUARTERLY_DATA_FILE, seasonal=True):
+    """
+    四半期データの計画行列を作成（ダミー変数なし、季節ダミー Q2〜Q4 つき）
+
+    06で年次に集約する前の四半期データ（2007Q1〜）を対数変換して使用します。
+    戻り値は load_annual_design() と同じ形式の辞書です。
+    """
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"{data_file} が見つかりません。")
+
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    df['Year'] = df['Year'].astype(str)
+
+    use_relative_price = 'P_relative' in df.columns and df['P_relative'].notna().any()
+    price_col = 'P_relative' if use_relative_price else 'P (yen/liter)'
+    columns = ['Q (liters)', price_col, 'Tax_rate (%)', 'GDP (trillion yen)']
+    df_complete = df[(df[columns] > 0).all(axis=1)].copy()
+
+    df_complete['ln_Q'] = np.log(df_complete['Q (liters)'])
+    df_complete['ln_P'] = np.log(df_complete['P (yen/liter)'])
+    df_complete['ln_GDP'] = np.log(df_complete['GDP (trillion yen)'])
+    df_complete['ln_Tax_rate'] = np.log(df_complete['Tax_rate (%)'])
+    ln_price_col = 'ln_P'
+    if use_relative_price:
+        df_complete['ln_P_relative'] = np.log(df_complete['P_relative'])
+        ln_price_col = 'ln_P_relative'
+
+    X = df_complete[['ln_GDP', ln_price_col, 'ln_Tax_rate']].copy()
+    X.columns = ['ln_GDP', 'ln_P', 'ln_Tax_rate']
+    seasonal_vars = []
+    if seasonal:
+        quarter = df_complete['Year'].str[-1]
+        for q in ['2', '3', '4']:
+            X[f'Q{q}'] = (quarter == q).astype(float)
+            seasonal_vars.append(f'Q{q}')
+    X.insert(0, 'const', 1.0)
+
+    return {
+        'X': X,
+        'y': df_complete['ln_Q'].copy(),
+        'data': df_complete,
+        'dummy_vars': seasonal_vars,
+        'price_col': price_col,
+        'ln_price_col': ln_price_col,
+        'data_file': data_file,
+    }
+
+
+def load_difference_design(data_file=LOG_TRANSFORMED_FILE, seasonal=True, relative_price=True):
+    """
+    四半期の対数差分モデルの計画行列
+
+        Δln Q = c + α×Δln GDP + β×Δln P + γ×Δln Tax_rate (+ 季節ダミー Q2〜Q4) + ε
+
+    00_prepare_log_transformed_data.py が計算した Δln_Q・Δln_GDP・Δln_Tax_rate を使います。
+    価格は relative_price なら相対価格の差分（ln_P_relative から計算、01と同じ）、そうでなければ Δln_P。
+    X の列名はレベルモデルと同じ（const, ln_GDP, ln_P, ln_Tax_rate）にしてあり、係数は同じく弾力性です。
+    戻り値は load_annual_design() と同じ形式の辞書です。
+    """
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(
+            f"{data_file} が見つかりません。先に 00_prepare_log_transformed_data.py を実行してください。"
+        )
+
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    df['Year'] = df['Year'].astype(str)
+    df = df.sort_values('Year').reset_index(drop=True)
+
+    use_relative_price = relative_price and 'ln_P_relative' in df.columns and df['ln_P_relative'].notna().any()
+    if use_relative_price:
+        price_col, ln_price_col = 'P_relative', 'ln_P_relative'
+        df['Δln_P_relative'] = df['ln_P_relative'].diff()
+    else:
+        price_col, ln_price_col = 'P (yen/liter)', 'ln_P'
+
+    columns = ['Δln_Q', 'Δln_GDP', f'Δ{ln_price_col}', 'Δln_Tax_rate']
+    df_complete = df[df[columns].notna().all(axis=1)].copy()
+
+    X = df_complete[['Δln_GDP', f'Δ{ln_price_col}', 'Δln_Tax_rate']].copy()
+    X.columns = ['ln_GDP', 'ln_P', 'ln_Tax_rate']
+    seasonal_vars = []
+    if seasonal:
+        quarter = df_complete['Year'].str[-1]
+        for q in ['2', '3', '4']:
+            X[f'Q{q}'] = (quarter == q).astype(float)
+            seasonal_vars.append(f'Q{q}')
+    X.insert(0, 'const', 1.0)
+
+    return {
+        'X': X,
+        'y': df_complete['Δln_Q'].copy(),
+        'data': df_complete,
+        'dummy_vars': seasonal_vars,
+        'price_col': price_col,
+        'ln_price_col': ln_price_col,
+        'data_file': data_file,
+    }
+
+
+def load_frequency_design(frequency='monthly', data_file=None, seasonal=True, difference=False, relative_price=True):
+    """
+    月次・四半期のデータ（demand_regression_data_raw.csv と同じ列）の計画行列
+
+        difference=False: ln Q = c + α×ln GDP + β×ln P + γ×ln Tax_rate (+ 季節ダミー) + ε
+        difference=True : 同じ式の対数差分（前の期間が抜けている期間は除く）
+
+    季節ダミーは月次が M2〜M12、四半期が Q2〜Q4。月次のデータは 08_build_frequency_data.py が
+    元の頻度のデータから作成します（lib/frequency.py）。X の列名は他のモデルと同じです。
+    戻り値は load_annual_design() と同じ形式の辞書です。
+    """
+    data_file = data_file or FREQUENCY_DATA_FILES[frequency]
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(
+            f"{data_file} が見つかりません。先に 08_build_frequency_data.py --frequency {frequency} を実行してください。"
+        )
+    letter, step = SEASONAL_PERIODS[frequency]
+
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    df['Year'] = df['Year'].astype(str)
+    months = to_datetime64(df['Year'].to_numpy()).astype('datetime64[M]').astype(np.int64)
+    order = np.argsort(months, kind='stable')
+    df, months = df.iloc[order].reset_index(drop=True), months[order]
+
+    use_relative_price = relative_price and 'P_relative' in df.columns and df['P_relative'].notna().any()
+    price_col, ln_price_col = ('P_relative', 'ln_P_relative') if use_relative_price else ('P (yen/liter)', 'ln_P')
+    levels = {'ln_Q': 'Q (liters)', 'ln_P': 'P (yen/liter)', 'ln_GDP': 'GDP (trillion yen)',
+              'ln_Tax_rate': 'Tax_rate (%)', 'ln_P_relative': 'P_relative'}
+    for name, column in levels.items():
+        if column in df.columns:
+            values = df[column].to_numpy(dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                df[name] = np.where(values > 0, np.log(values), np.nan)
+
+    columns = ['ln_Q', 'ln_GDP', ln_price_col, 'ln_Tax_rate']
+    if difference:
+        consecutive = np.r_[False, np.diff(months) == step]
+        for column in columns:
+            df[f'Δ{column}'] = np.where(consecutive, df[column].diff(), np.nan)
+        columns = [f'Δ{column}' for column in columns]
+    complete = df[columns].notna().all(axis=1).to_numpy()
+    df_complete = df[complete].copy()
+
+    X = df_complete[columns[1:]].copy()
+    X.columns = ['ln_GDP', 'ln_P', 'ln_Tax_rate']
+    seasonal_vars = []
+    if seasonal:
+        season = months[complete] % 12 // step + 1
+        for s in range(2, 12 // step + 1):
+            X[f'{letter}{s}'] = (season == s).astype(float)
+            seasonal_vars.append(f'{letter}{s}')
+    X.insert(0, 'const', 1.0)
+
+    return {
+        'X': X,
+        'y': df_complete[columns[0]].copy(),
+        'data': df_complete,
+        'dummy_vars': seasonal_vars,
+        'price_col': price_col,
+        'ln_price_col': ln_price_col,
+        'data_file': data_file,
+    }
+
+
+def coefficients_json(params, model_type, rsquared=None, rsquared_adj=None, f_pvalue=None,
+                      pvalues=None, dummy_vars=(), **extra):
+    """01_coefficients_annual_level_model.json と同じ形式の辞書を作成"""
+    def _value(v):
+        return None if v is None or (isinstance(v, float) and np.isnan(v)) else float(v)
+
+    pvalues = pvalues if pvalues is not None else {}
+    result = {
+        'alpha': float(params['ln_GDP']),
+        'beta': float(params['ln_P']),
+        'gamma': float(params['ln_Tax_rate']),
+        'const': float(params['const']),
+        'rsquared': _value(rsquared),
+        'rsquared_adj': _value(rsquared_adj),
+        'f_pvalue': _value(f_pvalue),
+        'model_type': model_type,
+        'dummy_variables': {d: float(params[d]) for d in dummy_vars},
+        'dummy_pvalues': {d: _value(pvalues.get(d)) for d in dummy_vars},
+    }
+    result.update(extra)
+    return result
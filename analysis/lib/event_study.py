@@ -0,0 +1,266 @@
+"""
+税率の変更の前後の週次価格によるイベントスタディ（税の転嫁率）
+
+税率表（TaxSchedule）から従量税・消費税率が変わった日を全て取り出し、週次の地域別価格で
+    異常な変化  AR_r(k) = (P_r(e+k) − P_r(e−1)) − (k+1) m_r
+    予測される変化 ΔP*_r = 完全に転嫁されたときの価格 − P_r(e−1)（本体価格は変更前の週の値で固定）
+    転嫁率      AR_r(k) / ΔP*_r
+を求めます。e は変更日以降の最初の調査週、m_r は推定期間（変更の gap 週前までの est_weeks 週）の平均の週次の変化です。
+
+- 推定期間が前の変更の影響の期間（変更後 post 週まで）と重なるときは、前の変更の推定期間を使います
+  （2008年4月の暫定税率失効と5月の復活など）。変更後の窓は次の変更の前の週で打ち切ります。
+- 検定は日付の並べ替え（permutation）で、税率の変更から十分離れた全ての週（プール）を偽の変更日とした
+  AR の分布と比べます。プールの全ての週の AR は添字の配列で一度に計算するので、
+  イベントごとの p値は並べ替えの分布を全て数え上げた正確な値です。
+- 同じ種類の変更（消費税・従量税）をまとめた転嫁率 Σ AR·ΔP* / Σ ΔP*² は、プールから偽の変更日の組を
+  n_perm 回抽出して (n_perm, 変更の数) の添字でまとめて計算した分布と比べます。
+- プラセボ: 実際の変更日の1年前・1年後（±52週）を偽の変更日として同じ計算をします（転嫁率は0に近いはず）。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from lib.data_plane import load_price_panel
+from lib.price_decomposition import CHANGE_LOG_FILE, TaxSchedule, base_price, consumer_price, to_datetime64
+
+NATIONAL = '全国'
+HORIZONS = [1, 2, 4, 8]          # 変更後の週数（1 は変更日以降の最初の調査週）
+PATH_OFFSETS = np.arange(-8, 13)  # 図のためのイベント時間（k = −8..12）
+
+
+def tax_events(source='change_log'):
+    """
+    税率の変更の一覧（従量税・消費税率のどちらかが変わった日）
+
+    source: 'change_log'（制度変更のメモ、月単位）または 'quarterly_table'（四半期ごとの税率表、四半期の初日）
+    戻り値: DataFrame（Event_Date, Label, Kind, Specific_Tax_Before/After, VAT_Before/After）
+    """
+    schedule = TaxSchedule.from_change_log() if source == 'change_log' else TaxSchedule.from_quarterly_table()
+    labels = {}
+    if source == 'change_log' and os.path.exists(CHANGE_LOG_FILE):
+        memo = pd.read_csv(CHANGE_LOG_FILE, encoding='utf-8-sig')
+        memo = memo[memo['年次'].astype(str).str.match(r'^\d{4}年')]
+        labels = dict(zip(to_datetime64(memo['年次'].to_numpy()), memo['制度変更']))
+    t, r = schedule.specific_tax, schedule.vat_rate
+    changed = np.flatnonzero((np.diff(t) != 0) | (np.diff(r) != 0)) + 1
+    rows = []
+    for i in changed:
+        kind = 'consumption_tax' if r[i] != r[i - 1] else 'specific_tax'
+        date = schedule.start[i]
+        rows.append({
+            'Event_Date': date,
+            'Label': labels.get(date, f'{str(date)[:7]} 税率変更'),
+            'Kind': kind,
+            'Specific_Tax_Before': t[i - 1], 'Specific_Tax_After': t[i],
+            'VAT_Before': r[i - 1], 'VAT_After': r[i],
+        })
+    return pd.DataFrame(rows)
+
+
+def predicted_change(price_before, events, tax_on_tax=True):
+    """完全に転嫁されたときの価格の変化 (E, R)（本体価格は変更前の週の値で固定）"""
+    t0 = events['Specific_Tax_Before'].to_numpy()[:, None]
+    t1 = events['Specific_Tax_After'].to_numpy()[:, None]
+    r0 = events['VAT_Before'].to_numpy()[:, None]
+    r1 = events['VAT_After'].to_numpy()[:, None]
+    base = base_price(price_before, t0, r0, tax_on_tax)
+    return consumer_price(base, t1, r1, tax_on_tax) - price_before
+
+
+def abnormal_changes(prices, anchor, est_start, est_end, offsets, cutoff=None):
+    """
+    偽の変更日も含めた異常な変化をまとめて計算
+
+    prices: (T, R)、anchor・est_start・est_end: (N,) の週の位置（anchor は変更後の最初の週）
+    offsets: (K,) のイベント時間、cutoff: (N,) この位置以降は NaN（次の変更）
+    戻り値: (N, K, R)
+    """
+    T = len(prices)
+    anchor = np.asarray(anchor)
+    drift = (prices[est_end] - prices[est_start]) / (est_end - est_start)[:, None]       # (N, R)
+    position = anchor[:, None] + np.asarray(offsets)[None]                                  # (N, K)
+    inside = (position >= 0) & (position < T)
+    if cutoff is not None:
+        inside &= position < np.asarray(cutoff)[:, None]
+    change = prices[np.clip(position, 0, T - 1)] - prices[anchor - 1][:, None]            # (N, K, R)
+    out = change - (np.asarray(offsets)[None, :, None] + 1) * drift[:, None]
+    return np.where(inside[..., None], out, np.nan)
+
+
+def estimation_windows(anchors, gap, est_weeks, post):
+    """変更ごとの推定期間 (start, end)。前の変更の影響の期間と重なるときは前の推定期間を使う"""
+    starts, ends = [], []
+    for i, e in enumerate(anchors):
+        end = e - 1 - gap
+        start = end - est_weeks
+        if i > 0 and anchors[i - 1] + post > start:
+            start, end = starts[-1], ends[-1]
+        starts.append(start)
+        ends.append(end)
+    return np.array(starts), np.array(ends)
+
+
+def placebo_pool(T, anchors, gap, est_weeks, post):
+    """偽の変更日にできる週: 推定期間から変更後 post 週までの窓に実際の変更の影響の期間がかからない週"""
+    d = np.arange(1 + gap + est_weeks, T - post)
+    ok = np.ones(len(d), dtype=bool)
+    for e in anchors:
+        ok &= (e + post < d - 1 - gap - est_weeks) | (e > d + post)
+    return d[ok]
+
+
+def _nanmean(a, axis):
+    """NaN を除いた平均（全て NaN なら NaN）"""
+    count = np.isfinite(a).sum(axis=axis)
+    total = np.nansum(a, axis=axis)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def pooled_pass_through(abnormal, predicted):
+    """
+    複数の変更・地域をまとめた転嫁率 Σ AR·ΔP* / Σ ΔP*²（原点を通る回帰の傾き）
+
+    abnormal・predicted: (..., 変更, 地域)。小さな変更の転嫁率が平均を振り回さないよう、ΔP*² で重みづけします。
+    """
+    finite = np.isfinite(abnormal) & np.isfinite(predicted)
+    num = np.where(finite, abnormal * predicted, 0.0).sum(axis=(-2, -1))
+    den = np.where(finite, predicted ** 2, 0.0).sum(axis=(-2, -1))
+    return np.where(den > 0, num / np.where(den > 0, den, 1.0), np.nan)
+
+
+def _p_value(observed, null):
+    """両側の並べ替えの p値。observed: (..., R)、null: (M, ..., R)（NaN は数えない）"""
+    finite = np.isfinite(null)
+    exceed = (np.abs(null) >= np.abs(observed)[None]) & finite
+    p = (1 + exceed.sum(axis=0)) / (1 + finite.sum(axis=0))
+    return np.where(np.isfinite(observed), p, np.nan)
+
+
+def run_event_study(source='change_log', post=8, gap=4, est_weeks=26, n_perm=5000, seed=None, data_file=None):
+    """
+    全ての税率の変更について、全国・地方局・都道府県の転嫁率と並べ替え検定
+
+    戻り値: 辞書
+        events: 変更（とプラセボ）の一覧、results: 変更×地域×週数の転嫁率・p値、
+        paths: 変更×イベント時間の転嫁率（全国と都道府県の平均・分布）、pooled: 種類ごとにまとめた転嫁率の検定
+        regions・pool_size
+    """
+    dates, regions, prices = load_price_panel() if data_file is None else load_price_panel(data_file)
+    T = len(dates)
+    prefectures = ~np.char.endswith(regions.astype(str), '局') & (regions != NATIONAL)
+    national = list(regions).index(NATIONAL)
+
+    events = tax_events(source)
+    events['Anchor'] = np.searchsorted(dates, events['Event_Date'].to_numpy().astype('datetime64[D]'))
+    first = 1 + gap + est_weeks
+    events = events[(events['Anchor'] >= first) & (events['Anchor'] < T)].reset_index(drop=True)
+    events['Type'] = 'tax'
+    anchors = events['Anchor'].to_numpy()
+    est_start, est_end = estimation_windows(anchors, gap, est_weeks, post)
+    cutoff = np.r_[anchors[1:], T]
+
+    # プラセボ（±52週、実際の変更の窓と重ならないもの）
+    pool = placebo_pool(T, anchors, gap, est_weeks, post)
+    placebo = []
+    for i, event in events.iterrows():
+        for shift in [-52, 52]:
+            if anchors[i] + shift in pool:
+                row = event.copy()
+                row['Anchor'] = anchors[i] + shift
+                row['Type'] = f'placebo_{shift:+d}w'
+                placebo.append(row)
+    placebo = pd.DataFrame(placebo)
+    p_anchor = placebo['Anchor'].to_numpy() if len(placebo) else np.array([], dtype=int)
+    all_events = pd.concat([events, placebo], ignore_index=True)
+    all_anchor = all_events['Anchor'].to_numpy()
+    all_start = np.r_[est_start, p_anchor - 1 - gap - est_weeks].astype(int)
+    all_end = np.r_[est_end, p_anchor - 1 - gap].astype(int)
+    all_cutoff = np.r_[cutoff, np.full(len(p_anchor), T)]
+    all_events['Week0_Date'] = dates[all_anchor]
+    all_events['Estimation_Start'] = dates[all_start]
+    all_events['Estimation_End'] = dates[all_end]
+
+    horizons = np.array(HORIZONS)
+    offsets = horizons - 1
+    predicted = predicted_change(prices[all_anchor - 1], all_events)                          # (E, R)
+    observed = abnormal_changes(prices, all_anchor, all_start, all_end, offsets, all_cutoff)  # (E, H, R)
+    null = abnormal_changes(prices, pool, pool - 1 - gap - est_weeks, pool - 1 - gap, offsets)  # (M, H, R)
+
+    # 変更ごと・地域ごとの転嫁率と p値（プールの全ての週との比較）
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = observed / predicted[:, None, :]
+    p_region = _p_value(observed, null[:, None])                                             # (E, H, R)
+    pref_obs = _nanmean(np.where(prefectures, rate, np.nan), axis=-1)                        # (E, H)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pref_null = _nanmean(np.where(prefectures, null[:, None] / predicted[None, :, None, :], np.nan), axis=-1)
+    p_pref = _p_value(pref_obs, pref_null)
+
+    E, H, R = observed.shape
+    results = pd.DataFrame({
+        'Event_Date': np.repeat(all_events['Event_Date'].to_numpy(), H * R),
+        'Type': np.repeat(all_events['Type'].to_numpy(), H * R),
+        'Kind': np.repeat(all_events['Kind'].to_numpy(), H * R),
+        'Region': np.tile(regions, E * H),
+        'Weeks': np.tile(np.repeat(horizons, R), E),
+        'Abnormal_Change': observed.ravel(),
+        'Predicted_Change': np.repeat(predicted[:, None, :], H, axis=1).ravel(),
+        'Pass_Through': rate.ravel(),
+        'p_value': p_region.ravel(),
+    })
+    summary = all_events[['Event_Date', 'Label', 'Kind', 'Type', 'Week0_Date', 'Estimation_Start',
+                          'Estimation_End']].copy()
+    summary['Predicted_Change_National'] = predicted[:, national]
+    for j, h in enumerate(horizons):
+        summary[f'Pass_Through_National_{h}w'] = rate[:, j, national]
+        summary[f'p_National_{h}w'] = p_region[:, j, national]
+        summary[f'Pass_Through_Prefecture_Mean_{h}w'] = pref_obs[:, j]
+        summary[f'p_Prefecture_Mean_{h}w'] = p_pref[:, j]
+        summary[f'Prefectures_Significant_{h}w'] = ((p_region[:, j] < 0.05) & prefectures).sum(axis=1)
+    summary['Prefectures_Observed'] = (np.isfinite(rate[:, 0]) & prefectures).sum(axis=1)
+
+    # イベント時間ごとの転嫁率（図）
+    path = abnormal_changes(prices, all_anchor, all_start, all_end, PATH_OFFSETS, all_cutoff)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        path_rate = path / predicted[:, None, :]
+    pref_path = path_rate[..., prefectures]
+    has_pref = np.isfinite(pref_path).any(axis=-1)
+    low, mean, high = (np.full(has_pref.shape, np.nan) for _ in range(3))
+    low[has_pref] = np.nanquantile(pref_path[has_pref], 0.1, axis=-1)
+    mean[has_pref] = _nanmean(pref_path[has_pref], axis=-1)
+    high[has_pref] = np.nanquantile(pref_path[has_pref], 0.9, axis=-1)
+    K = len(PATH_OFFSETS)
+    paths = pd.DataFrame({
+        'Event_Date': np.repeat(all_events['Event_Date'].to_numpy(), K),
+        'Type': np.repeat(all_events['Type'].to_numpy(), K),
+        'Event_Week': np.tile(PATH_OFFSETS, E),
+        'Pass_Through_National': path_rate[:, :, national].ravel(),
+        'Pass_Through_Prefecture_Mean': mean.ravel(),
+        'Pass_Through_Prefecture_P10': low.ravel(),
+        'Pass_Through_Prefecture_P90': high.ravel(),
+    })
+
+    # 種類ごとにまとめた転嫁率: 偽の変更日の組を n_perm 回抽出（(n_perm, 変更の数) の添字で一度に計算）
+    rng = np.random.default_rng(seed)
+    pooled = []
+    for kind in events['Kind'].unique():
+        members = np.flatnonzero((all_events['Type'] == 'tax') & (all_events['Kind'] == kind))
+        for label, columns in [('National', [national]), ('Prefectures', np.flatnonzero(prefectures))]:
+            # 偽の変更日はその地域の価格がある週だけ（都道府県は2004年以降）
+            usable = np.flatnonzero(np.isfinite(null[..., columns]).all(axis=(1, 2)))
+            draws = usable[rng.integers(0, len(usable), size=(n_perm, len(members)))]
+            pred = predicted[members][:, columns]                                               # (n_e, c)
+            obs = observed[members][..., columns].transpose(1, 0, 2)                            # (H, n_e, c)
+            perm = null[draws][..., columns].transpose(0, 2, 1, 3)                              # (n_perm, H, n_e, c)
+            perm = np.where(np.isfinite(obs)[None], perm, np.nan)          # 実際に観測できた変更・地域だけ
+            stat = pooled_pass_through(obs, pred[None])
+            perm_stat = pooled_pass_through(perm, pred[None, None])
+            p = _p_value(stat, perm_stat)
+            for j, h in enumerate(horizons):
+                pooled.append({'Kind': kind, 'Level': label, 'Events': int(np.isfinite(obs[j]).any(axis=-1).sum()),
+                               'Weeks': h, 'Pass_Through': stat[j], 'p_value': p[j],
+                               'Null_P05': np.nanquantile(perm_stat[:, j], 0.05),
+                               'Null_P95': np.nanquantile(perm_stat[:, j], 0.95)})
+    return {'events': summary, 'results': results, 'paths': paths, 'pooled': pd.DataFrame(pooled),
+            'regions': regions, 'pool_size': len(pool), 'n_perm': n_perm}
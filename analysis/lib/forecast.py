@@ -0,0 +1,325 @@
+"""
+ガソリン需要・税収・消費者余剰の予測（シナリオ別のシミュレーション）
+
+長期関係は01の需要関数 LR = α ln(GDP) + β ln(P_relative) + γ ln(Tax_rate) を使い、
+四半期データで誤差修正モデル（ECM）を推定します。
+    Δln Q_t = c + 季節ダミー + λ (ln Q_{t−1} − LR_{t−1}) + b Δln P_relative_t + ε_t
+本体価格（税抜き）は対数差分の AR(1)
+    d_t = μ + ρ (d_{t−1} − μ) + u_t,  d_t = Δln(本体価格)
+で動かし、税込み価格は税率表（lib/price_decomposition.py の TaxSchedule）から作ります。
+原油価格の系列はないため、原油価格のシナリオは本体価格の伸び率（μ）と初期の水準ショックで与えます。
+
+シナリオ（GDP成長率・CPI上昇率・本体価格の伸び率・税制）ごとに、
+ECM の係数（推定値の分布から抽出）・残差・本体価格のショックを n_paths 本の経路として
+配列のまま同時に計算し（ループは予測期間の四半期だけ）、分位点から予測区間を作ります。
+結果はシナリオのハッシュをキーとして推定結果ストア（lib/results_store.py）に保存するので、
+同じシナリオの再計算は読み込むだけで済みます。
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+
+from lib.consumer_surplus import cs_change
+from lib.design import QUARTERLY_DATA_FILE, load_quarterly_design
+from lib.price_decomposition import (
+    CHANGE_LOG_FILE, QUARTERLY_TABLE_FILE, TaxSchedule, consumer_price, decompose, to_datetime64
+)
+from lib.results_store import file_hash, make_key
+
+MODEL_TYPE = 'forecast_quarterly_ecm'
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+VARIABLES = ['Q', 'P', 'Base_Price', 'Excise_Revenue', 'VAT_Revenue', 'CS_Change', 'CS_Cumulative']
+
+# シナリオの既定値（年率）。tax は TaxSchedule の作り方と amend() の引数のリスト
+DEFAULT_SCENARIO = {
+    'gdp_growth': 0.01,
+    'cpi_inflation': 0.02,
+    'base_price_growth': None,      # None なら本体価格の過去の平均的な伸び
+    'base_price_shock': 0.0,        # 予測の最初の四半期の本体価格の水準変化（例: 0.2 で +20%）
+    'tax': {'source': 'quarterly_table', 'amend': []},
+}
+
+
+def make_scenario(**overrides):
+    """既定値にシナリオの値を上書きした辞書"""
+    scenario = copy.deepcopy(DEFAULT_SCENARIO)
+    for name, value in overrides.items():
+        if name not in scenario:
+            raise KeyError(f'不明なシナリオの項目: {name}')
+        scenario[name] = value
+    return scenario
+
+
+def tax_schedule(tax, schedules=None):
+    """
+    シナリオの tax（{'source': 'quarterly_table' | 'change_log', 'amend': [...]}）から TaxSchedule
+
+    schedules: 読み込み済みの {source: TaxSchedule}（あればファイルを読まずに使う）
+    """
+    source = tax.get('source', 'quarterly_table')
+    if schedules is not None and source in schedules:
+        schedule = schedules[source]
+    elif source == 'change_log':
+        schedule = TaxSchedule.from_change_log()
+    else:
+        schedule = TaxSchedule.from_quarterly_table()
+    for kwargs in tax.get('amend', []):
+        schedule = schedule.amend(**kwargs)
+    return schedule
+
+
+def future_periods(last_period, horizon):
+    """'2025Q1' の次の四半期から horizon 期分のラベル"""
+    index = pd.period_range(pd.Period(last_period, freq='Q') + 1, periods=horizon, freq='Q')
+    return [str(p) for p in index]
+
+
+def load_history(data_file=QUARTERLY_DATA_FILE):
+    """
+    予測に使う四半期データ（数量のある期間）と、本体価格の系列（価格のある全期間）
+
+    戻り値: 辞書
+        data: 数量・価格・GDP・CPI・税率のそろった期間の DataFrame（Period, Q, P, GDP, CPI, Tax_rate, Base_Price など）
+        base_price: 価格のある全期間の本体価格（Series、インデックスは Period）
+    """
+    design = load_quarterly_design(data_file)
+    df = design['data']
+    data = pd.DataFrame({
+        'Period': df['Year'].to_numpy(),
+        'Q': df['Q (liters)'].to_numpy(dtype=float),
+        'P': df['P (yen/liter)'].to_numpy(dtype=float),
+        'GDP': df['GDP (trillion yen)'].to_numpy(dtype=float),
+        'CPI': df['CPI'].to_numpy(dtype=float),
+        'Tax_rate': df['Tax_rate (%)'].to_numpy(dtype=float),
+    })
+
+    raw = pd.read_csv(data_file, encoding='utf-8-sig')
+    raw = raw[raw['P (yen/liter)'].notna()]
+    schedule = TaxSchedule.from_quarterly_table()
+    t, r = schedule.lookup(raw['Year'].astype(str).to_numpy())
+    base = decompose(raw['P (yen/liter)'].to_numpy(dtype=float), t, r)['base_price']
+    base_price = pd.Series(base, index=raw['Year'].astype(str).to_numpy())
+    data['Base_Price'] = base_price.reindex(data['Period']).to_numpy()
+    return {'data': data, 'base_price': base_price}
+
+
+def long_run(data, alpha, beta, gamma):
+    """01の需要関数による長期の ln Q（定数項を除く）"""
+    return (alpha * np.log(data['GDP']) + beta * np.log(data['P'] / data['CPI'])
+            + gamma * np.log(data['Tax_rate']))
+
+
+def fit_ecm(data, alpha, beta, gamma):
+    """
+    誤差修正モデルを OLS で推定
+
+    戻り値: 辞書（names, params, cov, sigma, resid, fit）
+    """
+    ln_q = np.log(data['Q'])
+    ect = ln_q - long_run(data, alpha, beta, gamma)
+    ln_p_rel = np.log(data['P'] / data['CPI'])
+    quarter = data['Period'].str[-1]
+    X = pd.DataFrame({
+        'const': 1.0,
+        **{f'Q{q}': (quarter == q).astype(float) for q in ['2', '3', '4']},
+        'ECT_lag': ect.shift(1),
+        'dln_P': ln_p_rel.diff(),
+    })
+    y = ln_q.diff()
+    valid = X.notna().all(axis=1) & y.notna()
+    fit = sm.OLS(y[valid], X[valid]).fit()
+    return {
+        'names': list(X.columns),
+        'params': fit.params.to_numpy(),
+        'cov': fit.cov_params().to_numpy(),
+        'sigma': float(np.sqrt(fit.scale)),
+        'resid': fit.resid.to_numpy(),
+        'fit': fit,
+    }
+
+
+def fit_price_ar(base_price):
+    """本体価格の対数差分の AR(1)（戻り値: mu, rho, sigma, last_diff）"""
+    d = np.diff(np.log(np.asarray(base_price, dtype=float)))
+    mu = d.mean()
+    x, y = d[:-1] - mu, d[1:] - mu
+    rho = float(x @ y / (x @ x))
+    resid = y - rho * x
+    return {'mu': float(mu), 'rho': rho, 'sigma': float(resid.std(ddof=1)), 'last_diff': float(d[-1])}
+
+
+def _seasonal_path(history, growth, horizon):
+    """前年同期の値 × (1 + 年率) で延ばした (horizon,) の経路（季節性を保つ）"""
+    values = list(np.asarray(history, dtype=float)[-4:])
+    for _ in range(horizon):
+        values.append(values[-4] * (1 + growth))
+    return np.array(values[4:])
+
+
+def simulate(history, ecm, price_ar, alpha, beta, gamma, scenario, horizon=40, n_paths=5000,
+             seed=None, parameter_uncertainty=True):
+    """
+    シナリオのもとで n_paths 本の経路を同時に計算
+
+    beta は需要曲線の価格弾力性として消費者余剰の計算にも使います。
+    戻り値: 辞書（periods と、VARIABLES の各変数の (n_paths, horizon) の配列）
+    """
+    rng = np.random.default_rng(seed)
+    data = history['data']
+    periods = future_periods(data['Period'].iloc[-1], horizon)
+    quarter = np.array([int(p[-1]) for p in periods])
+
+    gdp = _seasonal_path(data['GDP'], scenario['gdp_growth'], horizon)
+    cpi = _seasonal_path(data['CPI'], scenario['cpi_inflation'], horizon)
+    schedule = tax_schedule(scenario['tax'])
+    t, r = schedule.lookup(to_datetime64(periods))
+
+    # 本体価格: 対数差分の AR(1)
+    growth = scenario['base_price_growth']
+    mu = price_ar['mu'] if growth is None else np.log1p(growth) / 4
+    shocks = rng.standard_normal((n_paths, horizon)) * price_ar['sigma']
+    d = np.empty((n_paths, horizon))
+    prev = np.full(n_paths, price_ar['last_diff'])
+    for k in range(horizon):
+        prev = mu + price_ar['rho'] * (prev - mu) + shocks[:, k]
+        d[:, k] = prev
+    ln_base = np.log(history['base_price'].iloc[-1]) + np.log1p(scenario['base_price_shock']) + np.cumsum(d, axis=1)
+    base = np.exp(ln_base)
+
+    # 税込み価格と Tax_rate (%)（データと同じ定義: 従量税 × (1 + 消費税率) / (税込み価格 − 従量税)）
+    price = consumer_price(base, t, r)
+    tax_rate = decompose(price, t, r, tax_on_tax=False)['excise_rate'] * 100
+    ln_p_rel = np.log(price / cpi)
+
+    # ECM の係数（推定値の分布から経路ごとに抽出）
+    if parameter_uncertainty:
+        coef = rng.multivariate_normal(ecm['params'], ecm['cov'], size=n_paths)
+    else:
+        coef = np.broadcast_to(ecm['params'], (n_paths, len(ecm['params'])))
+    c = dict(zip(ecm['names'], coef.T))
+    eps = rng.standard_normal((n_paths, horizon)) * ecm['sigma']
+
+    lr = alpha * np.log(gdp) + beta * ln_p_rel + gamma * np.log(tax_rate)
+    last = data.iloc[-1]
+    ln_q_prev = np.full(n_paths, np.log(last['Q']))
+    lr_prev = np.full(n_paths, float(long_run(data.iloc[[-1]], alpha, beta, gamma).iloc[0]))
+    ln_p_prev = np.full(n_paths, np.log(last['P'] / last['CPI']))
+    ln_q = np.empty((n_paths, horizon))
+    for k in range(horizon):
+        seasonal = c[f'Q{quarter[k]}'] if quarter[k] > 1 else 0.0
+        ln_q[:, k] = (ln_q_prev + c['const'] + seasonal + c['ECT_lag'] * (ln_q_prev - lr_prev)
+                      + c['dln_P'] * (ln_p_rel[:, k] - ln_p_prev) + eps[:, k])
+        ln_q_prev, lr_prev, ln_p_prev = ln_q[:, k], lr[:, k], ln_p_rel[:, k]
+    q = np.exp(ln_q)
+
+    # 税収と消費者余剰（直前の四半期の (P, Q) を通る一定弾力性の需要曲線）
+    components = decompose(price, t, r)
+    p_prev = np.concatenate([np.full((n_paths, 1), last['P']), price[:, :-1]], axis=1)
+    q_prev = np.concatenate([np.full((n_paths, 1), last['Q']), q[:, :-1]], axis=1)
+    cs = cs_change(p_prev, price, q_prev, 'constant_elasticity', beta)
+
+    return {
+        'periods': periods,
+        'Q': q,
+        'P': price,
+        'Base_Price': base,
+        'Excise_Revenue': t * q,
+        'VAT_Revenue': components['consumption_tax'] * q,
+        'CS_Change': cs,
+        'CS_Cumulative': np.cumsum(cs, axis=1),
+    }
+
+
+def fan_chart_frame(paths, quantiles=QUANTILES):
+    """経路の配列から、期間 × 変数ごとの平均と分位点の縦長 DataFrame"""
+    frames = []
+    for name in VARIABLES:
+        values = paths[name]
+        q = np.quantile(values, quantiles, axis=0)
+        frame = pd.DataFrame({'Period': paths['periods'], 'Variable': name, 'Mean': values.mean(axis=0)})
+        for prob, row in zip(quantiles, q):
+            frame[f'q{int(round(prob * 100)):02d}'] = row
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def annual_totals(paths, quantiles=QUANTILES):
+    """年ごとの合計（数量・税収・消費者余剰）と平均価格の分位点"""
+    years = np.array([p[:4] for p in paths['periods']])
+    rows = []
+    for year in np.unique(years):
+        cols = years == year
+        if cols.sum() < 4:
+            continue
+        for name, how in [('Q', 'sum'), ('P', 'mean'), ('Excise_Revenue', 'sum'), ('VAT_Revenue', 'sum'),
+                          ('CS_Change', 'sum')]:
+            values = getattr(paths[name][:, cols], how)(axis=1)
+            row = {'Year': year, 'Variable': name, 'Mean': values.mean()}
+            for prob, value in zip(quantiles, np.quantile(values, quantiles)):
+                row[f'q{int(round(prob * 100)):02d}'] = value
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def forecast(scenario, coefficients, store=None, data_file=QUARTERLY_DATA_FILE, horizon=40,
+             n_paths=5000, seed=0, elasticity=None):
+    """
+    シナリオの予測（ストアにあれば読み込み、なければ計算して保存）
+
+    coefficients: 01の係数JSON（alpha, beta, gamma）
+    elasticity: 長期関係と消費者余剰に使う価格弾力性（省略時は β）
+    戻り値: 辞書（key, cached, fan: 四半期ごとの分位点, annual: 年ごとの分位点, ecm: ECM の要約）
+    """
+    alpha, gamma = coefficients['alpha'], coefficients['gamma']
+    beta = coefficients['beta'] if elasticity is None else elasticity
+    spec = {
+        'model': MODEL_TYPE,
+        'long_run': {'alpha': alpha, 'beta': beta, 'gamma': gamma},
+        'scenario': scenario,
+    }
+    options = {'horizon': horizon, 'n_paths': n_paths, 'seed': seed, 'quantiles': QUANTILES}
+    # データのバージョン: 四半期データと税率表（どちらかが更新されれば再計算）
+    tax_file = CHANGE_LOG_FILE if scenario['tax'].get('source') == 'change_log' else QUARTERLY_TABLE_FILE
+    data_version = f'{file_hash(data_file)}:{file_hash(tax_file)}'
+    key = make_key(data_version, spec, options)
+
+    if store is not None:
+        record = store.load(key)
+        if record is not None:
+            frame = record['frame']
+            annual = pd.DataFrame(record['arrays']['annual'], columns=record['summary']['annual_columns'])
+            annual.insert(0, 'Variable', record['arrays']['annual_variable'])
+            annual.insert(0, 'Year', record['arrays']['annual_year'])
+            return {'key': key, 'cached': True, 'fan': frame, 'annual': annual, 'ecm': record['summary']['ecm']}
+
+    history = load_history(data_file)
+    ecm = fit_ecm(history['data'], alpha, beta, gamma)
+    price_ar = fit_price_ar(history['base_price'])
+    paths = simulate(history, ecm, price_ar, alpha, beta, gamma, scenario, horizon, n_paths, seed)
+    fan = fan_chart_frame(paths)
+    annual = annual_totals(paths)
+    ecm_summary = {
+        'params': dict(zip(ecm['names'], ecm['params'].tolist())),
+        'sigma': ecm['sigma'],
+        'rsquared': float(ecm['fit'].rsquared),
+        'n_obs': int(ecm['fit'].nobs),
+        'price_ar': price_ar,
+    }
+
+    if store is not None:
+        value_columns = [c for c in annual.columns if c not in ('Year', 'Variable')]
+        store.save(
+            key, MODEL_TYPE, data_version, spec, options,
+            summary={'alpha': alpha, 'beta': beta, 'gamma': gamma, 'ecm': ecm_summary,
+                     'annual_columns': value_columns},
+            arrays={
+                'annual': annual[value_columns].to_numpy(dtype=float),
+                'annual_year': annual['Year'].to_numpy(dtype=str),
+                'annual_variable': annual['Variable'].to_numpy(dtype=str),
+            },
+            frame=fan,
+        )
+    return {'key': key, 'cached': False, 'fan': fan, 'annual': annual, 'ecm': ecm_summary}
@@ -0,0 +1,293 @@
+"""
+データの頻度（週次・月次・四半期・年次）の変換
+
+データ準備は週次の価格・月次の CPI を四半期に平均してから分析していました。ここでは各データを元の頻度の
+まま読み込み、分析の頻度へは必要なときに resample() で変換します（行ごとの関数の適用は使わず、
+期間の初日の datetime64 で一括に集計）。
+- load_weekly_price()・load_monthly_cpi()・load_monthly_sales()・load_quarterly_gdp(): 元の頻度のデータ
+- resample(): (日付, 値) を期間ごとの平均・合計・最初・最後に（期間が揃っていない期間は min_count で除外）
+- build_frame(): 指定した頻度で demand_regression_data_raw.csv と同じ列の DataFrame を作成
+  （Q は合計、価格・CPI は平均、税率は月ごとの従量税の平均から、GDP は四半期より細かい頻度では補間）
+- disaggregate_quarterly(): 四半期の合計を月次の指標で月次に分解（Chow–Lin・Fernández・Denton–Cholette、
+  lib/disaggregation.py）。build_frame(disaggregation=...) では月次の GDP と、月次の販売量のない月の Q に使います
+
+月次の販売量（石油統計の月別販売、統合.csv）は 2007年1月〜2014年3月だけなので、時間的分解を使わない場合の月次の推定はこの期間です。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from lib.cpi_contribution import CPI_MONTHLY_FILE, TOTAL, CPIMatrix
+from lib.data_plane import load_price_panel
+from lib.disaggregation import disaggregate
+from lib.design import QUARTERLY_DATA_FILE
+from lib.price_decomposition import TaxSchedule, decompose, to_datetime64
+
+MONTHLY_SALES_FILE = 'data/2007-2024ガソリン販売量/統合.csv'
+QUARTERLY_SALES_FILE = 'data/2007-2024ガソリン販売量/四半期データ_まとめ.csv'
+HEISEI = 1988                      # 平成元年 = 1989年
+MONTHS = {'monthly': 1, 'quarterly': 3, 'annual': 12}     # 期間の月数
+NATIONAL = '全国'                   # 週次の価格の全国平均の列
+
+
+def period_start(dates, frequency):
+    """日付 (N,) を期間の初日（datetime64[D]）に"""
+    dates = to_datetime64(dates)
+    if frequency == 'weekly':
+        return dates
+    months = dates.astype('datetime64[M]').astype(np.int64)
+    step = MONTHS[frequency]
+    return (months - months % step).astype('datetime64[M]').astype('datetime64[D]')
+
+
+def period_label(periods, frequency):
+    """期間の初日を '2009Q1'（四半期）・'2009-01'（月次）・'2009'（年次）・'2009-01-05'（週次）のラベルに"""
+    periods = to_datetime64(periods)
+    if frequency == 'weekly':
+        return np.datetime_as_string(periods, unit='D')
+    months = periods.astype('datetime64[M]').astype(np.int64)
+    years = (months // 12 + 1970).astype(str)
+    if frequency == 'monthly':
+        return np.char.add(np.char.add(years, '-'), np.char.zfill((months % 12 + 1).astype(str), 2))
+    if frequency == 'quarterly':
+        return np.char.add(np.char.add(years, 'Q'), (months % 12 // 3 + 1).astype(str))
+    return years
+
+
+def resample(dates, values, frequency, how='mean', min_count=1):
+    """
+    (日付 (N,), 値 (N,) または (N, K)) を期間ごとに集計
+
+    how: 'mean'・'sum'（NaN を除く）・'first'・'last'（NaN を除いた最初・最後の値）
+    min_count: 期間内の NaN でない値がこれより少ない期間は NaN（合計で欠けた月のある四半期を除くなど）
+    戻り値: (期間の初日 (P,), 集計した値 (P,) または (P, K), 期間ごとの値の数 (P,) または (P, K))
+    """
+    values = np.asarray(values, dtype=float)
+    one_dimensional = values.ndim == 1
+    values = values.reshape(len(values), -1)
+    periods, inverse = np.unique(period_start(dates, frequency), return_inverse=True)
+    observed = np.isfinite(values)
+    count = np.zeros((len(periods), values.shape[1]))
+    np.add.at(count, inverse, observed)
+    if how in ('mean', 'sum'):
+        total = np.zeros_like(count)
+        np.add.at(total, inverse, np.where(observed, values, 0.0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = total / count if how == 'mean' else total
+    elif how in ('first', 'last'):
+        order = np.arange(len(values))[:, None] * np.ones(values.shape[1], dtype=int)
+        rank = np.where(observed, order if how == 'last' else -order, np.iinfo(np.int64).min)
+        best = np.full(count.shape, np.iinfo(np.int64).min)
+        np.maximum.at(best, inverse, rank)
+        index = np.abs(np.where(best == np.iinfo(np.int64).min, 0, best))
+        out = np.take_along_axis(values, index, axis=0)
+    else:
+        raise ValueError(f"how は 'mean'・'sum'・'first'・'last' のいずれかです: {how}")
+    out = np.where(count >= min_count, out, np.nan)
+    if one_dimensional:
+        return periods, out[:, 0], count[:, 0]
+    return periods, out, count
+
+
+# ---- 元の頻度のデータ ----
+
+def load_weekly_price():
+    """週次の全国平均のレギュラーガソリン価格（調査日 (W,), 円/L (W,)）"""
+    dates, regions, prices = load_price_panel()
+    return dates, prices[:, list(regions).index(NATIONAL)]
+
+
+def load_monthly_cpi(data_file=CPI_MONTHLY_FILE):
+    """月次の CPI 総合（月の初日 (M,), 指数 (M,)）"""
+    cpi = CPIMatrix.from_file(data_file)
+    return cpi.periods.astype('datetime64[D]'), cpi.index[:, cpi.column(TOTAL)]
+
+
+def load_monthly_sales(data_file=MONTHLY_SALES_FILE):
+    """
+    月次のガソリン販売量（石油統計の月別販売、年ごとの表を貼り合わせた統合.csv）
+
+    年ごとの表（1列目の年で区切り）は前年の1〜3月を含むので、同じ月が2回ある場合は後の表（改訂後）を使います。
+    ガソリンの列は表の見出し「Gasoline」の列（見出しがない表は最初の数値の列）、月の行は「平成NN年M月」で
+    始まる区切り（空行まで）の中の月の行です。
+    戻り値: (月の初日 (M,), リットル (M,))
+    """
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"{data_file} が見つかりません。")
+    raw = pd.read_csv(data_file, header=None, dtype=str, encoding='utf-8')
+    table = pd.to_numeric(raw[0], errors='coerce').ffill()
+    values = raw.apply(lambda c: pd.to_numeric(c.str.replace(',', ''), errors='coerce')).to_numpy(dtype=float, copy=True)
+    values[:, :6] = np.nan                                   # 行番号・年月の列
+    header = (raw == 'Gasoline').to_numpy()
+    gasoline = pd.Series(np.where(header.any(axis=1), header.argmax(axis=1), np.nan)).groupby(table).transform('max')
+    numeric = np.isfinite(values)
+    column = gasoline.fillna(pd.Series(np.where(numeric.any(axis=1), numeric.argmax(axis=1), np.nan)))
+
+    label = (raw[2].fillna('') + raw[3].fillna('') + raw[4].fillna('') + raw[5].fillna('')).str.replace(r'\s', '', regex=True)
+    block = raw.isna().all(axis=1).cumsum()
+    parts = label.str.extract(r'^(?:平成(\d+)年)?(\d{1,2})月?$')
+    year = pd.to_numeric(parts[0], errors='coerce').where(label.str.contains('月')).groupby(block).transform('first')
+    rows = np.flatnonzero((year.notna() & parts[1].notna() & column.notna()).to_numpy())
+    months = (pd.to_datetime(pd.DataFrame({'year': year.iloc[rows].astype(int) + HEISEI,
+                                           'month': parts[1].iloc[rows].astype(int), 'day': 1}))
+              .to_numpy().astype('datetime64[D]'))
+    kiloliters = values[rows, column.iloc[rows].astype(int)]
+    # 後の表を優先して重複を除く
+    order = np.lexsort((-np.arange(len(months)), months))
+    months, kiloliters = months[order], kiloliters[order]
+    first = np.r_[True, months[1:] != months[:-1]]
+    return months[first], kiloliters[first] * 1000
+
+
+def load_quarterly_sales(data_file=QUARTERLY_SALES_FILE):
+    """四半期のガソリン販売量（四半期の初日 (N,), リットル (N,)）"""
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"{data_file} が見つかりません。")
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    quarters = to_datetime64((df['Year'].astype(str) + df['Quarter'].astype(str)).to_numpy())
+    return quarters, pd.to_numeric(df['Q (liters)'], errors='coerce').to_numpy() * 1000
+
+
+def load_quarterly_gdp(data_file=QUARTERLY_DATA_FILE):
+    """四半期の GDP（兆円、add_gdp_data.py が demand_regression_data_raw.csv に追加したもの）"""
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"{data_file} が見つかりません。")
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    quarters = to_datetime64(df['Year'].astype(str).to_numpy())
+    gdp = pd.to_numeric(df['GDP (trillion yen)'], errors='coerce').to_numpy()
+    valid = np.isfinite(gdp)
+    return quarters[valid], gdp[valid]
+
+
+def load_quarterly_consumption(data_file=QUARTERLY_DATA_FILE):
+    """四半期の販売量（リットル、02_complete_consumption_data.py で補完した demand_regression_data_raw.csv の Q）"""
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"{data_file} が見つかりません。")
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    quarters = to_datetime64(df['Year'].astype(str).to_numpy())
+    q = pd.to_numeric(df['Q (liters)'], errors='coerce').to_numpy()
+    valid = np.isfinite(q)
+    return quarters[valid], q[valid]
+
+
+def seasonal_factors(months, values):
+    """
+    月次の系列の暦月ごとの季節指数 (12,)（1月〜12月、平均 1）
+
+    12か月が揃っている年について、各月の値をその年の月平均で割った比を暦月ごとに平均します。
+    """
+    years, mean, _ = resample(months, values, 'annual', min_count=12)
+    ratio = values / mean[np.searchsorted(years, period_start(months, 'annual'))]
+    calendar = months.astype('datetime64[M]').astype(np.int64) % 12
+    factors = np.array([np.nanmean(ratio[calendar == m]) for m in range(12)])
+    return factors / factors.mean()
+
+
+def _align(periods, source_periods, values):
+    """source_periods の値を periods (P,) に並べ替え（ない期間は NaN）"""
+    out = np.full(len(periods), np.nan)
+    index = np.searchsorted(periods, source_periods)
+    inside = (index < len(periods)) & (periods[np.minimum(index, len(periods) - 1)] == source_periods)
+    out[index[inside]] = values[inside]
+    return out
+
+
+def interpolate_gdp(quarters, gdp, periods, frequency):
+    """
+    四半期の GDP を periods (P,) の頻度に
+
+    四半期・年次は四半期の合計（年次は4四半期が揃っている年のみ）。月次・週次は GDP が観測されないので、
+    四半期の中央に置いた対数の線形補間を期間の長さで按分した近似です。
+    """
+    if frequency in ('quarterly', 'annual'):
+        gdp_periods, total, count = resample(quarters, gdp, frequency, how='sum', min_count=MONTHS[frequency] // 3)
+        return _align(periods, gdp_periods, total)
+    middle = (quarters + np.timedelta64(45, 'D')).astype(float)
+    x = (to_datetime64(periods) + np.timedelta64(14 if frequency == 'monthly' else 3, 'D')).astype(float)
+    inside = (x >= middle[0]) & (x <= middle[-1])
+    share = 1 / 3 if frequency == 'monthly' else 7 / 91
+    return np.where(inside, np.exp(np.interp(x, middle, np.log(gdp))) * share, np.nan)
+
+
+def disaggregate_quarterly(quarters, values, months, indicators, method='chow_lin'):
+    """
+    四半期の合計 values (N,) を月次に分解（lib/disaggregation.py）
+
+    months (M,): 指標の月（月の初日、連続）、indicators (M, k): 月次の指標（Chow–Lin・Fernández は定数項を
+    加えて回帰、Denton–Cholette は最後の列に比例）。指標が揃っている最初の四半期から values の最後の
+    四半期までを分解し、その間の values のない四半期は指標と残差の補間で埋めます。
+    戻り値: (月の初日 (M',), 月次の値 (M',))
+    """
+    months = to_datetime64(months)
+    indicators = np.asarray(indicators, dtype=float).reshape(len(months), -1)
+    available = months[np.isfinite(indicators).all(axis=1)].astype('datetime64[M]').astype(np.int64)
+    quarter_months = quarters.astype('datetime64[M]').astype(np.int64)
+    first = max(-(-available[0] // 3) * 3, quarter_months[0])                   # 指標が揃っている最初の四半期
+    last = min((available[-1] + 1) // 3 * 3 - 3, quarter_months[-1])
+    grid_quarters = np.arange(first, last + 1, 3).astype('datetime64[M]').astype('datetime64[D]')
+    grid_months = np.arange(first, last + 3).astype('datetime64[M]').astype('datetime64[D]')
+    y_low = _align(grid_quarters, quarters, values)
+    X = indicators[np.searchsorted(months, grid_months)]
+    if method != 'denton':
+        X = np.column_stack([np.ones(len(X)), X])
+    return grid_months, disaggregate(y_low, X, method, ratio=3, how='sum')['values']
+
+
+def build_frame(frequency='monthly', schedule=None, disaggregation=None):
+    """
+    指定した頻度（'monthly'・'quarterly'・'annual'）の分析データ（demand_regression_data_raw.csv と同じ列）
+
+    Q (liters): 月次の販売量の合計（期間の月が揃っている期間のみ。四半期・年次は四半期の販売量で補完）
+    P (yen/liter): 週次の全国平均価格の平均、CPI: 月次の CPI 総合の平均、P_relative = P / CPI
+    Tax_rate (%): 月ごとの従量税・消費税率（税率表、既定は制度変更のメモ）の期間の平均と税抜き価格から
+        add_tax_rate_data.py と同じ定義（従量税 / 税抜き価格 × 100、tax_on_tax=False）
+    GDP (trillion yen): 四半期の GDP（interpolate_gdp()）
+    disaggregation: 月次で 'chow_lin'・'fernandez'・'denton' を指定すると、GDP を CPI を指標にした時間的分解に、
+        月次の販売量のない月の Q を四半期の販売量（load_quarterly_consumption()）の季節指数を指標にした
+        時間的分解にします（どちらも四半期の合計と一致）
+    """
+    if frequency not in MONTHS:
+        raise ValueError(f"frequency は {list(MONTHS)} のいずれかです: {frequency}")
+    schedule = schedule if schedule is not None else TaxSchedule.from_change_log()
+    step = MONTHS[frequency]
+    dates, price = load_weekly_price()
+    periods, p, _ = resample(dates, price, frequency)
+
+    months, cpi = load_monthly_cpi()
+    cpi = _align(periods, *resample(months, cpi, frequency, min_count=step)[:2])
+
+    sales_months, liters = load_monthly_sales()
+    q = _align(periods, *resample(sales_months, liters, frequency, how='sum', min_count=step)[:2])
+    if frequency != 'monthly':
+        quarters, quarterly_liters = load_quarterly_sales()
+        filled = _align(periods, *resample(quarters, quarterly_liters, frequency, how='sum', min_count=step // 3)[:2])
+        q = np.where(np.isnan(q), filled, q)
+
+    first, last = periods[0].astype('datetime64[M]'), periods[-1].astype('datetime64[M]') + step
+    all_months = np.arange(first, last).astype('datetime64[D]')
+    tax_periods, tax, _ = resample(all_months, np.column_stack(schedule.lookup(all_months)), frequency)
+    specific_tax = _align(periods, tax_periods, tax[:, 0])
+    vat_rate = _align(periods, tax_periods, tax[:, 1])
+    components = decompose(p, specific_tax, vat_rate, tax_on_tax=False)
+    tax_rate = np.where(components['base_price'] > 0, components['excise_rate'] * 100, np.nan)
+
+    quarters, gdp = load_quarterly_gdp()
+    gdp = interpolate_gdp(quarters, gdp, periods, frequency) if disaggregation is None or frequency != 'monthly' \
+        else _align(periods, *disaggregate_quarterly(quarters, gdp, periods, cpi, disaggregation))
+    if disaggregation is not None and frequency == 'monthly':
+        factors = seasonal_factors(sales_months, liters)
+        calendar = periods.astype('datetime64[M]').astype(np.int64) % 12
+        filled = _align(periods, *disaggregate_quarterly(*load_quarterly_consumption(), periods, factors[calendar],
+                                                         disaggregation))
+        q = np.where(np.isnan(q), filled, q)
+    return pd.DataFrame({
+        'Year': period_label(periods, frequency),
+        'Q (liters)': q,
+        'P (yen/liter)': p,
+        'Tax_rate (%)': np.round(tax_rate, 2),
+        'GDP (trillion yen)': gdp,
+        'CPI': cpi,
+        'P_relative': p / cpi,
+    })
@@ -0,0 +1,232 @@
+"""
+系列相関・不均一分散に頑健な共分散（HAC: Newey–West、Driscoll–Kraay）
+
+回帰 y = Xb + e のスコア u_t = x_t e_t から長期分散
+    S = Γ_0 + Σ_{j≥1} k(j / b) (Γ_j + Γ_j'),   Γ_j = Σ_t u_t u_{t−j}'
+を求め、Var(b) = (X'X)⁻¹ S (X'X)⁻¹ とします。
+
+- スコアのラグの行列 [u_t, u_{t−1}, ..., u_{t−L}]（lag_stack）を1回だけ作り、
+  全てのラグの Γ_j を einsum 1回で計算します。カーネル・帯域幅を変えても Γ_j は使い回せます。
+- 帯域幅 b は Newey–West（1994）の方法で自動選択できます（bartlett・parzen・qs）。
+  bartlett・parzen の重みは k(j / (m + 1))（m はラグの打ち切り、statsmodels の maxlags と同じ）、
+  qs は k(j / b) で全てのラグを使います。
+- Driscoll–Kraay はパネルのスコアを時点ごとに合計してから同じ計算をします
+  （地域間の相関・系列相関に頑健。系列が1つなら Newey–West と同じ）。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import stats
+
+
+def _bartlett(x):
+    return np.clip(1.0 - np.abs(x), 0.0, None)
+
+
+def _parzen(x):
+    x = np.abs(x)
+    return np.where(x <= 0.5, 1 - 6 * x ** 2 + 6 * x ** 3, np.where(x <= 1, 2 * (1 - x) ** 3, 0.0))
+
+
+def _quadratic_spectral(x):
+    x = np.asarray(x, dtype=float)
+    z = 6 * np.pi * x / 5
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = 25 / (12 * np.pi ** 2 * x ** 2) * (np.sin(z) / z - np.cos(z))
+    return np.where(x == 0, 1.0, w)
+
+
+# カーネル: (重みの関数, Newey–West 1994 の q, 定数 c_γ, 事前の帯域幅の指数, 打ち切りのあるカーネルか)
+KERNELS = {
+    'bartlett': (_bartlett, 1, 1.1447, 2 / 9, True),
+    'parzen': (_parzen, 2, 2.6614, 4 / 25, True),
+    'qs': (_quadratic_spectral, 2, 1.3221, 2 / 25, False),
+}
+
+
+def lag_stack(u, max_lag):
+    """
+    スコアのラグの行列 (n, max_lag+1, k)：[t, j] が u_{t−j}（t < j は0）
+
+    sliding_window_view のビューなのでコピーはしません（先頭の0の行の分だけ）。
+    """
+    u = np.asarray(u, dtype=float)
+    n, k = u.shape
+    padded = np.vstack([np.zeros((max_lag, k)), u])
+    windows = sliding_window_view(padded, max_lag + 1, axis=0)     # (n, k, L+1)、最後が u_t
+    return windows[:, :, ::-1].transpose(0, 2, 1)
+
+
+def autocovariances(u, max_lag, lags=None):
+    """Γ_j = Σ_t u_t u_{t−j}'（j = 0..max_lag）を (max_lag+1, k, k) で返す。lags は lag_stack の結果（再利用）"""
+    u = np.asarray(u, dtype=float)
+    lags = lag_stack(u, max_lag) if lags is None else lags
+    return np.einsum('tk,tjl->jkl', u, lags)
+
+
+def kernel_weights(kernel, bandwidth, max_lag):
+    """ラグ 0..max_lag の重み（qs の帯域幅 0 は bartlett・parzen の m = 0 と同じく Γ_0 のみ）"""
+    func, _, _, _, truncated = KERNELS[kernel]
+    j = np.arange(max_lag + 1)
+    if not truncated and bandwidth <= 0:
+        return (j == 0).astype(float)
+    return func(j / (bandwidth + 1) if truncated else j / bandwidth)
+
+
+def newey_west_bandwidth(u, kernel='bartlett', weights=None):
+    """
+    Newey–West（1994）の帯域幅の自動選択
+
+    u: スコア (n, k)、weights: スコアの重み（既定: 全て1。定数項の列は0にするのが通例）
+    戻り値: bartlett・parzen はラグの打ち切り m（整数）、qs は帯域幅 b（実数）
+    """
+    _, q, c_gamma, exponent, truncated = KERNELS[kernel]
+    u = np.asarray(u, dtype=float)
+    n, k = u.shape
+    w = np.ones(k) if weights is None else np.asarray(weights, dtype=float)
+    s = u @ w
+    n_lag = min(int(4 * (n / 100) ** exponent), n - 1)
+    sigma = np.array([s[j:] @ s[:n - j] for j in range(n_lag + 1)])
+    j = np.arange(1, n_lag + 1)
+    s0 = sigma[0] + 2 * sigma[1:].sum()
+    sq = 2 * (j ** q * sigma[1:]).sum()
+    if s0 <= 0 or sq == 0:
+        return 0 if truncated else 1.0
+    gamma = c_gamma * ((sq / s0) ** 2) ** (1 / (2 * q + 1))
+    bandwidth = gamma * n ** (1 / (2 * q + 1))
+    return min(int(bandwidth), n - 1) if truncated else float(bandwidth)
+
+
+def long_run_covariance(u, kernel='bartlett', bandwidth=None, weights=None):
+    """
+    スコア u (n, k) の長期分散 S（合計の尺度、n で割らない）
+
+    bandwidth: None なら newey_west_bandwidth() で自動選択
+    戻り値: (S (k, k), 帯域幅, 使ったラグの数)
+    """
+    u = np.asarray(u, dtype=float)
+    n = len(u)
+    if bandwidth is None:
+        bandwidth = newey_west_bandwidth(u, kernel, weights)
+    truncated = KERNELS[kernel][4]
+    max_lag = min(int(bandwidth), n - 1) if truncated else n - 1
+    gamma = autocovariances(u, max_lag)
+    w = kernel_weights(kernel, bandwidth, max_lag)
+    S = np.einsum('j,jkl->kl', w[1:], gamma[1:])
+    return gamma[0] + S + S.T, bandwidth, max_lag
+
+
+def hac_cov_path(X, resid, kernel='bartlett', bandwidths=None, small_sample=True):
+    """
+    複数の帯域幅での HAC 共分散 (B, k, k)
+
+    最大の帯域幅までの Γ_j を1回だけ計算し、帯域幅ごとの重みとの積を einsum でまとめて求めます。
+    bandwidths: 既定は bartlett・parzen が 0..12、qs が 1..12
+    """
+    X = np.asarray(X, dtype=float)
+    u = X * np.asarray(resid, dtype=float)[:, None]
+    truncated = KERNELS[kernel][4]
+    if bandwidths is None:
+        bandwidths = range(0, 13) if truncated else range(1, 13)
+    bandwidths = np.asarray(list(bandwidths), dtype=float)
+    max_lag = min(int(bandwidths.max()), len(u) - 1) if truncated else len(u) - 1
+    gamma = autocovariances(u, max_lag)
+    W = np.stack([kernel_weights(kernel, b, max_lag) for b in bandwidths])      # (B, L+1)
+    S = np.einsum('bj,jkl->bkl', W[:, 1:], gamma[1:])
+    S = gamma[0][None] + S + S.transpose(0, 2, 1)
+    n, k = X.shape
+    bread = np.linalg.inv(X.T @ X)
+    cov = bread[None] @ S @ bread[None]
+    return cov * n / (n - k) if small_sample else cov
+
+
+def sandwich(X, S, n_obs=None, small_sample=True):
+    """(X'X)⁻¹ S (X'X)⁻¹。small_sample なら n / (n − k) を掛ける（statsmodels の use_correction と同じ）"""
+    X = np.asarray(X, dtype=float)
+    n, k = X.shape
+    n = n if n_obs is None else n_obs
+    bread = np.linalg.inv(X.T @ X)
+    cov = bread @ S @ bread
+    return cov * n / (n - k) if small_sample else cov
+
+
+def _score_weights(X):
+    """帯域幅の選択に使うスコアの重み（定数・季節ダミーの列は0）"""
+    X = np.asarray(X, dtype=float)
+    binary = np.all((X == 0) | (X == 1), axis=0)
+    return np.where(binary, 0.0, 1.0) if not binary.all() else np.ones(X.shape[1])
+
+
+def hac_cov(X, resid, kernel='bartlett', bandwidth=None, small_sample=True):
+    """Newey–West 型の HAC 共分散。戻り値: (共分散 (k, k), 帯域幅, ラグの数)"""
+    X = np.asarray(X, dtype=float)
+    u = X * np.asarray(resid, dtype=float)[:, None]
+    S, bandwidth, max_lag = long_run_covariance(u, kernel, bandwidth, _score_weights(X))
+    return sandwich(X, S, small_sample=small_sample), bandwidth, max_lag
+
+
+def driscoll_kraay_cov(X, resid, time, kernel='bartlett', bandwidth=None, small_sample=True):
+    """
+    Driscoll–Kraay の共分散（パネル: 行ごとの時点 time）
+
+    スコアを時点ごとに合計した系列 h_t に Newey–West と同じ計算をします。
+    戻り値: (共分散 (k, k), 帯域幅, ラグの数)
+    """
+    X = np.asarray(X, dtype=float)
+    u = X * np.asarray(resid, dtype=float)[:, None]
+    periods, index = np.unique(np.asarray(time), return_inverse=True)
+    h = np.zeros((len(periods), X.shape[1]))
+    np.add.at(h, index, u)
+    S, bandwidth, max_lag = long_run_covariance(h, kernel, bandwidth, _score_weights(X))
+    return sandwich(X, S, small_sample=small_sample), bandwidth, max_lag
+
+
+def ols_hac(y, X, cov_type='newey_west', kernel='bartlett', bandwidth=None, time=None, small_sample=True):
+    """
+    OLS と HAC 共分散による推定
+
+    cov_type: 'newey_west'・'driscoll_kraay'（time が必要）・'nonrobust'
+    戻り値: 辞書（params, bse, tvalues, pvalues（t分布、自由度 n − k）, cov, resid, fitted,
+                 rsquared, rsquared_adj, bandwidth, max_lag, df_resid）
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n, k = X.shape
+    params, _, _, _ = np.linalg.lstsq(X, y, rcond=None)
+    fitted = X @ params
+    resid = y - fitted
+    df_resid = n - k
+    if cov_type == 'newey_west':
+        cov, bandwidth, max_lag = hac_cov(X, resid, kernel, bandwidth, small_sample)
+    elif cov_type == 'driscoll_kraay':
+        if time is None:
+            raise ValueError("driscoll_kraay には time（行ごとの時点）が必要です。")
+        cov, bandwidth, max_lag = driscoll_kraay_cov(X, resid, time, kernel, bandwidth, small_sample)
+    elif cov_type == 'nonrobust':
+        cov = np.linalg.inv(X.T @ X) * (resid @ resid) / df_resid
+        bandwidth, max_lag = None, 0
+    else:
+        raise ValueError(f"cov_type は 'newey_west'・'driscoll_kraay'・'nonrobust' です: {cov_type}")
+
+    bse = np.sqrt(np.diag(cov))
+    tvalues = params / bse
+    # 定数が列の線形結合で表せなければ（定数項も全ての季節ダミーもない）R² は原点まわり（statsmodels と同じ）
+    ones = np.ones(n)
+    has_const = bool(np.allclose(X @ np.linalg.lstsq(X, ones, rcond=None)[0], ones))
+    centered = y - y.mean() if has_const else y
+    rsquared = 1 - (resid @ resid) / (centered @ centered)
+    rsquared_adj = 1 - (1 - rsquared) * (n - int(has_const)) / df_resid
+    return {
+        'params': params,
+        'bse': bse,
+        'tvalues': tvalues,
+        'pvalues': 2 * stats.t.sf(np.abs(tvalues), df_resid),
+        'cov': cov,
+        'resid': resid,
+        'fitted': fitted,
+        'rsquared': rsquared,
+        'rsquared_adj': rsquared_adj,
+        'bandwidth': bandwidth,
+        'max_lag': max_lag,
+        'df_resid': df_resid,
+    }
@@ -0,0 +1,198 @@
+"""
+混合頻度（MIDAS）の需要関数：週次の価格のラグを四半期・月次の販売量の回帰に直接使う
+
+06_aggregate_to_annual_data.py などは週次の価格を期間の平均にしてから推定していました。ここでは期間 t の
+最後の週から K 週前までの週次の対数価格 x_{t,j}（j = 0 が最新）をそのまま説明変数に使い、
+ラグの重み w_j(θ)（合計 1）をパラメータで表します。
+
+    ln Q_t = const + α ln GDP_t + β Σ_{j<K} w_j(θ) x_{t,j} + γ ln Tax_rate_t + 季節ダミー + ε_t
+
+β は価格の（重みの合計が 1 なので期間の平均と同じ単位の）弾力性です。重みは
+- 'almon': 指数 Almon  w_j ∝ exp(θ1 s_j + θ2 s_j²)
+- 'beta':  ベータ      w_j ∝ s_j^(a−1) (1 − s_j)^(b−1)、θ = (ln a, ln b)
+（s_j = (j + 0.5) / K）で、θ = 0 の 'almon' は K 週の単純平均です。
+
+- 非線形最小二乗は Levenberg–Marquardt で、ヤコビアンは解析的に計算します
+  （∂w/∂θ = w (∂ln f/∂θ − Σ w ∂ln f/∂θ)、価格の列の微分は β X_lag ∂w/∂θ）。
+  θ は THETA_BOUNDS の範囲に射影します（価格の効果が小さいと重みが1週に集中して θ が発散するため）。
+- 候補のラグの長さ K と初期値の全ての組を1つのバッチ (B,) にまとめ、ヤコビアン (B, T, P)・正規方程式
+  (B, P, P) を einsum と np.linalg.solve で一括に解きます（K の違いはラグの列のマスク）。
+  各反復では収束していない問題だけを計算します。
+"""
+
+import numpy as np
+
+from lib.frequency import MONTHS, load_monthly_cpi, load_weekly_price, period_start
+
+WEIGHT_FUNCTIONS = ('almon', 'beta')
+STARTS = {                              # 初期値の θ（全ての K で同じ）
+    'almon': [(0.0, 0.0), (-3.0, 0.0), (3.0, 0.0)],
+    'beta': [(0.0, 0.0), (0.0, np.log(3.0)), (np.log(3.0), 0.0)],
+}
+# θ の範囲（重みが1週に集中して θ が発散しないように、この範囲に射影）
+THETA_BOUNDS = {
+    'almon': (-20.0, 20.0),
+    'beta': (np.log(0.05), np.log(50.0)),
+}
+
+
+def weekly_log_price(relative=True):
+    """
+    週次の全国平均価格の対数（relative=True ならその月の CPI 総合で割った相対価格、01の P_relative と同じ）
+
+    戻り値: (調査日 (W,), 対数価格 (W,)（CPI のない月は NaN）)
+    """
+    dates, price = load_weekly_price()
+    if not relative:
+        return dates, np.log(price)
+    months, cpi = load_monthly_cpi()
+    index = np.searchsorted(months, period_start(dates, 'monthly'))
+    found = (index < len(months)) & (months[np.minimum(index, len(months) - 1)] == period_start(dates, 'monthly'))
+    deflator = np.where(found, cpi[np.minimum(index, len(months) - 1)], np.nan)
+    return dates, np.log(price / deflator)
+
+
+def lag_matrix(dates, values, periods, frequency, max_lags):
+    """
+    週次の値 (W,) を期間 (T,) ごとのラグの行列 (T, max_lags) に
+
+    [t, j] は期間 t の終わりより前の最後の週から j 週前の値（週次のデータより前は NaN）。
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    periods = np.asarray(periods, dtype='datetime64[D]')
+    ends = (periods.astype('datetime64[M]') + MONTHS[frequency]).astype('datetime64[D]')
+    index = np.searchsorted(dates, ends, side='left')[:, None] - 1 - np.arange(max_lags)
+    values = np.asarray(values, dtype=float)
+    return np.where(index >= 0, values[np.maximum(index, 0)], np.nan)
+
+
+def lag_weights(theta, lags, max_lags, kind='almon'):
+    """
+    ラグの重みとその微分
+
+    theta (B, 2)、lags (B,): 問題ごとのラグの長さ K（j ≥ K の重みは 0）
+    戻り値: (重み (B, max_lags), ∂重み/∂θ (B, max_lags, 2))
+    """
+    theta = np.asarray(theta, dtype=float)
+    lags = np.asarray(lags)
+    j = np.arange(max_lags)
+    active = j < lags[:, None]
+    s = np.minimum((j + 0.5) / lags[:, None], 1 - 1e-9)
+    if kind == 'almon':
+        grad = np.stack([s, s ** 2], axis=-1)                             # ∂ln f/∂θ
+        log_f = theta[:, :1] * s + theta[:, 1:] * s ** 2
+    elif kind == 'beta':
+        a, b = np.exp(theta[:, :1]), np.exp(theta[:, 1:])
+        grad = np.stack([a * np.log(s), b * np.log1p(-s)], axis=-1)
+        log_f = (a - 1) * np.log(s) + (b - 1) * np.log1p(-s)
+    else:
+        raise ValueError(f"kind は {WEIGHT_FUNCTIONS} のいずれかです: {kind}")
+    log_f = np.where(active, log_f, -np.inf)
+    f = np.exp(log_f - log_f.max(axis=1, keepdims=True))
+    w = f / f.sum(axis=1, keepdims=True)
+    grad = np.where(active[:, :, None], grad, 0.0)
+    dw = w[:, :, None] * (grad - np.einsum('bk,bkq->bq', w, grad)[:, None, :])
+    return w, dw
+
+
+def _residuals(params, y, X, lag_values, lags, kind):
+    """残差 (B, T)、重み、重みの微分、価格の列 (B, T)"""
+    m = X.shape[1]
+    w, dw = lag_weights(params[:, m + 1:], lags, lag_values.shape[1], kind)
+    z = w @ lag_values.T
+    return y - params[:, :m] @ X.T - params[:, m:m + 1] * z, w, dw, z
+
+
+def _jacobian(params, X, lag_values, dw, z):
+    """当てはめ値のヤコビアン (B, T, m + 3): [X, 価格の列, β × X_lag ∂w/∂θ]"""
+    m = X.shape[1]
+    return np.concatenate([np.broadcast_to(X, (len(params),) + X.shape), z[:, :, None],
+                           params[:, m:m + 1, None] * np.einsum('tk,bkq->btq', lag_values, dw)], axis=2)
+
+
+def fit(y, X, lag_values, lags, kind='almon', starts=None, max_iter=200, tol=1e-9):
+    """
+    MIDAS 回帰を候補のラグの長さ lags (L,) について一括で推定
+
+    y (T,)、X (T, m): 期間の頻度の説明変数（定数項・ln GDP・ln Tax_rate・季節ダミー）、
+    lag_values (T, max(lags)): lag_matrix() の週次の対数価格
+    starts: θ の初期値のリスト（既定は STARTS[kind]）。K ごとに全ての初期値から推定し、SSR が最小のものを残します。
+    戻り値: 辞書（lags (L,), params (L, m + 3)（X の係数, β, θ1, θ2）, weights (L, max(lags)), ssr, aic, bic,
+                 converged, iterations (L,), resid (L, T), jacobian (L, T, m + 3), n_params）
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    lag_values = np.asarray(lag_values, dtype=float)
+    lags = np.asarray(lags)
+    starts = np.clip(np.asarray(STARTS[kind] if starts is None else starts, dtype=float), *THETA_BOUNDS[kind])
+    n, m = X.shape
+    k = m + 3
+    batch_lags = np.repeat(lags, len(starts))
+    theta = np.tile(starts, (len(lags), 1))
+    B = len(batch_lags)
+
+    # 初期値: θ を固定した OLS（価格の列は重み付きの平均）
+    w, _ = lag_weights(theta, batch_lags, lag_values.shape[1], kind)
+    Z = np.concatenate([np.broadcast_to(X, (B, n, m)), (w @ lag_values.T)[:, :, None]], axis=2)
+    linear = np.linalg.solve(np.einsum('btp,btq->bpq', Z, Z), np.einsum('btp,t->bp', Z, y)[:, :, None])[:, :, 0]
+    params = np.concatenate([linear, theta], axis=1)
+
+    resid, w, dw, z = _residuals(params, y, X, lag_values, batch_lags, kind)
+    ssr = np.einsum('bt,bt->b', resid, resid)
+    damping = np.full(B, 1e-3)
+    converged = np.zeros(B, dtype=bool)
+    iterations = np.zeros(B, dtype=int)
+    identity = np.eye(k)
+    lower, upper = THETA_BOUNDS[kind]
+    for _ in range(max_iter):
+        # 収束していない問題だけを計算
+        idx = np.flatnonzero(~converged)
+        if len(idx) == 0:
+            break
+        iterations[idx] += 1
+        J = _jacobian(params[idx], X, lag_values, dw[idx], z[idx])
+        A = np.einsum('btp,btq->bpq', J, J)
+        g = np.einsum('btp,bt->bp', J, resid[idx])
+        # 範囲の端で外に向かう θ は固定（その行・列を除いて解く）
+        theta = params[idx, m + 1:]
+        fixed = np.zeros((len(idx), k), dtype=bool)
+        fixed[:, m + 1:] = ((theta <= lower) & (g[:, m + 1:] < 0)) | ((theta >= upper) & (g[:, m + 1:] > 0))
+        A = np.where(fixed[:, :, None] | fixed[:, None, :], 0.0, A) + fixed[:, :, None] * identity
+        g = np.where(fixed, 0.0, g)
+        diagonal = np.einsum('bpp->bp', A)
+        step = np.linalg.solve(A + damping[idx, None, None] * (diagonal[:, :, None] * identity + 1e-12 * identity),
+                               g[:, :, None])[:, :, 0]
+        trial = params[idx] + step
+        trial[:, m + 1:] = np.clip(trial[:, m + 1:], lower, upper)
+        moved = np.abs(trial - params[idx]).max(axis=1)
+        trial_resid, trial_w, trial_dw, trial_z = _residuals(trial, y, X, lag_values, batch_lags[idx], kind)
+        trial_ssr = np.einsum('bt,bt->b', trial_resid, trial_resid)
+        better = np.isfinite(trial_ssr) & (trial_ssr <= ssr[idx])
+        change = np.where(better, ssr[idx] - trial_ssr, 0.0)
+        accept = idx[better]
+        params[accept], resid[accept], ssr[accept] = trial[better], trial_resid[better], trial_ssr[better]
+        w[accept], dw[accept], z[accept] = trial_w[better], trial_dw[better], trial_z[better]
+        damping[idx] = np.clip(np.where(better, damping[idx] / 10, damping[idx] * 10), 1e-12, 1e12)
+        converged[idx] = (better & ((change <= tol * trial_ssr) | (moved <= tol))) | (~better & (damping[idx] >= 1e12))
+
+    # K ごとに SSR が最小の初期値
+    best = ssr.reshape(len(lags), len(starts)).argmin(axis=1) + np.arange(len(lags)) * len(starts)
+    ssr = ssr[best]
+    return {
+        'lags': lags,
+        'params': params[best],
+        'weights': w[best],
+        'ssr': ssr,
+        'aic': n * np.log(ssr / n) + 2 * k,
+        'bic': n * np.log(ssr / n) + k * np.log(n),
+        'converged': converged[best],
+        'iterations': iterations[best],
+        'resid': resid[best],
+        'jacobian': _jacobian(params[best], X, lag_values, dw[best], z[best]),
+        'n_params': k,
+    }
+
+
+def select(fit_result, criterion='bic'):
+    """情報量規準が最小のラグの長さの位置"""
+    return int(np.nanargmin(fit_result[criterion]))
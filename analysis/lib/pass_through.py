@@ -0,0 +1,269 @@
+"""
+価格の非対称な転嫁（「ロケットと羽根」）の推定：週次・地域別
+
+費用 c が上がったときに小売価格 p が速く上がり、下がったときにはゆっくり下がるかを、
+地域ごとの非対称な誤差修正モデル（閾値つき、Enders–Siklos の TAR 型）で調べます。
+
+    長期関係:   p_t = λ0 + λ1 c_t + z_t
+    短期:       Δp_t = μ + Σ_{k=0}^{K} (a⁺_k Δc⁺_{t−k} + a⁻_k Δc⁻_{t−k}) + Σ_{l=1}^{L} φ_l Δp_{t−l}
+                       + θ⁺ z_{t−1} 1[z_{t−1} ≥ τ] + θ⁻ z_{t−1} 1[z_{t−1} < τ] + ε_t
+    Δc⁺ = max(Δc, 0)、Δc⁻ = min(Δc, 0)。τ は 0（threshold='zero'）か、SSR 最小の格子探索（'search'）。
+
+原油・卸売価格の系列はないため、費用には全国平均の小売価格を使います（地域に共通の費用ショックの代理）。
+卸売価格などの系列があれば cost に渡すだけで同じ計算ができます。
+
+- 全地域を1つの配列 X (地域, 週, 説明変数) にまとめ、正規方程式を地域についての一括計算（einsum・pinv）で解きます。
+  閾値の格子探索も、共通の列と閾値の2列の積和を分けて計算し、(地域, 格子点) について一括で解きます。
+- 累積反応関数（1円の恒久的な費用の上昇・下落に対する小売価格の累積の変化）は、
+  週についてだけループし、地域（とブートストラップの標本）は配列のまま計算します。
+- 信頼区間・p値は固定説明変数の wild ブートストラップ（Rademacher、lib/structural_break.py と同じ考え方）で、
+  (X'X)⁻¹X' を使い回して全標本の係数を一度に求めます。
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from lib.data_plane import load_price_panel
+
+NATIONAL = '全国'
+PREFECTURE_START = '2004-06-14'     # 都道府県別の調査の開始
+ASYMMETRY_HORIZONS = [1, 2, 4, 8, 12]
+
+
+def weekly_panel(start=PREFECTURE_START, end=None):
+    """
+    週次の地域別価格と費用（全国平均）
+
+    戻り値: 辞書（dates (T,), regions (R,)、prices (T, R) 円/L、cost (T,) 円/L、bureau (R,): 地方局の列か）
+    """
+    dates, regions, prices = load_price_panel()
+    keep = dates >= np.datetime64(start)
+    if end is not None:
+        keep &= dates <= np.datetime64(end)
+    national = list(regions).index(NATIONAL)
+    columns = [i for i in range(len(regions)) if i != national]
+    return {
+        'dates': dates[keep],
+        'regions': regions[columns],
+        'prices': prices[keep][:, columns],
+        'cost': prices[keep, national],
+        'bureau': np.char.endswith(regions[columns].astype(str), '局'),
+    }
+
+
+def _lag(a, k):
+    """先頭に NaN を k 行入れたラグ（a: (T, ...)）"""
+    out = np.full(a.shape, np.nan)
+    if k < len(a):
+        out[k:] = a[:len(a) - k]
+    return out
+
+
+def batched_ols(X, y, w):
+    """
+    地域ごとの重みつき最小二乗（X: (R, T, k)、y・w: (R, T)、w は 0/1）
+
+    戻り値: (係数 (R, k), (X'WX)⁻¹ (R, k, k))
+    """
+    Xw = X * w[..., None]
+    XtX = np.einsum('rtk,rtl->rkl', Xw, X)
+    Xty = np.einsum('rtk,rt->rk', Xw, y)
+    bread = np.linalg.pinv(XtX, hermitian=True)
+    return np.einsum('rkl,rl->rk', bread, Xty), bread
+
+
+def long_run(prices, cost):
+    """長期関係 p = λ0 + λ1 c を地域ごとに推定。戻り値: (λ (R, 2), z (T, R))"""
+    T, R = prices.shape
+    w = (np.isfinite(prices) & np.isfinite(cost)[:, None]).T.astype(float)
+    X = np.stack([np.ones(T), np.nan_to_num(cost)], axis=-1)[None].repeat(R, axis=0)
+    lam, _ = batched_ols(X, np.nan_to_num(prices.T), w)
+    z = prices - lam[:, 0][None] - lam[:, 1][None] * cost[:, None]
+    return lam, z
+
+
+def short_run_design(prices, cost, z, lags=4, own_lags=2):
+    """
+    短期の式の共通部分の説明変数 A (R, T, 1+2(K+1)+L)、閾値の列を作る z_{t−1} (R, T)、Δp (R, T)、有効な行 w (R, T)
+
+    A の列: 定数項, Δc⁺_{t−0..K}, Δc⁻_{t−0..K}, Δp_{t−1..L}
+    """
+    dc = np.diff(cost, prepend=np.nan)
+    up, down = np.maximum(dc, 0.0), np.minimum(dc, 0.0)
+    up[np.isnan(dc)] = np.nan
+    down[np.isnan(dc)] = np.nan
+    dp = np.diff(prices, axis=0, prepend=np.nan)                  # (T, R)
+    T, R = prices.shape
+    common = [np.ones(T)] + [_lag(up, k) for k in range(lags + 1)] + [_lag(down, k) for k in range(lags + 1)]
+    common = np.stack(common, axis=-1)                             # (T, 1+2(K+1))
+    own = np.stack([_lag(dp, l) for l in range(1, own_lags + 1)], axis=-1)   # (T, R, L)
+    A = np.concatenate([common[:, None, :].repeat(R, axis=1), own], axis=-1).transpose(1, 0, 2)
+    z_lag = _lag(z, 1).T
+    y = dp.T
+    valid = np.isfinite(A).all(axis=-1) & np.isfinite(z_lag) & np.isfinite(y)
+    w = valid.astype(float)
+    return np.where(valid[..., None], A, 0.0), np.where(valid, z_lag, 0.0), np.where(valid, y, 0.0), w
+
+
+def _threshold_columns(z_lag, tau):
+    above = z_lag >= tau[..., None]
+    return np.stack([z_lag * above, z_lag * ~above], axis=-1)
+
+
+def search_threshold(A, z_lag, y, w, grid=np.linspace(0.15, 0.85, 29)):
+    """
+    閾値 τ の格子探索（地域ごとに z_{t−1} の分位点、SSR 最小）
+
+    共通の列 A の積和は1回だけ計算し、閾値の2列との積和だけを格子点ごとに計算して
+    (地域, 格子点) の正規方程式をまとめて解きます。戻り値: τ (R,)
+    """
+    R = A.shape[0]
+    taus = np.stack([np.quantile(z_lag[r][w[r] > 0], grid) for r in range(R)])      # (R, G)
+    above = z_lag[:, None, :] >= taus[..., None]                                       # (R, G, T)
+    B = np.stack([z_lag[:, None, :] * above, z_lag[:, None, :] * ~above], axis=-1)    # (R, G, T, 2)
+    Aw = A * w[..., None]
+    AA = np.einsum('rtk,rtl->rkl', Aw, A)
+    AB = np.einsum('rtk,rgtl->rgkl', Aw, B)
+    BB = np.einsum('rgtk,rt,rgtl->rgkl', B, w, B)
+    Ay = np.einsum('rtk,rt->rk', Aw, y)
+    By = np.einsum('rgtk,rt->rgk', B, w * y)
+    G = taus.shape[1]
+    k = A.shape[-1]
+    XtX = np.zeros((R, G, k + 2, k + 2))
+    XtX[:, :, :k, :k] = AA[:, None]
+    XtX[:, :, :k, k:] = AB
+    XtX[:, :, k:, :k] = AB.transpose(0, 1, 3, 2)
+    XtX[:, :, k:, k:] = BB
+    Xty = np.concatenate([Ay[:, None].repeat(G, axis=1), By], axis=-1)
+    b = np.einsum('rgkl,rgl->rgk', np.linalg.pinv(XtX, hermitian=True), Xty)
+    ssr = np.einsum('rt,rt->r', w * y, y)[:, None] - np.einsum('rgk,rgk->rg', b, Xty)
+    return taus[np.arange(R), np.argmin(ssr, axis=1)]
+
+
+def cumulative_response(params, lam1, tau, lags, own_lags, horizon):
+    """
+    1円の恒久的な費用の上昇・下落に対する小売価格の累積の変化
+
+    params: (..., R, k)（列は短期の式と同じ順）、lam1・tau: (R,)
+    戻り値: (上昇 (..., R, H+1), 下落 (..., R, H+1))。下落は −1 円に対する反応（負の値）
+    """
+    a_up = params[..., 1:lags + 2]
+    a_down = params[..., lags + 2:2 * lags + 3]
+    phi = params[..., 2 * lags + 3:2 * lags + 3 + own_lags]
+    theta_up, theta_down = params[..., -2], params[..., -1]
+    out = []
+    for sign, a in [(1.0, a_up), (-1.0, a_down)]:
+        level = np.zeros(params.shape[:-1])
+        history = [np.zeros(params.shape[:-1]) for _ in range(own_lags)]      # Δp_{t−1}, Δp_{t−2}, ...
+        path = []
+        for h in range(horizon + 1):
+            cost_change = sign if h > 0 else 0.0                                # c_{h−1} − c_{−1}
+            z = level - lam1 * cost_change
+            adjust = np.where(z >= tau, theta_up, theta_down) * z
+            step = adjust + sum(phi[..., l] * history[l] for l in range(own_lags))
+            if h <= lags:
+                step = step + a[..., h] * sign
+            level = level + step
+            history = [step] + history[:-1]
+            path.append(level)
+        out.append(np.stack(path, axis=-1))
+    return out[0], out[1]
+
+
+def estimate(panel, lags=4, own_lags=2, threshold='search', horizon=26, n_boot=499, seed=None, batch_size=100):
+    """
+    全地域の非対称な誤差修正モデルを一括で推定
+
+    panel: weekly_panel() の辞書、threshold: 'zero' または 'search'
+    戻り値: 辞書
+        table: 地域ごとの係数・検定（DataFrame）
+        responses: 地域×週の累積反応（上昇・下落・非対称の大きさ、ブートストラップの90%区間）
+        params (R, k)・names・lam (R, 2)・tau (R,)
+    """
+    prices, cost = panel['prices'], panel['cost']
+    lam, z = long_run(prices, cost)
+    A, z_lag, y, w = short_run_design(prices, cost, z, lags, own_lags)
+    R = A.shape[0]
+    tau = search_threshold(A, z_lag, y, w) if threshold == 'search' else np.zeros(R)
+    X = np.concatenate([A, _threshold_columns(z_lag, tau)], axis=-1)
+    params, bread = batched_ols(X, y, w)
+    fitted = np.einsum('rtk,rk->rt', X, params)
+    resid = (y - fitted) * w
+    n = w.sum(axis=1)
+    k = X.shape[-1]
+    names = (['const'] + [f'dc_up_{i}' for i in range(lags + 1)] + [f'dc_down_{i}' for i in range(lags + 1)]
+             + [f'dp_lag_{l}' for l in range(1, own_lags + 1)] + ['theta_up', 'theta_down'])
+
+    # 不均一分散に頑健な共分散（HC1）と Wald 検定
+    meat = np.einsum('rtk,rt,rtl->rkl', X, resid ** 2, X)
+    cov = bread @ meat @ bread * (n / (n - k))[:, None, None]
+    restrictions = np.zeros((2, k))
+    restrictions[0, 1:lags + 2] = 1.0
+    restrictions[0, lags + 2:2 * lags + 3] = -1.0          # Σa⁺ = Σa⁻（短期の転嫁の合計）
+    restrictions[1, -2:] = [1.0, -1.0]                      # θ⁺ = θ⁻（調整の速さ）
+    diff = params @ restrictions.T                          # (R, 2)
+    V = np.einsum('ik,rkl,jl->rij', restrictions, cov, restrictions)
+    se = np.sqrt(np.einsum('rii->ri', V))
+    joint = np.einsum('ri,rij,rj->r', diff, np.linalg.pinv(V, hermitian=True), diff)
+
+    up, down = cumulative_response(params, lam[:, 1], tau, lags, own_lags, horizon)
+    asymmetry = up + down
+
+    # wild ブートストラップ（固定説明変数、τ と長期関係は固定）
+    boot_asym = np.zeros((0, R, horizon + 1))
+    if n_boot > 0:
+        rng = np.random.default_rng(seed)
+        P = np.einsum('rkl,rtl->rkt', bread, X * w[..., None])        # (X'WX)⁻¹ X'W
+        draws = []
+        for start in range(0, n_boot, batch_size):
+            size = min(batch_size, n_boot - start)
+            v = rng.choice([-1.0, 1.0], size=(size, R, resid.shape[1]))
+            b_star = params[None] + np.einsum('rkt,brt->brk', P, resid[None] * v)
+            u_star, d_star = cumulative_response(b_star, lam[:, 1], tau, lags, own_lags, horizon)
+            draws.append(u_star + d_star)
+        boot_asym = np.concatenate(draws)
+    lower = np.quantile(boot_asym, 0.05, axis=0) if n_boot > 0 else np.full_like(asymmetry, np.nan)
+    upper = np.quantile(boot_asym, 0.95, axis=0) if n_boot > 0 else np.full_like(asymmetry, np.nan)
+    # 非対称がないとき（0）の両側p値: 中心化したブートストラップ分布で |推定値| を超える割合
+    if n_boot > 0:
+        centered = np.abs(boot_asym - asymmetry[None])
+        boot_p = (1 + (centered >= np.abs(asymmetry)[None]).sum(axis=0)) / (n_boot + 1)
+    else:
+        boot_p = np.full_like(asymmetry, np.nan)
+
+    table = pd.DataFrame({
+        'Region': panel['regions'],
+        'Bureau': panel['bureau'],
+        'N': n.astype(int),
+        'Long_Run_Slope': lam[:, 1],
+        'Threshold': tau,
+        'Sum_Pass_Through_Up': params[:, 1:lags + 2].sum(axis=1),
+        'Sum_Pass_Through_Down': params[:, lags + 2:2 * lags + 3].sum(axis=1),
+        'Short_Run_Diff': diff[:, 0],
+        'Short_Run_p': 2 * stats.norm.sf(np.abs(diff[:, 0] / se[:, 0])),
+        'Theta_Up': params[:, -2],
+        'Theta_Down': params[:, -1],
+        'Adjustment_Diff': diff[:, 1],
+        'Adjustment_p': 2 * stats.norm.sf(np.abs(diff[:, 1] / se[:, 1])),
+        'Wald_Joint': joint,
+        'Wald_Joint_p': stats.chi2.sf(joint, 2),
+    })
+    for h in ASYMMETRY_HORIZONS:
+        if h <= horizon:
+            table[f'Asymmetry_{h}w'] = asymmetry[:, h]
+            table[f'Asymmetry_{h}w_p'] = boot_p[:, h]
+
+    weeks = np.arange(horizon + 1)
+    responses = pd.DataFrame({
+        'Region': np.repeat(panel['regions'], horizon + 1),
+        'Week': np.tile(weeks, R),
+        'Up': up.ravel(),
+        'Down': down.ravel(),
+        'Asymmetry': asymmetry.ravel(),
+        'Asymmetry_Lower_90': lower.ravel(),
+        'Asymmetry_Upper_90': upper.ravel(),
+        'Asymmetry_p': boot_p.ravel(),
+    })
+    return {'table': table, 'responses': responses, 'params': params, 'names': names, 'lam': lam, 'tau': tau,
+            'cov': cov, 'n_boot': n_boot}
@@ -0,0 +1,212 @@
+"""
+ガソリン小売価格の分解（本体価格・ガソリン税・消費税）
+
+税込み価格 P、1リットルあたりの従量税 t（揮発油税・地方揮発油税・石油石炭税の合計）、
+消費税率 r のとき、本体価格 p との関係は
+    tax_on_tax=True :  P = (p + t)(1 + r)   消費税がガソリン税にも課される（タックス・オン・タックス）
+    tax_on_tax=False:  P = p(1 + r) + t     消費税は本体価格のみに課される
+とします。
+
+税率は TaxSchedule（税率が変わった日と、その日からの t・r の表）で持ち、
+日付・四半期の配列を np.searchsorted で一度に引きます。週次・都道府県別・シミュレーションの
+価格でも、価格の配列と税率の配列をブロードキャストして一度に分解できます。
+- TaxSchedule.from_quarterly_table(): 四半期ごとの税率表（04・add_tax_rate_data と同じ値）
+- TaxSchedule.from_change_log(): 制度変更のメモ（2008年4月の暫定税率失効などを月単位で反映）
+- TaxSchedule.amend(): 期間を指定して税率を変えたシナリオ（暫定税率の廃止など）
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+QUARTERLY_TABLE_FILE = 'data/-2025ガソリン関連税四半期ごと/gasoline_tax_quarterly.csv'
+CHANGE_LOG_FILE = 'data/-2025ガソリン関連税四半期ごと/めも_gasoline_tax_major_changes.csv'
+PROVISIONAL_RATE = 25.1  # 暫定税率（揮発油税24.3円＋地方揮発油税0.8円）
+
+OUTPUT_COLUMNS = ['base_price', 'excise', 'consumption_tax', 'tax_on_tax', 'excise_rate', 'effective_rate']
+
+
+def to_datetime64(labels):
+    """
+    日付・期間のラベルを datetime64[D]（期間の初日）の配列に変換
+
+    '2007Q1'・'2007-Q1' 形式の四半期、'2007年4月'・'2007年' 形式、日付文字列・datetime に対応します。
+    """
+    if isinstance(labels, np.ndarray) and np.issubdtype(labels.dtype, np.datetime64):
+        return labels.astype('datetime64[D]')
+    values = pd.Series(np.atleast_1d(np.asarray(labels, dtype=object))).astype(str)
+    out = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+    quarter = values.str.extract(r'^(\d{4})-?Q([1-4])$')
+    japanese = values.str.extract(r'^(\d{4})年(?:(\d{1,2})月)?$')
+    is_quarter = quarter[0].notna().to_numpy()
+    is_japanese = japanese[0].notna().to_numpy()
+    if is_quarter.any():
+        q = quarter[is_quarter]
+        months = (q[1].astype(int) - 1) * 3 + 1
+        out[is_quarter] = pd.to_datetime(q[0] + '-' + months.astype(str).str.zfill(2) + '-01').to_numpy()
+    if is_japanese.any():
+        j = japanese[is_japanese]
+        out[is_japanese] = pd.to_datetime(j[0] + '-' + j[1].fillna('1').str.zfill(2) + '-01').to_numpy()
+    rest = ~(is_quarter | is_japanese)
+    if rest.any():
+        out[rest] = pd.to_datetime(values[rest]).to_numpy()
+    return out
+
+
+class TaxSchedule:
+    """
+    税率の変更日と、その日から次の変更日の前日までの従量税（円/L）・消費税率（小数）
+
+    start: datetime64[D] の昇順の配列、specific_tax・vat_rate: 同じ長さの配列
+    """
+
+    def __init__(self, start, specific_tax, vat_rate, name='history'):
+        start = to_datetime64(start)
+        order = np.argsort(start, kind='stable')
+        self.start = start[order]
+        self.specific_tax = np.asarray(specific_tax, dtype=float)[order]
+        self.vat_rate = np.asarray(vat_rate, dtype=float)[order]
+        self.name = name
+
+    @classmethod
+    def from_quarterly_table(cls, data_file=QUARTERLY_TABLE_FILE):
+        """四半期ごとの税率表から作成（変化のない四半期はまとめる）"""
+        if not os.path.exists(data_file):
+            raise FileNotFoundError(f"{data_file} が見つかりません。")
+        df = pd.read_csv(data_file, encoding='utf-8-sig')
+        t = df['合計従量税率_円L'].to_numpy(dtype=float)
+        r = df['消費税率_%'].to_numpy(dtype=float) / 100.0
+        changed = np.r_[True, (np.diff(t) != 0) | (np.diff(r) != 0)]
+        labels = df['Year'].astype(int).astype(str) + 'Q' + df['Quarter'].astype(int).astype(str)
+        return cls(labels[changed].to_numpy(), t[changed], r[changed], name='quarterly_table')
+
+    @classmethod
+    def from_change_log(cls, data_file=CHANGE_LOG_FILE, provisional=True):
+        """
+        制度変更のメモ（年次,...,合計従量税率_円L,消費税率_%,制度変更）から作成
+
+        provisional=False なら暫定税率（揮発油税_暫定・地方揮発油税_暫定）を除いた従量税（本則のみ）
+        """
+        if not os.path.exists(data_file):
+            raise FileNotFoundError(f"{data_file} が見つかりません。")
+        df = pd.read_csv(data_file, encoding='utf-8-sig')
+        df = df[df['年次'].astype(str).str.match(r'^\d{4}年')]
+        t = df['合計従量税率_円L'].astype(float)
+        if not provisional:
+            t = t - df['揮発油税_暫定_円L'].astype(float) - df['地方揮発油税_暫定_円L'].astype(float)
+        return cls(to_datetime64(df['年次'].to_numpy()), t, df['消費税率_%'].astype(float) / 100.0,
+                   name='change_log' if provisional else 'change_log_without_provisional')
+
+    def lookup(self, dates):
+        """日付・期間の配列に対する (従量税, 消費税率)。最初の変更日より前は NaN"""
+        index = np.searchsorted(self.start, to_datetime64(dates), side='right') - 1
+        valid = index >= 0
+        index = np.maximum(index, 0)
+        t = np.where(valid, self.specific_tax[index], np.nan)
+        r = np.where(valid, self.vat_rate[index], np.nan)
+        return t, r
+
+    def amend(self, start, end=None, specific_tax=None, vat_rate=None, delta_specific_tax=None, name=None):
+        """
+        start 以降（end を指定した場合は end の前日まで）の税率を変えた新しい TaxSchedule
+
+        specific_tax・vat_rate: 期間中の値、delta_specific_tax: 期間中の従量税への加算（暫定税率の廃止なら −25.1）
+        期間の前後の税率はそのまま残ります。
+        """
+        start = to_datetime64([start])[0]
+        dates = [start] + ([to_datetime64([end])[0]] if end is not None else [])
+        points = np.union1d(self.start, dates)
+        t, r = self.lookup(points)
+        inside = (points >= start) & ((points < dates[-1]) if end is not None else True)
+        if specific_tax is not None:
+            t = np.where(inside, specific_tax, t)
+        if delta_specific_tax is not None:
+            t = np.where(inside, t + delta_specific_tax, t)
+        if vat_rate is not None:
+            r = np.where(inside, vat_rate, r)
+        return TaxSchedule(points, t, r, name=name or f'{self.name}+amended')
+
+    def to_frame(self):
+        return pd.DataFrame({'Start': self.start, 'Specific_Tax': self.specific_tax, 'VAT_Rate': self.vat_rate})
+
+
+def consumer_price(base_price, specific_tax, vat_rate, tax_on_tax=True):
+    """本体価格から税込み価格"""
+    if tax_on_tax:
+        return (base_price + specific_tax) * (1 + vat_rate)
+    return base_price * (1 + vat_rate) + specific_tax
+
+
+def base_price(price, specific_tax, vat_rate, tax_on_tax=True):
+    """税込み価格から本体価格"""
+    if tax_on_tax:
+        return price / (1 + vat_rate) - specific_tax
+    return (price - specific_tax) / (1 + vat_rate)
+
+
+def decompose(price, specific_tax, vat_rate, tax_on_tax=True, dtype=np.float64):
+    """
+    税込み価格を本体価格・ガソリン税・消費税に分解
+
+    引数はブロードキャスト可能な配列（例: 価格 (N,) × シナリオの税率 (S, 1)）。
+    一時配列を作らないよう、結果の配列に直接書き込みます（dtype=np.float32 でメモリを半分に）。
+    戻り値: 辞書（1リットルあたり、すべて同じ形）
+        base_price: 本体価格
+        excise: ガソリン税（従量税）
+        consumption_tax: 消費税
+        tax_on_tax: 消費税のうちガソリン税に課される部分
+        excise_rate: ガソリン税 / 本体価格（Tax_rate (%) の定義、小数）
+        effective_rate: 税の合計 / 税込み価格
+    """
+    price = np.asarray(price, dtype=dtype)
+    specific_tax = np.asarray(specific_tax, dtype=dtype)
+    vat_rate = np.asarray(vat_rate, dtype=dtype)
+    shape = np.broadcast_shapes(price.shape, specific_tax.shape, vat_rate.shape)
+    out = {name: np.empty(shape, dtype=dtype) for name in OUTPUT_COLUMNS}
+
+    divisor = np.add(vat_rate, 1, dtype=dtype)
+    base = out['base_price']
+    if tax_on_tax:
+        np.divide(price, divisor, out=base)
+        np.subtract(base, specific_tax, out=base)
+        np.multiply(specific_tax, vat_rate, out=out['tax_on_tax'])
+    else:
+        np.subtract(price, specific_tax, out=base)
+        np.divide(base, divisor, out=base)
+        out['tax_on_tax'][...] = 0
+    out['excise'][...] = specific_tax
+    # 消費税 = 税込み価格 − 本体価格 − ガソリン税
+    vat = out['consumption_tax']
+    np.subtract(price, base, out=vat)
+    np.subtract(vat, specific_tax, out=vat)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(specific_tax, base, out=out['excise_rate'])
+        np.subtract(price, base, out=out['effective_rate'])
+        np.divide(out['effective_rate'], price, out=out['effective_rate'])
+    return out
+
+
+def decompose_by_date(price, dates, schedule, tax_on_tax=True, dtype=np.float64):
+    """日付・期間ごとの税率を schedule から引いて分解（週次・都道府県別の価格など）"""
+    t, r = schedule.lookup(dates)
+    return decompose(price, t, r, tax_on_tax=tax_on_tax, dtype=dtype)
+
+
+def scenario_schedules(schedule, scenarios):
+    """
+    シナリオの辞書 {名前: amend() の引数の辞書} から TaxSchedule の辞書を作成
+
+    例: {'abolish_provisional': {'start': '2025-12-31', 'delta_specific_tax': -PROVISIONAL_RATE}}
+    """
+    out = {schedule.name: schedule}
+    for name, kwargs in scenarios.items():
+        out[name] = schedule.amend(name=name, **kwargs)
+    return out
+
+
+def stack_lookup(schedules, dates):
+    """複数の TaxSchedule を同じ日付で引き、(シナリオ数, 日付数) の従量税・消費税率を返す"""
+    dates = to_datetime64(dates)
+    pairs = [s.lookup(dates) for s in schedules]
+    return np.stack([p[0] for p in pairs]), np.stack([p[1] for p in pairs])
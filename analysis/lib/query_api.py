@@ -0,0 +1,439 @@
+"""
+推定・シミュレーションの結果を返すローカルの HTTP API（読み取り専用、asyncio）
+
+「β = −0.3 での2022年の消費者余剰の変化」「2008Q2 の小売価格に占める税の割合」のような値を、
+スクリプトを再実行せずに問い合わせるためのサービスです（analysis/24_serve_results_api.py）。
+
+- 係数（analysis/results/*coefficients*.json）・02の消費者余剰・四半期の価格の分解（税率表）・
+  シナリオの計算に使う履歴は起動時に1回だけ読み込み、リクエストごとには CSV を読みません（ResultsData）。
+  --watch を指定すると、読み込んだファイルの更新時刻が変わったときだけ読み直し、キャッシュを空にします。
+- 計算が必要な問い合わせ（β を変えた消費者余剰、税制・β・本体価格のシナリオ）の結果と、応答の本文は LRUCache に
+  保存します（件数とバイト数の上限を超えると古いものから削除）。同じ問い合わせが同時に来た場合は
+  1回だけ計算して結果を共有します。計算は asyncio.to_thread で行い、他のリクエストを止めません。
+- 応答は JSON（既定）、または ?format=arrow で Apache Arrow の IPC ストリーム（pyarrow がある場合、表のみ）。
+
+エンドポイント（GET）:
+    /health                          読み込んだファイル・キャッシュの状態
+    /coefficients[/<名前>]           係数の JSON（名前はファイル名から拡張子を除いたもの）
+    /surplus?year=2022&beta=-0.3     02の消費者余剰（beta を指定すると台形近似をその β で再計算）
+    /decomposition?period=2008Q2     四半期の税込み価格の分解と税の割合（period は '2008Q2' または '2008'）
+    /scenario?delta=-25.1&start=2026Q1&beta=-0.1,-0.3&growth=0.02
+                                     税制のシナリオ（lib/scenario_sweep.py の1セルずつ、基準は現行の税制）
+"""
+
+import asyncio
+import glob
+import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from lib.consumer_surplus import trapezoid_cs
+from lib.design import QUARTERLY_DATA_FILE
+from lib.forecast import load_history
+from lib.price_decomposition import CHANGE_LOG_FILE, QUARTERLY_TABLE_FILE, TaxSchedule, decompose_by_date, to_datetime64
+from lib.scenario_sweep import OUTPUT_COLUMNS, build_inputs, evaluate_cells
+
+RESULTS = 'analysis/results'
+CS_FILE = f'{RESULTS}/02_consumer_surplus_results.csv'
+HOST = '127.0.0.1'
+PORT = 8765
+CACHE_ENTRIES = 256
+CACHE_BYTES = 64 * 1024 * 1024
+MAX_HORIZON = 80
+MAX_ELASTICITIES = 101
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          406: 'Not Acceptable', 500: 'Internal Server Error'}
+
+
+class QueryError(Exception):
+    """問い合わせの誤り（HTTP のステータスつき）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """件数と大きさ（バイト）の上限つきの LRU キャッシュ"""
+
+    def __init__(self, max_entries=CACHE_ENTRIES, max_bytes=CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key, value, nbytes):
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+        self.entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while len(self.entries) > self.max_entries or self.nbytes > self.max_bytes:
+            self.nbytes -= self.entries.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.nbytes, 'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class ResultsData:
+    """起動時に1回だけ読み込む結果とデータ（リクエストの間は読み取り専用）"""
+
+    def __init__(self, results_dir=RESULTS, data_file=QUARTERLY_DATA_FILE):
+        self.results_dir = results_dir
+        self.data_file = data_file
+        self.load()
+
+    def load(self):
+        coefficient_files = sorted(glob.glob(os.path.join(self.results_dir, '*coefficients*.json')))
+        self.coefficients = {}
+        for path in coefficient_files:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.coefficients[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+
+        cs_file = os.path.join(self.results_dir, os.path.basename(CS_FILE))
+        self.surplus = pd.read_csv(cs_file, encoding='utf-8-sig') if os.path.exists(cs_file) else None
+        if self.surplus is not None:
+            self.surplus['Year'] = self.surplus['Year'].astype(int)
+
+        # 四半期の税込み価格の分解（税率表は四半期の表、シナリオでも同じものを使う）
+        self.schedules = {'quarterly_table': TaxSchedule.from_quarterly_table(),
+                          'change_log': TaxSchedule.from_change_log()}
+        raw = pd.read_csv(self.data_file, encoding='utf-8-sig')
+        raw = raw[raw['P (yen/liter)'].notna()]
+        periods = raw['Year'].astype(str).to_numpy()
+        price = raw['P (yen/liter)'].to_numpy(dtype=float)
+        parts = decompose_by_date(price, to_datetime64(periods), self.schedules['quarterly_table'])
+        self.decomposition = pd.DataFrame({
+            'Period': periods,
+            'Price': price,
+            'Base_Price': parts['base_price'],
+            'Excise': parts['excise'],
+            'Consumption_Tax': parts['consumption_tax'],
+            'Tax_on_Tax': parts['tax_on_tax'],
+            'Excise_Rate': parts['excise_rate'],
+            'Tax_Share': parts['effective_rate'],
+        })
+        self.history = load_history(self.data_file)
+
+        self.files = coefficient_files + [p for p in [cs_file, self.data_file, QUARTERLY_TABLE_FILE, CHANGE_LOG_FILE]
+                                          if os.path.exists(p)]
+        self.mtimes = self._mtimes()
+        self.loaded_at = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _mtimes(self):
+        files = set(self.files) | set(glob.glob(os.path.join(self.results_dir, '*coefficients*.json')))
+        return {path: os.path.getmtime(path) for path in files if os.path.exists(path)}
+
+    def changed(self):
+        """読み込んだ後にファイルが更新・追加・削除されたか（更新時刻のみで判定）"""
+        return self._mtimes() != self.mtimes
+
+
+def _values(params, name, cast=float):
+    """クエリの値（'a,b' や同じ名前の繰り返しはリスト）"""
+    values = [v for raw in params.get(name, []) for v in raw.split(',') if v != '']
+    try:
+        return [cast(v) for v in values]
+    except ValueError:
+        raise QueryError(f"{name} の値が不正です: {','.join(values)}")
+
+
+def _one(params, name, cast=float, default=None):
+    values = _values(params, name, cast)
+    if len(values) > 1:
+        raise QueryError(f"{name} は1つだけ指定してください。")
+    return values[0] if values else default
+
+
+def surplus_year(table, year):
+    """消費者余剰の表の year 年の行"""
+    table = table[table['Year'] == year]
+    if len(table) == 0:
+        raise QueryError(f"{year}年の消費者余剰はありません。", 404)
+    return table.reset_index(drop=True)
+
+
+def surplus(data, year=None, beta=None):
+    """02の消費者余剰（beta を指定すると02と同じ台形近似をその β で再計算）"""
+    if data.surplus is None:
+        raise QueryError(f"{CS_FILE} が見つかりません。先に 02_calculate_consumer_surplus.py を実行してください。", 404)
+    table = data.surplus
+    if beta is not None:
+        # 行ごとの (前年, 当年) の組で計算（02の行が連続した年でなくても同じ）
+        result = trapezoid_cs(table[['Q_prev', 'Q_curr']].to_numpy(), table[['P_prev', 'P_curr']].to_numpy(), beta)
+        table = table[['Year', 'Q_prev', 'Q_curr', 'P_prev', 'P_curr']].copy()
+        for column, values in result.items():
+            table[column] = values[:, 0]
+        table['Cumulative_CS'] = table['CS_Increase'].cumsum()
+        table.insert(1, 'beta', beta)
+    return table.reset_index(drop=True) if year is None else surplus_year(table, year)
+
+
+def decomposition(data, period=None):
+    """四半期の税込み価格の分解（period は '2008Q2'・'2008'、省略時は全期間）"""
+    table = data.decomposition
+    if period is not None:
+        period = period.upper()
+        table = table[(table['Period'] == period) | (table['Period'].str[:4] == period)]
+        if len(table) == 0:
+            raise QueryError(f"{period} の価格はありません。", 404)
+    return table.reset_index(drop=True)
+
+
+def scenario_grid(params):
+    """/scenario のクエリを scenario_sweep の格子（基準は現行の税制）に"""
+    amend = {}
+    for name, key in [('specific_tax', 'specific_tax'), ('delta', 'delta_specific_tax'), ('vat_rate', 'vat_rate')]:
+        value = _one(params, name)
+        if value is not None:
+            amend[key] = value
+    horizon = _one(params, 'horizon', int, 20)
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise QueryError(f"horizon は 1〜{MAX_HORIZON} です。")
+    elasticities = _values(params, 'beta') or [-0.1, -0.2, -0.3, -0.4, -0.5]
+    if len(elasticities) > MAX_ELASTICITIES:
+        raise QueryError(f"beta は {MAX_ELASTICITIES} 個までです。")
+    source = _one(params, 'source', str, 'quarterly_table')
+    if source not in ('quarterly_table', 'change_log'):
+        raise QueryError("source は quarterly_table・change_log のいずれかです。")
+    tax = {'source': source, 'amend': []}
+    if amend:
+        start = _one(params, 'start', str)
+        if start is None:
+            raise QueryError("税制を変える場合は start（例: 2026Q1）を指定してください。")
+        end = _one(params, 'end', str)
+        tax['amend'] = [{'start': start, **({'end': end} if end else {}), **amend}]
+    return {
+        'horizon': horizon,
+        'reference_tax': 'status_quo',
+        'tax': {'status_quo': {'source': source, 'amend': []}, 'scenario': tax},
+        'elasticity': sorted(set(elasticities)),
+        'price': {'path': {'growth': _one(params, 'growth', float, 0.0), 'shock': _one(params, 'shock', float, 0.0)}},
+    }
+
+
+def evaluate_scenario(data, grid):
+    """格子の全セル（シナリオの税制 × β）を計算して1行1セルの DataFrame に"""
+    try:
+        inputs = build_inputs(grid, data.history, data.schedules)
+    except (ValueError, KeyError) as e:
+        raise QueryError(f"シナリオが不正です: {e}")
+    elasticities = inputs['elasticities']
+    # シナリオの税制のセルだけ（セルの番号は (税制, 弾力性, 価格経路) の順、価格経路は1つ）
+    block = len(elasticities) * len(inputs['price_names'])
+    cells = inputs['tax_names'].index('scenario') * block + np.arange(block)
+    result = evaluate_cells(inputs['arrays'], elasticities, cells)
+    return pd.DataFrame({'Start': inputs['periods'][0], 'End': inputs['periods'][-1], 'Elasticity': elasticities,
+                         **{column: result[column] for column in OUTPUT_COLUMNS}})
+
+
+def _clean(value):
+    """JSON に書けない値（NaN・inf・numpy の型）を変換"""
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    return value
+
+
+def to_json(payload):
+    if isinstance(payload, pd.DataFrame):
+        return payload.to_json(orient='records', force_ascii=False).encode('utf-8')
+    return json.dumps(_clean(payload), ensure_ascii=False).encode('utf-8')
+
+
+def to_arrow(df):
+    """DataFrame を Arrow の IPC ストリームに（pyarrow が必要）"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise QueryError("format=arrow には pyarrow が必要です（pip install pyarrow）。", 406)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class QueryService:
+    """HTTP のリクエストを読み、ResultsData と LRUCache から応答するサービス"""
+
+    def __init__(self, data=None, cache_entries=CACHE_ENTRIES, cache_bytes=CACHE_BYTES, log=print):
+        self.data = data or ResultsData()
+        self.cache = LRUCache(cache_entries, cache_bytes)
+        self.pending = {}
+        self.requests = 0
+        self.log = log
+
+    async def cached(self, key, compute):
+        """key の結果（キャッシュになければ別スレッドで計算、同時の同じ問い合わせは1回だけ計算）"""
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        if key in self.pending:
+            return await asyncio.shield(self.pending[key])
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            value = await asyncio.to_thread(compute)
+            self.cache.put(key, value, int(value.memory_usage(deep=True).sum()))
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()                       # 待っているリクエストがない場合の警告を抑える
+            raise
+        finally:
+            del self.pending[key]
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'loaded_at': self.data.loaded_at,
+            'files': self.data.files,
+            'coefficients': sorted(self.data.coefficients),
+            'cache': self.cache.stats(),
+            'requests': self.requests,
+            'endpoints': ['/health', '/coefficients', '/coefficients/<name>', '/surplus', '/decomposition',
+                          '/scenario'],
+        }
+
+    async def query(self, path, params):
+        """パスとクエリから応答の内容（DataFrame または辞書）"""
+        parts = [unquote(p) for p in path.strip('/').split('/') if p]
+        if not parts or parts == ['health']:
+            return self.health()
+        if parts[0] == 'coefficients' and len(parts) <= 2:
+            if len(parts) == 1:
+                return self.data.coefficients
+            if parts[1] not in self.data.coefficients:
+                raise QueryError(f"係数 {parts[1]} はありません（{sorted(self.data.coefficients)}）。", 404)
+            return self.data.coefficients[parts[1]]
+        if parts == ['surplus']:
+            year, beta = _one(params, 'year', int), _one(params, 'beta')
+            if beta is None:
+                return surplus(self.data, year)
+            table = await self.cached(('surplus', beta), lambda: surplus(self.data, beta=beta))
+            return table if year is None else surplus_year(table, year)
+        if parts == ['decomposition']:
+            return decomposition(self.data, _one(params, 'period', str))
+        if parts == ['scenario']:
+            grid = scenario_grid(params)
+            key = ('scenario', json.dumps(grid, sort_keys=True))
+            return await self.cached(key, lambda: evaluate_scenario(self.data, grid))
+        raise QueryError(f"{path} はありません。", 404)
+
+    async def respond(self, method, target):
+        """(ステータス, Content-Type, 本文)"""
+        self.requests += 1
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        # 応答の本文もキャッシュ（/health 以外。同じ問い合わせは JSON・Arrow への変換もしない）
+        key = ('response', url.path.rstrip('/'), tuple(sorted((k, tuple(v)) for k, v in params.items())))
+        cacheable = method in ('GET', 'HEAD') and url.path.strip('/') not in ('', 'health')
+        response = self.cache.get(key) if cacheable else None
+        if response is not None:
+            return response
+        try:
+            if method not in ('GET', 'HEAD'):
+                raise QueryError("GET のみです（読み取り専用）。", 405)
+            payload = await self.query(url.path, params)
+            fmt = _one(params, 'format', str, 'json')
+            if fmt == 'arrow':
+                if not isinstance(payload, pd.DataFrame):
+                    raise QueryError("format=arrow は表の結果（surplus・decomposition・scenario）のみです。")
+                response = 200, ARROW_TYPE, to_arrow(payload)
+            elif fmt == 'json':
+                response = 200, 'application/json; charset=utf-8', to_json(payload)
+            else:
+                raise QueryError("format は json・arrow のいずれかです。")
+            if cacheable:
+                self.cache.put(key, response, len(response[2]))
+            return response
+        except QueryError as e:
+            return e.status, 'application/json; charset=utf-8', to_json({'error': str(e)})
+        except Exception as e:                         # 1つのリクエストの失敗でサービスを止めない
+            self.log(f"エラー: {target}: {e!r}")
+            return 500, 'application/json; charset=utf-8', to_json({'error': repr(e)})
+
+    async def handle(self, reader, writer):
+        """1つの接続（HTTP/1.1 の keep-alive なら続けて複数のリクエスト）"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0) or 0):
+                    await reader.readexactly(int(headers['content-length']))
+                status, content_type, body = await self.respond(method, target)
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+                writer.write((f"HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: {content_type}\r\n"
+                              f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                              "\r\n\r\n").encode('latin-1') + (b'' if method == 'HEAD' else body))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def watch(self, interval):
+        """interval 秒ごとにファイルの更新を確認し、変わっていれば読み直してキャッシュを空にする"""
+        while True:
+            await asyncio.sleep(interval)
+            if await asyncio.to_thread(self.data.changed):
+                self.data = await asyncio.to_thread(ResultsData, self.data.results_dir, self.data.data_file)
+                self.cache.clear()
+                self.log(f"結果を読み直しました（{self.data.loaded_at}）")
+
+    async def start(self, host=HOST, port=PORT):
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def fetch(host, port, target):
+    """テスト・確認用の最小の HTTP クライアント（ステータス, 本文）"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), body
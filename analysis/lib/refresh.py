@@ -0,0 +1,473 @@
+"""
+統計データの更新の取り込みと、影響を受ける処理だけの再実行（データ更新サービス）
+
+GDP速報（ESRI）・CPI（e-Stat）・週次のガソリン小売価格（石油情報センター）・販売量・税率表の
+新しいファイルを受け取り用のディレクトリ（既定 data/drop）に置くと、
+    1. ファイル名で data/ 以下の置き場所を決め（SOURCES）、SHA-256 で前回からの変更を判定
+    2. 読み込みを検証（列・日付・値の範囲・行数が減っていないか）し、問題があれば rejected/ へ
+    3. 置き換える前のファイルを archive/ に保存してから data/ に配置（GDP・CPI は公表値の履歴にも追加）
+    4. 変更されたファイルを読む処理（STAGES）と、その出力を読む後続の処理だけを実行
+します。data/ のファイルを直接書き換えた場合もハッシュの変化で検出します。
+
+処理の依存関係は STAGES の各処理が読む・書くファイルから決めます。同じファイルを書く処理
+（demand_regression_data_raw.csv を更新する add_*_data など）は STAGES の順に1つずつ、
+関係のない処理（04・11・12 の図など）は asyncio のサブプロセスとして workers 個まで同時に実行します。
+"""
+
+import asyncio
+import fnmatch
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+from lib.backfill import BACKFILL_LOG_FILE, MANIFEST_FILE as BACKFILL_MANIFEST_FILE
+from lib.data_plane import PRICE_PANEL_FILE
+from lib.design import ANNUAL_DATA_FILE, LOG_TRANSFORMED_FILE, MONTHLY_DATA_FILE, QUARTERLY_DATA_FILE
+from lib.frequency import MONTHLY_SALES_FILE
+from lib.price_decomposition import CHANGE_LOG_FILE, QUARTERLY_TABLE_FILE
+from lib.results_store import file_hash
+from lib.vintage_store import VintageStore
+
+DROP_DIR = 'data/drop'
+STATE_FILE = 'analysis/results/refresh_state.json'
+LOG_DIR = 'analysis/results/refresh_logs'
+
+GDP_REAL_FILE = 'data/1994-2025_GDP四半期ごと/自由帳 - 実質原系列1994-2025.csv'
+GDP_FILE = 'data/1994-2025_GDP四半期ごと/gaku-jg2522.csv'
+CPI_MONTHLY_FILE = 'data/-2025消費者物価指数/自由帳 - zmi2020s.csv'
+CPI_ITEMS_FILE = 'data/-2025消費者物価指数/自由帳 - zni2020a-品目別.csv'
+CPI_QUARTERLY_FILE = 'data/-2025消費者物価指数/CPI_quarterly.csv'
+SALES_FILE = 'data/2007-2024ガソリン販売量/四半期データ_まとめ.csv'
+ANNUAL_FILE = 'demand_regression_data_annual.csv'
+
+RESULTS = 'analysis/results'
+COEFFICIENTS_FILE = f'{RESULTS}/01_coefficients_annual_level_model.json'
+ANALYSIS_DATA_FILE = f'{RESULTS}/01_analysis_data_annual_level_model.csv'
+CS_FILE = f'{RESULTS}/02_consumer_surplus_results.csv'
+CPI_CONTRIBUTION_FILE = f'{RESULTS}/04_cpi_contribution_analysis.csv'
+
+
+# ---- 受け取るファイルの検証（戻り値: (データ行数, 問題のリスト)） ----
+
+def _read_text(path, encodings=('utf-8-sig', 'cp932', 'shift-jis')):
+    for encoding in encodings:
+        try:
+            with open(path, 'r', encoding=encoding) as f:
+                return f.read()
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def _validate_gdp(path):
+    text = _read_text(path)
+    if text is None:
+        return 0, ['文字コードを判別できません。']
+    # 「1994/ 1- 3.」「4- 6.」形式の四半期の行
+    rows = [line for line in text.splitlines() if re.match(r'^"?(\d{4}/\s*)?\d{1,2}-\s*\d{1,2}\.', line)]
+    issues = [] if len(rows) >= 8 else [f'四半期の行が {len(rows)} 行しかありません。']
+    return len(rows), issues
+
+
+def _validate_cpi_monthly(path):
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    if '類・品目' not in df.columns or '総合' not in df.columns:
+        return 0, ['列「類・品目」「総合」がありません。']
+    data = df[df['類・品目'].astype(str).str.match(r'^\d{6}$', na=False)]
+    issues = []
+    if len(data) < 12:
+        issues.append(f'年月（YYYYMM）の行が {len(data)} 行しかありません。')
+    index = pd.to_numeric(data['総合'], errors='coerce')
+    if index.isna().any() or not index.between(50, 200).all():
+        issues.append('総合指数に欠損または範囲外（50〜200）の値があります。')
+    return len(data), issues
+
+
+def _validate_price_weekly(path):
+    df = pd.read_csv(path, encoding='utf-8', skiprows=2, header=None)
+    dates = pd.to_datetime(df.iloc[:, 1], format='%Y/%m/%d', errors='coerce')
+    prices = pd.to_numeric(df.iloc[:, 2], errors='coerce')
+    valid = dates.notna() & prices.notna()
+    issues = []
+    if valid.sum() == 0:
+        return 0, ['調査日（YYYY/MM/DD）と全国の価格の行がありません。']
+    if not dates[valid].is_monotonic_increasing:
+        issues.append('調査日が昇順になっていません。')
+    if not prices[valid].between(50, 400).all():
+        issues.append('全国の価格に範囲外（50〜400円/L）の値があります。')
+    return int(valid.sum()), issues
+
+
+def _validate_sales(path):
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    missing = {'Year', 'Quarter', 'Q (liters)'} - set(df.columns)
+    if missing:
+        return 0, [f'列がありません: {sorted(missing)}']
+    q = pd.to_numeric(df['Q (liters)'], errors='coerce')
+    issues = [] if (q.dropna() > 0).all() else ['Q (liters) に 0 以下の値があります。']
+    return int(q.notna().sum()), issues
+
+
+def _validate_tax(path):
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    missing = {'Year_Quarter', '合計従量税率_円L', '消費税率_%'} - set(df.columns)
+    if missing:
+        return 0, [f'列がありません: {sorted(missing)}']
+    issues = []
+    if not df['Year_Quarter'].astype(str).str.match(r'^\d{4}-Q[1-4]$').all():
+        issues.append('Year_Quarter が YYYY-Qn 形式ではありません。')
+    if (pd.to_numeric(df['合計従量税率_円L'], errors='coerce') < 0).any():
+        issues.append('合計従量税率_円L に負の値があります。')
+    return len(df), issues
+
+
+def _validate_readable(path):
+    text = _read_text(path)
+    if text is None:
+        return 0, ['文字コードを判別できません。']
+    lines = [line for line in text.splitlines() if line.strip()]
+    return len(lines), [] if lines else ['空のファイルです。']
+
+
+# 受け取るファイル: 名前 → (data/ 以下の置き場所, ファイル名のパターン, 検証)
+SOURCES = {
+    'gdp_real': (GDP_REAL_FILE, ['*実質原系列*.csv'], _validate_gdp),
+    'gdp': (GDP_FILE, ['gaku-jg*.csv'], _validate_gdp),
+    'cpi_monthly': (CPI_MONTHLY_FILE, ['*zmi2020s*.csv'], _validate_cpi_monthly),
+    'cpi_items': (CPI_ITEMS_FILE, ['*zni2020a*.csv'], _validate_readable),
+    'price_weekly': (PRICE_PANEL_FILE, ['*レギュラー現金価格*.csv'], _validate_price_weekly),
+    'sales': (SALES_FILE, ['四半期データ_まとめ*.csv'], _validate_sales),
+    'tax': (QUARTERLY_TABLE_FILE, ['gasoline_tax_quarterly*.csv'], _validate_tax),
+}
+
+# 受け取ったら公表値の履歴（lib/vintage_store.py）にも追加するファイル: 名前 → 系列
+VINTAGE_SERIES = {'gdp_real': 'gdp', 'gdp': 'gdp', 'cpi_monthly': 'cpi'}
+
+
+def match_source(filename):
+    """受け取ったファイル名に対応する SOURCES の名前（なければ None）"""
+    for name, (_, patterns, _) in SOURCES.items():
+        if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns):
+            return name
+    return None
+
+
+def validate(name, path):
+    """SOURCES の検証に加え、今のファイルよりデータ行が減っていないかを確認"""
+    destination, _, validator = SOURCES[name]
+    try:
+        rows, issues = validator(path)
+    except Exception as e:            # 読み込めないファイル
+        return 0, [f'読み込みに失敗しました: {e}']
+    if not issues and os.path.exists(destination):
+        try:
+            current, _ = validator(destination)
+        except Exception:
+            current = 0
+        if rows < current:
+            issues.append(f'データ行が減っています（{current} → {rows} 行）。')
+    return rows, issues
+
+
+# ---- 処理（順序つき）。inputs: 変わると再実行するファイル、updates: 読んで書き換えるファイル ----
+
+def _stage(script, inputs=(), updates=(), outputs=(), args=()):
+    return {'script': script, 'inputs': list(inputs), 'updates': list(updates), 'outputs': list(outputs),
+            'args': list(args)}
+
+
+PREP = 'scripts/data_preparation'
+STAGES = {
+    'add_gdp_data': _stage(f'{PREP}/add_gdp_data.py', [GDP_REAL_FILE, GDP_FILE], [QUARTERLY_DATA_FILE]),
+    'add_price_data_1990': _stage(f'{PREP}/add_price_data_1990.py', [PRICE_PANEL_FILE], [QUARTERLY_DATA_FILE]),
+    '02_complete_consumption_data': _stage(f'{PREP}/02_complete_consumption_data.py', [SALES_FILE],
+                                           [QUARTERLY_DATA_FILE]),
+    'add_tax_rate_data': _stage(f'{PREP}/add_tax_rate_data.py', [QUARTERLY_TABLE_FILE], [QUARTERLY_DATA_FILE]),
+    '03_fix_units': _stage(f'{PREP}/03_fix_units.py', [QUARTERLY_DATA_FILE], [QUARTERLY_DATA_FILE]),
+    '04_process_cpi_data': _stage(f'{PREP}/04_process_cpi_data.py', [CPI_MONTHLY_FILE],
+                                  outputs=[CPI_QUARTERLY_FILE]),
+    '05_add_cpi_and_relative_price': _stage(f'{PREP}/05_add_cpi_and_relative_price.py',
+                                            [CPI_QUARTERLY_FILE, QUARTERLY_DATA_FILE], [QUARTERLY_DATA_FILE]),
+    '00_prepare_log_transformed_data': _stage(f'{PREP}/00_prepare_log_transformed_data.py',
+                                              [QUARTERLY_DATA_FILE], outputs=[LOG_TRANSFORMED_FILE]),
+    '06_aggregate_to_annual_data': _stage(f'{PREP}/06_aggregate_to_annual_data.py', [QUARTERLY_DATA_FILE],
+                                          outputs=[ANNUAL_FILE]),
+    '07_prepare_annual_log_transformed_data': _stage(f'{PREP}/07_prepare_annual_log_transformed_data.py',
+                                                     [ANNUAL_FILE], outputs=[ANNUAL_DATA_FILE]),
+    '08_build_frequency_data': _stage(f'{PREP}/08_build_frequency_data.py',
+                                      [PRICE_PANEL_FILE, CPI_MONTHLY_FILE, MONTHLY_SALES_FILE, QUARTERLY_DATA_FILE,
+                                       CHANGE_LOG_FILE], outputs=[MONTHLY_DATA_FILE]),
+    '09_backfill_historical_data': _stage(f'{PREP}/09_backfill_historical_data.py',
+                                          [ANNUAL_FILE, BACKFILL_MANIFEST_FILE, CHANGE_LOG_FILE],
+                                          outputs=[BACKFILL_LOG_FILE]),
+    # 再推定と図
+    '01_estimate_demand_function': _stage('analysis/01_estimate_demand_function_annual_level_model.py',
+                                          [ANNUAL_DATA_FILE], outputs=[COEFFICIENTS_FILE, ANALYSIS_DATA_FILE]),
+    '02_calculate_consumer_surplus': _stage('analysis/02_calculate_consumer_surplus.py',
+                                            [COEFFICIENTS_FILE, ANALYSIS_DATA_FILE], outputs=[CS_FILE]),
+    '03_visualize_results': _stage('analysis/03_visualize_results.py',
+                                   [COEFFICIENTS_FILE, ANALYSIS_DATA_FILE, CS_FILE]),
+    '04_analyze_cpi_contribution': _stage('analysis/04_analyze_cpi_contribution.py',
+                                          [CPI_ITEMS_FILE, QUARTERLY_DATA_FILE, QUARTERLY_TABLE_FILE],
+                                          outputs=[CPI_CONTRIBUTION_FILE]),
+    '05_create_additional_graphs': _stage('analysis/05_create_additional_graphs.py',
+                                          [CS_FILE, CPI_CONTRIBUTION_FILE]),
+    '06_simulate_fixed_vs_advalorem_tax': _stage('analysis/06_simulate_fixed_vs_advalorem_tax.py',
+                                                 [CPI_CONTRIBUTION_FILE, ANNUAL_FILE]),
+    '10_calculate_exact_consumer_surplus': _stage('analysis/10_calculate_exact_consumer_surplus.py',
+                                                  [COEFFICIENTS_FILE, ANALYSIS_DATA_FILE, CPI_CONTRIBUTION_FILE]),
+    '11_analyze_tax_incidence': _stage('analysis/11_analyze_tax_incidence.py',
+                                       [QUARTERLY_DATA_FILE, QUARTERLY_TABLE_FILE, COEFFICIENTS_FILE]),
+    '12_forecast_demand_and_tax_revenue': _stage('analysis/12_forecast_demand_and_tax_revenue.py',
+                                                 [QUARTERLY_DATA_FILE, QUARTERLY_TABLE_FILE, COEFFICIENTS_FILE]),
+    '15_backtest_demand_models': _stage('analysis/15_backtest_demand_models.py',
+                                        [ANNUAL_DATA_FILE, QUARTERLY_DATA_FILE, QUARTERLY_TABLE_FILE]),
+    '16_estimate_difference_model': _stage('analysis/16_estimate_difference_model.py', [LOG_TRANSFORMED_FILE]),
+    '16_estimate_difference_model_monthly': _stage('analysis/16_estimate_difference_model.py', [MONTHLY_DATA_FILE],
+                                                   args=['--frequency', 'monthly']),
+    '17_estimate_price_asymmetry': _stage('analysis/17_estimate_price_asymmetry.py', [PRICE_PANEL_FILE]),
+    '18_estimate_tax_event_study': _stage('analysis/18_estimate_tax_event_study.py',
+                                          [PRICE_PANEL_FILE, CHANGE_LOG_FILE, QUARTERLY_TABLE_FILE]),
+    '19_analyze_regional_prices': _stage('analysis/19_analyze_regional_prices.py', [PRICE_PANEL_FILE]),
+    '20_decompose_cpi_energy_tax': _stage('analysis/20_decompose_cpi_energy_tax.py',
+                                          [CPI_ITEMS_FILE, CPI_MONTHLY_FILE, PRICE_PANEL_FILE, CHANGE_LOG_FILE]),
+    '21_estimate_midas_demand': _stage('analysis/21_estimate_midas_demand.py',
+                                       [QUARTERLY_DATA_FILE, PRICE_PANEL_FILE, CPI_MONTHLY_FILE]),
+    '22_temporal_disaggregation': _stage('analysis/22_temporal_disaggregation.py',
+                                         [QUARTERLY_DATA_FILE, CPI_MONTHLY_FILE, MONTHLY_SALES_FILE]),
+    '01_estimate_demand_function_backfill': _stage('analysis/01_estimate_demand_function_annual_level_model.py',
+                                                   [BACKFILL_LOG_FILE], args=['--backfill']),
+    '23_build_report': _stage('analysis/23_build_report.py', [COEFFICIENTS_FILE, CS_FILE, CPI_CONTRIBUTION_FILE]),
+}
+
+
+def _writes(stage):
+    return set(stage['updates']) | set(stage['outputs'])
+
+
+def _reads(stage):
+    return set(stage['inputs']) | set(stage['updates'])
+
+
+def plan(changed_files, stages=STAGES):
+    """
+    変更されたファイルから再実行する処理を STAGES の順に決める
+
+    処理は、読むファイル（inputs）が変更されたか、それより前の再実行する処理が書いたときに再実行します。
+    戻り値: 処理の名前のリスト
+    """
+    dirty = {os.path.normpath(f) for f in changed_files}
+    selected = []
+    for name, stage in stages.items():
+        if dirty & {os.path.normpath(f) for f in stage['inputs']}:
+            selected.append(name)
+            dirty |= {os.path.normpath(f) for f in _writes(stage)}
+    return selected
+
+
+def dependencies(selected, stages=STAGES):
+    """
+    再実行する処理ごとに、先に終わっている必要がある処理の集合
+
+    前の処理が書くファイルを読む・書く場合と、前の処理が読むファイルを書く場合に依存します。
+    """
+    deps = {}
+    for i, name in enumerate(selected):
+        stage = stages[name]
+        deps[name] = {
+            prev for prev in selected[:i]
+            if _writes(stages[prev]) & (_reads(stage) | _writes(stage)) or _reads(stages[prev]) & _writes(stage)
+        }
+    return deps
+
+
+async def run_stages(selected, workers=None, log_dir=LOG_DIR, stages=STAGES, report=None):
+    """
+    処理を依存関係の順に、同時に workers 個までのサブプロセスで実行
+
+    失敗した処理に依存する処理は実行しません（skipped）。
+    report: 処理が終わるたびに呼ぶ関数 report(名前, 結果の辞書)
+    戻り値: {名前: {'status': 'ok' | 'failed' | 'skipped', 'elapsed': 秒, 'log': ログファイル}}
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(workers or os.cpu_count() or 1)
+    deps = dependencies(selected, stages)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    results = {}
+    tasks = {}
+
+    async def run(name):
+        waited = await asyncio.gather(*(tasks[d] for d in deps[name]))
+        if any(r['status'] != 'ok' for r in waited):
+            results[name] = {'status': 'skipped', 'elapsed': 0.0, 'log': None}
+        else:
+            log_file = os.path.join(log_dir, f'{stamp}_{name}.log')
+            async with semaphore:
+                start = time.perf_counter()
+                with open(log_file, 'wb') as log:
+                    process = await asyncio.create_subprocess_exec(
+                        sys.executable, stages[name]['script'], *stages[name].get('args', []), stdout=log, stderr=asyncio.subprocess.STDOUT,
+                        env={**os.environ, 'MPLBACKEND': 'Agg'})
+                    code = await process.wait()
+                results[name] = {'status': 'ok' if code == 0 else 'failed',
+                                 'elapsed': time.perf_counter() - start, 'log': log_file}
+        if report is not None:
+            report(name, results[name])
+        return results[name]
+
+    for name in selected:
+        tasks[name] = asyncio.ensure_future(run(name))
+    await asyncio.gather(*tasks.values())
+    return results
+
+
+class RefreshService:
+    """
+    受け取り用ディレクトリの監視と、変更されたデータの取り込み・処理の再実行
+
+    状態（data/ のファイルごとのハッシュ・更新時刻・サイズ）は state_file に保存します。
+    初回（状態にないファイル）は今のハッシュを記録するだけで、処理は実行しません。
+    """
+
+    def __init__(self, drop_dir=DROP_DIR, state_file=STATE_FILE, workers=None, settle=1.0, log=print):
+        self.drop_dir = drop_dir
+        self.state_file = state_file
+        self.workers = workers
+        self.settle = settle
+        self.log = log
+        self.state = {'files': {}, 'runs': []}
+        if os.path.exists(state_file):
+            with open(state_file, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        for sub in ('processed', 'archive', 'rejected'):
+            os.makedirs(os.path.join(drop_dir, sub), exist_ok=True)
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+
+    async def _hash(self, path):
+        return await asyncio.to_thread(file_hash, path)
+
+    async def _record(self, path):
+        stat = os.stat(path)
+        self.state['files'][path] = {'hash': await self._hash(path), 'mtime': stat.st_mtime, 'size': stat.st_size}
+
+    async def ingest_drops(self):
+        """受け取り用ディレクトリのファイルを検証して data/ に配置（戻り値: 変更された data/ のファイル）"""
+        changed = []
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        for entry in sorted(os.scandir(self.drop_dir), key=lambda e: e.name):
+            if not entry.is_file() or entry.name.startswith('.'):
+                continue
+            if time.time() - entry.stat().st_mtime < self.settle:
+                continue                   # 書き込み中の可能性があるので次の確認で処理
+            name = match_source(entry.name)
+            if name is None:
+                self.log(f"  対応する置き場所がないファイル: {entry.name}")
+                self._move(entry.path, 'rejected', stamp, ['対応する置き場所がありません（lib/refresh.py の SOURCES）。'])
+                continue
+            destination = SOURCES[name][0]
+            digest = await self._hash(entry.path)
+            if os.path.exists(destination) and digest == await self._hash(destination):
+                self.log(f"  {entry.name}: 変更なし")
+                self._move(entry.path, 'processed', stamp)
+                continue
+            rows, issues = await asyncio.to_thread(validate, name, entry.path)
+            if issues:
+                self.log(f"  {entry.name}: 検証エラー（rejected/ に移動）")
+                for issue in issues:
+                    self.log(f"    - {issue}")
+                self._move(entry.path, 'rejected', stamp, issues)
+                continue
+            if os.path.exists(destination):
+                shutil.copy2(destination, os.path.join(self.drop_dir, 'archive',
+                                                       f'{stamp}_{os.path.basename(destination)}'))
+            shutil.copy2(entry.path, destination)
+            self._move(entry.path, 'processed', stamp)
+            await self._record(destination)
+            self.log(f"  {entry.name} → {destination}（{rows}行）")
+            if name in VINTAGE_SERIES:
+                release, n_changed = await asyncio.to_thread(
+                    VintageStore().record_file, VINTAGE_SERIES[name], destination, date.today().isoformat())
+                self.log(f"    ビンテージ {VINTAGE_SERIES[name]} {release}: {n_changed}期間が新規・改定")
+            changed.append(destination)
+        return changed
+
+    def _move(self, path, sub, stamp, issues=None):
+        target = os.path.join(self.drop_dir, sub, f'{stamp}_{os.path.basename(path)}')
+        shutil.move(path, target)
+        if issues:
+            with open(target + '.txt', 'w', encoding='utf-8') as f:
+                f.write('\n'.join(issues) + '\n')
+
+    async def detect_changes(self):
+        """data/ のファイルを直接書き換えた場合の検出（更新時刻・サイズが変わったものだけハッシュを計算）"""
+        changed = []
+        for path in sorted({f for stage in STAGES.values() for f in stage['inputs']} |
+                           {source[0] for source in SOURCES.values()}):
+            if not os.path.exists(path):
+                continue
+            stat = os.stat(path)
+            known = self.state['files'].get(path)
+            if known and known['mtime'] == stat.st_mtime and known['size'] == stat.st_size:
+                continue
+            digest = await self._hash(path)
+            if known is not None and known['hash'] != digest:
+                changed.append(path)
+            self.state['files'][path] = {'hash': digest, 'mtime': stat.st_mtime, 'size': stat.st_size}
+        return changed
+
+    async def refresh(self, changed):
+        """変更されたファイルから処理を決めて実行し、処理が書き換えたファイルの状態も記録"""
+        selected = plan(changed)
+        if not selected:
+            return {}
+        self.log(f"  再実行: {' → '.join(selected)}")
+        start = time.perf_counter()
+
+        def report(name, result):
+            mark = {'ok': '完了', 'failed': '失敗', 'skipped': 'スキップ'}[result['status']]
+            detail = f"（{result['elapsed']:.1f}秒）" if result['status'] != 'skipped' else ''
+            log_note = f" ログ: {result['log']}" if result['status'] == 'failed' else ''
+            self.log(f"    {name}: {mark}{detail}{log_note}")
+
+        results = await run_stages(selected, workers=self.workers, report=report)
+        elapsed = time.perf_counter() - start
+        for name in selected:
+            for path in _writes(STAGES[name]):
+                if os.path.exists(path):
+                    await self._record(path)
+        self.state['runs'] = (self.state.get('runs', []) + [{
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'changed': changed,
+            'stages': {name: r['status'] for name, r in results.items()},
+            'elapsed': round(elapsed, 2),
+        }])[-100:]
+        self.save_state()
+        n_ok = sum(r['status'] == 'ok' for r in results.values())
+        self.log(f"  {n_ok}/{len(results)} 処理が完了（{elapsed:.1f}秒）")
+        return results
+
+    async def run_once(self):
+        changed = await self.ingest_drops()
+        changed = list(dict.fromkeys(changed + await self.detect_changes()))
+        self.save_state()
+        if changed:
+            self.log(f"\n[{datetime.now():%H:%M:%S}] 変更されたファイル: {len(changed)}件")
+            for path in changed:
+                self.log(f"  - {path}")
+            return await self.refresh(changed)
+        return {}
+
+    async def run_forever(self, interval=2.0):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(interval)
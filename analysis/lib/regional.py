@@ -0,0 +1,188 @@
+"""
+週次の都道府県別価格の地域間のばらつき・収束・価格の先導関係
+
+- dispersion(): 週ごとの地域間のばらつき（変動係数・ジニ係数・四分位範囲・最大−最小）を配列のまま計算
+- sigma_convergence(): ばらつき（対数価格の標準偏差）の時間トレンド（HAC 標準誤差、lib/hac.py）
+- beta_convergence(): 全国平均からの乖離 d_rt の自己回帰 Δd_rt = a_r + β d_{r,t−1} + e_rt
+  （β < 0 なら乖離が縮む。地域ごとの β は一括の正規方程式、全体の β は Driscoll–Kraay の標準誤差）
+- cross_correlations(): 全ての地域の組の価格の変化の相互相関 ρ_ij(k) = corr(x_i,t, x_j,t+k)、k = −K..K
+  地域ごとの FFT を1回だけ計算し、クロススペクトルを地域のブロックごとに逆 FFT します
+  （O(地域² × 週 log 週)。組×ラグ×週のループは不要）。k > 0 で相関が大きければ i が j を先導します。
+- lead_lag(): 組ごとの相関が最大のラグ（k ≠ 0）と、地域ごとの先導の指標
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from lib.data_plane import load_price_panel
+from lib.hac import driscoll_kraay_cov, ols_hac
+
+NATIONAL = '全国'
+PREFECTURE_START = '2004-06-14'     # 都道府県別の調査の開始
+
+
+def regional_panel(level='prefecture', start=PREFECTURE_START, end=None):
+    """
+    週次の地域別価格（level: 'prefecture' は都道府県、'bureau' は地方局）
+
+    欠損は地域ごとに前後の週から線形補間し、補間できない先頭・末尾の週は除きます。
+    戻り値: (調査日 (T,), 地域名 (R,), 価格 (T, R))
+    """
+    dates, regions, prices = load_price_panel()
+    bureau = np.char.endswith(regions.astype(str), '局')
+    columns = (bureau if level == 'bureau' else ~bureau) & (regions != NATIONAL)
+    keep = dates >= np.datetime64(start)
+    if end is not None:
+        keep &= dates <= np.datetime64(end)
+    frame = pd.DataFrame(prices[keep][:, columns]).interpolate(limit_area='inside')
+    complete = frame.notna().all(axis=1).to_numpy()
+    return dates[keep][complete], regions[columns], frame.to_numpy()[complete]
+
+
+def gini(prices):
+    """週ごとの地域間のジニ係数（prices: (T, R)、各行を昇順に並べた式 Σ(2i − R − 1) x_(i) / (R Σx)）"""
+    x = np.sort(prices, axis=1)
+    R = x.shape[1]
+    weights = 2 * np.arange(1, R + 1) - R - 1
+    return (x @ weights) / (R * x.sum(axis=1))
+
+
+def dispersion(dates, prices):
+    """週ごとの地域間のばらつき（DataFrame）"""
+    mean = prices.mean(axis=1)
+    std = prices.std(axis=1)
+    q25, q75 = np.percentile(prices, [25, 75], axis=1)
+    return pd.DataFrame({
+        'Date': dates,
+        'Mean': mean,
+        'Std': std,
+        'CV': std / mean,
+        'Gini': gini(prices),
+        'IQR': q75 - q25,
+        'Range': prices.max(axis=1) - prices.min(axis=1),
+        'Std_Log': np.log(prices).std(axis=1),
+    })
+
+
+def sigma_convergence(dates, prices, kernel='bartlett'):
+    """
+    σ収束: 対数価格の地域間の標準偏差の時間トレンド（年あたり）
+
+    戻り値: 辞書（slope: 年あたりの変化、bse・pvalue: HAC、start・end: 最初と最後の年の平均）
+    """
+    sd = np.log(prices).std(axis=1)
+    years = (dates - dates[0]).astype(float) / 365.25
+    X = np.column_stack([np.ones(len(sd)), years])
+    fit = ols_hac(sd, X, kernel=kernel)
+    year = dates.astype('datetime64[Y]')
+    return {
+        'slope': fit['params'][1], 'bse': fit['bse'][1], 'pvalue': fit['pvalues'][1],
+        'bandwidth': fit['bandwidth'],
+        'start': sd[year == year[0]].mean(), 'end': sd[year == year[-1]].mean(),
+    }
+
+
+def beta_convergence(prices, step=1):
+    """
+    β収束: 全国平均（地域の平均）からの対数価格の乖離 d_rt の自己回帰
+
+        Δd_rt = a_r + β d_{r,t−step} + e_rt     （step 週ごとの変化）
+
+    地域ごとの β は (地域, 週, 2) の配列の正規方程式を一括で解き、全体の β は地域の固定効果を除いた
+    プールの推定（Driscoll–Kraay の標準誤差）です。半減期は ln 0.5 / ln(1 + β)（週）。
+    戻り値: 辞書（beta・bse・pvalue・half_life: 全体、by_region: (R,) の β、half_life_by_region）
+    """
+    logp = np.log(prices)
+    d = logp - logp.mean(axis=1, keepdims=True)
+    lagged = d[:-step]
+    change = d[step:] - d[:-step]
+    T, R = change.shape
+
+    X = np.stack([np.ones((R, T)), lagged.T], axis=-1)          # (R, T, 2)
+    XtX = np.einsum('rtk,rtl->rkl', X, X)
+    Xty = np.einsum('rtk,rt->rk', X, change.T)
+    by_region = np.linalg.solve(XtX, Xty[..., None])[..., 0][:, 1]
+
+    # 固定効果を除いたプールの推定
+    x = (lagged - lagged.mean(axis=0)).T.ravel()
+    y = (change - change.mean(axis=0)).T.ravel()
+    beta = (x @ y) / (x @ x)
+    resid = y - beta * x
+    time = np.tile(np.arange(T), R)
+    cov, _, _ = driscoll_kraay_cov(x[:, None], resid, time)
+    bse = float(np.sqrt(cov[0, 0]))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        half_life = np.log(0.5) / np.log1p(np.array([beta, *by_region])) * step
+    return {
+        'beta': beta, 'bse': bse, 'pvalue': 2 * stats.norm.sf(abs(beta / bse)),
+        'half_life': half_life[0], 'by_region': by_region, 'half_life_by_region': half_life[1:],
+    }
+
+
+def cross_correlations(x, max_lag, block=16):
+    """
+    全ての組の相互相関 ρ_ij(k) = corr(x_i,t, x_j,t+k)（k = −max_lag..max_lag）
+
+    x: (T, R)。各列を標準化して FFT を1回だけ計算し、i のブロックごとに
+    クロススペクトル conj(X_i) X_j を逆 FFT します（メモリは (FFT の長さ, block, R)）。
+    戻り値: (2 max_lag + 1, R, R)
+    """
+    x = np.asarray(x, dtype=float)
+    T, R = x.shape
+    z = (x - x.mean(axis=0)) / x.std(axis=0)
+    n_fft = 1 << int(np.ceil(np.log2(T + max_lag)))
+    spectrum = np.fft.rfft(z, n=n_fft, axis=0)                   # (F, R)
+    out = np.empty((2 * max_lag + 1, R, R))
+    for i0 in range(0, R, block):
+        i1 = min(i0 + block, R)
+        cross = np.fft.irfft(spectrum[:, i0:i1, None].conj() * spectrum[:, None, :], n=n_fft, axis=0)
+        # cross[k] = Σ_t z_i,t z_j,t+k（k < 0 は末尾に巡回）
+        out[max_lag:, i0:i1] = cross[:max_lag + 1]
+        out[:max_lag, i0:i1] = cross[n_fft - max_lag:]
+    return out / T
+
+
+def lead_lag(x, regions, max_lag=8):
+    """
+    価格の先導関係
+
+    同時点の相関が最も大きいのが普通なので、先導はラグ k ≠ 0 の中で相関が最大のラグ k* と、
+    その反対のラグとの差 ρ_ij(k*) − ρ_ij(−k*)（近似の標準誤差 √(2/T)）で判定します。
+    x: 週次の価格の変化 (T, R)
+    戻り値: (組ごとの表, 地域ごとの表, 相互相関 (2K+1, R, R))
+        組: 同時点の相関, k ≠ 0 で相関が最大のラグ（> 0 なら i が先導）, その相関, 反対のラグとの差,
+            先導の非対称 Σ_{k>0} ρ − Σ_{k<0} ρ
+        地域: 有意に先導する・先導される地域の数（差が 2√(2/T) を超える組）、非対称の平均
+    """
+    T, R = x.shape
+    rho = cross_correlations(x, max_lag)
+    lags = np.arange(-max_lag, max_lag + 1)
+    lagged = np.where((lags != 0)[:, None, None], rho, -np.inf)
+    best = np.argmax(lagged, axis=0)                             # (R, R)
+    best_lag = lags[best]
+    best_rho = np.take_along_axis(rho, best[None], axis=0)[0]
+    mirror_rho = np.take_along_axis(rho, (2 * max_lag - best)[None], axis=0)[0]
+    gap = best_rho - mirror_rho
+    asymmetry = rho[lags > 0].sum(axis=0) - rho[lags < 0].sum(axis=0)
+    i, j = np.triu_indices(R, k=1)
+    pairs = pd.DataFrame({
+        'Region_i': regions[i], 'Region_j': regions[j],
+        'Corr_0': rho[max_lag][i, j],
+        'Best_Lag': best_lag[i, j],
+        'Best_Corr': best_rho[i, j],
+        'Mirror_Gap': gap[i, j],
+        'Lead_Asymmetry': asymmetry[i, j],
+    })
+    off_diagonal = ~np.eye(R, dtype=bool)
+    significant = (gap > 2 * np.sqrt(2 / T)) & off_diagonal
+    leads = significant & (best_lag > 0)
+    led = significant & (best_lag < 0)
+    leadership = pd.DataFrame({
+        'Region': regions,
+        'Leads': leads.sum(axis=1),
+        'Led_By': led.sum(axis=1),
+        'Net_Leads': leads.sum(axis=1) - led.sum(axis=1),
+        'Mean_Lead_Asymmetry': np.where(off_diagonal, asymmetry, 0).sum(axis=1) / (R - 1),
+    }).sort_values(['Net_Leads', 'Mean_Lead_Asymmetry'], ascending=False).reset_index(drop=True)
+    return pairs, leadership, rho
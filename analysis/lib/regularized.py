@@ -0,0 +1,231 @@
+"""
+正則化回帰（リッジ・ラッソ・エラスティックネット）
+
+目的関数（glmnetと同じ定式化、説明変数は標準化済み）:
+    1/(2n)×||y − Zb||² + λ×{ l1_ratio×Σ pf_j|b_j| + (1 − l1_ratio)/2 × Σ pf_j b_j² }
+
+- ラッソ・エラスティックネットは共分散更新型の座標降下法で解きます。
+  グラム行列 G = Z'Z/n と c = Z'y/n を最初に1回だけ計算し、
+  反復中は勾配ベクトル c − Gb を列ごとに更新するだけなので、観測数に依存しません。
+  数回の更新ごとに非ゼロ係数の集合を固定した KKT 方程式を直接解き、収束を早めます。
+- λの経路は大きい値から順に、直前の解を初期値（ウォームスタート）として計算します。
+- リッジ（l1_ratio = 0）は G の固有値分解を1回行い、全λの解を閉じた形で一度に計算します。
+- 時系列の交差検証は、拡大ウィンドウ（過去のみで学習し、直後の期間で評価）で行います。
+"""
+
+import numpy as np
+
+
+def _standardize(X, y):
+    """説明変数を平均0・分散1に、被説明変数を平均0に基準化"""
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x_mean = X.mean(axis=0)
+    x_std = X.std(axis=0)
+    x_std = np.where(x_std > 0, x_std, 1.0)
+    y_mean = y.mean()
+    return (X - x_mean) / x_std, y - y_mean, x_mean, x_std, y_mean
+
+
+def lambda_grid(c, pf, l1_ratio, n_lambdas=100, eps=1e-4):
+    """λの格子（最大値から対数等間隔）。最大値はすべての係数が0になる最小のλ"""
+    active = pf > 0
+    lam_max = np.max(np.abs(c[active]) / pf[active]) / max(l1_ratio, 1e-3)
+    return lam_max * np.logspace(0, np.log10(eps), n_lambdas)
+
+
+def _kkt_solve(G, c, b, lam, l1_ratio, pf, tol):
+    """
+    現在の非ゼロ係数の集合と符号を固定して KKT 条件を直接解き、条件を満たせば解を返す
+
+    非ゼロの集合 A では (G_AA + λ(1−l1_ratio)diag(pf_A)) b_A = c_A − λ×l1_ratio×pf_A×sign(b_A)
+    が成り立つので、集合と符号が正しければ座標降下を収束まで回す必要がありません。
+    """
+    active = b != 0
+    if not active.any():
+        ok = np.all(np.abs(c) <= lam * l1_ratio * pf + tol)
+        return (b.copy() if ok else None)
+    A = np.where(active)[0]
+    sign = np.sign(b[A])
+    lhs = G[np.ix_(A, A)] + np.diag(lam * (1 - l1_ratio) * pf[A])
+    rhs = c[A] - lam * l1_ratio * pf[A] * sign
+    try:
+        b_A = np.linalg.solve(lhs, rhs)
+    except np.linalg.LinAlgError:
+        return None
+    if np.any(np.sign(b_A) != sign):
+        return None
+    b_new = np.zeros_like(b)
+    b_new[A] = b_A
+    inactive = ~active
+    grad = c - G @ b_new
+    if np.any(np.abs(grad[inactive]) > lam * l1_ratio * pf[inactive] + tol):
+        return None
+    return b_new
+
+
+def _coordinate_descent(G, c, lambdas, l1_ratio, pf, tol=1e-10, max_iter=10000, sweeps_per_check=3):
+    """
+    共分散更新型の座標降下法でλの経路を計算（ウォームスタートつき）
+
+    数回の座標更新ごとに非ゼロ集合を固定した KKT 方程式を解き、条件を満たせば打ち切ります。
+    ln_P と ln_Tax_rate のように相関が極めて強い場合、座標降下だけでは収束が遅いためです。
+    """
+    p = len(c)
+    coefs = np.zeros((len(lambdas), p))
+    b = np.zeros(p)
+    G_rows = G.tolist()
+    G_diag = np.diag(G).tolist()
+    pf_list = pf.tolist()
+    n_iter = np.zeros(len(lambdas), dtype=int)
+
+    for i, lam in enumerate(lambdas):
+        l1 = [lam * l1_ratio * w for w in pf_list]
+        denom = [G_diag[j] + lam * (1 - l1_ratio) * pf_list[j] for j in range(p)]
+        b_list = b.tolist()
+        grad = (c - G @ b).tolist()          # grad = c − G b
+        it = 0
+        while it < max_iter:
+            solved = _kkt_solve(G, c, np.array(b_list), lam, l1_ratio, pf, tol)
+            if solved is not None:
+                b_list = solved.tolist()
+                break
+            for _ in range(sweeps_per_check):
+                it += 1
+                for j in range(p):
+                    if denom[j] <= 0:   # 学習期間中に一定の列（ダミーなど）は0のまま
+                        continue
+                    b_old = b_list[j]
+                    z = grad[j] + G_diag[j] * b_old
+                    if z > l1[j]:
+                        b_new = (z - l1[j]) / denom[j]
+                    elif z < -l1[j]:
+                        b_new = (z + l1[j]) / denom[j]
+                    else:
+                        b_new = 0.0
+                    if b_new != b_old:
+                        delta = b_new - b_old
+                        row = G_rows[j]
+                        for k in range(p):
+                            grad[k] -= row[k] * delta
+                        b_list[j] = b_new
+        n_iter[i] = it
+        b = np.array(b_list)
+        coefs[i] = b
+    return coefs, n_iter
+
+
+def _ridge_path(G, c, lambdas, pf):
+    """リッジの全λの解を固有値分解1回で計算"""
+    free = pf <= 0
+    pen = ~free
+    coefs = np.zeros((len(lambdas), len(pf)))
+    if free.any():
+        # pf=0 の変数は罰則なしで解くため、先に罰則付きの変数から partial out する
+        # （シューア補元 G_PP − G_PF G_FF⁻¹ G_FP と c_P − G_PF G_FF⁻¹ c_F でリッジを解く）
+        G_FF_inv = np.linalg.pinv(G[np.ix_(free, free)])
+        G_PF = G[np.ix_(pen, free)]
+        G_pen = G[np.ix_(pen, pen)] - G_PF @ G_FF_inv @ G_PF.T
+        c_pen = c[pen] - G_PF @ G_FF_inv @ c[free]
+    else:
+        G_pen, c_pen = G, c
+    if pen.any():
+        # 罰則の重み pf で変数変換: b = D^{-1/2} u
+        w = np.sqrt(pf[pen])
+        G_w = G_pen / w[:, None] / w[None, :]
+        c_w = c_pen / w
+        eigval, eigvec = np.linalg.eigh(G_w)
+        proj = eigvec.T @ c_w                                      # (p,)
+        shrink = 1.0 / (eigval[None, :] + lambdas[:, None])        # (L, p)
+        u = (shrink * proj[None, :]) @ eigvec.T                    # (L, p)
+        coefs[:, pen] = u / w[None, :]
+    if free.any():
+        # 罰則なしの変数: b_F = G_FF⁻¹ (c_F − G_FP b_P)
+        coefs[:, free] = (c[free][None, :] - coefs[:, pen] @ G_PF) @ G_FF_inv.T
+    return coefs
+
+
+def gram_path(G, c, lambdas, l1_ratio, pf):
+    """
+    標準化済みのグラム行列 G = Z'Z/n と c = Z'y/n から正則化パスを計算
+
+    積和を使い回す場合（lib/backtest.py の学習期間ごとの推定など）に使います。
+    戻り値: (標準化した尺度の係数 (L, p), 反復回数 (L,))
+    """
+    if l1_ratio == 0:
+        return _ridge_path(G, c, lambdas, pf), np.ones(len(lambdas), dtype=int)
+    return _coordinate_descent(G, c, lambdas, l1_ratio, pf)
+
+
+def regularization_path(X, y, l1_ratio=1.0, lambdas=None, n_lambdas=100, eps=1e-4,
+                        penalty_factor=None):
+    """
+    正則化パスを計算
+
+    X: 定数項を除いた説明変数 (n, p)
+    l1_ratio: 1.0=ラッソ、0.0=リッジ、その間=エラスティックネット
+    penalty_factor: 変数ごとの罰則の重み（0にすると罰則なし。例: ダミー変数）
+    戻り値: 辞書（lambdas, coef (L, p)：元の尺度の係数, intercept (L,)）
+    """
+    Z, yc, x_mean, x_std, y_mean = _standardize(X, y)
+    n, p = Z.shape
+    pf = np.ones(p) if penalty_factor is None else np.asarray(penalty_factor, dtype=float)
+
+    G = Z.T @ Z / n
+    c = Z.T @ yc / n
+    if lambdas is None:
+        lambdas = lambda_grid(c, pf, l1_ratio, n_lambdas, eps)
+    lambdas = np.asarray(lambdas, dtype=float)
+    coefs_std, n_iter = gram_path(G, c, lambdas, l1_ratio, pf)
+
+    coef = coefs_std / x_std[None, :]
+    intercept = y_mean - coef @ x_mean
+    return {'lambdas': lambdas, 'coef': coef, 'intercept': intercept, 'n_iter': n_iter}
+
+
+def time_series_splits(n, min_train=10, horizon=1):
+    """拡大ウィンドウの分割（学習: 0..t-1、評価: t..t+horizon-1）"""
+    splits = []
+    for t in range(min_train, n - horizon + 1):
+        splits.append((np.arange(t), np.arange(t, t + horizon)))
+    return splits
+
+
+def cross_validate(X, y, l1_ratio=1.0, n_lambdas=100, eps=1e-4, penalty_factor=None,
+                   min_train=10, horizon=1):
+    """
+    時系列交差検証でλを選択
+
+    λの格子は全データで決め、各分割の学習データで同じ格子の経路を計算します。
+    戻り値: 辞書（lambdas, cv_mse (L,), cv_se (L,), lambda_min, lambda_1se, path：全データでの経路）
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    full = regularization_path(X, y, l1_ratio, None, n_lambdas, eps, penalty_factor)
+    lambdas = full['lambdas']
+
+    splits = time_series_splits(len(y), min_train, horizon)
+    errors = np.zeros((len(splits), len(lambdas)))
+    for k, (train, test) in enumerate(splits):
+        fold = regularization_path(X[train], y[train], l1_ratio, lambdas, penalty_factor=penalty_factor)
+        pred = fold['intercept'][:, None] + fold['coef'] @ X[test].T     # (L, horizon)
+        errors[k] = ((pred - y[test][None, :]) ** 2).mean(axis=1)
+
+    cv_mse = errors.mean(axis=0)
+    cv_se = errors.std(axis=0, ddof=1) / np.sqrt(len(splits)) if len(splits) > 1 else np.zeros_like(cv_mse)
+    i_min = int(np.argmin(cv_mse))
+    # 1標準誤差ルール: 最小誤差+1SE以内で最も強い正則化
+    within = np.where(cv_mse <= cv_mse[i_min] + cv_se[i_min])[0]
+    i_1se = int(within.min())
+
+    return {
+        'lambdas': lambdas,
+        'cv_mse': cv_mse,
+        'cv_se': cv_se,
+        'index_min': i_min,
+        'index_1se': i_1se,
+        'lambda_min': lambdas[i_min],
+        'lambda_1se': lambdas[i_1se],
+        'n_splits': len(splits),
+        'path': full,
+    }
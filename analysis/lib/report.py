@@ -0,0 +1,308 @@
+"""
+分析結果のレポート（HTML・PDF）：推定・余剰・診断の表と図を1つの文書に
+
+analysis/results/*.csv・*.json、analysis/figures/*.png、visualization/figures/*.png を節（SECTIONS）ごとに
+まとめて analysis/results/report/report.html に出力します（スクリプト・結果.md などの手作業の更新の代わり）。
+
+- 節は読むファイルの glob（tables・figures）で定義し、節のキー = SHA-256（VERSION・節の定義・
+  一致したファイルのパスとハッシュ）が前回と同じ節は保存した HTML の断片をそのまま使います。
+  結果が変わった節だけを作り直します（状態は report_state.json）。
+- 図は縮小した画像（サムネイル、幅 THUMBNAIL_WIDTH）を埋め込み、元の解像度の画像にリンクします。
+  サムネイルは元の画像のハッシュと幅を名前に含めて保存し、画像が変わったときだけ作ります。
+- 図の説明は project/グラフ説明.md の見出し（`## ★NN_★: 説明` と `**ファイル名**: `...``）から取ります。
+- PDF（write_pdf()）は matplotlib の PdfPages で、節ごとの表と図をページにします（図の文字と同じく英語の見出し、
+  表の日本語の文字は既定のフォントにないため除きます）。
+"""
+
+import base64
+import glob
+import hashlib
+import html
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from lib.results_store import file_hash
+
+REPORT_DIR = 'analysis/results/report'
+REPORT_FILE = f'{REPORT_DIR}/report.html'
+PDF_FILE = f'{REPORT_DIR}/report.pdf'
+THUMBNAILS_DIR = f'{REPORT_DIR}/thumbnails'
+CAPTIONS_FILE = 'project/グラフ説明.md'
+RESULTS = 'analysis/results'
+FIGURES = 'analysis/figures'
+THUMBNAIL_WIDTH = 480
+PDF_WIDTH = 1600
+MAX_ROWS = 30
+VERSION = 1                           # 節の HTML の作り方を変えたら上げる（節のキーに含める）
+
+
+def _section(key, title, label, tables=(), figures=()):
+    return {'key': key, 'title': title, 'label': label, 'tables': list(tables), 'figures': list(figures)}
+
+
+SECTIONS = [
+    _section('data', 'データ', 'Data', figures=['visualization/figures/*.png']),
+    _section('estimation', '需要関数の推定', 'Demand estimation',
+             [f'{RESULTS}/01_coefficients_*.json', f'{RESULTS}/01_demand_function_coefficients_*.csv',
+              f'{RESULTS}/07_coefficients_regularized_*.json', f'{RESULTS}/08_bayesian_posterior_summary.csv',
+              f'{RESULTS}/16_coefficients_*.csv', f'{RESULTS}/21_coefficients_*.csv',
+              f'{RESULTS}/21_midas_model_selection*.csv'],
+             [f'{FIGURES}/01_*.png', f'{FIGURES}/10_*.png', f'{FIGURES}/11_*.png', f'{FIGURES}/19_*.png',
+              f'{FIGURES}/24_*.png']),
+    _section('surplus', '消費者余剰', 'Consumer surplus',
+             [f'{RESULTS}/02_consumer_surplus_results.csv', f'{RESULTS}/08_consumer_surplus_posterior.csv',
+              f'{RESULTS}/10_exact_consumer_surplus*.csv', f'{RESULTS}/10_tax_deadweight_loss*.csv'],
+             [f'{FIGURES}/02_*.png', f'{FIGURES}/03_*.png', f'{FIGURES}/13_*.png']),
+    _section('tax', '税と価格・物価', 'Taxes, prices and CPI',
+             [f'{RESULTS}/04_cpi_contribution_analysis.csv', f'{RESULTS}/06_fixed_vs_advalorem_simulation.csv',
+              f'{RESULTS}/11_tax_incidence_quarterly.csv', f'{RESULTS}/20_cpi_energy_tax_*.csv'],
+             [f'{FIGURES}/0[4-9]_*.png', f'{FIGURES}/14_*.png', f'{FIGURES}/23_*.png']),
+    _section('diagnostics', '診断・頑健性', 'Diagnostics and robustness',
+             [f'{RESULTS}/09_structural_breaks.json', f'{RESULTS}/09_break_dummy_comparison.csv',
+              f'{RESULTS}/14_realtime_estimates.csv', f'{RESULTS}/15_backtest_scores.csv',
+              f'{RESULTS}/15_backtest_elasticity_stability.csv', f'{RESULTS}/16_difference_model_se_comparison*.csv'],
+             [f'{FIGURES}/12_*.png', f'{FIGURES}/17_*.png', f'{FIGURES}/18_*.png']),
+    _section('forecast', '予測・シナリオ', 'Forecasts and scenarios',
+             [f'{RESULTS}/12_forecast_annual.csv', f'{RESULTS}/13_scenario_sweep_*_summary.csv'],
+             [f'{FIGURES}/15_*.png', f'{FIGURES}/16_*.png']),
+    _section('regional', '地域の価格・税の転嫁', 'Regional prices and pass-through',
+             [f'{RESULTS}/17_price_asymmetry_crf.csv', f'{RESULTS}/18_tax_event_study_pooled.csv',
+              f'{RESULTS}/19_regional_convergence.csv', f'{RESULTS}/19_regional_leadership.csv'],
+             [f'{FIGURES}/20_*.png', f'{FIGURES}/21_*.png', f'{FIGURES}/22_*.png']),
+    _section('frequency', '時間的分解', 'Temporal disaggregation',
+             [f'{RESULTS}/22_temporal_disaggregation_validation.csv', f'{RESULTS}/22_temporal_disaggregation_timing.csv'],
+             [f'{FIGURES}/25_*.png']),
+]
+
+
+def section_files(section):
+    """節の表・図のファイル（glob に一致したもの、パスの順）"""
+    tables = sorted({path for pattern in section['tables'] for path in glob.glob(pattern)})
+    figures = sorted({path for pattern in section['figures'] for path in glob.glob(pattern)})
+    return [p.replace(os.sep, '/') for p in tables], [p.replace(os.sep, '/') for p in figures]
+
+
+def section_key(section, tables, figures, captions=None):
+    """節のキー（節の定義・ファイルのハッシュ・図の説明が同じなら同じ）"""
+    payload = {
+        'version': VERSION,
+        'section': section,
+        'files': {path: file_hash(path) for path in tables + figures},
+        'captions': {os.path.basename(path): (captions or {}).get(os.path.basename(path)) for path in figures},
+    }
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def load_captions(captions_file=CAPTIONS_FILE):
+    """図の説明 {ファイル名: 見出し}（project/グラフ説明.md）"""
+    if not os.path.exists(captions_file):
+        return {}
+    with open(captions_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    captions = {}
+    for title, name in re.findall(r'^## ★\d+_★: *(.+?)\s*\n+\*\*ファイル名\*\*: *`([^`]+)`', text, flags=re.M):
+        captions[name] = title
+    return captions
+
+
+def flatten_json(data, prefix=''):
+    """JSON の数値・文字列を (項目, 値) の表に（入れ子は '.' でつなぐ、長いリストは省略）"""
+    rows = []
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            rows.extend(flatten_json(value, f'{name}.'))
+        elif isinstance(value, list):
+            if len(value) <= 10 and all(not isinstance(v, (dict, list)) for v in value):
+                rows.append((name, ', '.join(str(v) for v in value)))
+        else:
+            rows.append((name, value))
+    return rows
+
+
+def load_table(path):
+    """表のファイル（CSV・JSON）を DataFrame に"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return pd.DataFrame(flatten_json(data) if isinstance(data, dict) else [], columns=['Item', 'Value'])
+    return pd.read_csv(path, encoding='utf-8-sig')
+
+
+def _format(value):
+    if isinstance(value, (float, np.floating)):
+        return '' if not np.isfinite(value) else f'{value:.4g}'
+    return str(value)
+
+
+def table_html(df, max_rows=MAX_ROWS):
+    """表の HTML（数値は有効数字4桁、max_rows 行を超える分は省略）"""
+    shown = df.head(max_rows)
+    note = f'<p class="note">（全 {len(df)} 行のうち最初の {max_rows} 行）</p>' if len(df) > max_rows else ''
+    return shown.to_html(index=False, border=0, classes='table', na_rep='', formatters={
+        column: _format for column in shown.columns}) + note
+
+
+def thumbnail(path, thumbnails_dir=THUMBNAILS_DIR, width=THUMBNAIL_WIDTH):
+    """縮小した画像のパス（元の画像のハッシュを名前に含め、なければ作る）"""
+    from PIL import Image
+
+    name = f"{os.path.splitext(os.path.basename(path))[0]}_{file_hash(path)[:12]}_{width}.png"
+    target = os.path.join(thumbnails_dir, name)
+    if not os.path.exists(target):
+        os.makedirs(thumbnails_dir, exist_ok=True)
+        with Image.open(path) as image:
+            image.thumbnail((width, width * 4))
+            image.save(target, optimize=True)
+    return target
+
+
+def render_section(section, tables, figures, captions, report_dir=REPORT_DIR, embed=False):
+    """節の HTML の断片（embed=True ならサムネイルを data URI で埋め込む）"""
+    parts = [f'<section id="{section["key"]}">', f'<h2>{html.escape(section["title"])}</h2>']
+    if not tables and not figures:
+        parts.append('<p class="note">結果のファイルがありません（該当するスクリプトを実行してください）。</p>')
+    for path in tables:
+        parts.append(f'<h3>{html.escape(os.path.basename(path))}</h3>')
+        try:
+            parts.append(table_html(load_table(path)))
+        except (ValueError, pd.errors.ParserError) as e:
+            parts.append(f'<p class="note">読み込めません: {html.escape(str(e))}</p>')
+    if figures:
+        parts.append('<div class="figures">')
+        for path in figures:
+            name = os.path.basename(path)
+            small = thumbnail(path, os.path.join(report_dir, 'thumbnails'))
+            if embed:
+                with open(small, 'rb') as f:
+                    source = 'data:image/png;base64,' + base64.b64encode(f.read()).decode('ascii')
+            else:
+                source = os.path.relpath(small, report_dir).replace(os.sep, '/')
+            link = os.path.relpath(path, report_dir).replace(os.sep, '/')
+            caption = html.escape(captions.get(name, '')) + f' <code>{html.escape(name)}</code>'
+            parts.append(f'<figure><a href="{html.escape(link)}"><img src="{html.escape(source)}" '
+                         f'alt="{html.escape(name)}" loading="lazy"></a><figcaption>{caption}</figcaption></figure>')
+        parts.append('</div>')
+    parts.append('</section>')
+    return '\n'.join(parts)
+
+
+STYLE = """
+body { font-family: sans-serif; margin: 2em auto; max-width: 1200px; color: #222; }
+nav ul { columns: 2; }
+h2 { border-bottom: 2px solid #2E86AB; padding-bottom: 0.2em; margin-top: 2em; }
+h3 { font-size: 1em; margin-bottom: 0.3em; }
+table.table { border-collapse: collapse; font-size: 0.85em; margin-bottom: 0.5em; }
+table.table th, table.table td { border: 1px solid #ccc; padding: 2px 6px; text-align: right; }
+table.table th { background: #f0f4f8; }
+.figures { display: flex; flex-wrap: wrap; gap: 1em; }
+figure { margin: 0; width: %dpx; }
+figure img { width: 100%%; border: 1px solid #ddd; }
+figcaption, .note { font-size: 0.85em; color: #555; }
+"""
+
+
+def build(sections=SECTIONS, report_dir=REPORT_DIR, force=False, embed=False, captions_file=CAPTIONS_FILE):
+    """
+    レポートの HTML を作成（前回とキーが同じ節は保存した断片を使う）
+
+    戻り値: (レポートのパス, 節ごとの状態のリスト（key, title, tables, figures, rendered）)
+    """
+    sections_dir = os.path.join(report_dir, 'sections')
+    state_file = os.path.join(report_dir, 'report_state.json')
+    os.makedirs(sections_dir, exist_ok=True)
+    state = {}
+    if os.path.exists(state_file) and not force:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    captions = load_captions(captions_file)
+
+    fragments, summary = [], []
+    for section in sections:
+        tables, figures = section_files(section)
+        key = section_key({**section, 'embed': embed}, tables, figures, captions)
+        fragment_file = os.path.join(sections_dir, f"{section['key']}.html")
+        rendered = state.get(section['key']) != key or not os.path.exists(fragment_file)
+        if rendered:
+            fragment = render_section(section, tables, figures, captions, report_dir, embed)
+            with open(fragment_file, 'w', encoding='utf-8') as f:
+                f.write(fragment)
+            state[section['key']] = key
+        else:
+            with open(fragment_file, 'r', encoding='utf-8') as f:
+                fragment = f.read()
+        fragments.append(fragment)
+        summary.append({'key': section['key'], 'title': section['title'], 'label': section['label'],
+                        'tables': tables, 'figures': figures, 'rendered': rendered})
+
+    toc = '\n'.join(f'<li><a href="#{s["key"]}">{html.escape(s["title"])}</a>'
+                    f'（表 {len(s["tables"])}・図 {len(s["figures"])}）</li>' for s in summary)
+    document = '\n'.join([
+        '<!DOCTYPE html>', '<html lang="ja">', '<head>', '<meta charset="utf-8">',
+        '<title>ガソリン税による消費者余剰分析 - 結果レポート</title>',
+        f'<style>{STYLE % THUMBNAIL_WIDTH}</style>', '</head>', '<body>',
+        '<h1>ガソリン税による消費者余剰分析 - 結果レポート</h1>',
+        f'<p class="note">作成: {datetime.now().strftime("%Y-%m-%d %H:%M")}'
+        '（analysis/23_build_report.py）。図をクリックすると元の解像度の画像を開きます。</p>',
+        f'<nav><ul>{toc}</ul></nav>',
+        *fragments, '</body>', '</html>',
+    ])
+    report_file = os.path.join(report_dir, 'report.html')
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write(document)
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    return report_file, summary
+
+
+JAPANESE = re.compile(r'[\u3000-\u9fff\uff00-\uffef]')
+
+
+def _pdf_text(value, width=24):
+    """PDF の表の文字（matplotlib の既定のフォントにない日本語の文字を除く）"""
+    return JAPANESE.sub('', _format(value)).replace('()', '').strip()[:width]
+
+
+def _pdf_table(df):
+    """PDF の表（日本語の説明の列は除き、最初の列（項目の名前）は日本語の文字だけを除く）"""
+    keep = [c for i, c in enumerate(df.columns)
+            if i == 0 or not df[c].map(lambda v: bool(JAPANESE.search(str(v)))).any()]
+    df = df[keep].map(_pdf_text)
+    return df.loc[:, (df != '').any(axis=0)]
+
+
+def write_pdf(summary, pdf_file=PDF_FILE, max_rows=MAX_ROWS, thumbnails_dir=THUMBNAILS_DIR):
+    """節ごとの表と図の PDF（matplotlib の PdfPages、1ページに1つの表・図。図は幅 PDF_WIDTH に縮小）"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with PdfPages(pdf_file) as pdf:
+        for section in summary:
+            for path in section['tables']:
+                df = _pdf_table(load_table(path).head(max_rows))
+                fig, ax = plt.subplots(figsize=(11.69, 8.27))
+                ax.axis('off')
+                ax.set_title(f"{section['label']}: {os.path.basename(path)}", fontweight='bold', loc='left')
+                if len(df) > 0:
+                    table = ax.table(cellText=df.to_numpy().tolist(), colLabels=[_pdf_text(c) for c in df.columns],
+                                     loc='upper center')
+                    table.auto_set_font_size(False)
+                    table.set_fontsize(6)
+                pdf.savefig(fig)
+                plt.close(fig)
+            for path in section['figures']:
+                fig, ax = plt.subplots(figsize=(11.69, 8.27))
+                ax.imshow(plt.imread(thumbnail(path, thumbnails_dir, PDF_WIDTH)))
+                ax.axis('off')
+                ax.set_title(f"{section['label']}: {os.path.basename(path)}", fontweight='bold', loc='left')
+                pdf.savefig(fig)
+                plt.close(fig)
+    return pdf_file
@@ -0,0 +1,191 @@
+"""
+推定結果ストア（コンテンツアドレス方式）
+
+推定結果を (データのバージョン, 推定式の仕様, 推定オプション) のハッシュをキーとして保存します。
+固定ファイル名のJSON/CSVを上書きする代わりに、すべてのモデルを並べて保持できます。
+
+保存形式:
+- analysis/results/store/<key>.npz : 係数・共分散行列・残差・理論値などの配列（圧縮バイナリ）
+- analysis/results/store/index.sqlite : キー・モデルタイプ・統計指標などの索引（SQLで検索可能）
+
+同じ入力での再実行は、キーが一致するため既存の結果を読み込むだけで済みます。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_DIR = 'analysis/results/store'
+
+
+def file_hash(path):
+    """ファイル内容のSHA-256ハッシュ（データのバージョンとして使用）"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def array_hash(*arrays):
+    """配列の内容からハッシュを計算（ファイルを経由しないデータ用）"""
+    h = hashlib.sha256()
+    for a in arrays:
+        a = np.ascontiguousarray(np.asarray(a, dtype=float))
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def make_key(data_version, spec, options):
+    """(データのバージョン, 仕様, 推定オプション) からストアのキーを作成"""
+    payload = json.dumps(
+        {'data_version': data_version, 'spec': spec, 'options': options},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultsStore:
+    """推定結果をキーごとに保存・検索するストア"""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self.index_path = os.path.join(store_dir, 'index.sqlite')
+        with self._connect() as con:
+            con.execute(
+                'CREATE TABLE IF NOT EXISTS models ('
+                ' key TEXT PRIMARY KEY,'
+                ' model_type TEXT,'
+                ' data_version TEXT,'
+                ' spec TEXT,'
+                ' options TEXT,'
+                ' summary TEXT,'
+                ' created_at TEXT)'
+            )
+            con.execute('CREATE INDEX IF NOT EXISTS idx_model_type ON models (model_type)')
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path)
+
+    def _array_path(self, key):
+        return os.path.join(self.store_dir, f'{key}.npz')
+
+    def exists(self, key):
+        """キーが保存済みかどうか"""
+        with self._connect() as con:
+            row = con.execute('SELECT 1 FROM models WHERE key = ?', (key,)).fetchone()
+        return row is not None and os.path.exists(self._array_path(key))
+
+    def resolve(self, key_prefix):
+        """キーの先頭部分（12文字程度）から完全なキーを取得"""
+        with self._connect() as con:
+            rows = con.execute(
+                'SELECT key FROM models WHERE key LIKE ?', (key_prefix + '%',)
+            ).fetchall()
+        if len(rows) == 0:
+            raise KeyError(f'ストアにキーが見つかりません: {key_prefix}')
+        if len(rows) > 1:
+            raise KeyError(f'キーが一意に定まりません: {key_prefix}（{len(rows)}件）')
+        return rows[0][0]
+
+    def save(self, key, model_type, data_version, spec, options, summary,
+             arrays=None, frame=None):
+        """
+        推定結果を保存
+
+        summary: 01_coefficients_*.json と同じ形式の辞書（alpha, beta, gamma, const, rsquared, ...）
+        arrays: 係数・共分散行列・残差などの配列の辞書
+        frame: 推定に使用した分析データ（列ごとに配列として保存）
+        """
+        payload = {}
+        for name, value in (arrays or {}).items():
+            payload[f'array__{name}'] = np.asarray(value)
+        if frame is not None:
+            payload['frame__columns'] = np.array(list(frame.columns), dtype=str)
+            for i, col in enumerate(frame.columns):
+                values = frame[col].to_numpy()
+                if values.dtype == object:
+                    values = values.astype(str)
+                payload[f'frame__{i}'] = values
+
+        # 一時ファイルに書いてから置き換え（途中で落ちても壊れたファイルを残さない）
+        tmp_path = self._array_path(key) + '.tmp.npz'
+        np.savez_compressed(tmp_path, **payload)
+        os.replace(tmp_path, self._array_path(key))
+
+        with self._connect() as con:
+            con.execute(
+                'INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    key, model_type, data_version,
+                    json.dumps(spec, ensure_ascii=False, sort_keys=True, default=str),
+                    json.dumps(options, ensure_ascii=False, sort_keys=True, default=str),
+                    json.dumps(summary, ensure_ascii=False, default=float),
+                    datetime.now().isoformat(timespec='seconds'),
+                )
+            )
+        return key
+
+    def load(self, key):
+        """保存済みの推定結果を読み込む（存在しない場合はNone）"""
+        with self._connect() as con:
+            row = con.execute(
+                'SELECT model_type, data_version, spec, options, summary, created_at '
+                'FROM models WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or not os.path.exists(self._array_path(key)):
+            return None
+
+        arrays = {}
+        frame = None
+        with np.load(self._array_path(key), allow_pickle=False) as npz:
+            for name in npz.files:
+                if name.startswith('array__'):
+                    arrays[name[len('array__'):]] = npz[name]
+            if 'frame__columns' in npz.files:
+                columns = list(npz['frame__columns'])
+                frame = pd.DataFrame({col: npz[f'frame__{i}'] for i, col in enumerate(columns)})
+
+        return {
+            'key': key,
+            'model_type': row[0],
+            'data_version': row[1],
+            'spec': json.loads(row[2]),
+            'options': json.loads(row[3]),
+            'summary': json.loads(row[4]),
+            'created_at': row[5],
+            'arrays': arrays,
+            'frame': frame,
+        }
+
+    def query(self, model_type=None, data_version=None):
+        """索引を検索してDataFrameで返す（summaryの主要な統計指標を列に展開）"""
+        sql = 'SELECT key, model_type, data_version, spec, options, summary, created_at FROM models'
+        conditions = []
+        params = []
+        if model_type is not None:
+            conditions.append('model_type = ?')
+            params.append(model_type)
+        if data_version is not None:
+            conditions.append('data_version = ?')
+            params.append(data_version)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY created_at'
+
+        with self._connect() as con:
+            df = pd.read_sql_query(sql, con, params=params)
+        if len(df) == 0:
+            return df
+
+        summaries = df['summary'].apply(json.loads)
+        for col in ['alpha', 'beta', 'gamma', 'const', 'rsquared', 'rsquared_adj']:
+            df[col] = summaries.apply(lambda s: s.get(col))
+        return df.drop(columns=['summary'])
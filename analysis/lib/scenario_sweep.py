@@ -0,0 +1,241 @@
+"""
+政策シナリオの格子計算（税制 × 需要の価格弾力性 × 本体価格の経路）
+
+「2026Q1 に暫定税率 25.1円/L を廃止したら、β が −0.1〜−0.5 のそれぞれで、原油価格の3つのシナリオで
+どうなるか」のような問いを、格子の宣言（辞書・JSON）から全セル一度に計算します。
+
+各セルの計算（予測期間の四半期ごと）:
+    税込み価格  P = (本体価格 + 従量税)(1 + 消費税率)          （lib/price_decomposition.py）
+    数量        Q = Q_ref × (P / P_ref)^β                     （一定弾力性の需要）
+    消費者余剰  ΔCS = −∫_{P_ref}^{P} Q(p) dp                   （lib/consumer_surplus.py）
+P_ref・Q_ref は基準の税制（reference_tax）での価格と、直近1年の同じ四半期の数量です。
+税収（ガソリン税・消費税）と ΔCS を期間で合計し、税収の変化との和（純便益）も出力します。
+
+セルは (税制, 弾力性, 価格経路) の順に通し番号をつけ、一定数ずつのブロックに分けて
+プロセスプールで計算します。入力の配列（本体価格の経路・税率）は共有メモリに1回だけ置き
+（lib/data_plane.py）、ワーカーは読み取り専用のビューを作るだけなので、セル数が増えてもコピーは増えません。
+結果はブロックが終わるたびに CSV（1行1セル）に追記します。
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from lib.consumer_surplus import cs_change
+from lib.data_plane import DataPlane, WorkerPool
+from lib.forecast import fit_price_ar, future_periods, load_history, tax_schedule
+from lib.price_decomposition import consumer_price, decompose, to_datetime64
+
+OUTPUT_COLUMNS = ['Price_Mean', 'Quantity', 'Excise_Revenue', 'VAT_Revenue', 'Total_Revenue',
+                  'Revenue_Change', 'CS_Change', 'Net_Benefit']
+
+# 格子の例（13_run_scenario_sweep.py の既定）
+EXAMPLE_GRID = {
+    'horizon': 20,
+    'reference_tax': 'status_quo',
+    'tax': {
+        'status_quo': {'source': 'quarterly_table', 'amend': []},
+        'abolish_provisional_2026Q1': {'source': 'quarterly_table',
+                                       'amend': [{'start': '2026Q1', 'delta_specific_tax': -25.1}]},
+    },
+    'elasticity': {'start': -0.1, 'stop': -0.5, 'num': 5},
+    'price': {
+        'flat': {'growth': 0.0},
+        'high_crude': {'growth': 0.05, 'shock': 0.2},
+        'low_crude': {'growth': -0.03, 'shock': -0.2},
+    },
+}
+
+
+def expand_values(spec):
+    """値のリスト、または {'start', 'stop', 'num'}（等間隔）からの配列"""
+    if isinstance(spec, dict):
+        return np.linspace(spec['start'], spec['stop'], int(spec['num']))
+    return np.asarray(spec, dtype=float)
+
+
+def expand_tax(spec):
+    """
+    税制の軸 {名前: tax の指定}。'levels' は従量税の水準の掃引
+        {'levels': {'start': '2026Q1', 'specific_tax': {'start': 0, 'stop': 60, 'num': 61}}}
+    → 'specific_tax=0.0', 'specific_tax=1.0', ...（start 以降の従量税をその値に固定）
+    """
+    scenarios = {}
+    for name, tax in spec.items():
+        if name == 'levels':
+            for value in expand_values(tax['specific_tax']):
+                scenarios[f'specific_tax={value:g}'] = {
+                    'source': tax.get('source', 'quarterly_table'),
+                    'amend': [{'start': tax['start'], 'specific_tax': float(value)}],
+                }
+        else:
+            scenarios[name] = tax
+    return scenarios
+
+
+def price_paths(spec, base_last, price_ar, horizon):
+    """
+    本体価格の経路の軸（名前のリスト, (経路数, horizon) の配列）
+
+    {名前: {'growth': 年率, 'shock': 最初の四半期の水準変化}} は確定的な経路、
+    {名前: {'random': 本数, 'seed': ..., 'growth': ...}} は本体価格の AR(1)（lib/forecast.py）の経路
+    """
+    names = []
+    paths = []
+    steps = np.arange(1, horizon + 1)
+    for name, path in spec.items():
+        level = base_last * (1 + path.get('shock', 0.0))
+        if 'random' in path:
+            rng = np.random.default_rng(path.get('seed'))
+            n = int(path['random'])
+            mu = price_ar['mu'] if path.get('growth') is None else np.log1p(path['growth']) / 4
+            shocks = rng.standard_normal((n, horizon)) * price_ar['sigma']
+            d = np.empty((n, horizon))
+            prev = np.full(n, price_ar['last_diff'])
+            for k in range(horizon):
+                prev = mu + price_ar['rho'] * (prev - mu) + shocks[:, k]
+                d[:, k] = prev
+            paths.append(level * np.exp(np.cumsum(d, axis=1)))
+            names.extend(f'{name}#{i}' for i in range(n))
+        else:
+            paths.append((level * (1 + path.get('growth', 0.0)) ** (steps / 4))[None, :])
+            names.append(name)
+    return names, np.vstack(paths)
+
+
+def build_inputs(grid, history=None, schedules=None):
+    """
+    格子の宣言から計算に使う配列を作成（history・schedules は読み込み済みの履歴と税率表、省略時は読み込む）
+
+    戻り値: 辞書（periods, tax_names, elasticities, price_names と、配列 specific_tax (A, T),
+    vat_rate (A, T), base_price (C, T), reference (3, T): 基準の税制の t・r と Q_ref）
+    """
+    history = history or load_history()
+    data = history['data']
+    horizon = int(grid.get('horizon', 20))
+    periods = future_periods(data['Period'].iloc[-1], horizon)
+    dates = to_datetime64(periods)
+
+    taxes = expand_tax(grid['tax'])
+    reference_name = grid.get('reference_tax', next(iter(taxes)))
+    if reference_name not in taxes:
+        raise KeyError(f'基準の税制 {reference_name} が tax にありません。')
+    lookups = [tax_schedule(tax, schedules).lookup(dates) for tax in taxes.values()]
+    specific_tax = np.stack([lk[0] for lk in lookups])
+    vat_rate = np.stack([lk[1] for lk in lookups])
+    ref = list(taxes).index(reference_name)
+
+    # 直近1年の同じ四半期の数量
+    recent = data.tail(4)
+    q_by_quarter = dict(zip(recent['Period'].str[-1], recent['Q']))
+    q_ref = np.array([q_by_quarter[p[-1]] for p in periods])
+
+    price_ar = fit_price_ar(history['base_price'])
+    price_names, base = price_paths(grid['price'], float(history['base_price'].iloc[-1]), price_ar, horizon)
+
+    return {
+        'periods': periods,
+        'tax_names': list(taxes),
+        'reference_tax': reference_name,
+        'elasticities': expand_values(grid['elasticity']),
+        'price_names': price_names,
+        'arrays': {
+            'specific_tax': specific_tax,
+            'vat_rate': vat_rate,
+            'base_price': base,
+            'reference': np.stack([specific_tax[ref], vat_rate[ref], q_ref]),
+        },
+    }
+
+
+def evaluate_cells(arrays, elasticities, cells):
+    """
+    通し番号 cells のセルをまとめて計算（戻り値: OUTPUT_COLUMNS の列の辞書、各 (len(cells),)）
+    """
+    n_tax = arrays['specific_tax'].shape[0]
+    n_price = arrays['base_price'].shape[0]
+    a, b, c = np.unravel_index(cells, (n_tax, len(elasticities), n_price))
+    t, r = arrays['specific_tax'][a], arrays['vat_rate'][a]              # (n, T)
+    base = arrays['base_price'][c]                                       # (n, T)
+    eps = np.asarray(elasticities)[b][:, None]                           # (n, 1)
+    t_ref, r_ref, q_ref = arrays['reference']                            # (T,)
+
+    p_ref = consumer_price(base, t_ref, r_ref)
+    price = consumer_price(base, t, r)
+    q = q_ref * (price / p_ref) ** eps
+    excise = t * q
+    vat = decompose(price, t, r)['consumption_tax'] * q
+    revenue_ref = (t_ref + decompose(p_ref, t_ref, r_ref)['consumption_tax']) * q_ref
+    cs = cs_change(p_ref, price, q_ref, 'constant_elasticity', eps)
+
+    total = excise.sum(axis=1) + vat.sum(axis=1)
+    revenue_change = total - revenue_ref.sum(axis=1)
+    cs_total = cs.sum(axis=1)
+    return {
+        'Price_Mean': price.mean(axis=1),
+        'Quantity': q.sum(axis=1),
+        'Excise_Revenue': excise.sum(axis=1),
+        'VAT_Revenue': vat.sum(axis=1),
+        'Total_Revenue': total,
+        'Revenue_Change': revenue_change,
+        'CS_Change': cs_total,
+        'Net_Benefit': cs_total + revenue_change,
+    }
+
+
+def _run_block(arrays, bounds):
+    start, stop = bounds
+    return start, evaluate_cells(arrays, arrays['elasticities'], np.arange(start, stop))
+
+
+def run_sweep(inputs, output_file, workers=None, block_size=5000, progress=None):
+    """
+    全セルを計算して output_file（CSV）に追記
+
+    workers: プロセス数（None なら CPU 数、1 ならプールを使わずに計算）
+    progress: ブロックが終わるたびに呼ぶ関数 progress(終わったセル数, 全セル数)
+    戻り値: 辞書（n_cells, elapsed, output_file）
+    """
+    arrays = inputs['arrays']
+    elasticities = inputs['elasticities']
+    shape = (len(inputs['tax_names']), len(elasticities), len(inputs['price_names']))
+    n_cells = int(np.prod(shape))
+    blocks = [(s, min(s + block_size, n_cells)) for s in range(0, n_cells, block_size)]
+    tax_names = np.asarray(inputs['tax_names'], dtype=object)
+    price_names = np.asarray(inputs['price_names'], dtype=object)
+
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    start_time = time.perf_counter()
+    done = 0
+
+    def write(first, columns):
+        nonlocal done
+        cells = np.arange(first, first + len(columns['Quantity']))
+        a, b, c = np.unravel_index(cells, shape)
+        frame = pd.DataFrame({
+            'Tax_Scenario': tax_names[a],
+            'Elasticity': elasticities[b],
+            'Price_Scenario': price_names[c],
+            **columns,
+        })
+        # BOM は先頭のブロックだけ（追記では付けない）
+        first_block = done == 0
+        frame.to_csv(output_file, mode='a', header=first_block, index=False,
+                     encoding='utf-8-sig' if first_block else 'utf-8')
+        done += len(cells)
+        if progress is not None:
+            progress(done, n_cells)
+
+    plane = DataPlane({**arrays, 'elasticities': np.asarray(elasticities, dtype=float)})
+    try:
+        with WorkerPool(plane, workers=workers) as pool:
+            # 終わった順に受け取ってすぐ書き出す（行の順序はブロック単位で前後する）
+            for first, columns in pool.imap_unordered(_run_block, blocks):
+                write(first, columns)
+    finally:
+        plane.close()
+
+    return {'n_cells': n_cells, 'elapsed': time.perf_counter() - start_time, 'output_file': output_file}
@@ -0,0 +1,273 @@
+"""
+構造変化の検定（Chow検定・sup-F検定・Bai–Perron の複数構造変化）
+
+需要関数 y = Xb + ε の係数が期間ごとに異なる（純粋構造変化）かを調べます。
+
+- X'X, X'y, y'y の累積和を1回だけ計算しておき、任意の区間 [i, j) の残差平方和を
+  累積和の差 SSR(i, j) = y'y − (X'y)' (X'X)⁺ (X'y) から求めます（区間の長さによらず一定の計算量）。
+- 全区間の (X'X)⁺ を一括で計算し、Bai–Perron の動的計画法は
+  「m−1回の変化までの最小SSR + 最後の区間のSSR」の最小化を配列演算で行います。
+- p値は固定説明変数ブートストラップ（Hansen 2000、残差×標準正規の wild 型）で求めます。
+  ブートストラップ標本も X は共通なので、(X'X)⁺ を使い回して全標本を同時に計算します。
+- 見つかった構造変化の時点から、推定用のダミー変数（水準シフト・パルス）を作成できます。
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def _center(X, y):
+    """定数でない列と y を全期間平均で中心化（定数項があれば SSR は変わらず、桁落ちを防ぐ）"""
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    varying = X.std(axis=0) > 0
+    Xc = X.copy()
+    Xc[:, varying] -= X[:, varying].mean(axis=0)
+    return Xc, y - y.mean(axis=-1, keepdims=True)
+
+
+def cumulative_moments(X, y):
+    """
+    累積積和
+
+    X: (n, k), y: (n,) または (B, n)
+    戻り値: Sxx (n+1, k, k), Sxy (..., n+1, k), Syy (..., n+1)
+        区間 [i, j) の積和は S[j] − S[i]
+    """
+    n, k = X.shape
+    Sxx = np.zeros((n + 1, k, k))
+    Sxx[1:] = np.cumsum(X[:, :, None] * X[:, None, :], axis=0)
+    y = np.asarray(y, dtype=float)
+    lead = y.shape[:-1]
+    Sxy = np.zeros(lead + (n + 1, k))
+    Sxy[..., 1:, :] = np.cumsum(y[..., :, None] * X, axis=-2)
+    Syy = np.zeros(lead + (n + 1,))
+    Syy[..., 1:] = np.cumsum(y ** 2, axis=-1)
+    return Sxx, Sxy, Syy
+
+
+class _SegmentTable:
+    """長さ min_size 以上の全区間について (X'X)⁺ を保持し、任意の y の区間SSRを計算"""
+
+    def __init__(self, X, min_size):
+        n = X.shape[0]
+        self.n = n
+        self.X = X
+        self.Sxx = cumulative_moments(X, np.zeros(n))[0]
+        starts, ends = np.triu_indices(n + 1, k=min_size)
+        self.starts = starts
+        self.ends = ends
+        XX = self.Sxx[ends] - self.Sxx[starts]
+        self.P = np.linalg.pinv(XX, hermitian=True)               # (区間数, k, k)
+
+    def ssr(self, y):
+        """y: (n,) または (B, n) → SSR表 (..., n+1, n+1)。無効な区間は inf"""
+        _, Sxy, Syy = cumulative_moments(self.X, y)
+        xy = Sxy[..., self.ends, :] - Sxy[..., self.starts, :]     # (..., 区間数, k)
+        yy = Syy[..., self.ends] - Syy[..., self.starts]
+        fit = np.einsum('...si,sij,...sj->...s', xy, self.P, xy)
+        table = np.full(Syy.shape[:-1] + (self.n + 1, self.n + 1), np.inf)
+        table[..., self.starts, self.ends] = np.maximum(yy - fit, 0.0)
+        return table
+
+
+def _min_size(n, k, trim):
+    return max(int(np.ceil(trim * n)), k + 1)
+
+
+def _dynamic_programming(table, max_breaks):
+    """
+    Bai–Perron の動的計画法
+
+    table: SSR表 (..., n+1, n+1)
+    戻り値: 最小SSR (..., max_breaks+1)、逆追跡用の配列（最後の区間の開始位置）
+    """
+    n = table.shape[-1] - 1
+    opt = table[..., 0, :]                                        # 変化0回: [0, j) の SSR
+    best = [opt[..., n]]
+    argmins = []
+    for _ in range(max_breaks):
+        total = opt[..., :, None] + table                         # (..., i, j)
+        arg = np.argmin(total, axis=-2)
+        opt = np.take_along_axis(total, arg[..., None, :], axis=-2)[..., 0, :]
+        argmins.append(arg)
+        best.append(opt[..., n])
+    return np.stack(best, axis=-1), argmins
+
+
+def _backtrack(argmins, m, n):
+    """m回の変化の時点（各レジームの開始インデックス）を逆追跡"""
+    breaks = []
+    j = n
+    for level in range(m - 1, -1, -1):
+        i = int(argmins[level][j])
+        breaks.append(i)
+        j = i
+    return sorted(breaks)
+
+
+def _sup_f(ssr_m, ssr0, n, k):
+    """m回の変化（m=1..）の F 統計量"""
+    m = np.arange(1, ssr_m.shape[-1])
+    ssr_alt = ssr_m[..., 1:]
+    return ((ssr0[..., None] - ssr_alt) / (m * k)) / (ssr_alt / (n - (m + 1) * k - m))
+
+
+def chow_test(X, y, breaks):
+    """
+    Chow検定（既知の変化時点）
+
+    breaks: 各レジームの開始インデックス（昇順）
+    説明変数の数以下の観測しかない区間は完全に当てはまるものとして扱うため、
+    短い区間では予測型の Chow 検定（第2種）と一致します。
+    戻り値: 辞書（F, pvalue, df_num, df_den）
+    """
+    Xc, yc = _center(X, y)
+    n, k = Xc.shape
+    bounds = [0] + list(breaks) + [n]
+    Sxx, Sxy, Syy = cumulative_moments(Xc, yc)
+
+    def _ssr(i, j):
+        xy = Sxy[j] - Sxy[i]
+        return max(Syy[j] - Syy[i] - xy @ np.linalg.pinv(Sxx[j] - Sxx[i], hermitian=True) @ xy, 0.0)
+
+    ssr_r = _ssr(0, n)
+    ssr_u = sum(_ssr(i, j) for i, j in zip(bounds[:-1], bounds[1:]))
+    used = sum(min(j - i, k) for i, j in zip(bounds[:-1], bounds[1:]))
+    df_num = used - k
+    df_den = n - used
+    if df_num <= 0 or df_den <= 0:
+        return {'F': np.nan, 'pvalue': np.nan, 'df_num': df_num, 'df_den': df_den}
+    F = ((ssr_r - ssr_u) / df_num) / (ssr_u / df_den)
+    return {'F': float(F), 'pvalue': float(stats.f.sf(F, df_num, df_den)), 'df_num': df_num, 'df_den': df_den}
+
+
+def sup_f_test(X, y, trim=0.15, n_boot=999, seed=None):
+    """
+    sup-F 検定（Andrews、変化時点が未知の1回の構造変化）
+
+    戻り値: 辞書
+        statistic, break_index, F（候補時点ごとの F 統計量 (n,)、候補外は nan）, pvalue
+    """
+    Xc, yc = _center(X, y)
+    n, k = Xc.shape
+    h = _min_size(n, k, trim)
+    seg = _SegmentTable(Xc, h)
+    table = seg.ssr(yc)
+    ssr0 = table[0, n]
+    ssr1 = table[0, :] + table[:, n]                               # 候補時点 τ ごとの SSR（候補外は inf）
+    with np.errstate(invalid='ignore'):
+        F = ((ssr0 - ssr1) / k) / (ssr1 / (n - 2 * k))
+    F[~np.isfinite(F)] = np.nan
+    tau = int(np.nanargmax(F))
+    stat = float(F[tau])
+
+    pvalue = np.nan
+    if n_boot:
+        y_boot = _bootstrap_samples(Xc, yc, n_boot, seed)
+        t_boot = seg.ssr(y_boot)
+        ssr0_b = t_boot[:, 0, n]
+        ssr1_b = t_boot[:, 0, :] + t_boot[:, :, n]
+        with np.errstate(invalid='ignore'):
+            F_b = ((ssr0_b[:, None] - ssr1_b) / k) / (ssr1_b / (n - 2 * k))
+        F_b[~np.isfinite(F_b)] = -np.inf
+        pvalue = float((F_b.max(axis=1) >= stat).mean())
+    return {'statistic': stat, 'break_index': tau, 'F': F, 'pvalue': pvalue, 'min_size': h}
+
+
+def _bootstrap_samples(Xc, yc, n_boot, seed):
+    """固定説明変数ブートストラップ: 帰無仮説（変化なし）の残差 × 標準正規"""
+    rng = np.random.default_rng(seed)
+    b = np.linalg.lstsq(Xc, yc, rcond=None)[0]
+    resid = yc - Xc @ b
+    return resid[None, :] * rng.standard_normal((n_boot, len(resid)))
+
+
+def bai_perron(X, y, max_breaks=5, trim=0.15, n_boot=499, seed=None, batch_size=100):
+    """
+    Bai–Perron の複数構造変化の推定と検定
+
+    max_breaks: 調べる最大の変化回数（区間の最小長で可能な回数に制限）
+    trim: 区間の最小長（観測数に対する比率、ただし説明変数の数+1以上）
+    戻り値: 辞書
+        ssr (M+1,): 変化 m 回での最小SSR
+        breaks: {m: 各レジームの開始インデックスのリスト}
+        bic, lwz (M+1,): 情報量基準（Yao 1988 / Liu, Wu and Zidek 1997）
+        n_breaks_bic, n_breaks_lwz: 情報量基準で選んだ変化回数
+        sup_f (M,), sup_f_pvalue (M,): 変化 m 回 対 変化なし の F 統計量とブートストラップp値
+        udmax, udmax_pvalue: sup-F の最大値（変化回数を特定しない検定）
+    """
+    Xc, yc = _center(X, y)
+    n, k = Xc.shape
+    h = _min_size(n, k, trim)
+    max_breaks = int(min(max_breaks, n // h - 1))
+    if max_breaks < 1:
+        raise ValueError(f"観測数 {n} に対して区間の最小長 {h} が大きすぎます。")
+
+    seg = _SegmentTable(Xc, h)
+    table = seg.ssr(yc)
+    ssr, argmins = _dynamic_programming(table, max_breaks)
+    breaks = {m: _backtrack(argmins, m, n) for m in range(1, max_breaks + 1)}
+
+    m = np.arange(max_breaks + 1)
+    n_params = (m + 1) * k + m
+    bic = np.log(ssr / n) + n_params * np.log(n) / n
+    lwz = np.log(ssr / (n - n_params)) + n_params * 0.299 * np.log(n) ** 2.1 / n
+
+    sup_f = _sup_f(ssr, ssr[0], n, k)
+    udmax = float(sup_f.max())
+
+    sup_f_pvalue = np.full(max_breaks, np.nan)
+    udmax_pvalue = np.nan
+    if n_boot:
+        y_boot = _bootstrap_samples(Xc, yc, n_boot, seed)
+        boot = []
+        for start in range(0, n_boot, batch_size):
+            ssr_b, _ = _dynamic_programming(seg.ssr(y_boot[start:start + batch_size]), max_breaks)
+            boot.append(_sup_f(ssr_b, ssr_b[:, 0], n, k))
+        boot = np.concatenate(boot, axis=0)                        # (n_boot, M)
+        sup_f_pvalue = (boot >= sup_f[None, :]).mean(axis=0)
+        udmax_pvalue = float((boot.max(axis=1) >= udmax).mean())
+
+    return {
+        'ssr': ssr,
+        'breaks': breaks,
+        'bic': bic,
+        'lwz': lwz,
+        'n_breaks_bic': int(np.argmin(bic)),
+        'n_breaks_lwz': int(np.argmin(lwz)),
+        'sup_f': sup_f,
+        'sup_f_pvalue': sup_f_pvalue,
+        'udmax': udmax,
+        'udmax_pvalue': udmax_pvalue,
+        'min_size': h,
+        'max_breaks': max_breaks,
+    }
+
+
+def break_dummies(labels, break_labels, kind='level', prefix='B'):
+    """
+    構造変化の時点からダミー変数を作成
+
+    labels: 各観測の時点ラベル（例: '2008', '2008Q2'）
+    break_labels: 新しいレジームが始まる時点のラベル
+    kind: 'level'（変化時点以降が1の水準シフト）または 'pulse'（変化時点のみ1）
+    戻り値: DataFrame（列名: prefix + 時点ラベル）
+    """
+    labels = pd.Index([str(v) for v in labels])
+    columns = {}
+    for label in break_labels:
+        label = str(label)
+        if label not in labels:
+            raise KeyError(f"変化時点 {label} がデータにありません。")
+        position = labels.get_loc(label)
+        values = np.zeros(len(labels), dtype=int)
+        if kind == 'level':
+            values[position:] = 1
+        elif kind == 'pulse':
+            values[position] = 1
+        else:
+            raise ValueError(f"kind は 'level' または 'pulse' を指定してください: {kind}")
+        columns[f'{prefix}{label}'] = values
+    return pd.DataFrame(columns, index=labels)
@@ -0,0 +1,137 @@
+"""
+ガソリン税の帰着と死荷重
+
+税込み価格 P、1リットルあたりの従量税 t（揮発油税・地方揮発油税・石油石炭税の合計）、
+消費税率 r のとき、生産者価格（本体価格）p との関係は
+    tax_on_tax=True :  P = (p + t)(1 + r)   消費税がガソリン税にも課される（タックス・オン・タックス）
+    tax_on_tax=False:  P = p(1 + r) + t     消費税は本体価格のみに課される
+とします。
+
+需要・供給を観測点 (P, Q)・(p, Q) を通る一定弾力性の曲線
+    D(P') = Q (P'/P)^εd（εd < 0）,  S(p') = Q (p'/p)^εs（εs > 0、np.inf で完全弾力的）
+として、任意の税制（t', r', tax_on_tax'）での均衡を解き、税収・消費者負担・生産者負担・死荷重を求めます。
+均衡は ln p についてのニュートン法を配列全体で同時に解くので、
+全四半期 × 弾力性の格子をブロードキャストして一度に計算できます。
+価格の換算は lib/price_decomposition.py と共通です。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from lib.consumer_surplus import integrate_demand
+from lib.price_decomposition import QUARTERLY_TABLE_FILE as TAX_TABLE_FILE
+from lib.price_decomposition import base_price as producer_price
+from lib.price_decomposition import consumer_price
+
+
+def load_quarterly_tax_table(data_file=TAX_TABLE_FILE):
+    """
+    四半期ごとの税率表（1950年〜）
+
+    戻り値: DataFrame（Period: '1950Q1' 形式, Year, Quarter, Specific_Tax: 円/L, VAT_Rate: 小数）
+    """
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"{data_file} が見つかりません。")
+    df = pd.read_csv(data_file, encoding='utf-8-sig')
+    return pd.DataFrame({
+        'Period': df['Year'].astype(int).astype(str) + 'Q' + df['Quarter'].astype(int).astype(str),
+        'Year': df['Year'].astype(int),
+        'Quarter': df['Quarter'].astype(int),
+        'Specific_Tax': df['合計従量税率_円L'].astype(float),
+        'VAT_Rate': df['消費税率_%'].astype(float) / 100.0,
+    })
+
+
+def solve_equilibrium(price, quantity, demand_elasticity, supply_elasticity,
+                      specific_tax, vat_rate, new_specific_tax, new_vat_rate,
+                      tax_on_tax=True, new_tax_on_tax=None, tol=1e-12, max_iter=50):
+    """
+    税制変更後の均衡価格と数量
+
+    観測点（税込み価格 price、数量 quantity、現行の税 specific_tax・vat_rate）で需要・供給曲線を置き、
+    新しい税（new_specific_tax・new_vat_rate）での均衡を解きます。
+    戻り値: 辞書（consumer_price, producer_price, quantity）
+    """
+    if new_tax_on_tax is None:
+        new_tax_on_tax = tax_on_tax
+    ed = np.asarray(demand_elasticity, dtype=float)
+    es = np.asarray(supply_elasticity, dtype=float)
+    p_obs = producer_price(price, specific_tax, vat_rate, tax_on_tax)
+    z0 = np.log(p_obs)
+    ln_price = np.log(price)
+    # 供給が完全弾力的（εs = ∞）なら生産者価格は変わらない
+    ratio = np.where(np.isinf(es), 0.0, ed / np.where(np.isinf(es), 1.0, es))
+
+    # g(z) = (εd/εs)(ln P(e^z) − ln P_obs) − (z − z0) = 0 をニュートン法で解く（g は z について単調減少）
+    z = np.broadcast_to(z0, np.broadcast(z0, ratio, new_specific_tax, new_vat_rate).shape).copy()
+    for _ in range(max_iter):
+        p = np.exp(z)
+        pc = consumer_price(p, new_specific_tax, new_vat_rate, new_tax_on_tax)
+        g = ratio * (np.log(pc) - ln_price) - (z - z0)
+        # d ln P / dz = p (1 + r) / P
+        dg = ratio * p * (1 + new_vat_rate) / pc - 1.0
+        step = g / dg
+        z = z - step
+        if np.nanmax(np.abs(step)) < tol:
+            break
+
+    p_new = np.exp(z)
+    pc_new = consumer_price(p_new, new_specific_tax, new_vat_rate, new_tax_on_tax)
+    q_new = quantity * (pc_new / price) ** ed
+    return {'consumer_price': pc_new, 'producer_price': p_new, 'quantity': q_new}
+
+
+def incidence(price, quantity, specific_tax, vat_rate, demand_elasticity, supply_elasticity,
+              tax_on_tax=True, counterfactual_specific_tax=0.0, counterfactual_vat_rate=0.0,
+              counterfactual_tax_on_tax=None):
+    """
+    現行の税と比較対象の税制（既定は税なし）との差で見た税の帰着と死荷重
+
+    すべての引数はブロードキャスト可能な配列（四半期 × 需要弾力性 × 供給弾力性など）。
+    戻り値: 辞書
+        revenue: 現行の税収 − 比較対象の税収
+        consumer_burden / producer_burden: 消費者余剰・生産者余剰の減少
+        consumer_share: 消費者負担の割合（1リットルあたりの価格変化で測る）
+        dwl: 死荷重（= 消費者負担 + 生産者負担 − 税収）
+        tax_on_tax_revenue: ガソリン税に課される消費税の税収
+        counterfactual_*: 比較対象の均衡価格・数量
+    """
+    cf = solve_equilibrium(price, quantity, demand_elasticity, supply_elasticity,
+                           specific_tax, vat_rate, counterfactual_specific_tax, counterfactual_vat_rate,
+                           tax_on_tax, counterfactual_tax_on_tax)
+    p_obs = producer_price(price, specific_tax, vat_rate, tax_on_tax)
+    ed = np.asarray(demand_elasticity, dtype=float)
+    es = np.asarray(supply_elasticity, dtype=float)
+
+    # 消費者余剰の減少: 需要曲線の左の面積（比較対象の価格 → 現行価格）
+    consumer_burden = -integrate_demand(price, cf['consumer_price'], quantity, 'constant_elasticity', ed)
+    # 生産者余剰の減少: 供給曲線の左の面積（現行の生産者価格 → 比較対象の生産者価格）
+    es_finite = np.where(np.isinf(es), 1.0, es)
+    producer_burden = np.where(
+        np.isinf(es), 0.0,
+        integrate_demand(p_obs, cf['producer_price'], quantity, 'constant_elasticity', es_finite)
+    )
+
+    revenue_now = (price - p_obs) * quantity
+    revenue_cf = (cf['consumer_price'] - cf['producer_price']) * cf['quantity']
+    revenue = revenue_now - revenue_cf
+
+    dp_consumer = price - cf['consumer_price']
+    dp_producer = cf['producer_price'] - p_obs
+    with np.errstate(invalid='ignore', divide='ignore'):
+        consumer_share = dp_consumer / (dp_consumer + dp_producer)
+
+    return {
+        'revenue': revenue,
+        'consumer_burden': consumer_burden,
+        'producer_burden': producer_burden,
+        'consumer_share': consumer_share,
+        'dwl': consumer_burden + producer_burden - revenue,
+        'tax_on_tax_revenue': np.broadcast_to(
+            specific_tax * vat_rate * quantity if tax_on_tax else 0.0, np.shape(revenue)),
+        'counterfactual_consumer_price': cf['consumer_price'],
+        'counterfactual_producer_price': cf['producer_price'],
+        'counterfactual_quantity': cf['quantity'],
+    }
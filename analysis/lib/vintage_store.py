@@ -0,0 +1,301 @@
+"""
+GDP・CPI の公表値の履歴（ビンテージ）の保存と、公表時点（as-of）のデータでの推定
+
+ESRI の GDP速報は公表のたびに過去の四半期も改定され、add_gdp_data.py でファイルを置き換えると
+以前の値は残りません。ここでは公表（release、公表日）ごとの系列を SQLite に保存します。
+公表ごとに全期間を複製せず、前回の公表から変わった期間（新しい期間・改定された期間・削除された期間）の
+値だけを保存する差分形式です。
+
+    observations(series, period, release, value)   主キー (series, period, release)
+    releases(series, release, source_file, file_hash, n_obs, n_changed)
+
+期間 period のある時点 as_of での値は、release <= as_of の最後の行の値です。1回の問い合わせは
+主キーの索引で引けます。多数の時点で繰り返す場合（バックテスト）は matrix() で
+(公表数, 期間数) の配列に展開し、np.searchsorted で公表を選びます。
+
+- record(): 公表された系列（期間 → 値）を差分で追加
+- as_of(): ある日に利用できた値
+- matrix(): 全公表の値の配列（前の公表の値で埋めたもの）
+- realtime_annual_frame(): ある日に利用できた GDP・CPI で、06・07と同じ年次データを作成
+"""
+
+import csv
+import io
+import os
+import re
+import sqlite3
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from lib.design import QUARTERLY_DATA_FILE
+from lib.results_store import file_hash
+
+STORE_FILE = 'data/vintages/vintages.sqlite'
+GDP_FILES = [  # add_gdp_data.py と同じ優先順
+    'data/1994-2025_GDP四半期ごと/自由帳 - 実質原系列1994-2025.csv',
+    'data/1994-2025_GDP四半期ごと/gaku-jg2522.csv',
+]
+CPI_FILE = 'data/-2025消費者物価指数/自由帳 - zmi2020s.csv'
+
+# 期間の終わりから公表までのおおよその日数（公表日が分からないファイルの推定に使用）
+PUBLICATION_LAG_DAYS = {'gdp': 46, 'cpi': 21}
+TOLERANCE = 1e-9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    series TEXT NOT NULL,
+    period TEXT NOT NULL,
+    release TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (series, period, release)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS releases (
+    series TEXT NOT NULL,
+    release TEXT NOT NULL,
+    source_file TEXT,
+    file_hash TEXT,
+    n_obs INTEGER,
+    n_changed INTEGER,
+    PRIMARY KEY (series, release)
+);
+"""
+
+
+# ---- 公表ファイルの読み込み（戻り値: 期間 → 値 の Series） ----
+
+def _decode(path):
+    raw = open(path, 'rb').read()
+    for encoding in ('utf-8-sig', 'cp932', 'shift-jis'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"{path} の文字コードを判別できません。")
+
+
+def parse_gdp_release(path):
+    """
+    ESRI の四半期別GDP速報（原系列）の CSV から国内総生産（1列目の値、10億円）
+
+    「1994/ 1- 3.」「4- 6.」形式の行を読み、年は直前の行から引き継ぎます（add_gdp_data.py と同じ）。
+    期間は 'YYYYQn'。同じ期間が複数の表にある場合は最初の値を使用します。
+    """
+    values = {}
+    year = None
+    for row in csv.reader(io.StringIO(_decode(path))):
+        if len(row) < 2:
+            continue
+        match = re.match(r'^\s*(?:(\d{4})/)?\s*(\d{1,2})\s*-\s*\d{1,2}\.?\s*$', row[0])
+        if not match:
+            continue
+        year = int(match.group(1)) if match.group(1) else year
+        value = pd.to_numeric(row[1].replace(',', '').strip(), errors='coerce')
+        if year is None or pd.isna(value):
+            continue
+        period = f'{year}Q{(int(match.group(2)) - 1) // 3 + 1}'
+        values.setdefault(period, float(value))
+    return pd.Series(values, name='gdp', dtype=float)
+
+
+def parse_cpi_release(path):
+    """e-Stat の消費者物価指数（月次、2020年基準）の CSV から総合指数（期間は 'YYYY-MM'）"""
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    data = df[df['類・品目'].astype(str).str.match(r'^\d{6}$', na=False)]
+    months = data['類・品目'].astype(str)
+    periods = months.str[:4] + '-' + months.str[4:6]
+    return pd.Series(pd.to_numeric(data['総合'], errors='coerce').to_numpy(), index=periods.to_numpy(),
+                     name='cpi', dtype=float).dropna()
+
+
+PARSERS = {'gdp': parse_gdp_release, 'cpi': parse_cpi_release}
+
+
+def estimated_release_date(series, values):
+    """最後の期間の終わり + 公表までの日数（公表日が分からないときの推定）"""
+    last = max(values.index)
+    if series == 'gdp':
+        end = pd.Period(last, freq='Q').end_time
+    else:
+        end = pd.Period(last, freq='M').end_time
+    return (end.date() + timedelta(days=PUBLICATION_LAG_DAYS[series])).isoformat()
+
+
+class VintageStore:
+    """公表値の履歴（SQLite、差分形式）"""
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as con:
+            con.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def record(self, series, release, values, source_file=None):
+        """
+        公表 release（'YYYY-MM-DD'）の系列 values（期間 → 値の Series）を追加
+
+        前回までの公表（release より前）と値が変わった期間だけを保存し、なくなった期間は NULL を保存します。
+        同じ series・release の再登録は置き換えます。後の公表がすでにある場合（過去の公表の追加）は、
+        後の公表の値を保ったまま差分を作り直します。戻り値: 保存した（変わった）期間の数
+        """
+        release = _iso(release)
+        values = values.dropna().astype(float)
+        known = self.releases(series)
+        later = known[known['release'] > release]
+        if len(later):
+            snapshots = [(row, self.as_of(series, row['release'])) for _, row in later.iterrows()]
+            with self._connect() as con:
+                con.execute('DELETE FROM observations WHERE series = ? AND release > ?', (series, release))
+                con.execute('DELETE FROM releases WHERE series = ? AND release > ?', (series, release))
+            n_changed = self.record(series, release, values, source_file=source_file)
+            for row, snapshot in snapshots:
+                self._insert(series, row['release'], snapshot, row['source_file'], row['file_hash'])
+            return n_changed
+        source_hash = file_hash(source_file) if source_file and os.path.exists(source_file) else None
+        return self._insert(series, release, values, source_file, source_hash)
+
+    def _insert(self, series, release, values, source_file, source_hash):
+        previous = self.as_of(series, release, include_release=False)
+        joined = pd.concat([previous.rename('old'), values.rename('new')], axis=1)
+        changed = joined[
+            joined['old'].isna() | joined['new'].isna() | ((joined['old'] - joined['new']).abs() > TOLERANCE)
+        ]
+        rows = [(series, period, release, None if pd.isna(v) else float(v)) for period, v in changed['new'].items()]
+        with self._connect() as con:
+            con.execute('DELETE FROM observations WHERE series = ? AND release = ?', (series, release))
+            con.executemany('INSERT INTO observations VALUES (?, ?, ?, ?)', rows)
+            con.execute('INSERT OR REPLACE INTO releases VALUES (?, ?, ?, ?, ?, ?)',
+                        (series, release, source_file, source_hash, len(values), len(rows)))
+        return len(rows)
+
+    def record_file(self, series, path, release=None):
+        """公表ファイルを読み込んで追加（release を省略すると推定公表日）。戻り値: (公表日, 変わった期間の数)"""
+        values = PARSERS[series](path)
+        release = release or estimated_release_date(series, values)
+        return release, self.record(series, release, values, source_file=path)
+
+    def releases(self, series=None):
+        query = 'SELECT * FROM releases' + (' WHERE series = ?' if series else '') + ' ORDER BY series, release'
+        with self._connect() as con:
+            return pd.read_sql_query(query, con, params=(series,) if series else ())
+
+    def as_of(self, series, as_of=None, include_release=True):
+        """
+        as_of の日に利用できた系列（期間 → 値の Series、期間の昇順）
+
+        as_of=None なら最新の公表。include_release=False なら as_of の日の公表は含めません。
+        """
+        op = '<=' if include_release else '<'
+        as_of = _iso(as_of) if as_of is not None else '9999-12-31'
+        query = f"""
+            SELECT o.period, o.value FROM observations o
+            WHERE o.series = ? AND o.release = (
+                SELECT MAX(i.release) FROM observations i
+                WHERE i.series = o.series AND i.period = o.period AND i.release {op} ?)
+            ORDER BY o.period
+        """
+        with self._connect() as con:
+            rows = con.execute(query, (series, as_of)).fetchall()
+        return pd.Series({p: v for p, v in rows if v is not None}, name=series, dtype=float)
+
+    def matrix(self, series):
+        """
+        全公表の値を (公表数, 期間数) の配列に展開（各公表で、変わっていない期間は前の公表の値）
+
+        戻り値: (公表日 datetime64[D] (R,), 期間のラベル (N,), 値 (R, N)。未公表・削除は NaN)
+        """
+        with self._connect() as con:
+            df = pd.read_sql_query('SELECT period, release, value FROM observations WHERE series = ?',
+                                   con, params=(series,))
+        releases = np.unique(df['release'].to_numpy().astype('datetime64[D]'))
+        periods = np.sort(df['period'].unique())
+        r = np.searchsorted(releases, df['release'].to_numpy().astype('datetime64[D]'))
+        p = np.searchsorted(periods, df['period'].to_numpy())
+        values = np.full((len(releases), len(periods)), np.nan)
+        stored = np.zeros_like(values, dtype=bool)
+        values[r, p] = df['value'].to_numpy(dtype=float)
+        stored[r, p] = True
+        # 前の公表の値で埋める: 各セルについて、値を保存した最後の公表の行番号
+        last = np.where(stored, np.arange(len(releases))[:, None], -1)
+        last = np.maximum.accumulate(last, axis=0)
+        filled = np.where(last >= 0, values[np.maximum(last, 0), np.arange(len(periods))], np.nan)
+        return releases, periods, filled
+
+    def revisions(self, series, period):
+        """ある期間の値の公表ごとの推移（release, value）"""
+        with self._connect() as con:
+            return pd.read_sql_query(
+                'SELECT release, value FROM observations WHERE series = ? AND period = ? ORDER BY release',
+                con, params=(series, period))
+
+
+def _iso(value):
+    if isinstance(value, (date, pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).date().isoformat()
+    return pd.Timestamp(str(value)).date().isoformat()
+
+
+class AsOfIndex:
+    """
+    matrix() の配列を使った多数の時点の as-of（バックテスト用、SQLite への問い合わせは最初の1回だけ）
+
+    index = AsOfIndex(store, 'gdp'); values = index.at('2020-06-30')  # 期間 → 値の Series
+    """
+
+    def __init__(self, store, series):
+        self.releases, self.periods, self.values = store.matrix(series)
+
+    def at(self, as_of):
+        row = np.searchsorted(self.releases, np.datetime64(_iso(as_of), 'D'), side='right') - 1
+        if row < 0:
+            return pd.Series(dtype=float)
+        values = self.values[row]
+        keep = ~np.isnan(values)
+        return pd.Series(values[keep], index=self.periods[keep])
+
+
+# ---- リアルタイム推定用の年次データ ----
+
+ANNUAL_AGGREGATION = {  # 06_aggregate_to_annual_data.py と同じ
+    'Q (liters)': 'sum',
+    'P (yen/liter)': 'mean',
+    'Tax_rate (%)': 'mean',
+    'GDP (trillion yen)': 'sum',
+    'CPI': 'mean',
+    'P_relative': 'mean',
+}
+
+
+def realtime_annual_frame(gdp, cpi, quarterly_file=QUARTERLY_DATA_FILE):
+    """
+    as-of の GDP（四半期、10億円）・CPI（月次）で置き換えた、07の出力と同じ列の年次データ
+
+    数量・価格・税率は四半期データ（demand_regression_data_raw.csv）の値のまま使い、
+    GDP は add_gdp_data.py と同じく兆円（小数2桁）、CPI は04と同じく月の平均、相対価格 = P / CPI とします。
+    年次の値は 4四半期すべての数量・GDP・CPI がそろう年だけ計算します（公表前の四半期を含む年は NaN）。
+    """
+    if not os.path.exists(quarterly_file):
+        raise FileNotFoundError(f"{quarterly_file} が見つかりません。")
+    df = pd.read_csv(quarterly_file, encoding='utf-8-sig')
+    df['Year'] = df['Year'].astype(str)
+    cpi_quarterly = cpi.groupby(pd.PeriodIndex(cpi.index, freq='M').asfreq('Q').astype(str)).mean()
+    df['GDP (trillion yen)'] = df['Year'].map((gdp / 1000).round(2))
+    df['CPI'] = df['Year'].map(cpi_quarterly)
+    df['P_relative'] = df['P (yen/liter)'] / df['CPI']
+
+    df['Year_num'] = df['Year'].str[:4]
+    complete = df[['Q (liters)', 'GDP (trillion yen)', 'CPI']].notna().all(axis=1).groupby(df['Year_num']).sum() == 4
+    annual = df.groupby('Year_num').agg(ANNUAL_AGGREGATION)
+    annual.loc[~complete.reindex(annual.index, fill_value=False)] = np.nan
+    annual = annual.reset_index().rename(columns={'Year_num': 'Year'})
+    for year in ['2008', '2020', '2009']:
+        annual[f'D{year}'] = (annual['Year'] == year).astype(int)
+    for column, name in [('Q (liters)', 'ln_Q'), ('P (yen/liter)', 'ln_P'), ('GDP (trillion yen)', 'ln_GDP'),
+                         ('Tax_rate (%)', 'ln_Tax_rate'), ('P_relative', 'ln_P_relative')]:
+        values = annual[column].where(annual[column] > 0)
+        annual[name] = np.log(values)
+    return annual
@@ -5,10 +5,12 @@ Step 2 & 3: 2025年を除外して回帰分析を再実行し、VIFを計算し
 import pandas as pd
 import numpy as np
 import statsmodels.api as sm
-from statsmodels.stats.outliers_influence import variance_inflation_factor
 import os
 import json
 
+from lib.collinearity import all_subsets, batch_vif, collinearity_diagnostics
+from lib.results_store import ResultsStore, file_hash, make_key
+
 print("="*60)
 print("Step 2 & 3: 回帰分析の再実行と多重共線性の診断")
 print("="*60)
@@ -130,10 +132,10 @@ print("VIF > 10 の場合、多重共線性が問題となります。")
 # 説明変数だけ（定数項を除く）
 X_for_vif = X_with_const.iloc[:, 1:]  # 定数項を除外
 
-vif_data = pd.DataFrame()
-vif_data["Variable"] = X_for_vif.columns
-vif_data["VIF"] = [variance_inflation_factor(X_for_vif.values, i) 
-                   for i in range(len(X_for_vif.columns))]
+# 相関行列の逆行列の対角要素から全変数のVIFを一度に計算
+# （補助回帰を変数ごとに推定する方法と異なり、定数項ありの補助回帰に対応する中心化VIF）
+diagnostics = collinearity_diagnostics(X_for_vif)
+vif_data = diagnostics['vif']
 
 print("\nVIF値:")
 print(vif_data.to_string(index=False))
@@ -145,6 +147,26 @@ if len(high_vif) > 0:
     print(high_vif.to_string(index=False))
     print("\nこれらの変数をモデルから除外するか、主成分分析などを検討してください。")
 
+# 条件指数と分散分解比率（Belsley）
+print("\n条件指数と分散分解比率（Belsley）:")
+print("条件指数 > 30 の成分で、2つ以上の係数の分散分解比率が0.5を超える場合に共線性が問題となります。")
+print(diagnostics['condition'].round(4).to_string(index=False))
+max_condition_index = float(diagnostics['condition']['Condition_Index'].max())
+print(f"最大条件指数: {max_condition_index:.2f}")
+
+# 偏相関（他の説明変数を制御した相関）
+print("\n偏相関行列:")
+print(diagnostics['partial_correlation'].round(4))
+
+# 説明変数の組み合わせごとのVIF（相関行列は1回だけ計算）
+print("\n説明変数の組み合わせごとの最大VIF:")
+specs = all_subsets(list(X_for_vif.columns), min_size=2, always=['ln_GDP', 'ln_P'])
+spec_vif = batch_vif(X_for_vif, list(X_for_vif.columns), specs)
+spec_summary = spec_vif.groupby('spec_id')['VIF'].max().rename('Max_VIF').to_frame()
+spec_summary['Variables'] = [', '.join(specs[i]) for i in spec_summary.index]
+spec_summary = spec_summary.sort_values('Max_VIF')
+print(spec_summary[['Variables', 'Max_VIF']].round(2).to_string(index=False))
+
 # 9. 変数間の相関マトリックス（詳細）
 print(f"\n【7. 変数間の相関マトリックス（詳細）】")
 print("="*60)
@@ -173,7 +195,8 @@ results_json = {
     'excluded_year': '2025',
     'dummy_variables': {d: float(dummy_coeffs[d]) for d in dummy_vars},
     'dummy_pvalues': {d: float(pvalues[d]) for d in dummy_vars},
-    'vif': {row['Variable']: float(row['VIF']) for _, row in vif_data.iterrows()}
+    'vif': {row['Variable']: float(row['VIF']) for _, row in vif_data.iterrows()},
+    'max_condition_index': max_condition_index
 }
 
 output_file = os.path.join(output_dir, '01_coefficients_annual_level_model_excl_2025.json')
@@ -182,6 +205,39 @@ with open(output_file, 'w', encoding='utf-8') as f:
 
 print(f"結果を保存しました: {output_file}")
 
+# 推定結果ストアにも保存（01の結果と並べて取り出せるようにする）
+store = ResultsStore()
+data_version = file_hash(data_file)
+model_spec = {
+    'formula': 'ln(Q) = C + α×ln(GDP) + β×ln(P) + γ×ln(Tax_rate) + dummies',
+    'price_variable': ln_price_col,
+    'regressors': list(X_with_const.columns),
+    'sample_years': df_complete.loc[y.index, 'Year'].tolist(),
+    # 01と同じ標本になった場合でも別キーになるよう、モデルの種類を明示する
+    'model_variant': 'annual_level_model_excl_2025',
+    'excluded_years': [2025],
+}
+model_options = {'estimator': 'OLS', 'cov_type': 'nonrobust'}
+model_key = make_key(data_version, model_spec, model_options)
+store.save(
+    model_key,
+    model_type='annual_level_model_excl_2025',
+    data_version=data_version,
+    spec=model_spec,
+    options=model_options,
+    summary={**results_json, 'fvalue': float(model.fvalue), 'model_key': model_key},
+    arrays={
+        'params': model.params.to_numpy(),
+        'bse': model.bse.to_numpy(),
+        'pvalues': model.pvalues.to_numpy(),
+        'cov_params': model.cov_params().to_numpy(),
+        'resid': model.resid.to_numpy(),
+        'fitted': model.fittedvalues.to_numpy(),
+    },
+    frame=df_complete.loc[y.index],
+)
+print(f"推定結果ストアに保存しました（key: {model_key[:12]}）")
+
 print("\n" + "="*60)
 print("Step 2 & 3完了")
 print("="*60)
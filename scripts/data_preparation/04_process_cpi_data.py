@@ -35,18 +35,8 @@ df_cpi_data['年月'] = df_cpi_data['類・品目'].astype(str)
 df_cpi_data['Year'] = df_cpi_data['年月'].str[:4].astype(int)
 df_cpi_data['Month'] = df_cpi_data['年月'].str[4:6].astype(int)
 
-# 4. 四半期の計算
-def get_quarter(month):
-    if month in [1, 2, 3]:
-        return 1
-    elif month in [4, 5, 6]:
-        return 2
-    elif month in [7, 8, 9]:
-        return 3
-    else:
-        return 4
-
-df_cpi_data['Quarter'] = df_cpi_data['Month'].apply(get_quarter)
+# 4. 四半期の計算（列全体で一括）
+df_cpi_data['Quarter'] = (df_cpi_data['Month'] - 1) // 3 + 1
 df_cpi_data['YearQuarter'] = df_cpi_data['Year'].astype(str) + 'Q' + df_cpi_data['Quarter'].astype(str)
 
 # 5. 消費者物価指数（総合）の抽出と数値変換
@@ -32,11 +32,12 @@ print(f"\nメインデータを読み込み中: {main_file}")
 df_main = pd.read_csv(main_file, encoding='utf-8-sig')
 print(f"メインデータ数: {len(df_main)}")
 
-# 3. YearQuarter列の作成（メインデータにない場合）
-if 'YearQuarter' not in df_main.columns:
+# 3. YearQuarter列の作成（メインデータにない場合。マージ用なので保存しない）
+year_quarter_added = 'YearQuarter' not in df_main.columns
+if year_quarter_added:
     if 'Year' in df_main.columns:
         # Year列が「1950Q1」形式の場合、そのまま使用
-        if df_main['Year'].dtype == 'object' and df_main['Year'].str.contains('Q', na=False).any():
+        if df_main['Year'].astype(str).str.contains('Q', na=False).any():
             df_main['YearQuarter'] = df_main['Year'].astype(str)
         elif 'Quarter' in df_main.columns:
             df_main['YearQuarter'] = df_main['Year'].astype(str) + 'Q' + df_main['Quarter'].astype(str)
@@ -47,8 +48,9 @@ if 'YearQuarter' not in df_main.columns:
         print("エラー: Year列が見つかりません。")
         exit(1)
 
-# 4. CPIデータのマージ
+# 4. CPIデータのマージ（再実行時は前回のCPI・相対価格を置き換える）
 print("\nCPIデータをマージ中...")
+df_main = df_main.drop(columns=['CPI', 'P_relative'], errors='ignore')
 df_merged = df_main.merge(
     df_cpi[['YearQuarter', 'CPI']],
     on='YearQuarter',
@@ -90,6 +92,8 @@ if len(cpi_merged) > 0:
 # 7. データの保存
 output_file = 'demand_regression_data_raw.csv'
 print(f"\nマージ済みデータを保存中: {output_file}")
+if year_quarter_added:
+    df_merged = df_merged.drop(columns=['YearQuarter'])
 df_merged.to_csv(output_file, index=False, encoding='utf-8-sig')
 print("保存完了！")
 
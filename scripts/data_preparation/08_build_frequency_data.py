@@ -0,0 +1,74 @@
+"""
+元の頻度のデータから分析データを作成するスクリプト（月次など）
+
+データ準備の他のスクリプトは週次の価格・月次の CPI を四半期に平均して demand_regression_data_raw.csv に
+まとめています。このスクリプトは価格（週次）・CPI（月次）・販売量（月次、石油統計の月別販売）・
+税率（制度変更のメモ、月単位）を元の頻度のまま読み込み、指定した頻度に一括で集計します（analysis/lib/frequency.py）。
+GDP は四半期しかないので、月次では CPI を指標にした時間的分解（既定は Chow–Lin、四半期の合計と一致）です。
+月次の販売量は 2007年1月〜2014年3月だけなので、それ以外の月の Q は四半期の販売量（02で補完したもの）を
+季節指数を指標にして月次に分解します（--disaggregation none で従来の補間・観測された月だけ）。
+
+処理内容:
+1. 元の頻度のデータの読み込みと集計（Q は合計、価格・CPI は平均）、月次の GDP・Q の時間的分解
+2. 税率（従量税 / 税抜き価格 × 100、add_tax_rate_data.py と同じ定義）と相対価格の計算
+3. demand_regression_data_monthly.csv（--frequency monthly）などに保存
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'analysis'))
+from lib.design import MONTHLY_DATA_FILE
+from lib.disaggregation import METHODS
+from lib.frequency import MONTHS, build_frame
+
+parser = argparse.ArgumentParser(description='元の頻度のデータから分析データを作成')
+parser.add_argument('--frequency', choices=list(MONTHS), default='monthly', help='頻度（既定: monthly）')
+parser.add_argument('--output', default=None,
+                    help=f'出力ファイル（既定: 月次は {MONTHLY_DATA_FILE}、他は demand_regression_data_<頻度>_native.csv）')
+parser.add_argument('--disaggregation', choices=list(METHODS) + ['none'], default='chow_lin',
+                    help='月次の GDP・Q の時間的分解の方法（既定: chow_lin、none で従来の補間）')
+args = parser.parse_args()
+disaggregation = None if args.disaggregation == 'none' else args.disaggregation
+
+print("="*60)
+print(f"元の頻度のデータから分析データを作成（{args.frequency}）")
+print("="*60)
+
+# 1. 読み込みと集計
+start = time.perf_counter()
+try:
+    df = build_frame(args.frequency, disaggregation=disaggregation)
+except FileNotFoundError as e:
+    print(f"エラー: {e}")
+    exit(1)
+elapsed = time.perf_counter() - start
+print(f"\n集計: {elapsed:.2f}秒（{len(df)}期間: {df['Year'].iloc[0]} - {df['Year'].iloc[-1]}）")
+if args.frequency == 'monthly':
+    print(f"月次の GDP・Q: {'時間的分解（' + disaggregation + '）' if disaggregation else '補間・観測された月のみ'}")
+
+# 2. データの確認
+print("\n各データの欠損状況:")
+for column in ['Q (liters)', 'P (yen/liter)', 'Tax_rate (%)', 'GDP (trillion yen)', 'CPI', 'P_relative']:
+    observed = df[column].notna()
+    period = f"{df.loc[observed, 'Year'].iloc[0]} - {df.loc[observed, 'Year'].iloc[-1]}" if observed.any() else '-'
+    print(f"  {column}: {observed.sum()} / {len(df)}（{period}）")
+
+complete = df.dropna()
+print(f"\n全変数が揃っているデータ: {len(complete)}期間")
+if len(complete) > 0:
+    print(f"期間: {complete['Year'].iloc[0]} - {complete['Year'].iloc[-1]}")
+    print(complete.head(6).to_string(index=False))
+
+# 3. 保存
+output_file = args.output or (MONTHLY_DATA_FILE if args.frequency == 'monthly'
+                              else f'demand_regression_data_{args.frequency}_native.csv')
+df.to_csv(output_file, index=False, encoding='utf-8-sig')
+print(f"\n{output_file} を保存しました")
+
+print("\n完了しました！")
+if args.frequency == 'monthly':
+    print("\n次のステップ:")
+    print("  python analysis/16_estimate_difference_model.py --frequency monthly")
@@ -0,0 +1,105 @@
+"""
+1990年より前の過去データを接続して年次データを延長するスクリプト（backfill）
+
+06の年次データ（demand_regression_data_annual.csv）は価格が1990年、GDP が1994年、販売量が2007年からです。
+data/backfill/ に古い統計表（旧系列の価格・68SNA/93SNA の GDP・販売量など）をローカルの CSV として置き、
+目録 data/backfill/sources.csv に登録すると、重なる年の比で現在の系列に接続して 1950年まで延長します
+（analysis/lib/backfill.py）。目録が空なら06のデータをそのまま写します。
+
+処理内容:
+1. 目録の系列の読み込みと年次への集計、全ての変数・系列の比率による接続（チェーン接続）
+2. 税率（税率表から）と相対価格の補完
+3. demand_regression_data_annual_backfill.csv・セルごとの由来（_provenance.csv）・
+   対数変換済みのデータ（analysis/demand_regression_data_annual_backfill_log_transformed.csv）の保存
+列ごとの結果は入力のバージョンのキーで data/backfill/cache/ に保存し、入力が変わった列だけを再計算します。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'analysis'))
+from lib.backfill import (ANNUAL_FILE, BACKFILL_FILE, BACKFILL_LOG_FILE, CACHE_DIR, MANIFEST_FILE, PROVENANCE_FILE,
+                          build, dataset_version, load_manifest, log_transform)
+
+parser = argparse.ArgumentParser(description='過去データを接続して年次データを延長')
+parser.add_argument('--manifest', default=MANIFEST_FILE, help=f'過去の系列の目録（既定: {MANIFEST_FILE}）')
+parser.add_argument('--overlap-years', type=int, default=5,
+                    help='接続の比に使う重なりの年数（新しい系列の最初の年から、既定: 5）')
+parser.add_argument('--refresh', action='store_true', help='キャッシュを使わずに全ての列を再計算')
+parser.add_argument('--output', default=BACKFILL_FILE, help=f'出力ファイル（既定: {BACKFILL_FILE}）')
+args = parser.parse_args()
+
+print("="*60)
+print("過去データの接続（backfill）")
+print("="*60)
+
+# 1. 目録の確認
+try:
+    manifest = load_manifest(args.manifest)
+except ValueError as e:
+    print(f"エラー: {e}")
+    exit(1)
+print(f"\n目録: {args.manifest}（{len(manifest)}系列）")
+for row in manifest.itertuples(index=False):
+    print(f"  {row.Variable}: {row.Source}（{row.File}、優先度 {row.Priority}）")
+if len(manifest) == 0:
+    print("  登録された過去の系列はありません（06のデータをそのまま写します）。")
+
+# 2. 接続
+start = time.perf_counter()
+try:
+    df, provenance, versions = build(ANNUAL_FILE, args.manifest, args.overlap_years, CACHE_DIR, args.refresh)
+except FileNotFoundError as e:
+    print(f"エラー: {e}")
+    exit(1)
+elapsed = time.perf_counter() - start
+print(f"\n接続: {elapsed*1000:.0f}ミリ秒（キャッシュ: "
+      f"{sum(info['cached'] for info in versions.values())} / {len(versions)}列）")
+
+# 3. 変数ごとの範囲と由来
+print("\n各変数の範囲と由来:")
+for variable, group in provenance.groupby('Variable', sort=False):
+    observed = group[group['Kind'] != 'missing']
+    period = f"{observed['Year'].iloc[0]} - {observed['Year'].iloc[-1]}" if len(observed) else '-'
+    counts = group['Kind'].value_counts()
+    print(f"  {variable}: {period}（観測 {counts.get('observed', 0)}年、接続 {counts.get('spliced', 0)}年、"
+          f"補完 {counts.get('derived', 0)}年）")
+    factors = group[group['Kind'] == 'spliced'].drop_duplicates('Source')
+    for row in factors.itertuples(index=False):
+        print(f"    {row.Source}: 倍率 {row.Factor:.4f}")
+
+complete = df.dropna(subset=['Q (liters)', 'P (yen/liter)', 'Tax_rate (%)', 'GDP (trillion yen)', 'P_relative'])
+print(f"\n全変数が揃っているデータ: {len(complete)}年")
+if len(complete) > 0:
+    print(f"期間: {complete['Year'].iloc[0]} - {complete['Year'].iloc[-1]}")
+
+# 4. 保存
+version = dataset_version(versions)
+df.to_csv(args.output, index=False, encoding='utf-8-sig')
+provenance_file = PROVENANCE_FILE if args.output == BACKFILL_FILE else args.output.replace('.csv', '_provenance.csv')
+provenance.to_csv(provenance_file, index=False, encoding='utf-8-sig')
+log_file = BACKFILL_LOG_FILE if args.output == BACKFILL_FILE else args.output.replace('.csv', '_log_transformed.csv')
+log_transform(df).to_csv(log_file, index=False, encoding='utf-8-sig')
+metadata_file = args.output.replace('.csv', '_version.json')
+with open(metadata_file, 'w', encoding='utf-8') as f:
+    json.dump({
+        'dataset_version': version,
+        'overlap_years': args.overlap_years,
+        'manifest': args.manifest,
+        'columns': {variable: {'key': info['key'], 'sources': info['sources']} for variable, info in versions.items()},
+    }, f, indent=2, ensure_ascii=False)
+
+print("\n" + "="*60)
+print("結果を保存しました")
+print("="*60)
+print(f"延長した年次データ: {args.output}")
+print(f"セルごとの由来: {provenance_file}")
+print(f"対数変換済み: {log_file}")
+print(f"バージョン: {metadata_file}（{version[:16]}）")
+
+print("\n完了しました！")
+print("\n次のステップ:")
+print("  python analysis/01_estimate_demand_function_annual_level_model.py --backfill")
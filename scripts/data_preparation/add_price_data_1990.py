@@ -23,25 +23,10 @@ df_price = pd.DataFrame()
 df_price['調査日'] = df_price_raw.iloc[:, 1]  # 調査日（列1）
 df_price['全国平均'] = pd.to_numeric(df_price_raw.iloc[:, 2], errors='coerce')  # 全国平均価格（列2）
 
-# 調査日から年と四半期を抽出
-def extract_year_quarter(date_str):
-    """日付文字列から年と四半期を抽出"""
-    if pd.isna(date_str):
-        return None, None
-    
-    try:
-        # 日付をパース
-        date = pd.to_datetime(date_str, format='%Y/%m/%d', errors='coerce')
-        if pd.isna(date):
-            return None, None
-        
-        year = date.year
-        quarter = (date.month - 1) // 3 + 1
-        return year, f"Q{quarter}"
-    except:
-        return None, None
-
-df_price['Year'], df_price['Quarter'] = zip(*df_price['調査日'].apply(extract_year_quarter))
+# 調査日から年と四半期を抽出（列全体で一括）
+dates = pd.to_datetime(df_price['調査日'], format='%Y/%m/%d', errors='coerce')
+df_price['Year'] = dates.dt.year
+df_price['Quarter'] = ('Q' + dates.dt.quarter.astype('Int64').astype(str)).where(dates.notna())
 df_price = df_price.dropna(subset=['Year', 'Quarter', '全国平均'])
 
 # 四半期ごとに平均価格を計算
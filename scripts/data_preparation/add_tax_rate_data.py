@@ -1,6 +1,12 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'analysis'))
+from lib.price_decomposition import decompose
+
 print("税率データを追加します...\n")
 
 # 1. 既存のdemand_regression_data_raw.csvを読み込む
@@ -69,6 +75,7 @@ df_main = df_main.merge(df_tax_quarterly[['YearQuarter', 'Gasoline_Tax_Amount',
 # 税込み価格 = 本体価格 + ガソリン税額 + 消費税額
 # 消費税額 = (税込み価格 - ガソリン税額) × 消費税率 / (1 + 消費税率)
 # 本体価格（税抜き）= 税込み価格 - ガソリン税額 - 消費税額
+# 分解は analysis/lib/price_decomposition.py（この定義は tax_on_tax=False にあたる）
 
 df_main['Tax_rate (%)'] = np.nan
 mask = (df_main['Gasoline_Tax_Amount'].notna() & 
@@ -76,23 +83,15 @@ mask = (df_main['Gasoline_Tax_Amount'].notna() &
         df_main['Consumption_Tax_Rate'].notna())
 
 if mask.sum() > 0:
-    # 消費税率を小数に変換
-    consumption_tax_rate_decimal = df_main.loc[mask, 'Consumption_Tax_Rate'] / 100.0
-    
-    # 消費税額を計算
-    tax_base = df_main.loc[mask, 'P (yen/liter)'] - df_main.loc[mask, 'Gasoline_Tax_Amount']
-    consumption_tax_amount = tax_base * consumption_tax_rate_decimal / (1 + consumption_tax_rate_decimal)
-    
-    # 税抜き価格（本体価格）を計算
-    price_base = df_main.loc[mask, 'P (yen/liter)'] - df_main.loc[mask, 'Gasoline_Tax_Amount'] - consumption_tax_amount
+    components = decompose(df_main.loc[mask, 'P (yen/liter)'].to_numpy(),
+                           df_main.loc[mask, 'Gasoline_Tax_Amount'].to_numpy(),
+                           df_main.loc[mask, 'Consumption_Tax_Rate'].to_numpy() / 100.0,
+                           tax_on_tax=False)
     
     # 税率を計算：合計従量税率 / 税抜き価格 × 100
     # ただし、税抜き価格が0以下になる場合は計算しない
-    valid_price_mask = price_base > 0
-    df_main.loc[mask & valid_price_mask, 'Tax_rate (%)'] = (
-        df_main.loc[mask & valid_price_mask, 'Gasoline_Tax_Amount'] / 
-        price_base[valid_price_mask] * 100
-    ).round(2)
+    tax_rate = np.where(components['base_price'] > 0, components['excise_rate'] * 100, np.nan)
+    df_main.loc[mask, 'Tax_rate (%)'] = np.round(tax_rate, 2)
 
 # 既存のTax_rate (%)がある場合は上書きしない（既存データを優先）
 existing_tax_mask = df_main['Tax_rate (%)'].notna() & (df_main['Tax_rate (%)'] != '')
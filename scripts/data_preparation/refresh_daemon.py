@@ -0,0 +1,63 @@
+"""
+統計データの更新を監視し、影響を受ける処理だけを再実行するサービス
+
+受け取り用のディレクトリ（既定 data/drop）に新しいファイルを置くと、検証して data/ に配置し、
+そのファイルを読むデータ準備スクリプトと、後続の再推定・図の作成を自動で実行します（lib/refresh.py）。
+例: 週次の価格（1990-2025レギュラー現金価格.csv）→ add_price_data_1990 → 05 → 06 → 07 → 01 → 02・03 の図
+
+- GDP速報（gaku-jg*.csv・実質原系列）、CPI（zmi2020s.csv・zni2020a.csv）、週次の価格、販売量、税率表に対応
+- 変更の判定は SHA-256。data/ のファイルを直接書き換えた場合も検出
+- --once で1回だけ確認して終了、--plan で変更されたファイルから実行される処理を表示
+
+実行方法（リポジトリのルートで）:
+    python scripts/data_preparation/refresh_daemon.py
+    python scripts/data_preparation/refresh_daemon.py --once --workers 2
+    python scripts/data_preparation/refresh_daemon.py --plan "data/1990-2025_ガソリン小売価格四半期ごと/1990-2025レギュラー現金価格.csv"
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'analysis'))
+from lib.refresh import DROP_DIR, STAGES, RefreshService, dependencies, plan
+
+parser = argparse.ArgumentParser(description='統計データの更新の監視と処理の再実行')
+parser.add_argument('--drop-dir', default=DROP_DIR, help='受け取り用のディレクトリ')
+parser.add_argument('--interval', type=float, default=2.0, help='確認の間隔（秒）')
+parser.add_argument('--workers', type=int, default=None, help='同時に実行する処理の数（省略時は CPU 数）')
+parser.add_argument('--once', action='store_true', help='1回だけ確認して終了')
+parser.add_argument('--plan', nargs='+', metavar='FILE', help='変更されたファイルから実行される処理を表示して終了')
+args = parser.parse_args()
+
+print("="*60)
+print("統計データの更新の監視")
+print("="*60)
+
+if args.plan:
+    selected = plan(args.plan)
+    deps = dependencies(selected)
+    print(f"\n変更されたファイル: {', '.join(args.plan)}")
+    print(f"実行される処理（{len(selected)}件）:")
+    for name in selected:
+        # 間接的な依存（依存先がさらに依存している処理）は表示しない
+        direct = deps[name] - set().union(*(deps[d] for d in deps[name]))
+        after = f"（{', '.join(sorted(direct, key=selected.index))} の後）" if direct else ''
+        print(f"  {name}: {STAGES[name]['script']}{after}")
+    sys.exit(0)
+
+os.makedirs(args.drop_dir, exist_ok=True)
+service = RefreshService(drop_dir=args.drop_dir, workers=args.workers)
+print(f"\n受け取り用のディレクトリ: {args.drop_dir}")
+print(f"状態ファイル: {service.state_file}")
+
+if args.once:
+    asyncio.run(service.run_once())
+    print("\n完了しました！")
+else:
+    print(f"{args.interval}秒ごとに確認します（Ctrl+C で終了）")
+    try:
+        asyncio.run(service.run_forever(args.interval))
+    except KeyboardInterrupt:
+        print("\n終了しました")